@@ -4,6 +4,16 @@ Integração com OpenAI para geração de insights
 from typing import List, Tuple, Optional
 import pandas as pd
 
+from result_set import ResultSet
+
+
+def _to_dataframe(data, columns: List[str]) -> pd.DataFrame:
+    """DataFrame dos dados; um ResultSet reaproveita os arrays colunares."""
+    if isinstance(data, ResultSet):
+        return data.to_pandas()
+    return pd.DataFrame(data, columns=columns)
+
+
 class AIInsightsGenerator:
     """Gerador de insights usando OpenAI"""
     
@@ -50,7 +60,7 @@ class AIInsightsGenerator:
         Gera insights sobre os dados usando IA.
         
         Args:
-            data: Lista de tuplas com os dados
+            data: ResultSet ou lista de tuplas com os dados
             columns: Nomes das colunas
             query_description: Descrição da consulta/contexto
             max_rows_sample: Número máximo de linhas para análise
@@ -62,8 +72,8 @@ class AIInsightsGenerator:
             return "Erro: Cliente OpenAI não inicializado. Configure a chave da API."
         
         try:
-            # Converte dados para DataFrame
-            df = pd.DataFrame(data, columns=columns)
+            # Converte dados para DataFrame (ResultSet: arrays colunares sem cópia)
+            df = _to_dataframe(data, columns)
             
             # Limita número de linhas para análise
             df_sample = df.head(max_rows_sample)
@@ -189,7 +199,7 @@ Formate a resposta de forma clara e estruturada em português do Brasil."""
         Gera análise customizada baseada em uma pergunta específica.
         
         Args:
-            data: Lista de tuplas com os dados
+            data: ResultSet ou lista de tuplas com os dados
             columns: Nomes das colunas
             custom_question: Pergunta específica sobre os dados
         
@@ -200,7 +210,7 @@ Formate a resposta de forma clara e estruturada em português do Brasil."""
             return "Erro: Cliente OpenAI não inicializado."
         
         try:
-            df = pd.DataFrame(data, columns=columns)
+            df = _to_dataframe(data, columns)
             df_sample = df.head(50)
             
             data_preview = df_sample.to_string()
@@ -4,11 +4,16 @@ Módulo de autenticação
 Responsável por:
 - Estabelecer conexão com SQL Server (SQL Auth ou Trusted Connection)
 - Fazer fallback automático para Trusted se o login 'sa' estiver desabilitado
+- Manter um pool de conexões com filas separadas para metadados e consultas
 - Validar usuário lógico na tabela Usuarios / stored procedure csspValidaSenha
 """
 
 import os
+import time
 import typing
+import threading
+from collections import deque
+from contextlib import contextmanager
 from datetime import datetime
 
 try:
@@ -97,6 +102,277 @@ def get_db_connection(db_config: DatabaseConfig):
     raise NotImplementedError(f"Tipo de banco não suportado: {tipo}")
 
 
+# ============================================================
+# POOL DE CONEXÕES
+# ============================================================
+
+# Filas (lanes) do pool: consultas de metadados são rápidas e interativas e
+# não devem esperar atrás de consultas analíticas longas.
+LANE_METADATA = "metadata"
+LANE_QUERY = "query"
+
+# (mínimo, máximo) de conexões por fila
+DEFAULT_POOL_LANES = {
+    LANE_METADATA: (1, 2),
+    LANE_QUERY: (0, 4),
+}
+
+
+class PoolTimeoutError(RuntimeError):
+    """Nenhuma conexão ficou disponível dentro do tempo de espera."""
+
+
+class _PoolLane:
+    """Estado de uma fila do pool (protegido pelo lock do ConnectionPool)."""
+
+    def __init__(self, name: str, min_size: int, max_size: int, lock: threading.Lock):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError(f"Limites inválidos para a fila '{name}': min={min_size}, max={max_size}")
+        self.name = name
+        self.min_size = min_size
+        self.max_size = max_size
+        # conexões ociosas: (conexão, instante da devolução)
+        self.idle = deque()
+        # total de conexões abertas (ociosas + emprestadas + em criação)
+        self.total = 0
+        self.available = threading.Condition(lock)
+
+
+class ConnectionPool:
+    """Pool de conexões DB-API thread-safe com filas separadas.
+
+    - `factory`: função sem argumentos que abre uma nova conexão
+      (ex.: ``lambda: get_db_connection(cfg)`` ou ``sqlite3.connect``);
+    - `lanes`: dicionário ``fila -> (mínimo, máximo)``;
+    - `idle_timeout`: segundos que uma conexão excedente ao mínimo pode
+      ficar ociosa antes de ser fechada;
+    - `health_check_sql`: instrução executada ao emprestar uma conexão
+      ociosa; conexões que falham são descartadas e substituídas.
+
+    Uso:
+        with pool.connection(LANE_METADATA) as conn:
+            cur = conn.cursor()
+            ...
+    """
+
+    def __init__(
+        self,
+        factory: typing.Callable[[], typing.Any],
+        lanes: typing.Optional[typing.Dict[str, typing.Tuple[int, int]]] = None,
+        idle_timeout: float = 300.0,
+        checkout_timeout: float = 30.0,
+        health_check_sql: typing.Optional[str] = "SELECT 1",
+        clock: typing.Callable[[], float] = time.monotonic,
+    ):
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._lanes = {
+            name: _PoolLane(name, int(lo), int(hi), self._lock)
+            for name, (lo, hi) in (lanes or DEFAULT_POOL_LANES).items()
+        }
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.health_check_sql = health_check_sql
+        self._clock = clock
+        self._closed = False
+
+    # ----------------------------------------------------------
+    # Empréstimo / devolução
+    # ----------------------------------------------------------
+    def acquire(self, lane: str = LANE_QUERY, timeout: typing.Optional[float] = None):
+        """Empresta uma conexão da fila; deve ser devolvida com `release`."""
+        q = self._lane(lane)
+        wait = self.checkout_timeout if timeout is None else timeout
+        deadline = self._clock() + wait
+        while True:
+            conn = None
+            create = False
+            expired = []
+            try:
+                with q.available:
+                    while True:
+                        if self._closed:
+                            raise RuntimeError("Pool de conexões encerrado")
+                        expired.extend(self._collect_expired(q))
+                        if q.idle:
+                            # LIFO: reaproveita a conexão usada mais recentemente
+                            conn, _ = q.idle.pop()
+                            break
+                        if q.total < q.max_size:
+                            q.total += 1
+                            create = True
+                            break
+                        remaining = deadline - self._clock()
+                        if remaining <= 0:
+                            raise PoolTimeoutError(
+                                f"Nenhuma conexão disponível na fila '{lane}' após {wait:.0f}s"
+                            )
+                        q.available.wait(remaining)
+            finally:
+                # fechamento fora do lock: pode envolver I/O de rede
+                self._close_all(expired)
+
+            if create:
+                try:
+                    return self._factory()
+                except Exception:
+                    with q.available:
+                        q.total -= 1
+                        q.available.notify()
+                    raise
+
+            if self._is_healthy(conn):
+                return conn
+            # conexão quebrada: descarta e tenta novamente (nova ou outra ociosa)
+            self._discard(q, conn)
+
+    def release(self, conn, lane: str = LANE_QUERY, discard: bool = False):
+        """Devolve uma conexão emprestada por `acquire`."""
+        q = self._lane(lane)
+        if not discard:
+            try:
+                # encerra transação implícita aberta pelo SELECT (autocommit=False)
+                conn.rollback()
+            except Exception:
+                discard = True
+        if discard or self._closed:
+            self._discard(q, conn)
+            return
+        with q.available:
+            q.idle.append((conn, self._clock()))
+            expired = self._collect_expired(q)
+            q.available.notify()
+        self._close_all(expired)
+
+    @contextmanager
+    def connection(self, lane: str = LANE_QUERY, timeout: typing.Optional[float] = None):
+        """Context manager que empresta e devolve uma conexão da fila."""
+        conn = self.acquire(lane, timeout)
+        try:
+            yield conn
+        finally:
+            self.release(conn, lane)
+
+    # ----------------------------------------------------------
+    # Manutenção
+    # ----------------------------------------------------------
+    def prefill(self):
+        """Abre as conexões mínimas de cada fila."""
+        for name, q in self._lanes.items():
+            while True:
+                with q.available:
+                    if self._closed or q.total >= q.min_size:
+                        break
+                    q.total += 1
+                try:
+                    conn = self._factory()
+                except Exception:
+                    with q.available:
+                        q.total -= 1
+                    raise
+                with q.available:
+                    q.idle.append((conn, self._clock()))
+                    q.available.notify()
+
+    def evict_idle(self) -> int:
+        """Fecha conexões ociosas além do mínimo há mais de `idle_timeout`.
+
+        Retorna a quantidade de conexões fechadas.
+        """
+        expired = []
+        for q in self._lanes.values():
+            with q.available:
+                expired.extend(self._collect_expired(q))
+        self._close_all(expired)
+        return len(expired)
+
+    def close(self):
+        """Fecha as conexões ociosas; as emprestadas são fechadas na devolução."""
+        to_close = []
+        with self._lock:
+            self._closed = True
+            for q in self._lanes.values():
+                while q.idle:
+                    conn, _ = q.idle.popleft()
+                    q.total -= 1
+                    to_close.append(conn)
+                q.available.notify_all()
+        self._close_all(to_close)
+
+    def lane_size(self, lane: str = LANE_QUERY) -> int:
+        """Número máximo de conexões da fila."""
+        return self._lane(lane).max_size
+
+    def stats(self) -> typing.Dict[str, typing.Dict[str, int]]:
+        """Retorna contadores por fila: ociosas, emprestadas e total."""
+        with self._lock:
+            return {
+                name: {'idle': len(q.idle), 'in_use': q.total - len(q.idle), 'total': q.total}
+                for name, q in self._lanes.items()
+            }
+
+    # ----------------------------------------------------------
+    # Auxiliares
+    # ----------------------------------------------------------
+    def _lane(self, lane: str) -> _PoolLane:
+        try:
+            return self._lanes[lane]
+        except KeyError:
+            raise ValueError(f"Fila de conexões desconhecida: {lane}") from None
+
+    def _collect_expired(self, q: _PoolLane) -> list:
+        """Remove (sob o lock) as conexões ociosas expiradas da fila."""
+        if not self.idle_timeout or q.total <= q.min_size:
+            return []
+        limit = self._clock() - self.idle_timeout
+        expired = []
+        # as mais antigas ficam no início da deque
+        while q.idle and q.total > q.min_size and q.idle[0][1] < limit:
+            conn, _ = q.idle.popleft()
+            q.total -= 1
+            expired.append(conn)
+        return expired
+
+    def _is_healthy(self, conn) -> bool:
+        if not self.health_check_sql:
+            return True
+        cur = None
+        try:
+            cur = conn.cursor()
+            cur.execute(self.health_check_sql)
+            cur.fetchall()
+            return True
+        except Exception:
+            return False
+        finally:
+            try:
+                if cur is not None:
+                    cur.close()
+            except Exception:
+                pass
+
+    def _discard(self, q: _PoolLane, conn):
+        with q.available:
+            q.total -= 1
+            q.available.notify()
+        self._close_all([conn])
+
+    @staticmethod
+    def _close_all(conns):
+        for c in conns:
+            try:
+                c.close()
+            except Exception:
+                pass
+
+
+def create_connection_pool(db_config: DatabaseConfig, **kwargs) -> ConnectionPool:
+    """Cria um ConnectionPool cujas conexões são abertas por `get_db_connection`."""
+    if not db_config:
+        raise ValueError("DatabaseConfig é obrigatório")
+    return ConnectionPool(lambda: get_db_connection(db_config), **kwargs)
+
+
 # ============================================================
 # VALIDAÇÃO DE USUÁRIO
 # ============================================================
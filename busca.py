@@ -0,0 +1,131 @@
+"""
+Índice de busca incremental para CSData Studio
+
+Usado nas caixas de pesquisa de fontes (tabelas/views) e de informações
+(colunas). Cada entrada tem um ou mais textos — nome técnico, nome amigável
+(`table_friendly_names.json`), rótulo de `mapping.FIELD_LABEL_OVERRIDES` —
+normalizados uma única vez: minúsculas, sem acentos ("Saída" ~ "saida") e
+com os nomes em CamelCase quebrados em palavras ("NotaSaidaItens" ->
+"nota saida itens").
+
+A busca usa um índice de trigramas:
+
+- termos de 1 ou 2 letras: trecho contido no texto;
+- termos maiores: entradas que compartilham trigramas com o termo; quem
+  contém o termo inteiro ganha pontuação cheia e quem tem ao menos
+  `LIMIAR_APROXIMADO` dos trigramas (erros de digitação) ganha pontuação
+  parcial.
+
+Com várias palavras, todas precisam combinar. O resultado vem ordenado por
+relevância: palavra inteira > início de palavra > trecho > aproximado; em
+empate, o primeiro texto (nome técnico) mais curto e depois a ordem de
+inclusão.
+"""
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, Hashable, List, Optional, Set, Tuple
+
+# fração mínima dos trigramas do termo presentes na entrada (busca aproximada)
+LIMIAR_APROXIMADO = 0.6
+
+_RE_CAMEL = re.compile(r'(?<=[a-z0-9])(?=[A-Z])|(?<=[A-Z])(?=[A-Z][a-z])')
+_RE_SEPARADORES = re.compile(r'[^0-9a-z]+')
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas, sem acentos e só com letras/dígitos separados por espaço."""
+    if not texto:
+        return ''
+    texto = _RE_CAMEL.sub(' ', str(texto))
+    texto = unicodedata.normalize('NFKD', texto)
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+    return _RE_SEPARADORES.sub(' ', texto).strip()
+
+
+def _trigramas(texto: str) -> Set[str]:
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class IndiceBusca:
+    """Índice de trigramas sobre os textos de cada entrada (chave)."""
+
+    def __init__(self):
+        self._chaves: List[Hashable] = []
+        # texto normalizado de cada entrada, com ' ' entre palavras
+        self._textos: List[str] = []
+        # o mesmo texto sem espaços (trechos que atravessam palavras)
+        self._compactos: List[str] = []
+        self._palavras: List[Set[str]] = []
+        # tamanho do primeiro texto (desempate do ranking)
+        self._tamanhos: List[int] = []
+        self._postagens: Dict[str, List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._chaves)
+
+    def adicionar(self, chave: Hashable, *textos: Optional[str]):
+        """Inclui uma entrada; `textos` vazios/None são ignorados."""
+        indice = len(self._chaves)
+        normalizados = [n for n in (normalizar(t) for t in textos if t) if n]
+        normalizado = ' '.join(normalizados)
+        compacto = normalizado.replace(' ', '')
+        self._chaves.append(chave)
+        self._textos.append(normalizado)
+        self._compactos.append(compacto)
+        self._palavras.append(set(normalizado.split()))
+        self._tamanhos.append(len(normalizados[0]) if normalizados else 0)
+        for tri in _trigramas(normalizado) | _trigramas(compacto):
+            self._postagens.setdefault(tri, []).append(indice)
+
+    def _pontuar_termo(self, termo: str) -> Dict[int, float]:
+        """Pontuação de cada entrada que combina com um termo normalizado (sem espaços)."""
+        pontos: Dict[int, float] = {}
+        if len(termo) < 3:
+            for i, compacto in enumerate(self._compactos):
+                if termo in compacto:
+                    pontos[i] = self._pontuacao_exata(i, termo)
+            return pontos
+        tris = _trigramas(termo)
+        contagem: Counter = Counter()
+        for tri in tris:
+            contagem.update(self._postagens.get(tri, ()))
+        minimo = max(1, int(len(tris) * LIMIAR_APROXIMADO + 0.999))
+        for i, n in contagem.items():
+            if n < minimo:
+                continue
+            if n == len(tris) and termo in self._compactos[i]:
+                pontos[i] = self._pontuacao_exata(i, termo)
+            else:
+                pontos[i] = n / len(tris)
+        return pontos
+
+    def _pontuacao_exata(self, i: int, termo: str) -> float:
+        if termo in self._palavras[i]:
+            return 4.0
+        texto = self._textos[i]
+        if texto.startswith(termo) or f' {termo}' in texto:
+            return 3.0
+        return 2.0
+
+    def buscar(self, consulta: str, limite: Optional[int] = None) -> List[Hashable]:
+        """Chaves que combinam com `consulta`, das mais relevantes para as menos.
+
+        Consulta vazia devolve todas as entradas na ordem de inclusão.
+        """
+        termos = normalizar(consulta).split()
+        if not termos:
+            return list(self._chaves[:limite] if limite else self._chaves)
+        total: Optional[Dict[int, float]] = None
+        for termo in termos:
+            pontos = self._pontuar_termo(termo)
+            if total is None:
+                total = pontos
+            else:
+                total = {i: total[i] + p for i, p in pontos.items() if i in total}
+            if not total:
+                return []
+        ordem: List[Tuple[float, int, int]] = sorted((-p, self._tamanhos[i], i) for i, p in total.items())
+        if limite:
+            ordem = ordem[:limite]
+        return [self._chaves[i] for _, _, i in ordem]
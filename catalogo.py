@@ -0,0 +1,459 @@
+"""
+Catálogo do esquema do banco para CSData Studio
+
+Os métodos de metadados do QueryBuilder (`get_table_columns`,
+`get_primary_keys`, `get_foreign_keys`, ...) faziam uma consulta ao
+INFORMATION_SCHEMA por tabela; com ~1.160 tabelas e ~23.800 colunas a
+navegação fica lenta em conexões remotas (VPN).
+
+O `SchemaCatalog` carrega tabelas, colunas, chaves primárias e chaves
+estrangeiras de uma só vez — um único lote de consultas sobre as views
+`sys.*` — e os mantém indexados em memória por (esquema, tabela), com as
+colunas na ordem ordinal. Os nomes são comparados sem diferenciar
+maiúsculas/minúsculas, como na collation padrão do SQL Server.
+
+O catálogo é gravado em um arquivo local por servidor/banco
+(`caminho_cache`); no login seguinte ele é exibido de imediato e validado
+em segundo plano pela assinatura do esquema, recarregando apenas os
+objetos cuja data de alteração mudou.
+
+Sem conexão, o catálogo pode ser montado a partir das planilhas exportadas
+do banco na pasta Planilhas/ (`SchemaCatalog.from_planilhas`).
+"""
+import csv
+import hashlib
+import os
+import pickle
+import re
+import sys
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+@dataclass
+class TableInfo:
+    schema: str
+    name: str
+    type: str
+
+    @property
+    def full_name(self) -> str:
+        return f"[{self.schema}].{self.name}"
+
+
+@dataclass
+class ColumnInfo:
+    table_schema: str
+    table_name: str
+    column_name: str
+    data_type: str
+    is_nullable: bool
+
+    @property
+    def full_name(self) -> str:
+        return f"{self.table_name}.{self.column_name}"
+
+
+@dataclass
+class ForeignKey:
+    constraint_name: Optional[str] = None
+    fk_schema: Optional[str] = None
+    fk_table: Optional[str] = None
+    fk_column: Optional[str] = None
+    pk_schema: Optional[str] = None
+    pk_table: Optional[str] = None
+    pk_column: Optional[str] = None
+
+
+# Versão do formato do catálogo gravado em disco; mudar ao alterar a estrutura
+CATALOGO_VERSAO = 1
+
+# Impressão barata do esquema: muda quando um objeto é criado, alterado ou removido
+SQL_ASSINATURA = """
+SELECT MAX(modify_date), COUNT(*)
+FROM sys.objects
+WHERE type IN ('U', 'V', 'PK', 'F') AND is_ms_shipped = 0
+"""
+
+# Tabelas e views com a data de alteração efetiva: a do próprio objeto ou a
+# da sua PK/FK mais recente (criar uma constraint também altera a tabela)
+SQL_OBJETOS = """
+SELECT s.name, o.name, o.type,
+    (SELECT MAX(d) FROM (VALUES (o.modify_date),
+        ((SELECT MAX(k.modify_date) FROM sys.objects k
+          WHERE k.parent_object_id = o.object_id AND k.type IN ('PK', 'F')))) AS v(d)),
+    o.object_id
+FROM sys.objects o
+JOIN sys.schemas s ON s.schema_id = o.schema_id
+WHERE o.type IN ('U', 'V') AND o.is_ms_shipped = 0
+ORDER BY s.name, o.name
+"""
+
+_SQL_COLUNAS = """
+SELECT s.name, o.name, c.name, ty.name, c.is_nullable
+FROM sys.columns c
+JOIN sys.objects o ON o.object_id = c.object_id
+JOIN sys.schemas s ON s.schema_id = o.schema_id
+JOIN sys.types ty ON ty.user_type_id = c.system_type_id
+WHERE o.type IN ('U', 'V') AND o.is_ms_shipped = 0{filtro}
+ORDER BY s.name, o.name, c.column_id
+"""
+
+SQL_PKS = """
+SELECT s.name, o.name, c.name
+FROM sys.indexes i
+JOIN sys.index_columns ic ON ic.object_id = i.object_id AND ic.index_id = i.index_id
+JOIN sys.columns c ON c.object_id = ic.object_id AND c.column_id = ic.column_id
+JOIN sys.objects o ON o.object_id = i.object_id
+JOIN sys.schemas s ON s.schema_id = o.schema_id
+WHERE i.is_primary_key = 1 AND o.is_ms_shipped = 0
+ORDER BY s.name, o.name, ic.key_ordinal
+"""
+
+SQL_FKS = """
+SELECT fk.name, fs.name, ft.name, fc.name, ps.name, pt.name, pc.name
+FROM sys.foreign_keys fk
+JOIN sys.foreign_key_columns fkc ON fkc.constraint_object_id = fk.object_id
+JOIN sys.objects ft ON ft.object_id = fkc.parent_object_id
+JOIN sys.schemas fs ON fs.schema_id = ft.schema_id
+JOIN sys.columns fc ON fc.object_id = fkc.parent_object_id AND fc.column_id = fkc.parent_column_id
+JOIN sys.objects pt ON pt.object_id = fkc.referenced_object_id
+JOIN sys.schemas ps ON ps.schema_id = pt.schema_id
+JOIN sys.columns pc ON pc.object_id = fkc.referenced_object_id AND pc.column_id = fkc.referenced_column_id
+ORDER BY fs.name, ft.name, fk.name, fkc.constraint_column_id
+"""
+
+SQL_COLUNAS = _SQL_COLUNAS.format(filtro="")
+
+# Um lote, cinco conjuntos de resultados (lidos com cursor.nextset()):
+# assinatura, tabelas/views, colunas, colunas de PK e colunas de FK.
+SQL_CATALOGO = ";\n".join(["SET NOCOUNT ON", SQL_ASSINATURA, SQL_OBJETOS, SQL_COLUNAS, SQL_PKS, SQL_FKS]) + ";"
+
+# acima disso a atualização incremental vira uma recarga completa
+MAX_OBJETOS_INCREMENTAL = 200
+
+# Planilhas exportadas do banco (pasta Planilhas/, separadas por ';', sem cabeçalho)
+PLANILHA_TABELAS = "Base do agrupamento.csv"              # esquema;tabela;BASE TABLE|VIEW
+PLANILHA_COLUNAS = "Lista de campos de cada tabela.csv"   # esquema;tabela;coluna;tipo;tamanho;YES|NO;default
+PLANILHA_PKS = "Identificar chaves primárias.csv"         # esquema;tabela;coluna
+PLANILHA_FKS = "Identificar relacionamentos.csv"          # constraint;tabela_pk;coluna_pk;tabela_fk;coluna_fk
+
+
+def _sql_atualizacao(object_ids: Iterable[int]) -> str:
+    """Lote da atualização incremental: colunas dos objetos alterados, PKs e FKs."""
+    ids = ", ".join(str(int(i)) for i in object_ids)
+    colunas = _SQL_COLUNAS.format(filtro=f" AND o.object_id IN ({ids})")
+    return ";\n".join(["SET NOCOUNT ON", colunas, SQL_PKS, SQL_FKS]) + ";"
+
+
+def _ler_conjuntos(conn, sql: str, esperados: int) -> List[List[tuple]]:
+    cur = conn.cursor()
+    try:
+        cur.execute(sql)
+        conjuntos = []
+        while True:
+            # SET NOCOUNT ON evita contagens, mas alguns drivers ainda
+            # entregam conjuntos sem colunas: são ignorados
+            if cur.description:
+                conjuntos.append(cur.fetchall())
+            if not cur.nextset():
+                break
+    finally:
+        cur.close()
+    if len(conjuntos) != esperados:
+        raise RuntimeError(f"Catálogo incompleto: {len(conjuntos)} de {esperados} conjuntos de resultados")
+    return conjuntos
+
+
+def ler_planilha(caminho: str, campos: int) -> Iterator[tuple]:
+    """Lê uma planilha exportada linha a linha: tuplas com os `campos` primeiros valores.
+
+    Os valores são internados (`sys.intern`): esquema, tabela e tipo se
+    repetem em milhares de linhas e passam a ocupar uma única string.
+    Linhas incompletas são ignoradas.
+    """
+    intern, strip = sys.intern, str.strip
+    with open(caminho, encoding='utf-8-sig', newline='') as f:
+        for linha in csv.reader(f, delimiter=';'):
+            if len(linha) < campos:
+                continue
+            valores = tuple(map(intern, map(strip, linha[:campos])))
+            if valores[0]:
+                yield valores
+
+
+def linhas_fk_planilha(caminho: str, schema: str = 'dbo') -> Iterator[tuple]:
+    """Relacionamentos da planilha no formato das linhas de FK de `from_rows`.
+
+    A planilha não traz o esquema; todas as tabelas ficam em `schema`.
+    """
+    for nome, pk_tabela, pk_coluna, fk_tabela, fk_coluna in ler_planilha(caminho, 5):
+        yield nome, schema, fk_tabela, fk_coluna, schema, pk_tabela, pk_coluna
+
+
+def chave_tabela(schema: str, table: str) -> Tuple[str, str]:
+    """Chave dos índices: (esquema, tabela) sem colchetes e em minúsculas."""
+    return ((schema or 'dbo').strip().strip('[]').lower(), (table or '').strip().strip('[]').lower())
+
+
+class SchemaCatalog:
+    """Tabelas, colunas, PKs e FKs do banco indexados por (esquema, tabela).
+
+    As consultas retornam None para tabelas ausentes do catálogo (ex.: criadas
+    depois do carregamento), para que o chamador possa consultar o banco.
+
+    O catálogo pode ser gravado em disco (`salvar`) e validado no próximo
+    login por `atualizado`, que compara a assinatura do esquema
+    (MAX(modify_date) e contagem de objetos) e recarrega só os objetos
+    alterados. Um catálogo nunca é alterado depois de montado: a atualização
+    devolve uma nova instância, que pode substituir a anterior enquanto
+    outras threads ainda a consultam.
+    """
+
+    def __init__(self):
+        self._tabelas: Dict[Tuple[str, str], TableInfo] = {}
+        self._colunas: Dict[Tuple[str, str], List[ColumnInfo]] = {}
+        self._pks: Dict[Tuple[str, str], List[str]] = {}
+        # FKs em que a tabela é a referenciadora / a referenciada
+        self._fks_saida: Dict[Tuple[str, str], List[ForeignKey]] = {}
+        self._fks_entrada: Dict[Tuple[str, str], List[ForeignKey]] = {}
+        # (object_id, data de alteração efetiva) de cada tabela/view
+        self._objetos: Dict[Tuple[str, str], Tuple[Optional[int], object]] = {}
+        # (MAX(modify_date), quantidade de objetos) no momento da carga
+        self.assinatura: Optional[tuple] = None
+
+    # ----------------------------------------------------------
+    # Carga
+    # ----------------------------------------------------------
+    @classmethod
+    def from_connection(cls, conn) -> "SchemaCatalog":
+        """Carrega o catálogo com um único lote (`SQL_CATALOGO`) na conexão."""
+        assinatura, tabelas, colunas, pks, fks = _ler_conjuntos(conn, SQL_CATALOGO, 5)
+        cat = cls.from_rows(tabelas, colunas, pks, fks)
+        cat.assinatura = tuple(assinatura[0]) if assinatura else None
+        return cat
+
+    @classmethod
+    def from_rows(
+        cls,
+        tabelas: Iterable[tuple],
+        colunas: Iterable[tuple],
+        pks: Iterable[tuple] = (),
+        fks: Iterable[tuple] = (),
+    ) -> "SchemaCatalog":
+        """Monta o catálogo a partir das linhas de `SQL_CATALOGO`.
+
+        - tabelas: (esquema, tabela, tipo[, data de alteração[, object_id]]) —
+          tipo 'U'/'BASE TABLE' ou 'V'/'VIEW';
+        - colunas: (esquema, tabela, coluna, tipo de dado, aceita nulo), em ordem ordinal;
+        - pks: (esquema, tabela, coluna), na ordem da chave;
+        - fks: (constraint, esquema, tabela, coluna, esquema_pk, tabela_pk, coluna_pk).
+        """
+        cat = cls()
+        cat._definir_tabelas(tabelas)
+        cat._adicionar_colunas(colunas)
+        cat._definir_chaves(pks, fks)
+        return cat
+
+    @classmethod
+    def from_planilhas(cls, pasta: str) -> "SchemaCatalog":
+        """Monta o catálogo a partir das planilhas exportadas em `pasta`, sem conexão.
+
+        A lista de colunas (~23.800 linhas) é lida uma única vez, em fluxo;
+        tabelas que só aparecem nela entram como TABLE. As planilhas de
+        tabelas, PKs e relacionamentos são opcionais.
+        """
+        def opcional(nome, leitor, *args):
+            caminho = os.path.join(pasta, nome)
+            return leitor(caminho, *args) if os.path.exists(caminho) else ()
+
+        cat = cls()
+        cat._definir_tabelas(opcional(PLANILHA_TABELAS, ler_planilha, 3))
+        anterior = None
+        lista: List[ColumnInfo] = []
+        for schema, tabela, coluna, tipo, _tamanho, nulo in ler_planilha(os.path.join(pasta, PLANILHA_COLUNAS), 6):
+            # o arquivo vem agrupado por tabela e as strings estão internadas:
+            # basta comparar identidade para saber se a tabela mudou
+            if anterior is None or anterior[0] is not schema or anterior[1] is not tabela:
+                anterior = (schema, tabela)
+                chave = chave_tabela(schema, tabela)
+                if chave not in cat._tabelas:
+                    cat._tabelas[chave] = TableInfo(schema=schema, name=tabela, type='TABLE')
+                    cat._objetos[chave] = (None, None)
+                lista = cat._colunas.setdefault(chave, [])
+            lista.append(ColumnInfo(table_schema=schema, table_name=tabela, column_name=coluna,
+                                    data_type=tipo, is_nullable=nulo.upper() == 'YES'))
+        cat._definir_chaves(opcional(PLANILHA_PKS, ler_planilha, 3), opcional(PLANILHA_FKS, linhas_fk_planilha))
+        return cat
+
+    def _definir_tabelas(self, tabelas: Iterable[tuple]):
+        for r in tabelas:
+            tipo = str(r[2] or '').strip().upper()
+            t = 'VIEW' if tipo in ('V', 'VIEW') or 'VIEW' in tipo else 'TABLE'
+            chave = chave_tabela(r[0], r[1])
+            self._tabelas[chave] = TableInfo(schema=r[0], name=r[1], type=t)
+            self._objetos[chave] = (r[4] if len(r) > 4 else None, r[3] if len(r) > 3 else None)
+
+    def _adicionar_colunas(self, colunas: Iterable[tuple]):
+        for r in colunas:
+            nulo = r[4]
+            if isinstance(nulo, str):
+                nulo = nulo.strip().upper() in ('YES', '1', 'TRUE')
+            self._colunas.setdefault(chave_tabela(r[0], r[1]), []).append(
+                ColumnInfo(table_schema=r[0], table_name=r[1], column_name=r[2], data_type=r[3], is_nullable=bool(nulo))
+            )
+
+    def _definir_chaves(self, pks: Iterable[tuple], fks: Iterable[tuple]):
+        self._pks = {}
+        self._fks_saida = {}
+        self._fks_entrada = {}
+        for r in pks:
+            self._pks.setdefault(chave_tabela(r[0], r[1]), []).append(r[2])
+        for r in fks:
+            fk = ForeignKey(constraint_name=r[0], fk_schema=r[1], fk_table=r[2], fk_column=r[3],
+                            pk_schema=r[4], pk_table=r[5], pk_column=r[6])
+            self._fks_saida.setdefault(chave_tabela(r[1], r[2]), []).append(fk)
+            self._fks_entrada.setdefault(chave_tabela(r[4], r[5]), []).append(fk)
+
+    # ----------------------------------------------------------
+    # Validação e atualização incremental
+    # ----------------------------------------------------------
+    def atualizado(self, conn) -> Tuple["SchemaCatalog", int]:
+        """Valida o catálogo contra o banco e devolve (catálogo, objetos alterados).
+
+        Com a assinatura igual, devolve o próprio catálogo e 0. Caso
+        contrário, compara a data de alteração de cada tabela/view e recarrega
+        as colunas apenas das novas ou alteradas (PKs e FKs, que são poucas,
+        são sempre relidas); objetos removidos saem do catálogo. Muitas
+        alterações (ou catálogo sem datas) levam a uma recarga completa.
+        """
+        cur = conn.cursor()
+        try:
+            cur.execute(SQL_ASSINATURA)
+            row = cur.fetchone()
+        finally:
+            cur.close()
+        assinatura = tuple(row) if row else None
+        if self.assinatura is not None and assinatura == self.assinatura:
+            return self, 0
+
+        cur = conn.cursor()
+        try:
+            cur.execute(SQL_OBJETOS)
+            objetos = cur.fetchall()
+        finally:
+            cur.close()
+        atuais = {chave_tabela(r[0], r[1]): r for r in objetos}
+        alterados = [r for chave, r in atuais.items()
+                     if self._objetos.get(chave) != (r[4], r[3]) or r[3] is None]
+        removidos = [chave for chave in self._tabelas if chave not in atuais]
+        if len(alterados) > MAX_OBJETOS_INCREMENTAL:
+            novo = SchemaCatalog.from_connection(conn)
+            return novo, len(alterados) + len(removidos)
+
+        if alterados:
+            colunas, pks, fks = _ler_conjuntos(conn, _sql_atualizacao(r[4] for r in alterados), 3)
+        else:
+            pks, fks = _ler_conjuntos(conn, ";\n".join(["SET NOCOUNT ON", SQL_PKS, SQL_FKS]) + ";", 2)
+            colunas = []
+
+        novo = SchemaCatalog()
+        novo._definir_tabelas(objetos)
+        chaves_alteradas = {chave_tabela(r[0], r[1]) for r in alterados}
+        # colunas das tabelas inalteradas são reaproveitadas (as listas não são modificadas)
+        novo._colunas = {chave: cols for chave, cols in self._colunas.items()
+                         if chave in atuais and chave not in chaves_alteradas}
+        novo._adicionar_colunas(colunas)
+        novo._definir_chaves(pks, fks)
+        novo.assinatura = assinatura
+        return novo, len(alterados) + len(removidos)
+
+    # ----------------------------------------------------------
+    # Arquivo local
+    # ----------------------------------------------------------
+    def salvar(self, caminho: str):
+        """Grava o catálogo em `caminho` (substituição atômica do arquivo)."""
+        os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+        dados = {
+            'versao': CATALOGO_VERSAO,
+            'assinatura': self.assinatura,
+            'tabelas': self._tabelas,
+            'colunas': self._colunas,
+            'pks': self._pks,
+            'fks': [fk for fks in self._fks_saida.values() for fk in fks],
+            'objetos': self._objetos,
+        }
+        tmp = f"{caminho}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            pickle.dump(dados, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, caminho)
+
+    @classmethod
+    def carregar_arquivo(cls, caminho: str) -> Optional["SchemaCatalog"]:
+        """Lê um catálogo gravado por `salvar`; None se ausente, corrompido ou de outra versão."""
+        try:
+            with open(caminho, 'rb') as f:
+                dados = pickle.load(f)
+            if not isinstance(dados, dict) or dados.get('versao') != CATALOGO_VERSAO:
+                return None
+            cat = cls()
+            cat.assinatura = dados['assinatura']
+            cat._tabelas = dados['tabelas']
+            cat._colunas = dados['colunas']
+            cat._pks = dados['pks']
+            cat._objetos = dados['objetos']
+            for fk in dados['fks']:
+                cat._fks_saida.setdefault(chave_tabela(fk.fk_schema, fk.fk_table), []).append(fk)
+                cat._fks_entrada.setdefault(chave_tabela(fk.pk_schema, fk.pk_table), []).append(fk)
+            return cat
+        except Exception:
+            return None
+
+    # ----------------------------------------------------------
+    # Consultas
+    # ----------------------------------------------------------
+    def __len__(self) -> int:
+        return len(self._tabelas)
+
+    def tem_tabela(self, schema: str, table: str) -> bool:
+        return chave_tabela(schema, table) in self._tabelas
+
+    def tabelas(self) -> List[TableInfo]:
+        """Tabelas e views, ordenadas por esquema e nome."""
+        return sorted(self._tabelas.values(), key=lambda t: (t.schema.lower(), t.name.lower()))
+
+    def colunas(self, schema: str, table: str) -> Optional[List[ColumnInfo]]:
+        chave = chave_tabela(schema, table)
+        if chave not in self._tabelas:
+            return None
+        return list(self._colunas.get(chave, []))
+
+    def chaves_primarias(self, schema: str, table: str) -> Optional[List[str]]:
+        chave = chave_tabela(schema, table)
+        if chave not in self._tabelas:
+            return None
+        return list(self._pks.get(chave, []))
+
+    def chaves_estrangeiras(self, schema: str, table: str) -> Optional[List[ForeignKey]]:
+        """FKs em que a tabela é a referenciadora (lado FK)."""
+        chave = chave_tabela(schema, table)
+        if chave not in self._tabelas:
+            return None
+        return list(self._fks_saida.get(chave, []))
+
+    def referenciada_por(self, schema: str, table: str) -> Optional[List[ForeignKey]]:
+        """FKs de outras tabelas que apontam para esta (lado PK)."""
+        chave = chave_tabela(schema, table)
+        if chave not in self._tabelas:
+            return None
+        return list(self._fks_entrada.get(chave, []))
+
+    def total_colunas(self) -> int:
+        return sum(len(c) for c in self._colunas.values())
+
+
+def caminho_cache(pasta: str, db_identity: str) -> str:
+    """Arquivo do catálogo em cache para o servidor/banco `db_identity`."""
+    legivel = re.sub(r'[^A-Za-z0-9_.-]+', '_', db_identity or 'padrao').strip('_')[:60]
+    resumo = hashlib.sha1((db_identity or '').lower().encode('utf-8')).hexdigest()[:10]
+    return os.path.join(pasta, f"catalogo_{legivel}_{resumo}.pkl")
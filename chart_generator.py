@@ -1,13 +1,21 @@
 """
 Gerador de gráficos para CSData Studio
 Suporta gráficos de barras e colunas com agregações
+
+A agregação pode ser feita no servidor: `montar_sql_agregacao` encapsula a
+consulta atual em ``SELECT x, AGG(y) FROM (<consulta>) AS _graf GROUP BY x``
+e `create_chart_from_aggregate` desenha a série já agregada. Quando a
+consulta não pode ser encapsulada, `create_chart` agrega no cliente.
 """
 import matplotlib.pyplot as plt
 from matplotlib.figure import Figure
-from typing import List, Tuple, Dict
+from typing import List, Optional, Sequence, Tuple, Dict
 from enum import Enum
 import pandas as pd
 
+from result_set import ResultSet
+from tokenizador_sql import SIMBOLO, clausulas, tokenizar
+
 class ChartType(Enum):
     """Tipos de gráficos suportados"""
     BAR = "bar"
@@ -21,6 +29,110 @@ class AggregationType(Enum):
     MIN = "min"
     MAX = "max"
 
+# expressão SQL de cada agregação; AVG em float para não truncar inteiros
+_SQL_AGREGACAO = {
+    AggregationType.COUNT: "COUNT({col})",
+    AggregationType.SUM: "SUM({col})",
+    AggregationType.AVG: "AVG(CAST({col} AS float))",
+    AggregationType.MIN: "MIN({col})",
+    AggregationType.MAX: "MAX({col})",
+}
+
+_ROTULO_AGREGACAO = {
+    AggregationType.COUNT: "Contagem de {col}",
+    AggregationType.SUM: "Soma de {col}",
+    AggregationType.AVG: "Média de {col}",
+    AggregationType.MIN: "Mínimo de {col}",
+    AggregationType.MAX: "Máximo de {col}",
+}
+
+# cláusulas que não podem ficar dentro de uma tabela derivada
+_CLAUSULAS_NAO_ENCAPSULAVEIS = frozenset(("WITH", "INTO", "OPTION"))
+
+
+def _ident(nome: str) -> str:
+    return "[" + str(nome).replace("]", "]]") + "]"
+
+
+def montar_sql_agregacao(
+    sql: str,
+    columns: Sequence[str],
+    x_column: str,
+    y_column: str,
+    aggregation: AggregationType
+) -> Optional[str]:
+    """SQL que agrega a consulta no servidor para o gráfico.
+
+    Gera ``SELECT x, AGG(y) FROM (<consulta>) AS _graf WHERE x IS NOT NULL
+    GROUP BY x ORDER BY x`` — o mesmo resultado do `groupby` de
+    `create_chart` (chaves nulas descartadas, categorias ordenadas). Os
+    parâmetros da consulta original continuam valendo, na mesma ordem.
+
+    Retorna None quando a consulta não pode ser encapsulada: mais de uma
+    instrução, CTE, SELECT INTO, OPTION, colunas sem nome ou repetidas no
+    resultado, ou x/y fora do resultado. O ORDER BY final é descartado,
+    exceto quando acompanha TOP/OFFSET (aí ele define as linhas).
+    """
+    expr = _SQL_AGREGACAO.get(aggregation)
+    if expr is None or x_column not in columns or y_column not in columns:
+        return None
+    nomes = [str(c or '').lower() for c in columns]
+    if '' in nomes or len(set(nomes)) != len(nomes):
+        return None
+    texto = (sql or '').strip()
+    tokens = tokenizar(texto)
+    # ';' finais não contam como outra instrução
+    while tokens and tokens[-1].tipo == SIMBOLO and tokens[-1].texto == ';':
+        tokens = tokens[:-1]
+    if not tokens or tokens[0].palavra != 'SELECT':
+        return None
+    if any(t.tipo == SIMBOLO and t.texto == ';' for t in tokens):
+        return None
+    partes = clausulas(tokens)
+    if any(c.nome in _CLAUSULAS_NAO_ENCAPSULAVEIS for c in partes):
+        return None
+    fim = tokens[-1].fim
+    ultima = partes[-1] if partes else None
+    if ultima is not None and ultima.nome == 'ORDER BY':
+        corpo = tokens[ultima.ini:ultima.fim]
+        tem_offset = any(t.palavra == 'OFFSET' for t in corpo)
+        inicio_select = 2 if len(tokens) > 2 and tokens[1].palavra in ('DISTINCT', 'ALL') else 1
+        tem_top = len(tokens) > inicio_select and tokens[inicio_select].palavra == 'TOP'
+        if not (tem_offset or tem_top):
+            # um parâmetro no ORDER BY descartado desalinharia os demais
+            if any(t.tipo == SIMBOLO and t.texto == '?' for t in corpo):
+                return None
+            fim = tokens[ultima.ini - 2].inicio
+    base = texto[:fim].rstrip()
+    x = f"_graf.{_ident(x_column)}"
+    y = f"_graf.{_ident(y_column)}"
+    return (
+        f"SELECT {x} AS {_ident(x_column)}, {expr.format(col=y)} AS {_ident(y_column)}\n"
+        f"FROM (\n{base}\n) AS _graf\n"
+        f"WHERE {x} IS NOT NULL\n"
+        f"GROUP BY {x}\n"
+        f"ORDER BY {x}"
+    )
+
+
+def _to_dataframe(data, columns: List[str], needed: List[str]) -> pd.DataFrame:
+    """Converte os dados do gráfico para DataFrame.
+
+    Um ResultSet entrega só as colunas `needed`, sem copiar os arrays
+    numéricos. Listas de linhas passam por `tuple(r)`: alguns drivers (pyodbc)
+    retornam objetos Row que nem sempre são aceitos diretamente pelo
+    pandas.DataFrame.
+    """
+    if isinstance(data, ResultSet):
+        wanted = [c for c in dict.fromkeys(needed) if c in data.columns]
+        return data.to_pandas(wanted)
+    rows = [tuple(r) for r in data]
+    # valida consistência
+    if rows and any(len(r) != len(columns) for r in rows):
+        raise ValueError(f"Inconsistência entre número de colunas ({len(columns)}) e tamanho das linhas retornadas (ex.: {len(rows[0])}).")
+    return pd.DataFrame(rows, columns=columns)
+
+
 class ChartGenerator:
     """Gerador de gráficos usando matplotlib"""
     
@@ -45,7 +157,7 @@ class ChartGenerator:
         Cria um gráfico baseado nos dados fornecidos.
         
         Args:
-            data: Lista de tuplas com os dados
+            data: ResultSet ou lista de tuplas com os dados
             columns: Nomes das colunas
             x_column: Nome da coluna para eixo X
             y_column: Nome da coluna para eixo Y (será agregada)
@@ -60,16 +172,9 @@ class ChartGenerator:
             Figura matplotlib
         """
         try:
-            # Converte dados para DataFrame
-            # Alguns drivers (pyodbc) retornam objetos Row que nem sempre são aceitos
-            # diretamente pelo pandas.DataFrame quando passados em uma lista. Para
-            # robustez, convertemos cada linha para uma tupla simples antes de
-            # criar o DataFrame e validamos o comprimento.
-            rows = [tuple(r) for r in data]
-            # valida consistência
-            if rows and any(len(r) != len(columns) for r in rows):
-                raise ValueError(f"Inconsistência entre número de colunas ({len(columns)}) e tamanho das linhas retornadas (ex.: {len(rows[0])}).")
-            df = pd.DataFrame(rows, columns=columns)
+            # Converte dados para DataFrame (apenas as colunas usadas quando
+            # os dados vêm de um ResultSet colunar)
+            df = _to_dataframe(data, columns, [x_column, y_column])
             
             # Valida colunas
             if x_column not in df.columns:
@@ -86,66 +191,105 @@ class ChartGenerator:
                     raise ValueError(f"no numeric data to plot for column '{y_column}'")
 
             # Aplica agregação
+            grupos = df.groupby(x_column, observed=True)[y_column]
             if aggregation == AggregationType.COUNT:
-                agg_data = df.groupby(x_column)[y_column].count()
-                default_y_label = f"Contagem de {y_column}"
+                agg_data = grupos.count()
             elif aggregation == AggregationType.SUM:
-                agg_data = df.groupby(x_column)[y_column].sum()
-                default_y_label = f"Soma de {y_column}"
+                agg_data = grupos.sum()
             elif aggregation == AggregationType.AVG:
-                agg_data = df.groupby(x_column)[y_column].mean()
-                default_y_label = f"Média de {y_column}"
+                agg_data = grupos.mean()
             elif aggregation == AggregationType.MIN:
-                agg_data = df.groupby(x_column)[y_column].min()
-                default_y_label = f"Mínimo de {y_column}"
+                agg_data = grupos.min()
             elif aggregation == AggregationType.MAX:
-                agg_data = df.groupby(x_column)[y_column].max()
-                default_y_label = f"Máximo de {y_column}"
+                agg_data = grupos.max()
             else:
                 raise ValueError(f"Tipo de agregação inválido: {aggregation}")
             
-            # Cria figura
-            fig, ax = plt.subplots(figsize=(12, 6))
-            
-            # Desenha gráfico
-            if chart_type == ChartType.BAR:
-                # Gráfico de barras (horizontal)
-                agg_data.plot(kind='barh', ax=ax, color=color)
-            else:
-                # Gráfico de colunas (vertical)
-                agg_data.plot(kind='bar', ax=ax, color=color)
-            
-            # Configurações
-            ax.set_title(title, fontsize=16, fontweight='bold', pad=20)
-            ax.set_xlabel(x_label or x_column, fontsize=12, fontweight='bold')
-            ax.set_ylabel(y_label or default_y_label, fontsize=12, fontweight='bold')
-            
-            # Rotaciona labels do eixo X se necessário
-            if chart_type == ChartType.COLUMN:
-                plt.xticks(rotation=45, ha='right')
-            
-            # Adiciona valores nas barras/colunas
-            # Formato de rótulo: se for contagem -> inteiro, senão mostrar com 2 casas decimais
-            fmt = '%.0f' if aggregation == AggregationType.COUNT else '%.2f'
-            for container in ax.containers:
-                try:
-                    ax.bar_label(container, fmt=fmt, padding=3)
-                except Exception:
-                    # Falha no label não impede o gráfico principal
-                    pass
-            
-            # Grid
-            ax.grid(True, alpha=0.3, linestyle='--')
-            
-            # Ajusta layout
-            plt.tight_layout()
-            
-            return fig
+            return self._plot_aggregate(agg_data, x_column, y_column, aggregation, chart_type,
+                                        title, x_label, y_label, color)
             
         except Exception as e:
             print(f"Erro ao criar gráfico: {e}")
             raise
     
+    def create_chart_from_aggregate(
+        self,
+        rows: Sequence[Tuple],
+        x_column: str,
+        y_column: str,
+        aggregation: AggregationType,
+        chart_type: ChartType = ChartType.COLUMN,
+        title: str = "Gráfico",
+        x_label: str = None,
+        y_label: str = None,
+        color: str = '#3498db'
+    ) -> Figure:
+        """
+        Cria o gráfico a partir da série já agregada no servidor.
+        
+        Args:
+            rows: Pares (categoria, valor), como retornados pela SQL de
+                `montar_sql_agregacao`
+            x_column, y_column, aggregation, chart_type, title, x_label,
+            y_label, color: como em `create_chart`
+        
+        Returns:
+            Figura matplotlib
+        """
+        try:
+            pares = [tuple(r) for r in rows]
+            indice = pd.Index([p[0] for p in pares], name=x_column)
+            valores = pd.to_numeric(pd.Series([p[1] for p in pares], index=indice, name=y_column), errors='coerce')
+            if aggregation != AggregationType.COUNT and valores.dropna().empty:
+                raise ValueError(f"no numeric data to plot for column '{y_column}'")
+            return self._plot_aggregate(valores, x_column, y_column, aggregation, chart_type,
+                                        title, x_label, y_label, color)
+        except Exception as e:
+            print(f"Erro ao criar gráfico: {e}")
+            raise
+
+    def _plot_aggregate(self, agg_data: pd.Series, x_column: str, y_column: str,
+                        aggregation: AggregationType, chart_type: ChartType, title: str,
+                        x_label: str, y_label: str, color: str) -> Figure:
+        """Desenha a série agregada (índice = categorias do eixo X)."""
+        # Cria figura
+        fig, ax = plt.subplots(figsize=(12, 6))
+        
+        # Desenha gráfico
+        if chart_type == ChartType.BAR:
+            # Gráfico de barras (horizontal)
+            agg_data.plot(kind='barh', ax=ax, color=color)
+        else:
+            # Gráfico de colunas (vertical)
+            agg_data.plot(kind='bar', ax=ax, color=color)
+        
+        # Configurações
+        ax.set_title(title, fontsize=16, fontweight='bold', pad=20)
+        ax.set_xlabel(x_label or x_column, fontsize=12, fontweight='bold')
+        ax.set_ylabel(y_label or _ROTULO_AGREGACAO[aggregation].format(col=y_column), fontsize=12, fontweight='bold')
+        
+        # Rotaciona labels do eixo X se necessário
+        if chart_type == ChartType.COLUMN:
+            plt.xticks(rotation=45, ha='right')
+        
+        # Adiciona valores nas barras/colunas
+        # Formato de rótulo: se for contagem -> inteiro, senão mostrar com 2 casas decimais
+        fmt = '%.0f' if aggregation == AggregationType.COUNT else '%.2f'
+        for container in ax.containers:
+            try:
+                ax.bar_label(container, fmt=fmt, padding=3)
+            except Exception:
+                # Falha no label não impede o gráfico principal
+                pass
+        
+        # Grid
+        ax.grid(True, alpha=0.3, linestyle='--')
+        
+        # Ajusta layout
+        plt.tight_layout()
+        
+        return fig
+    
     def create_multi_series_chart(
         self,
         data: List[Tuple],
@@ -161,7 +305,7 @@ class ChartGenerator:
         Cria um gráfico com múltiplas séries de dados.
         
         Args:
-            data: Lista de tuplas com os dados
+            data: ResultSet ou lista de tuplas com os dados
             columns: Nomes das colunas
             x_column: Nome da coluna para eixo X
             y_columns: Lista de nomes das colunas para eixo Y
@@ -175,10 +319,7 @@ class ChartGenerator:
         """
         try:
             # Converte dados para DataFrame (robustez para Row objects)
-            rows = [tuple(r) for r in data]
-            if rows and any(len(r) != len(columns) for r in rows):
-                raise ValueError(f"Inconsistência entre número de colunas ({len(columns)}) e tamanho das linhas retornadas (ex.: {len(rows[0])}).")
-            df = pd.DataFrame(rows, columns=columns)
+            df = _to_dataframe(data, columns, [x_column] + list(y_columns))
             
             # Valida colunas
             if x_column not in df.columns:
@@ -242,4 +383,4 @@ class ChartGenerator:
             print(f"Erro ao salvar gráfico: {e}")
             return False
 
-__all__ = ['ChartGenerator', 'ChartType', 'AggregationType']
\ No newline at end of file
+__all__ = ['ChartGenerator', 'ChartType', 'AggregationType', 'montar_sql_agregacao']
\ No newline at end of file
@@ -0,0 +1,454 @@
+"""
+Compilação de agrupamentos em modelos de SQL para CSData Studio
+
+`QueryBuilder.gerar_sql_por_agrupamento` montava a SQL do zero a cada
+chamada: normalizava cada nome de tabela, qualificava cada campo, passava
+o tokenizador de expressões em cada ON e procurava aliases percorrendo o
+mapa inteiro para cada dimensão.
+
+Só o WHERE (e seus parâmetros) muda entre as execuções de um mesmo
+agrupamento com as mesmas tabelas selecionadas. `compilar_agrupamento`
+monta uma vez o SELECT/FROM/JOINs e o GROUP BY (`ModeloAgrupamento`), e
+`ModeloAgrupamento.montar` apenas encaixa os filtros. O
+`CompiladorAgrupamentos` guarda os modelos por (módulo, agrupamento,
+aliases, métricas parciais); o modelo é refeito quando o registro de
+metadados devolve outro objeto para o agrupamento ou para o módulo, ou
+seja, quando um dos arquivos JSON mudou, ou quando o catálogo do esquema
+foi trocado.
+
+A busca de alias pelo nome da tabela usa um índice montado uma vez por
+mapa de aliases, respeitando a regra anterior: vale o primeiro alias (na
+ordem do mapa) cuja tabela tem o mesmo nome, sem diferenciar maiúsculas.
+Nomes de tabelas e campos e as expressões ON são lidos pelo tokenizador
+(tokenizador_sql), que respeita colchetes, literais e comentários.
+
+Poda de JOINs: com os metadados do módulo, `ModeloAgrupamento.montar`
+omite os JOINs que nenhuma dimensão, métrica, filtro ou outro JOIN mantido
+referencia e que comprovadamente não mudam a cardinalidade:
+
+- o JOIN é LEFT (``"tipo": "left"`` no agrupamento), logo não descarta
+  linhas da tabela principal;
+- o ON iguala todas as colunas da chave primária da tabela juntada a
+  colunas de outra tabela, logo cada linha encontra no máximo uma
+  correspondência. A chave vem de `chave_primaria` nos metadados do módulo
+  ou, sem ela, do catálogo do esquema (catalogo.SchemaCatalog);
+- um OR no nível externo do ON impede a prova.
+
+INNER JOINs são sempre mantidos: descartam as linhas sem correspondência.
+Nomes sem qualificação nos filtros precisam ser colunas conhecidas da
+tabela principal (campos e chave da tabela "principal" dos metadados ou
+colunas do catálogo); qualquer outro nome desliga a poda naquela chamada.
+"""
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+from particionamento import SUFIXO_CONTAGEM
+from periodos import COLUNAS_PERIODO, expressao_periodo
+from tokenizador_sql import (
+    PALAVRA, SIMBOLO, nome_unico, nomes_compostos, partes_nome, substituir_nomes, tokenizar,
+)
+
+DEFAULT_MAX_MODELOS = 256
+
+# valor de "tipo" nos joins do agrupamento -> JOIN emitido (padrão: inner)
+TIPOS_JOIN = {"inner": "INNER JOIN", "left": "LEFT JOIN", "right": "RIGHT JOIN"}
+
+# funções cujo primeiro argumento é a parte da data (DAY, MONTH...), não uma coluna
+_FUNCOES_PARTE_DATA = frozenset(("DATEADD", "DATEDIFF", "DATEDIFF_BIG", "DATEPART", "DATENAME", "DATETRUNC"))
+
+
+def parse_table_ident(t: str) -> Tuple[str, str]:
+    """(schema, tabela) de '[schema].Tabela', 'schema.tabela' ou 'tabela'."""
+    parts = partes_nome(t) or (str(t).strip(),)
+    if len(parts) == 1:
+        return ('dbo', parts[0])
+    return (parts[-2], parts[-1])
+
+
+class _Aliases:
+    """Mapa de aliases com índice pelo nome da tabela (primeiro alias vence)."""
+
+    def __init__(self, aliases: Optional[Dict[tuple, str]]):
+        self.mapa = aliases or {}
+        self.por_tabela: Dict[str, str] = {}
+        for (_, tabela), alias in self.mapa.items():
+            self.por_tabela.setdefault(str(tabela).lower(), alias)
+
+    def __bool__(self) -> bool:
+        return bool(self.mapa)
+
+    def __contains__(self, chave) -> bool:
+        return chave in self.mapa
+
+    def exato(self, chave) -> Optional[str]:
+        return self.mapa.get(chave)
+
+    def pela_tabela(self, tabela: str) -> Optional[str]:
+        return self.por_tabela.get(tabela.lower())
+
+
+def _alias_da_referencia(partes: Tuple[str, ...], aliases: _Aliases) -> Optional[str]:
+    """Alias da tabela de uma referência tabela.coluna ou schema.tabela.coluna."""
+    tabela = partes[-2]
+    if len(partes) >= 3 and (partes[-3], tabela) in aliases:
+        return aliases.exato((partes[-3], tabela))
+    if (None, tabela) in aliases:
+        return aliases.exato((None, tabela))
+    return aliases.pela_tabela(tabela)
+
+
+def _qualificar_campo(campo: str, aliases: _Aliases, principal: Tuple[str, str]) -> str:
+    """Prefixa campos simples com o alias da tabela principal; troca a tabela de
+    campos qualificados pelo alias, quando houver. Expressões só têm as
+    referências qualificadas trocadas."""
+    if not campo:
+        return campo
+    s = str(campo).strip()
+    partes = nome_unico(s)
+    if partes is None:
+        return _reescrever_on(s, aliases)
+    if len(partes) == 1:
+        if principal in aliases:
+            return f"{aliases.exato(principal)}.{s}"
+        return s
+    if aliases:
+        alias = _alias_da_referencia(partes, aliases)
+        if alias is not None:
+            return f"{alias}.{partes[-1]}"
+    return s
+
+
+def _reescrever_on(on_expr: str, aliases: _Aliases) -> str:
+    """Troca referências tabela.coluna / schema.tabela.coluna da expressão por alias.coluna."""
+    if not aliases:
+        return on_expr
+
+    def trocar(partes, texto):
+        if len(partes) < 2:
+            return None
+        alias = _alias_da_referencia(partes, aliases)
+        return f"{alias}.{partes[-1]}" if alias is not None else None
+
+    return substituir_nomes(on_expr, trocar)
+
+
+def referencias_sql(texto: str, colunas_principais: FrozenSet[str]) -> Optional[Set[str]]:
+    """Tabelas/aliases (minúsculos) que qualificam nomes em `texto`.
+
+    None quando há um nome sem qualificação fora de `colunas_principais`:
+    ele pode ser coluna de qualquer tabela juntada. Nomes após AS (apelidos
+    de coluna, tipos do CAST) e a parte da data em DATEADD(DAY, ...) e
+    afins não contam.
+    """
+    tokens = tokenizar(texto)
+    refs: Set[str] = set()
+    for nome in nomes_compostos(tokens):
+        if nome.ini > 0 and tokens[nome.ini - 1].palavra == 'AS':
+            continue
+        if (nome.ini > 1 and tokens[nome.ini - 1].texto == '('
+                and tokens[nome.ini - 2].palavra in _FUNCOES_PARTE_DATA):
+            continue
+        if len(nome.partes) == 1:
+            if nome.partes[0].lower() not in colunas_principais:
+                return None
+            continue
+        refs.add(nome.partes[-2].lower())
+    return refs
+
+
+def _colunas_igualadas(on: str, nomes: FrozenSet[str]) -> Optional[Set[str]]:
+    """Colunas da tabela juntada (referida por `nomes`) que o ON iguala a
+    colunas de outra tabela, nos termos ligados por AND; None com OR no
+    nível externo."""
+    tokens = tokenizar(on)
+    termos: List[list] = [[]]
+    profundidade = 0
+    for tok in tokens:
+        if tok.tipo == SIMBOLO and tok.texto in '()':
+            profundidade += 1 if tok.texto == '(' else -1
+        elif profundidade == 0 and tok.tipo == PALAVRA:
+            if tok.palavra == 'OR':
+                return None
+            if tok.palavra == 'AND':
+                termos.append([])
+                continue
+        termos[-1].append(tok)
+    colunas: Set[str] = set()
+    for termo in termos:
+        # nome = nome, sem mais nada no termo
+        lados = list(nomes_compostos(termo))
+        if len(lados) != 2 or lados[0].ini != 0 or lados[1].fim != len(termo):
+            continue
+        if lados[0].fim + 1 != lados[1].ini or termo[lados[0].fim].texto != '=':
+            continue
+        a, b = lados[0].partes, lados[1].partes
+        if len(a) < 2 or len(b) < 2:
+            continue
+        a_juntada, b_juntada = a[-2].lower() in nomes, b[-2].lower() in nomes
+        if a_juntada != b_juntada:
+            colunas.add((a if a_juntada else b)[-1].lower())
+    return colunas
+
+
+def _chave_primaria(tabela: Tuple[str, str], modulo_meta: Optional[dict], catalogo) -> List[str]:
+    """Chave primária da tabela: `chave_primaria` nos metadados do módulo, senão o catálogo."""
+    for nome, meta in ((modulo_meta or {}).get("tabelas") or {}).items():
+        if str(nome).lower() == tabela[1].lower():
+            pk = meta.get("chave_primaria") or []
+            if isinstance(pk, str):
+                pk = [pk]
+            if pk:
+                return list(pk)
+    if catalogo is not None:
+        try:
+            return list(catalogo.chaves_primarias(*tabela) or [])
+        except Exception:
+            return []
+    return []
+
+
+def _colunas_principais(principal: Tuple[str, str], modulo_meta: Optional[dict], catalogo) -> FrozenSet[str]:
+    """Colunas conhecidas da tabela principal, em minúsculas (vazio = desconhecidas)."""
+    colunas: Set[str] = set()
+    for meta in ((modulo_meta or {}).get("tabelas") or {}).values():
+        if meta.get("tipo") != "principal":
+            continue
+        pk = meta.get("chave_primaria") or []
+        colunas.update(str(c).lower() for c in ([pk] if isinstance(pk, str) else pk))
+        campos = meta.get("campos")
+        secoes = [campos.get(s) or [] for s in ("padrao", "avancado")] if isinstance(campos, dict) else [campos or []]
+        for secao in secoes:
+            for campo in secao:
+                nome = campo.get("campo") if isinstance(campo, dict) else campo
+                if nome:
+                    colunas.add(str(nome).lower())
+    if catalogo is not None:
+        try:
+            colunas.update(c.column_name.lower() for c in catalogo.colunas(*principal) or [])
+        except Exception:
+            pass
+    return frozenset(colunas)
+
+
+@dataclass
+class JuncaoCompilada:
+    """Um JOIN do modelo e o que a poda precisa saber dele."""
+    sql: str
+    # como a tabela pode ser referida (alias, nome), em minúsculas
+    nomes: FrozenSet[str]
+    # tabelas/aliases citados no ON, exceto a própria tabela
+    usa: FrozenSet[str] = frozenset()
+    # LEFT JOIN pela chave primária: pode sair quando não referenciado
+    removivel: bool = False
+
+
+@dataclass
+class ModeloAgrupamento:
+    """SQL de um agrupamento sem o WHERE: `corpo` (SELECT/FROM), `juncoes` e `group_by`."""
+    corpo: str
+    group_by: str = ""
+    juncoes: List[JuncaoCompilada] = field(default_factory=list)
+    # tabelas/aliases citados pelas dimensões e métricas
+    referencias: FrozenSet[str] = frozenset()
+    colunas_principais: FrozenSet[str] = frozenset()
+
+    def juncoes_usadas(self, exprs: List[str]) -> List[JuncaoCompilada]:
+        """JOINs mantidos para os filtros `exprs` (ver a poda no início do módulo)."""
+        if not any(j.removivel for j in self.juncoes):
+            return self.juncoes
+        refs = set(self.referencias)
+        for e in exprs:
+            r = referencias_sql(e, self.colunas_principais)
+            if r is None:
+                return self.juncoes
+            refs |= r
+        # um JOIN mantido pode citar no ON a tabela de outro JOIN
+        mantidas = [False] * len(self.juncoes)
+        mudou = True
+        while mudou:
+            mudou = False
+            for i, j in enumerate(self.juncoes):
+                if not mantidas[i] and (not j.removivel or j.nomes & refs):
+                    mantidas[i] = True
+                    refs |= j.usa
+                    mudou = True
+        return [j for j, manter in zip(self.juncoes, mantidas) if manter]
+
+    def montar(self, filtros: Optional[List] = None) -> Tuple[str, list]:
+        """(sql, params) com os filtros — strings ou tuplas (expr, params) — no WHERE."""
+        params: list = []
+        exprs = []
+        for f in filtros or []:
+            if isinstance(f, (list, tuple)) and len(f) >= 1:
+                exprs.append(f[0])
+                if len(f) > 1 and f[1]:
+                    if isinstance(f[1], (list, tuple)):
+                        params.extend(list(f[1]))
+                    else:
+                        params.append(f[1])
+            else:
+                exprs.append(str(f))
+        sql = self.corpo
+        juncoes = self.juncoes_usadas(exprs)
+        if juncoes:
+            sql += "\n" + "\n".join(j.sql for j in juncoes)
+        if exprs:
+            sql += "\nWHERE " + " AND ".join(exprs)
+        sql += self.group_by
+        return sql.strip(), params
+
+
+def compilar_agrupamento(
+    agrupamento: dict,
+    aliases: Optional[Dict[tuple, str]] = None,
+    metricas_parciais: bool = False,
+    modulo_meta: Optional[dict] = None,
+    catalogo=None,
+) -> ModeloAgrupamento:
+    """Monta o modelo de SQL de um agrupamento para um mapa de aliases.
+
+    Com `metricas_parciais=True` (execução particionada) cada AVG é gerado
+    como SUM na coluna do label mais COUNT em `<label>__n`. `modulo_meta`
+    (o `<modulo>.json`) e `catalogo` habilitam a poda de JOINs; sem eles
+    todos os JOINs são emitidos.
+    """
+    mapa = _Aliases(aliases)
+    tabela_principal = agrupamento["tabela"]
+    principal = parse_table_ident(tabela_principal)
+    select_parts = []
+    group_by_parts = []
+
+    # Dimensões
+    for dim in agrupamento.get("dimensoes", []):
+        if isinstance(dim, dict):
+            campo = dim.get("campo")
+            tipo = dim.get("tipo")
+            tabela = dim.get("tabela")
+            if tipo in COLUNAS_PERIODO:
+                # agrupa pelo início do período; o rótulo é montado no cliente (periodos.py)
+                expr = expressao_periodo(_qualificar_campo(campo, mapa, principal), tipo)
+                select_parts.append(f"{expr} AS {COLUNAS_PERIODO[tipo]}")
+                group_by_parts.append(expr)
+                continue
+            if tabela:
+                alias = mapa.pela_tabela(tabela) if mapa else None
+                qcampo = f"{alias or tabela}.{campo}"
+            else:
+                qcampo = _qualificar_campo(campo, mapa, principal)
+        else:
+            # dim pode ser string simples ou já qualificado
+            qcampo = _qualificar_campo(dim, mapa, principal)
+        select_parts.append(qcampo)
+        group_by_parts.append(qcampo)
+
+    # Métricas
+    for met in agrupamento.get("metricas", []):
+        func = met["funcao"]
+        label = met["label"]
+        qcampo = _qualificar_campo(met["campo"], mapa, principal)
+        if metricas_parciais and str(func).strip().upper() == "AVG":
+            select_parts.append(f"SUM({qcampo}) AS [{label}]")
+            select_parts.append(f"COUNT({qcampo}) AS [{label}{SUFIXO_CONTAGEM}]")
+            continue
+        select_parts.append(f"{func}({qcampo}) AS [{label}]")
+
+    schema, tabela = principal
+    origem = f"[{schema}].[{tabela}]"
+    if principal in mapa:
+        origem += f" {mapa.exato(principal)}"
+    corpo = f"""
+        SELECT
+            {", ".join(select_parts)}
+        FROM {origem}
+        """
+
+    # referências das dimensões e métricas; None desliga a poda
+    colunas_principais = frozenset()
+    referencias = None
+    if modulo_meta is not None:
+        colunas_principais = _colunas_principais(principal, modulo_meta, catalogo)
+        referencias = referencias_sql(", ".join(select_parts + group_by_parts), colunas_principais)
+
+    # JOINs: a tabela ganha o alias e o ON é reescrito quando há alias para ela
+    juncoes = []
+    for join in agrupamento.get("joins", []):
+        tipo = TIPOS_JOIN.get(str(join.get("tipo") or "inner").strip().lower())
+        if tipo is None:
+            raise ValueError(f"Tipo de join inválido no agrupamento '{agrupamento.get('id')}': {join.get('tipo')}")
+        jt = parse_table_ident(join['tabela'])
+        nomes = {jt[1].lower()}
+        nomes.update(alias.lower() for (_, t), alias in mapa.mapa.items() if str(t).lower() == jt[1].lower())
+        if jt in mapa:
+            on = _reescrever_on(str(join['on']).strip(), mapa)
+            sql_join = f"{tipo} [{jt[0]}].[{jt[1]}] {mapa.exato(jt)} ON {on}"
+        else:
+            on = str(join['on'])
+            sql_join = f"{tipo} {join['tabela']} ON {join['on']}"
+        nomes = frozenset(nomes)
+        removivel = False
+        usa = frozenset()
+        if referencias is not None:
+            citadas = referencias_sql(on, colunas_principais)
+            if citadas is None:
+                # coluna sem qualificação no ON: pode ser de qualquer tabela juntada
+                referencias = None
+            else:
+                usa = frozenset(citadas) - nomes
+            if tipo == TIPOS_JOIN["left"]:
+                pk = {c.lower() for c in _chave_primaria(jt, modulo_meta, catalogo)}
+                igualadas = _colunas_igualadas(on, nomes)
+                removivel = bool(pk) and igualadas is not None and pk <= igualadas
+        juncoes.append(JuncaoCompilada(sql=sql_join, nomes=nomes, usa=usa, removivel=removivel))
+    if referencias is None:
+        for j in juncoes:
+            j.removivel = False
+
+    group_by = "\nGROUP BY " + ", ".join(group_by_parts) if group_by_parts else ""
+    return ModeloAgrupamento(corpo=corpo, group_by=group_by, juncoes=juncoes,
+                             referencias=frozenset(referencias or ()),
+                             colunas_principais=colunas_principais)
+
+
+class CompiladorAgrupamentos:
+    """Cache LRU de modelos de agrupamento."""
+
+    def __init__(self, max_modelos: int = DEFAULT_MAX_MODELOS):
+        self.max_modelos = max_modelos
+        self._lock = threading.Lock()
+        # chave -> (fontes usadas na compilação, modelo)
+        self._modelos: "OrderedDict[tuple, Tuple[tuple, ModeloAgrupamento]]" = OrderedDict()
+        # compilações efetivas (diagnóstico/testes)
+        self.compilacoes = 0
+
+    def obter(
+        self,
+        modulo: str,
+        agrupamento: dict,
+        aliases: Optional[Dict[tuple, str]] = None,
+        metricas_parciais: bool = False,
+        modulo_meta: Optional[dict] = None,
+        catalogo=None,
+    ) -> ModeloAgrupamento:
+        # a ordem dos aliases faz parte da chave (o primeiro com o nome da tabela vence)
+        chave = (modulo, agrupamento.get("id"), tuple((aliases or {}).items()), bool(metricas_parciais))
+        # o modelo vale enquanto agrupamento, metadados do módulo e catálogo forem os mesmos objetos
+        fontes = (agrupamento, modulo_meta, catalogo)
+        with self._lock:
+            entrada = self._modelos.get(chave)
+            if entrada is not None and all(a is b for a, b in zip(entrada[0], fontes)):
+                self._modelos.move_to_end(chave)
+                return entrada[1]
+        modelo = compilar_agrupamento(agrupamento, aliases, metricas_parciais, modulo_meta, catalogo)
+        with self._lock:
+            self._modelos[chave] = (fontes, modelo)
+            self._modelos.move_to_end(chave)
+            self.compilacoes += 1
+            while len(self._modelos) > max(1, self.max_modelos):
+                self._modelos.popitem(last=False)
+        return modelo
+
+    def clear(self):
+        with self._lock:
+            self._modelos.clear()
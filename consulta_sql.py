@@ -3,48 +3,108 @@ Gerenciador de consultas SQL para CSData Studio
 Construção dinâmica de SQL a partir de metadados JSON
 """
 
-import json
 import pyodbc
-import re
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional, Iterator
 from enum import Enum
-from dataclasses import dataclass
 
+from authentication import LANE_METADATA, LANE_QUERY
+from result_cache import ResultCache, gerar_chave
+from paginacao import PaginadorConsulta, DEFAULT_PAGE_SIZE
+from result_set import ResultSet
+from particionamento import (
+    PlanoParticionado, MetricaParticionada, DEFAULT_MAX_CONCORRENCIA, TAMANHO_MES,
+    FUNCOES_COMBINAVEIS, gerar_intervalos, localizar_filtro_data,
+    filtro_da_particao, combinar_parciais, intervalo_semiaberto,
+)
+from periodos import TIPOS_PERIODO, RotuladorPeriodos, periodos_do_agrupamento
+from plano_execucao import CacheEstimativas, EstimativaPlano, analisar_showplan
+from estatisticas_colunas import (
+    CacheEstatisticas, EstatisticasColuna, DEFAULT_AMOSTRA_LINHAS, DEFAULT_TOP_VALORES,
+    chave_estatisticas, coletar_estatisticas, coluna_com_estatistica, tipo_data,
+)
+# TableInfo/ColumnInfo/ForeignKey continuam importáveis a partir deste módulo
+from catalogo import SchemaCatalog, TableInfo, ColumnInfo, ForeignKey, chave_tabela
+from relacionamentos import GrafoRelacionamentos, PassoJuncao, Relacionamento
+from registro_metadados import RegistroMetadados
+from compilador_agrupamentos import CompiladorAgrupamentos
+from valores_distintos import (
+    CachePaginasDistintos, PaginaValores, DEFAULT_TAMANHO_PAGINA, montar_pagina, sql_pagina_distintos,
+)
 
-@dataclass
-class TableInfo:
-    schema: str
-    name: str
-    type: str
 
-    @property
-    def full_name(self) -> str:
-        return f"[{self.schema}].{self.name}"
+# Quantidade padrão de linhas lidas por `fetchmany` na execução em lotes
+DEFAULT_FETCH_BATCH_SIZE = 5000
 
 
-@dataclass
-class ColumnInfo:
-    table_schema: str
-    table_name: str
-    column_name: str
-    data_type: str
-    is_nullable: bool
+class QueryCancelledError(RuntimeError):
+    """Consulta interrompida a pedido do usuário."""
 
-    @property
-    def full_name(self) -> str:
-        return f"{self.table_name}.{self.column_name}"
 
+class QueryTimeoutError(RuntimeError):
+    """Consulta interrompida por exceder o tempo limite configurado."""
 
-@dataclass
-class ForeignKey:
-    constraint_name: Optional[str] = None
-    fk_schema: Optional[str] = None
-    fk_table: Optional[str] = None
-    fk_column: Optional[str] = None
-    pk_schema: Optional[str] = None
-    pk_table: Optional[str] = None
-    pk_column: Optional[str] = None
+
+class QueryCancelToken:
+    """Permite cancelar, a partir de outra thread, a consulta em execução.
+
+    O cursor ativo é registrado com `bind`; `cancel` marca o token e chama
+    `cursor.cancel()`, que no pyodbc interrompe a instrução no servidor.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cursor = None
+        self._derivados = []
+        self.cancelled = False
+
+    def bind(self, cursor):
+        with self._lock:
+            self._cursor = cursor
+            if self.cancelled:
+                self._cancel_cursor(cursor)
+
+    def release(self):
+        with self._lock:
+            self._cursor = None
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            if self._cursor is not None:
+                self._cancel_cursor(self._cursor)
+            derivados = list(self._derivados)
+        for token in derivados:
+            token.cancel()
+
+    def derivar(self) -> "QueryCancelToken":
+        """Cria um token ligado a este: cancelar este cancela também o derivado.
+
+        Usado quando uma consulta é executada em várias partes simultâneas,
+        cada uma com o seu cursor.
+        """
+        token = QueryCancelToken()
+        with self._lock:
+            self._derivados.append(token)
+            cancelado = self.cancelled
+        if cancelado:
+            token.cancel()
+        return token
+
+    @staticmethod
+    def _cancel_cursor(cursor):
+        try:
+            cursor.cancel()
+        except Exception:
+            # drivers sem suporte a cancel (ex.: sqlite3) param no próximo lote
+            pass
 
 
 class JoinType(Enum):
@@ -54,27 +114,97 @@ class JoinType(Enum):
 
 
 class QueryBuilder:
-    def __init__(self, conn: pyodbc.Connection = None, pasta_metadados: str = "metadados", **kwargs):
+    def __init__(
+        self,
+        conn: pyodbc.Connection = None,
+        pasta_metadados: str = "metadados",
+        pool=None,
+        result_cache: Optional[ResultCache] = None,
+        db_identity: str = "",
+        spill_dir: Optional[str] = None,
+        spill_threshold_mb: Optional[float] = None,
+        plan_cache: Optional[CacheEstimativas] = None,
+        schema_cache_path: Optional[str] = None,
+        relationships_csv: Optional[str] = None,
+        column_stats_cache: Optional[CacheEstatisticas] = None,
+        distinct_values_cache: Optional[CachePaginasDistintos] = None,
+        **kwargs
+    ):
         """Inicializa o QueryBuilder.
 
         Compatibilidade: aceita tanto o parâmetro posicional `conn` quanto
         o nome de parâmetro `connection` usado em testes antigos.
+
+        Com `pool` (authentication.ConnectionPool) cada operação empresta uma
+        conexão da fila adequada — metadados ou consultas — em vez de usar a
+        conexão única `conn`.
+
+        Com `result_cache` (result_cache.ResultCache) os resultados de
+        `execute_query`/`execute_query_stream` são reaproveitados; a chave
+        inclui `db_identity` (ex.: "servidor/banco/usuário"; com o usuário,
+        resultados gravados em disco não são servidos a outro login).
+
+        Com `spill_threshold_mb`, os ResultSets criados por `novo_result_set`
+        passam a gravar as colunas em arquivos mapeados em memória ao
+        ultrapassar esse tamanho, em uma pasta temporária da sessão criada
+        dentro de `spill_dir` (ou na pasta temporária do sistema).
+
+        `plan_cache` guarda as estimativas de `estimar_plano`; quando omitido
+        é criado um cache próprio.
+
+        `schema_cache_path` é o arquivo local onde o catálogo do esquema é
+        gravado (ver `carregar_catalogo_em_cache` e `revalidar_catalogo`).
+
+        `relationships_csv` é a planilha "Identificar relacionamentos.csv",
+        usada para o grafo de relacionamentos enquanto o catálogo não foi
+        carregado (ver `grafo_relacionamentos`).
+
+        `column_stats_cache` guarda as estatísticas de `estatisticas_coluna`
+        e `distinct_values_cache` as páginas de `pagina_valores_distintos`;
+        quando omitidos são criados caches próprios.
         """
         # aceitar `connection=` por compatibilidade de chamadas externas/tests
         if conn is None and 'connection' in kwargs:
             conn = kwargs.get('connection')
         self.conn = conn
+        self.pool = pool
+        self.result_cache = result_cache
+        self.db_identity = db_identity or ""
         self.pasta_metadados = Path(pasta_metadados)
+        # JSONs da pasta de metadados lidos uma vez (relidos quando o arquivo muda)
+        self.metadados = RegistroMetadados(str(self.pasta_metadados))
+        # SELECT/FROM/JOINs/GROUP BY de cada agrupamento montados uma vez (ver compilador_agrupamentos)
+        self.compilador_agrupamentos = CompiladorAgrupamentos()
+        self.spill_dir = spill_dir
+        self.spill_threshold_bytes = int(spill_threshold_mb * 1024 * 1024) if spill_threshold_mb is not None else None
+        self._pasta_sessao: Optional[str] = None
+        self.plan_cache = plan_cache if plan_cache is not None else CacheEstimativas()
+        self.column_stats_cache = column_stats_cache if column_stats_cache is not None else CacheEstatisticas()
+        self.distinct_values_cache = distinct_values_cache if distinct_values_cache is not None else CachePaginasDistintos()
+        # catálogo do esquema em memória (ver carregar_catalogo)
+        self.schema_catalog: Optional[SchemaCatalog] = None
+        self.schema_cache_path = schema_cache_path
+        # False enquanto o catálogo lido do arquivo local não foi conferido no banco
+        self.catalogo_validado = True
+        self.relationships_csv = relationships_csv
+        # (fonte, grafo): reconstruído quando o catálogo é substituído
+        self._grafo: Optional[Tuple[object, Optional[GrafoRelacionamentos]]] = None
+
+    @contextmanager
+    def _emprestar_conexao(self, lane: str = LANE_QUERY):
+        """Fornece a conexão para uma operação: do pool (quando houver) ou `self.conn`."""
+        if self.pool is not None:
+            with self.pool.connection(lane) as conn:
+                yield conn
+        else:
+            yield self.conn
 
     # ==========================================================
     # Leitura de Metadados
     # ==========================================================
     def _carregar_json(self, nome: str) -> Dict:
-        caminho = self.pasta_metadados / nome
-        if not caminho.exists():
-            raise FileNotFoundError(f"Arquivo de metadados não encontrado: {nome}")
-        with open(caminho, encoding="utf-8") as f:
-            return json.load(f)
+        # pelo registro: o arquivo só é lido de novo quando muda (mtime/tamanho)
+        return self.metadados.documento(nome)
 
     def carregar_modulo(self, modulo: str) -> Dict:
         return self._carregar_json(f"{modulo}.json")
@@ -82,6 +212,10 @@ class QueryBuilder:
     def carregar_agrupamentos(self, modulo: str) -> Dict:
         return self._carregar_json(f"{modulo}_agrupamentos.json")
 
+    def obter_agrupamento(self, modulo: str, agrupamento_id: str) -> Optional[Dict]:
+        """Agrupamento do módulo pelo id (índice do registro), ou None."""
+        return self.metadados.agrupamento(modulo, agrupamento_id)
+
     # ==========================================================
     # Geração de SQL
     # ==========================================================
@@ -90,229 +224,217 @@ class QueryBuilder:
         modulo: str,
         agrupamento_id: str,
         filtros: Optional[List] = None,
-        aliases: Optional[Dict[tuple, str]] = None
+        aliases: Optional[Dict[tuple, str]] = None,
+        metricas_parciais: bool = False
     ) -> tuple:
+        """Gera (sql, params) do agrupamento.
 
-        modulo_meta = self.carregar_modulo(modulo)
-        agrup_meta = self.carregar_agrupamentos(modulo)
+        Com `metricas_parciais=True` (execução particionada) cada AVG é
+        gerado como SUM na coluna do label mais COUNT em `<label>__n`, para
+        que a média seja recalculada ao combinar as partições.
 
-        agrupamento = next(
-            (a for a in agrup_meta["agrupamentos"] if a["id"] == agrupamento_id),
-            None
-        )
+        O restante da SQL vem do modelo compilado do agrupamento para esses
+        aliases (ver compilador_agrupamentos); a cada chamada só o WHERE e
+        os parâmetros são montados. LEFT JOINs pela chave primária
+        (`chave_primaria` do módulo ou catálogo do esquema) que nenhuma
+        dimensão, métrica ou filtro usa são omitidos.
+
+        Filtros BETWEEN com datas sem hora saem como `>= início AND < fim + 1
+        dia` (ver particionamento.intervalo_semiaberto), e as dimensões de
+        período (ver periodos.py) agrupam pela data de início do período.
+        """
+
+        modulo_meta = self.carregar_modulo(modulo)
+        agrupamento = self.obter_agrupamento(modulo, agrupamento_id)
         if not agrupamento:
             raise ValueError(f"Agrupamento '{agrupamento_id}' não encontrado.")
 
-        tabela_principal = agrupamento["tabela"]
-        select_parts = []
-        group_by_parts = []
-        join_parts = []
-        where_params = []
-
-        # helper: normalize table identifier and optionally add alias
-        def parse_table_ident(t: str):
-            # aceita formas: [schema].Table, schema.table, table
-            parts = re.split(r"\.|\[|\]", t)
-            parts = [p for p in parts if p]
-            if len(parts) == 1:
-                return ('dbo', parts[0])
-            elif len(parts) == 2:
-                return (parts[0], parts[1])
-            else:
-                return (parts[-2], parts[-1])
-
-        def apply_alias_to_table(t: str):
-            schema, tbl = parse_table_ident(t)
-            # always return a normalized qualified name; add alias if present
-            qualified = f"[{schema}].[{tbl}]"
-            if aliases and (schema, tbl) in aliases:
-                return f"{qualified} {aliases[(schema, tbl)]}"
-            return qualified
-
-        # helper: qualify a field name using available aliases
-        def qualify_field(field: str):
-            """Se o campo for simples (ex: 'CodVendedor'), prefixa com o alias da tabela principal
-            quando disponível. Se já estiver qualificado (schema.table.col ou table.col), tenta
-            substituir o table pelo alias correspondente quando houver um mapeamento em aliases.
-            """
-            if not field:
-                return field
-            s = str(field).strip()
-            # se já tem ponto (qualificado), tentaremos substituir por alias quando possível
-            if '.' in s:
-                # captura a porção final (coluna) e a porção da esquerda (possível esquema/tabela)
-                # exemplos de formatos: [dbo].[Tabela].Col, dbo.Tabela.Col, Tabela.Col
-                m = re.match(r"^\[?(?P<left>[^\]]+?)\]?\.?\[?(?P<table>[^\]]+?)\]?\.(?P<col>\w+)$", s)
-                if m:
-                    left = m.group('left')
-                    table = m.group('table')
-                    col = m.group('col')
-                    # tente achar alias primeiro por (schema,table)
-                    try_keys = []
-                    # left pode ser schema or schema.table depending on match; prefer (left,table)
-                    try_keys.append((left, table))
-                    try_keys.append((None, table))
-                    for k in try_keys:
-                        if aliases and k in aliases:
-                            return f"{aliases[k]}.{col}"
-                # se não conseguimos mapear, return original string limpa
-                return s
-            else:
-                # campo sem qualificação: prefixar com alias da tabela principal quando houver
-                try:
-                    p_schema, p_table = parse_table_ident(tabela_principal)
-                    if aliases and (p_schema, p_table) in aliases:
-                        return f"{aliases[(p_schema, p_table)]}.{s}"
-                except Exception:
-                    pass
-                return s
-
-        # Dimensões
-        for dim in agrupamento.get("dimensoes", []):
-            if isinstance(dim, dict):
-                campo = dim.get("campo")
-                tipo = dim.get("tipo")
-                tabela = dim.get("tabela")
-                if tipo == "mes_ano":
-                    qcampo = qualify_field(campo)
-                    expr = f"FORMAT({qcampo}, 'yyyy-MM')"
-                    select_parts.append(f"{expr} AS MesAno")
-                    group_by_parts.append(expr)
-                elif tabela:
-                    # tenta usar alias se disponível
-                    alias = None
-                    if aliases:
-                        for (sch, tbl), a in aliases.items():
-                            if tbl.lower() == tabela.lower():
-                                alias = a
-                                break
-                    if alias:
-                        qcampo = f"{alias}.{campo}"
-                    else:
-                        qcampo = f"{tabela}.{campo}"
-                    select_parts.append(qcampo)
-                    group_by_parts.append(qcampo)
-                else:
-                    qcampo = qualify_field(campo)
-                    select_parts.append(qcampo)
-                    group_by_parts.append(qcampo)
-            else:
-                # dim pode ser string simples ou já qualificado
-                q = qualify_field(dim)
-                select_parts.append(q)
-                group_by_parts.append(q)
+        modelo = self.compilador_agrupamentos.obter(
+            modulo, agrupamento, aliases, metricas_parciais, modulo_meta, self.schema_catalog)
+        return modelo.montar([intervalo_semiaberto(f) for f in filtros or []])
+
+    def rotulador_periodos(self, modulo: str, agrupamento_id: str) -> RotuladorPeriodos:
+        """Rótulos das colunas de período do resultado do agrupamento (aplicados no cliente)."""
+        return RotuladorPeriodos(periodos_do_agrupamento(self.obter_agrupamento(modulo, agrupamento_id)))
+
+    def planejar_particoes(
+        self,
+        modulo: str,
+        agrupamento_id: str,
+        filtros: Optional[List] = None,
+        aliases: Optional[Dict[tuple, str]] = None,
+        tamanho: object = TAMANHO_MES
+    ) -> Optional[PlanoParticionado]:
+        """Divide o filtro BETWEEN de datas do agrupamento em partições.
 
-        # Métricas
+        Retorna None quando a consulta não pode ser particionada: sem filtro
+        de datas, intervalo de uma única partição ou métricas que não podem
+        ser combinadas no cliente (ex.: COUNT(DISTINCT ...)).
+        """
+        agrupamento = self.obter_agrupamento(modulo, agrupamento_id)
+        if not agrupamento:
+            raise ValueError(f"Agrupamento '{agrupamento_id}' não encontrado.")
+
+        metricas = []
         for met in agrupamento.get("metricas", []):
-            campo = met["campo"]
-            func = met["funcao"]
-            label = met["label"]
-            qcampo = qualify_field(campo)
-            select_parts.append(f"{func}({qcampo}) AS [{label}]")
-
-        # JOINs
-        for join in agrupamento.get("joins", []):
-            join_parts.append(
-                f"INNER JOIN {join['tabela']} ON {join['on']}"
-            )
-
-        # SQL base
-        sql = f"""
-        SELECT
-            {", ".join(select_parts)}
-        FROM {apply_alias_to_table(tabela_principal)}
+            func = str(met.get("funcao", "")).strip().upper()
+            if func not in FUNCOES_COMBINAVEIS or "DISTINCT" in str(met.get("campo", "")).upper():
+                return None
+            metricas.append(MetricaParticionada(label=met["label"], funcao=func))
+
+        campos_data = [
+            d.get("campo") for d in agrupamento.get("dimensoes", [])
+            if isinstance(d, dict) and d.get("tipo") in TIPOS_PERIODO
+        ]
+        achado = localizar_filtro_data(filtros or [], campos_data)
+        if achado is None:
+            return None
+        indice, campo, inicio, fim, originais = achado
+        intervalos = gerar_intervalos(inicio, fim, tamanho)
+        if len(intervalos) < 2:
+            return None
+
+        particoes = []
+        for n, (a, b) in enumerate(intervalos):
+            filtros_particao = list(filtros)
+            filtros_particao[indice] = filtro_da_particao(campo, a, b, n == len(intervalos) - 1, originais)
+            particoes.append(self.gerar_sql_por_agrupamento(
+                modulo, agrupamento_id, filtros_particao, aliases, metricas_parciais=True
+            ))
+        sql_base, params_base = self.gerar_sql_por_agrupamento(modulo, agrupamento_id, filtros, aliases)
+        return PlanoParticionado(
+            particoes=particoes,
+            n_dimensoes=len(agrupamento.get("dimensoes", [])),
+            metricas=metricas,
+            intervalos=intervalos,
+            sql_base=sql_base,
+            params_base=list(params_base),
+        )
+
+    def executar_particionado(
+        self,
+        plano: PlanoParticionado,
+        timeout: Optional[int] = None,
+        max_concorrencia: int = DEFAULT_MAX_CONCORRENCIA,
+        cancel_token: Optional[QueryCancelToken] = None
+    ) -> Tuple[List[str], List[tuple]]:
+        """Executa as partições em paralelo e combina os agregados parciais.
+
+        Cada partição empresta a sua conexão da fila de consultas do pool; o
+        número de partições simultâneas é limitado por `max_concorrencia` e
+        pelo tamanho da fila. Sem pool (conexão única) a execução é serial.
+        Se uma partição falhar, as demais são canceladas e o erro repassado.
         """
+        limite = max(1, min(int(max_concorrencia or 1), len(plano.particoes)))
+        if self.pool is None:
+            limite = 1
+        else:
+            try:
+                limite = min(limite, self.pool.lane_size(LANE_QUERY))
+            except Exception:
+                pass
+        grupo = cancel_token.derivar() if cancel_token is not None else QueryCancelToken()
 
-        if join_parts:
-            # if aliases provided, attempt to rewrite join table names and ON expressions
-            rewritten_joins = []
-            # helper: reescreve a expressão ON substituindo referências table.col ou schema.table.col por alias.col
-            def rewrite_on_expr(on_expr: str) -> str:
-                if not aliases:
-                    return on_expr
-                # encontra tokens do tipo [schema].[table].col ou schema.table.col ou table.col ou [table].col
-                token_re = re.compile(r"(?P<tok>(?:\[[^\]]+\]|[A-Za-z0-9_]+)(?:\.(?:\[[^\]]+\]|[A-Za-z0-9_]+)){1,2})")
-                out = []
-                last = 0
-                for m in token_re.finditer(on_expr):
-                    start, end = m.span('tok')
-                    out.append(on_expr[last:start])
-                    tok = m.group('tok')
-                    # split parts and strip brackets
-                    parts = [p.strip('[]') for p in tok.split('.')]
-                    alias_repl = None
-                    if len(parts) == 3:
-                        schema, table, col = parts
-                        # try exact (schema,table)
-                        if (schema, table) in aliases:
-                            alias_repl = f"{aliases[(schema, table)]}.{col}"
-                        else:
-                            # try match by table name only
-                            for (s2, t2), a2 in aliases.items():
-                                if t2.lower() == table.lower():
-                                    alias_repl = f"{a2}.{col}"
-                                    break
-                    elif len(parts) == 2:
-                        table, col = parts
-                        # try match by table name
-                        for (s2, t2), a2 in aliases.items():
-                            if t2.lower() == table.lower():
-                                alias_repl = f"{a2}.{col}"
-                                break
-                    # if found replacement, use it, else keep original token (but normalized without extra brackets)
-                    if alias_repl:
-                        out.append(alias_repl)
-                    else:
-                        out.append(tok)
-                    last = end
-                out.append(on_expr[last:])
-                return ''.join(out)
-
-            for j in join_parts:
-                # expected original format: 'INNER JOIN {join_table} ON {on_expr}'
-                m = re.match(r"(\w+\s+JOIN)\s+(.+)\s+ON\s+(.+)", j, re.IGNORECASE)
-                if m:
-                    join_kw = m.group(1)
-                    join_table = m.group(2).strip()
-                    on_expr = m.group(3).strip()
-                    jt_schema, jt_table = parse_table_ident(join_table)
-                    if aliases and (jt_schema, jt_table) in aliases:
-                        alias = aliases[(jt_schema, jt_table)]
-                        join_table_repr = f"[{jt_schema}].[{jt_table}] {alias}"
-                        on_expr = rewrite_on_expr(on_expr)
-                        rewritten_joins.append(f"{join_kw} {join_table_repr} ON {on_expr}")
-                    else:
-                        rewritten_joins.append(j)
-                else:
-                    rewritten_joins.append(j)
-            sql += "\n" + "\n".join(rewritten_joins)
-
-        if filtros:
-            # filtros pode ser lista de strings (compatibilidade) ou lista de tuples (expr, params)
-            exprs = []
-            for f in filtros:
-                if isinstance(f, (list, tuple)) and len(f) >= 1:
-                    exprs.append(f[0])
-                    if len(f) > 1 and f[1]:
-                        if isinstance(f[1], (list, tuple)):
-                            where_params.extend(list(f[1]))
-                        else:
-                            where_params.append(f[1])
+        def executar(sql, params):
+            token = grupo.derivar()
+            colunas, linhas = [], []
+            for colunas, lote in self.executar_sql_em_lotes(sql, params, timeout=timeout, cancel_token=token):
+                linhas.extend(lote)
+            return colunas, linhas
+
+        with ThreadPoolExecutor(max_workers=limite, thread_name_prefix="particao") as executor:
+            futuros = [executor.submit(executar, sql, params) for sql, params in plano.particoes]
+            feitos, _ = wait(futuros, return_when=FIRST_EXCEPTION)
+            erros = [f.exception() for f in futuros if f in feitos and f.exception() is not None]
+            if erros:
+                grupo.cancel()
+                for f in futuros:
+                    f.cancel()
+                wait(futuros)
+                # prefere o erro original ao cancelamento provocado por ele
+                originais = [e for e in erros if not isinstance(e, QueryCancelledError)]
+                raise (originais or erros)[0]
+            resultados = [f.result() for f in futuros]
+        return combinar_parciais(plano, resultados)
+
+    def execute_partitioned(
+        self,
+        plano: PlanoParticionado,
+        timeout: Optional[int] = None,
+        max_concurrency: int = DEFAULT_MAX_CONCORRENCIA,
+        cancel_token: Optional[QueryCancelToken] = None
+    ) -> Tuple[List[str], List[tuple]]:
+        """Wrapper (inglês) de `executar_particionado`."""
+        return self.executar_particionado(plano, timeout, max_concurrency, cancel_token)
+
+    # ==========================================================
+    # Relacionamentos (grafo de FKs)
+    # ==========================================================
+    def grafo_relacionamentos(self) -> Optional[GrafoRelacionamentos]:
+        """Grafo de FKs do catálogo em memória ou, sem catálogo, da planilha
+        `relationships_csv`. Retorna None quando nenhuma das fontes existe.
+        """
+        fonte = self.schema_catalog if self.schema_catalog is not None else self.relationships_csv
+        if fonte is None:
+            return None
+        if self._grafo is None or self._grafo[0] is not fonte:
+            try:
+                if isinstance(fonte, SchemaCatalog):
+                    grafo = GrafoRelacionamentos.from_catalogo(fonte)
                 else:
-                    exprs.append(str(f))
-            sql += "\nWHERE " + " AND ".join(exprs)
+                    grafo = GrafoRelacionamentos.from_csv(fonte)
+            except (OSError, ValueError):
+                grafo = None
+            self._grafo = (fonte, grafo)
+        return self._grafo[1]
+
+    def _grafo_para(self, tabelas: List[tuple]) -> GrafoRelacionamentos:
+        """Grafo completo quando disponível; senão só com as FKs das `tabelas`."""
+        grafo = self.grafo_relacionamentos()
+        if grafo is not None:
+            return grafo
+        fks = []
+        for t in tabelas:
+            schema, tabela = t if isinstance(t, (tuple, list)) else ('dbo', t)
+            try:
+                fks.extend(self.get_foreign_keys(schema, tabela))
+            except Exception:
+                continue
+        return GrafoRelacionamentos.from_foreign_keys(fks)
 
-        if group_by_parts:
-            sql += "\nGROUP BY " + ", ".join(group_by_parts)
+    def find_relationship(self, table1, table2) -> Optional[Relacionamento]:
+        """FK que liga diretamente as duas tabelas (nome ou (schema, tabela)).
 
-        return sql.strip(), where_params
+        O retorno tem os atributos de ForeignKey (primeiro par de colunas) e
+        `condicao_on()` com todos os pares de uma FK composta.
+        """
+        relacoes = self._grafo_para([table1, table2]).relacoes_diretas(table1, table2)
+        return relacoes[0] if relacoes else None
+
+    def sugerir_juncoes(self, tables: List[tuple]) -> List[PassoJuncao]:
+        """Ordem de JOIN de menor custo ligando as tabelas (schema, tabela),
+        com as tabelas intermediárias necessárias (ver GrafoRelacionamentos.arvore_juncao).
+        """
+        return self._grafo_para(tables).arvore_juncao(list(tables))
+
+    def sugerir_on(self, prior_tables: List[tuple], current_table: tuple) -> Optional[str]:
+        """Expressão ON entre `current_table` e a tabela anterior mais recente
+        com FK direta para ela; None quando não há relacionamento direto.
+        """
+        grafo = self._grafo_para(list(prior_tables) + [current_table])
+        for anterior in reversed(list(prior_tables)):
+            relacoes = grafo.relacoes_diretas(tuple(anterior), tuple(current_table))
+            if relacoes:
+                return relacoes[0].condicao_on()
+        return None
 
-    def build_query(self, tables: List[tuple], columns: List[tuple], joins=None, where_clause: Optional[str]=None, alias_mode: str='none') -> str:
+    def build_query(self, tables: List[tuple], columns: List[tuple], joins=None, where_clause: Optional[str]=None, alias_mode: str='none', auto_join_path: bool = False) -> str:
         """Gera uma SQL simples a partir de listas de tabelas e colunas.
 
-        Esta implementação é minimalista e atende aos testes unitários que
-        verificam ordem de JOINs e geração de ON quando há relacionamento
-        detectado por `find_relationship`.
+        O ON de cada JOIN vem de `find_relationship` entre a tabela e as
+        anteriores (da mais recente para a primeira); sem relacionamento,
+        usa `1=1`. Com `auto_join_path`, a ordem dos JOINs e as tabelas
+        intermediárias necessárias vêm de `sugerir_juncoes`.
         """
         # SELECT
         sel_parts = []
@@ -325,6 +447,15 @@ class QueryBuilder:
 
         sql = "SELECT " + (", ".join(sel_parts) if sel_parts else "*") + "\n"
 
+        relacoes_arvore = None
+        if auto_join_path and tables and len(tables) > 1:
+            try:
+                passos = self.sugerir_juncoes(tables)
+                tables = [(p.schema, p.tabela) for p in passos]
+                relacoes_arvore = {chave_tabela(p.schema, p.tabela): p.relacionamento for p in passos}
+            except Exception:
+                relacoes_arvore = None
+
         # aliases (short: use table name as alias with possible suffix)
         alias_map = {}
         if alias_mode == 'short':
@@ -346,14 +477,24 @@ class QueryBuilder:
             sql += f"FROM {qname(prev_sch, prev_tbl)}\n"
 
         # JOINs (preserve order)
+        anteriores = [prev_tbl]
         for sch, tbl in tables[1:]:
             # determine ON expression via relationship discovery
-            try:
-                fk = self.find_relationship(prev_tbl, tbl)
-            except Exception:
-                fk = None
+            fk = None
+            if relacoes_arvore is not None:
+                fk = relacoes_arvore.get(chave_tabela(sch, tbl))
+            else:
+                for anterior in reversed(anteriores):
+                    try:
+                        fk = self.find_relationship(anterior, tbl)
+                    except Exception:
+                        fk = None
+                    if fk:
+                        break
 
-            if fk:
+            if fk and hasattr(fk, 'condicao_on'):
+                on_expr = fk.condicao_on()
+            elif fk:
                 # try to use schema from fk if present, else default to provided schema
                 fk_schema = getattr(fk, 'fk_schema', sch) or sch
                 pk_schema = getattr(fk, 'pk_schema', prev_sch) or prev_sch
@@ -369,6 +510,7 @@ class QueryBuilder:
                 sql += f"JOIN {qname(sch, tbl)} ON {on_expr}\n"
 
             prev_sch, prev_tbl = sch, tbl
+            anteriores.append(tbl)
 
         # WHERE
         if where_clause:
@@ -379,38 +521,577 @@ class QueryBuilder:
     # ==========================================================
     # Execução
     # ==========================================================
-    def executar_sql(self, sql: str, params: Optional[List] = None) -> Tuple[List[str], List[tuple]]:
-        cursor = self.conn.cursor()
-        if params:
-            cursor.execute(sql, params)
-        else:
-            cursor.execute(sql)
+    def executar_sql(
+        self,
+        sql: str,
+        params: Optional[List] = None,
+        timeout: Optional[int] = None
+    ) -> Tuple[List[str], List[tuple]]:
+        with self._emprestar_conexao(LANE_QUERY) as conn:
+            anterior = self._aplicar_timeout(conn, timeout)
+            try:
+                cursor = conn.cursor()
+            finally:
+                self._restaurar_timeout(conn, anterior)
+            try:
+                if params:
+                    cursor.execute(sql, params)
+                else:
+                    cursor.execute(sql)
+
+                colunas = [c[0] for c in cursor.description] if cursor.description else []
+                dados = cursor.fetchall()
+            except Exception as e:
+                self._traduzir_erro_execucao(e, timeout, None)
+                raise
+            finally:
+                cursor.close()
+        return colunas, dados
+
+    def executar_sql_em_lotes(
+        self,
+        sql: str,
+        params: Optional[List] = None,
+        batch_size: Optional[int] = None,
+        timeout: Optional[int] = None,
+        cancel_token: Optional[QueryCancelToken] = None
+    ) -> Iterator[Tuple[List[str], List[tuple]]]:
+        """Executa a SQL e entrega o resultado em lotes lidos com `fetchmany`.
+
+        Cada item gerado é uma tupla (colunas, lote). Quando a consulta não
+        retorna linhas, um único lote vazio é gerado para que o chamador
+        ainda receba os nomes das colunas. O cursor (e a conexão emprestada
+        do pool, se houver) é liberado ao final da iteração ou quando o
+        gerador é descartado.
+
+        `timeout` (segundos) é aplicado via `conn.timeout`; `cancel_token`
+        permite interromper a consulta a partir de outra thread, caso em que
+        `QueryCancelledError` é levantada.
+        """
+        tamanho = int(batch_size or DEFAULT_FETCH_BATCH_SIZE)
+        if tamanho <= 0:
+            tamanho = DEFAULT_FETCH_BATCH_SIZE
+        if cancel_token is not None and cancel_token.cancelled:
+            raise QueryCancelledError("Consulta cancelada pelo usuário")
+        with self._emprestar_conexao(LANE_QUERY) as conn:
+            anterior = self._aplicar_timeout(conn, timeout)
+            try:
+                cursor = conn.cursor()
+            finally:
+                self._restaurar_timeout(conn, anterior)
+            if cancel_token is not None:
+                cancel_token.bind(cursor)
+            try:
+                try:
+                    if params:
+                        cursor.execute(sql, params)
+                    else:
+                        cursor.execute(sql)
+                except Exception as e:
+                    self._traduzir_erro_execucao(e, timeout, cancel_token)
+                    raise
+
+                colunas = [c[0] for c in cursor.description] if cursor.description else []
+                if not cursor.description:
+                    yield colunas, []
+                    return
+
+                vazio = True
+                while True:
+                    if cancel_token is not None and cancel_token.cancelled:
+                        raise QueryCancelledError("Consulta cancelada pelo usuário")
+                    try:
+                        lote = cursor.fetchmany(tamanho)
+                    except Exception as e:
+                        self._traduzir_erro_execucao(e, timeout, cancel_token)
+                        raise
+                    if not lote:
+                        break
+                    vazio = False
+                    yield colunas, lote
+                if vazio:
+                    yield colunas, []
+            finally:
+                if cancel_token is not None:
+                    cancel_token.release()
+                try:
+                    cursor.close()
+                except Exception:
+                    pass
+
+    @staticmethod
+    def _aplicar_timeout(conn, timeout: Optional[int]):
+        """Aplica `timeout` (segundos) em `conn.timeout` e devolve o valor anterior.
+
+        No pyodbc o valor é copiado para cada cursor no momento da criação,
+        por isso deve ser aplicado antes de `conn.cursor()`.
+        """
+        if not timeout:
+            return None
+        try:
+            anterior = getattr(conn, 'timeout', 0)
+            conn.timeout = int(timeout)
+            return anterior
+        except Exception:
+            return None
+
+    @staticmethod
+    def _restaurar_timeout(conn, anterior):
+        if anterior is None:
+            return
+        try:
+            conn.timeout = anterior
+        except Exception:
+            pass
 
-        colunas = [c[0] for c in cursor.description] if cursor.description else []
-        dados = cursor.fetchall()
+    @staticmethod
+    def _traduzir_erro_execucao(erro: Exception, timeout: Optional[int], cancel_token: Optional[QueryCancelToken]):
+        """Converte erros do driver em cancelamento/tempo limite quando aplicável."""
+        if cancel_token is not None and cancel_token.cancelled:
+            raise QueryCancelledError("Consulta cancelada pelo usuário") from erro
+        msg = str(erro)
+        if timeout and ('HYT00' in msg or 'timeout expired' in msg.lower()):
+            raise QueryTimeoutError(f"A consulta excedeu o tempo limite de {int(timeout)} segundos") from erro
 
-        cursor.close()
+    def execute_query(
+        self,
+        sql: str,
+        params: Optional[List] = None,
+        timeout: Optional[int] = None,
+        force_refresh: bool = False
+    ) -> Tuple[List[str], List[tuple]]:
+        """Wrapper compatível com chamadas existentes (inglês) que aceita parâmetros.
+
+        Com `result_cache` configurado, devolve o resultado em cache quando
+        houver; `force_refresh=True` ignora o cache e o atualiza.
+        """
+        if self.result_cache is None:
+            return self.executar_sql(sql, params, timeout=timeout)
+        chave = self._chave_cache(sql, params)
+        if not force_refresh:
+            cached = self.result_cache.get(chave)
+            if cached is not None:
+                return cached
+        colunas, dados = self.executar_sql(sql, params, timeout=timeout)
+        self.result_cache.put(chave, colunas, dados)
         return colunas, dados
 
-    def execute_query(self, sql: str, params: Optional[List] = None) -> Tuple[List[str], List[tuple]]:
-        """Wrapper compatível com chamadas existentes (inglês) que aceita parâmetros."""
-        return self.executar_sql(sql, params)
+    def execute_query_stream(
+        self,
+        sql: str,
+        params: Optional[List] = None,
+        batch_size: Optional[int] = None,
+        timeout: Optional[int] = None,
+        cancel_token: Optional[QueryCancelToken] = None,
+        force_refresh: bool = False
+    ) -> Iterator[Tuple[List[str], List[tuple]]]:
+        """Wrapper (inglês) de `executar_sql_em_lotes`, com uso do cache de resultados."""
+        if self.result_cache is None:
+            return self.executar_sql_em_lotes(sql, params, batch_size, timeout=timeout, cancel_token=cancel_token)
+        return self._stream_com_cache(sql, params, batch_size, timeout, cancel_token, force_refresh)
+
+    def paginar(
+        self,
+        sql: str,
+        params: Optional[List] = None,
+        tamanho_pagina: int = DEFAULT_PAGE_SIZE,
+        chaves_candidatas: Optional[List[str]] = None,
+        timeout: Optional[int] = None,
+        rotular: Optional[RotuladorPeriodos] = None
+    ) -> PaginadorConsulta:
+        """Cria um PaginadorConsulta para executar a SQL página a página no servidor.
+
+        `chaves_candidatas` (ex.: `obter_chaves_paginacao`) habilita o modo
+        keyset quando alguma delas fizer parte do resultado. `rotular`
+        (ver `rotulador_periodos`) é aplicado às linhas de cada página.
+        """
+        def executar_rotulado(sql, params=None, timeout=None):
+            colunas, linhas = self.executar_sql(sql, params, timeout=timeout)
+            return colunas, rotular(colunas, linhas)
+
+        return PaginadorConsulta(
+            executar_rotulado if rotular else self.executar_sql,
+            sql,
+            params,
+            tamanho_pagina=tamanho_pagina,
+            chaves_candidatas=chaves_candidatas,
+            timeout=timeout,
+            # sem pool há uma única conexão: página e contagem não podem concorrer
+            serializar=self.pool is None,
+        )
+
+    def novo_result_set(self, colunas: List[str]) -> ResultSet:
+        """Cria um ResultSet vazio com a configuração de gravação em disco da sessão."""
+        if self.spill_threshold_bytes is None:
+            return ResultSet(colunas)
+        return ResultSet(colunas, spill_dir=self.pasta_sessao(), spill_threshold_bytes=self.spill_threshold_bytes)
+
+    def execute_query_result_set(
+        self,
+        sql: str,
+        params: Optional[List] = None,
+        batch_size: Optional[int] = None,
+        timeout: Optional[int] = None,
+        cancel_token: Optional[QueryCancelToken] = None,
+        force_refresh: bool = False
+    ) -> ResultSet:
+        """Executa a consulta e monta o ResultSet lote a lote (ver `novo_result_set`)."""
+        rs = None
+        try:
+            for colunas, lote in self.execute_query_stream(sql, params, batch_size, timeout=timeout,
+                                                           cancel_token=cancel_token, force_refresh=force_refresh):
+                if rs is None:
+                    rs = self.novo_result_set(colunas)
+                rs.extend(lote)
+        except BaseException:
+            if rs is not None:
+                rs.close()
+            raise
+        return rs if rs is not None else self.novo_result_set([])
+
+    def pasta_sessao(self) -> Optional[str]:
+        """Pasta temporária (uma por sessão) dos resultados gravados em disco."""
+        if self._pasta_sessao is None:
+            base = self.spill_dir or None
+            try:
+                if base:
+                    os.makedirs(base, exist_ok=True)
+                self._pasta_sessao = tempfile.mkdtemp(prefix="csdata_resultados_", dir=base)
+            except Exception:
+                return None
+        return self._pasta_sessao
+
+    def limpar_resultados_em_disco(self):
+        """Remove a pasta temporária da sessão (chamado ao encerrar)."""
+        if self._pasta_sessao is not None:
+            shutil.rmtree(self._pasta_sessao, ignore_errors=True)
+            self._pasta_sessao = None
+
+    def obter_chaves_paginacao(self, modulo: str) -> List[str]:
+        """Retorna as chaves primárias de coluna única declaradas no módulo
+        (`chave_primaria` em `<modulo>.json`), usadas na paginação keyset."""
+        try:
+            modulo_meta = self.carregar_modulo(modulo)
+        except Exception:
+            return []
+        chaves = []
+        for tabela in (modulo_meta.get("tabelas") or {}).values():
+            pk = tabela.get("chave_primaria") or []
+            if isinstance(pk, str):
+                pk = [pk]
+            if len(pk) == 1 and pk[0] not in chaves:
+                chaves.append(pk[0])
+        return chaves
+
+    def _chave_cache(self, sql: str, params: Optional[List]) -> str:
+        return gerar_chave(sql, params, self.db_identity)
+
+    def _stream_com_cache(self, sql, params, batch_size, timeout, cancel_token, force_refresh):
+        chave = self._chave_cache(sql, params)
+        if not force_refresh:
+            cached = self.result_cache.get(chave)
+            if cached is not None:
+                colunas, dados = cached
+                tamanho = int(batch_size or DEFAULT_FETCH_BATCH_SIZE)
+                if tamanho <= 0:
+                    tamanho = DEFAULT_FETCH_BATCH_SIZE
+                if not dados:
+                    yield colunas, []
+                    return
+                for i in range(0, len(dados), tamanho):
+                    yield colunas, dados[i:i + tamanho]
+                return
+        colunas = []
+        acumulado = []
+        limite_linhas = None
+        for colunas, lote in self.executar_sql_em_lotes(sql, params, batch_size, timeout=timeout, cancel_token=cancel_token):
+            if acumulado is not None:
+                if limite_linhas is None and lote:
+                    limite_linhas = self._limite_linhas_cache(lote)
+                acumulado.extend(lote)
+                if limite_linhas is not None and len(acumulado) > limite_linhas:
+                    # não caberia no cache: deixa de acumular uma cópia das linhas
+                    acumulado = None
+            yield colunas, lote
+        # só chega aqui quando a leitura terminou sem erro nem cancelamento
+        if acumulado is not None:
+            self.result_cache.put(chave, colunas, acumulado)
+
+    def _limite_linhas_cache(self, lote: List[tuple]) -> int:
+        """Estimativa de quantas linhas cabem no cache, pelo tamanho serializado do primeiro lote."""
+        cache = self.result_cache
+        orcamento = max(cache.max_memory_bytes, cache.max_disk_bytes if cache.spill_dir else 0)
+        try:
+            amostra = [tuple(r) for r in lote[:1000]]
+            por_linha = max(1, len(pickle.dumps(amostra, protocol=pickle.HIGHEST_PROTOCOL)) // len(amostra))
+        except Exception:
+            return len(lote)
+        return max(len(lote), orcamento // por_linha)
+
+    def estimar_plano(
+        self,
+        sql: str,
+        params: Optional[List] = None,
+        timeout: Optional[int] = None,
+        force_refresh: bool = False
+    ) -> EstimativaPlano:
+        """Obtém do SQL Server a estimativa do plano (SET SHOWPLAN_XML ON).
+
+        A consulta é apenas compilada, não executada. O resultado fica em
+        `plan_cache` pela impressão digital da SQL + parâmetros + banco.
+        Erros do driver (ex.: banco que não é SQL Server, falta de permissão
+        SHOWPLAN) são propagados para o chamador decidir o que fazer.
+        """
+        chave = self._chave_cache(sql, params)
+        if not force_refresh:
+            cached = self.plan_cache.get(chave)
+            if cached is not None:
+                return cached
+        if self.pool is not None:
+            conn = self.pool.acquire(LANE_QUERY)
+        else:
+            conn = self.conn
+        descartar = False
+        try:
+            anterior = self._aplicar_timeout(conn, timeout)
+            try:
+                cursor = conn.cursor()
+            finally:
+                self._restaurar_timeout(conn, anterior)
+            try:
+                # SET SHOWPLAN_XML precisa ser a única instrução do lote
+                cursor.execute("SET SHOWPLAN_XML ON")
+                try:
+                    if params:
+                        cursor.execute(sql, params)
+                    else:
+                        cursor.execute(sql)
+                    documentos = []
+                    while True:
+                        for row in cursor.fetchall():
+                            if row and row[0]:
+                                documentos.append(row[0])
+                        if not cursor.nextset():
+                            break
+                finally:
+                    try:
+                        cursor.execute("SET SHOWPLAN_XML OFF")
+                    except Exception:
+                        # a conexão ficaria compilando sem executar: não pode voltar ao pool
+                        descartar = True
+            except Exception as e:
+                self._traduzir_erro_execucao(e, timeout, None)
+                raise
+            finally:
+                try:
+                    cursor.close()
+                except Exception:
+                    pass
+        finally:
+            if self.pool is not None:
+                self.pool.release(conn, LANE_QUERY, discard=descartar)
+        if not documentos:
+            raise ValueError("O servidor não retornou o plano de execução")
+        estimativa = analisar_showplan(documentos)
+        self.plan_cache.put(chave, estimativa)
+        return estimativa
+
+    def _tipo_coluna(self, schema: str, table: str, column: str) -> Optional[str]:
+        try:
+            for c in self.get_table_columns(schema, table) or []:
+                if (c.column_name or '').lower() == column.strip('[]').lower():
+                    return c.data_type
+        except Exception:
+            pass
+        return None
+
+    def estatisticas_em_cache(self, schema: str, table: str, column: str) -> Optional[EstatisticasColuna]:
+        """Estatísticas da coluna já em `column_stats_cache` (sem consultar o banco)."""
+        return self.column_stats_cache.get(chave_estatisticas(schema, table, column, self.db_identity))
+
+    def estatisticas_coluna(
+        self,
+        schema: str,
+        table: str,
+        column: str,
+        data_type: Optional[str] = None,
+        amostra_linhas: int = DEFAULT_AMOSTRA_LINHAS,
+        top_valores: int = DEFAULT_TOP_VALORES,
+        force_refresh: bool = False
+    ) -> Optional[EstatisticasColuna]:
+        """Valores distintos aproximados, mínimo/máximo e valores frequentes de uma coluna.
+
+        Calculados sobre uma amostra da tabela (ver estatisticas_colunas) na
+        fila de metadados e guardados em `column_stats_cache`. Retorna None
+        para colunas sem estatística útil (text, xml, binários...). Quando
+        `data_type` não é informado, é lido dos metadados da tabela.
+        """
+        schema = schema or 'dbo'
+        chave = chave_estatisticas(schema, table, column, self.db_identity)
+        if not force_refresh:
+            cached = self.column_stats_cache.get(chave)
+            if cached is not None:
+                return cached
+        if data_type is None:
+            data_type = self._tipo_coluna(schema, table, column)
+        if not coluna_com_estatistica(data_type):
+            return None
+        estatisticas = coletar_estatisticas(
+            self._consultar_metadados, schema, table.strip('[]'), column.strip('[]'),
+            amostra_linhas=amostra_linhas, top_valores=top_valores,
+        )
+        ttl = self.column_stats_cache.ttl_datas_seconds if tipo_data(data_type) else None
+        self.column_stats_cache.put(chave, estatisticas, ttl)
+        return estatisticas
+
+    def pagina_valores_distintos(
+        self,
+        schema: str,
+        table: str,
+        column: str,
+        prefixo: str = '',
+        numero: int = 0,
+        tamanho: int = DEFAULT_TAMANHO_PAGINA,
+        timeout: Optional[int] = None,
+        cancel_token: Optional[QueryCancelToken] = None
+    ) -> PaginaValores:
+        """Página `numero` dos valores distintos da coluna que começam com `prefixo`.
+
+        Usa `distinct_values_cache` (ver valores_distintos); a página seguinte
+        a uma já em cache continua pelo último valor dela em vez de OFFSET.
+        `cancel_token` interrompe a consulta quando o usuário continua digitando.
+        """
+        schema = schema or 'dbo'
+        coluna = chave_estatisticas(schema, table, column, self.db_identity)
+        cached = self.distinct_values_cache.get(coluna, prefixo, numero)
+        if cached is not None:
+            return cached
+        apos = self.distinct_values_cache.ultimo_valor(coluna, prefixo, numero - 1) if numero > 0 else None
+        sql, params = sql_pagina_distintos(
+            schema, table, column, prefixo, offset=numero * tamanho, tamanho=tamanho, apos=apos)
+        linhas: List[tuple] = []
+        for _, lote in self.executar_sql_em_lotes(sql, params, timeout=timeout, cancel_token=cancel_token):
+            linhas.extend(lote)
+        pagina = montar_pagina(linhas, tamanho)
+        self.distinct_values_cache.put(coluna, prefixo, numero, pagina)
+        return pagina
+
+    def obter_timeout_agrupamento(self, modulo: str, agrupamento_id: Optional[str] = None) -> Optional[int]:
+        """Retorna o tempo limite (segundos) configurado para o agrupamento.
+
+        Procura `timeout_segundos` no próprio agrupamento e, na ausência,
+        no nível do arquivo `<modulo>_agrupamentos.json`. Retorna None
+        quando nenhum valor válido estiver configurado.
+        """
+        try:
+            agrup_meta = self.carregar_agrupamentos(modulo)
+        except Exception:
+            return None
+        valor = None
+        if agrupamento_id:
+            agrupamento = self.obter_agrupamento(modulo, agrupamento_id)
+            if agrupamento:
+                valor = agrupamento.get("timeout_segundos")
+        if valor is None:
+            valor = agrup_meta.get("timeout_segundos")
+        try:
+            valor = int(valor)
+        except (TypeError, ValueError):
+            return None
+        return valor if valor > 0 else None
 
     # ==========================================================
     # Métodos de utilitários/metadata (compatibilidade com Main)
     # ==========================================================
+    def _consultar_metadados(self, sql: str, params: Optional[tuple] = None) -> List[tuple]:
+        """Executa uma consulta de catálogo na fila de metadados e retorna todas as linhas."""
+        with self._emprestar_conexao(LANE_METADATA) as conn:
+            cur = conn.cursor()
+            try:
+                if params:
+                    cur.execute(sql, params)
+                else:
+                    cur.execute(sql)
+                return cur.fetchall()
+            finally:
+                cur.close()
+
+    def carregar_catalogo(self) -> SchemaCatalog:
+        """Carrega tabelas, colunas, PKs e FKs de uma só vez (catalogo.SchemaCatalog).
+
+        A partir daí os métodos de metadados abaixo respondem pelo catálogo
+        em memória; tabelas fora dele (ex.: criadas depois da carga) ainda
+        são consultadas no INFORMATION_SCHEMA.
+        """
+        with self._emprestar_conexao(LANE_METADATA) as conn:
+            catalogo = SchemaCatalog.from_connection(conn)
+        self.schema_catalog = catalogo
+        self.catalogo_validado = True
+        self._salvar_catalogo()
+        return catalogo
+
+    def carregar_catalogo_planilhas(self, pasta: str = "Planilhas") -> SchemaCatalog:
+        """Usa o catálogo das planilhas exportadas do banco (SchemaCatalog.from_planilhas).
+
+        Permite gerar SQL, montar JOINs e rodar benchmarks sem conexão. O
+        catálogo não é gravado em `schema_cache_path`, que é do banco conectado.
+        """
+        catalogo = SchemaCatalog.from_planilhas(pasta)
+        self.schema_catalog = catalogo
+        self.catalogo_validado = True
+        return catalogo
+
+    def carregar_catalogo_em_cache(self) -> Optional[SchemaCatalog]:
+        """Usa o catálogo gravado em `schema_cache_path`, sem consultar o banco.
+
+        O catálogo fica marcado como não validado até `revalidar_catalogo`.
+        Retorna None quando não há arquivo válido.
+        """
+        if not self.schema_cache_path:
+            return None
+        catalogo = SchemaCatalog.carregar_arquivo(self.schema_cache_path)
+        if catalogo is not None:
+            self.schema_catalog = catalogo
+            self.catalogo_validado = False
+        return catalogo
+
+    def revalidar_catalogo(self) -> int:
+        """Confere o catálogo no banco e recarrega o que mudou (ver SchemaCatalog.atualizado).
+
+        Pode rodar em segundo plano: o catálogo é substituído de uma vez.
+        Retorna a quantidade de tabelas/views novas, alteradas ou removidas.
+        """
+        atual = self.schema_catalog
+        if atual is None:
+            return len(self.carregar_catalogo())
+        with self._emprestar_conexao(LANE_METADATA) as conn:
+            novo, alterados = atual.atualizado(conn)
+        self.catalogo_validado = True
+        if novo is not atual:
+            self.schema_catalog = novo
+            self._salvar_catalogo()
+        return alterados
+
+    def _salvar_catalogo(self):
+        if not self.schema_cache_path or self.schema_catalog is None:
+            return
+        try:
+            self.schema_catalog.salvar(self.schema_cache_path)
+        except Exception:
+            # sem o arquivo local o próximo login apenas faz a carga completa
+            pass
+
     def get_tables_and_views(self) -> List[TableInfo]:
         """Retorna uma lista de TableInfo com tabelas e views do banco."""
+        if self.schema_catalog is not None:
+            return self.schema_catalog.tabelas()
         sql = """
         SELECT TABLE_SCHEMA, TABLE_NAME, TABLE_TYPE
         FROM INFORMATION_SCHEMA.TABLES
         WHERE TABLE_TYPE IN ('BASE TABLE', 'VIEW')
         ORDER BY TABLE_SCHEMA, TABLE_NAME
         """
-        cur = self.conn.cursor()
-        cur.execute(sql)
-        rows = cur.fetchall()
-        cur.close()
+        rows = self._consultar_metadados(sql)
         result = []
         for r in rows:
             schema, name, ttype = r[0], r[1], r[2]
@@ -421,16 +1102,17 @@ class QueryBuilder:
 
     def get_table_columns(self, schema: str, table: str) -> List[ColumnInfo]:
         """Retorna ColumnInfo para a tabela informada."""
+        if self.schema_catalog is not None:
+            cols = self.schema_catalog.colunas(schema, table)
+            if cols is not None:
+                return cols
         sql = """
         SELECT TABLE_SCHEMA, TABLE_NAME, COLUMN_NAME, DATA_TYPE, IS_NULLABLE
         FROM INFORMATION_SCHEMA.COLUMNS
         WHERE TABLE_SCHEMA = ? AND TABLE_NAME = ?
         ORDER BY ORDINAL_POSITION
         """
-        cur = self.conn.cursor()
-        cur.execute(sql, (schema, table))
-        rows = cur.fetchall()
-        cur.close()
+        rows = self._consultar_metadados(sql, (schema, table))
         cols = []
         for r in rows:
             is_nullable = True if (r[4] or '').upper() == 'YES' else False
@@ -440,8 +1122,13 @@ class QueryBuilder:
     def get_foreign_keys(self, schema: str, table: str) -> List[ForeignKey]:
         """Retorna lista de ForeignKey envolvendo a tabela (como fk ou pk).
 
-        Usa INFORMATION_SCHEMA para ser mais portátil.
+        Usa o catálogo em memória quando carregado; senão INFORMATION_SCHEMA,
+        para ser mais portátil.
         """
+        if self.schema_catalog is not None:
+            fks = self.schema_catalog.chaves_estrangeiras(schema, table)
+            if fks is not None:
+                return fks
         sql = """
         SELECT
             kcu.CONSTRAINT_NAME,
@@ -456,14 +1143,11 @@ class QueryBuilder:
         JOIN INFORMATION_SCHEMA.CONSTRAINT_COLUMN_USAGE ccu ON rc.UNIQUE_CONSTRAINT_NAME = ccu.CONSTRAINT_NAME
         WHERE kcu.TABLE_SCHEMA = ? AND kcu.TABLE_NAME = ?
         """
-        cur = self.conn.cursor()
-        cur.execute(sql, (schema, table))
-        rows = cur.fetchall()
+        rows = self._consultar_metadados(sql, (schema, table))
         fks = []
         for r in rows:
             # (constraint, fk_schema, fk_table, fk_col, pk_schema, pk_table, pk_col)
             fks.append(ForeignKey(constraint_name=r[0], fk_schema=r[1], fk_table=r[2], fk_column=r[3], pk_schema=r[4], pk_table=r[5], pk_column=r[6]))
-        cur.close()
         return fks
 
     def get_table_dependencies(self, schema: str, table: str) -> Dict[str, List[Tuple]]:
@@ -477,6 +1161,12 @@ class QueryBuilder:
             refs.append((fk.constraint_name, fk.fk_schema, fk.fk_table, fk.fk_column, fk.pk_schema, fk.pk_table, fk.pk_column))
 
         # referências onde outras tabelas possuem FK apontando para esta (outras -> esta)
+        if self.schema_catalog is not None:
+            entrada = self.schema_catalog.referenciada_por(schema, table)
+            if entrada is not None:
+                referenced_by = [(fk.constraint_name, fk.fk_schema, fk.fk_table, fk.fk_column, fk.pk_schema, fk.pk_table, fk.pk_column)
+                                 for fk in entrada]
+                return {'references': refs, 'referenced_by': referenced_by}
         sql = """
         SELECT
             kcu.CONSTRAINT_NAME,
@@ -491,18 +1181,19 @@ class QueryBuilder:
         JOIN INFORMATION_SCHEMA.CONSTRAINT_COLUMN_USAGE ccu ON rc.UNIQUE_CONSTRAINT_NAME = ccu.CONSTRAINT_NAME
         WHERE ccu.TABLE_SCHEMA = ? AND ccu.TABLE_NAME = ?
         """
-        cur = self.conn.cursor()
-        cur.execute(sql, (schema, table))
-        rows = cur.fetchall()
+        rows = self._consultar_metadados(sql, (schema, table))
         referenced_by = []
         for r in rows:
             referenced_by.append((r[0], r[1], r[2], r[3], r[4], r[5], r[6]))
-        cur.close()
 
         return {'references': refs, 'referenced_by': referenced_by}
 
     def get_primary_keys(self, schema: str, table: str) -> List[str]:
         """Retorna lista de nomes de colunas que compõem a PK da tabela."""
+        if self.schema_catalog is not None:
+            pks = self.schema_catalog.chaves_primarias(schema, table)
+            if pks is not None:
+                return pks
         sql = """
         SELECT kcu.COLUMN_NAME
         FROM INFORMATION_SCHEMA.TABLE_CONSTRAINTS tc
@@ -510,8 +1201,5 @@ class QueryBuilder:
         WHERE tc.CONSTRAINT_TYPE = 'PRIMARY KEY' AND kcu.TABLE_SCHEMA = ? AND kcu.TABLE_NAME = ?
         ORDER BY kcu.ORDINAL_POSITION
         """
-        cur = self.conn.cursor()
-        cur.execute(sql, (schema, table))
-        rows = cur.fetchall()
-        cur.close()
+        rows = self._consultar_metadados(sql, (schema, table))
         return [r[0] for r in rows]
@@ -0,0 +1,259 @@
+"""
+Estatísticas de colunas para as sugestões dos filtros do CSData Studio
+
+Nos diálogos de filtro o usuário digitava os valores às cegas: tentava um
+valor, executava a consulta e tentava outro. Para cada coluna filtrada são
+levantados, a partir de uma amostra barata da tabela:
+
+- quantidade aproximada de valores distintos;
+- mínimo e máximo (intervalo sugerido para datas e números);
+- os valores mais frequentes (autocompletar dos campos de texto).
+
+Tudo sai de uma única consulta sobre a amostra: os valores são agrupados e
+os totais vêm como agregações de janela sobre os grupos, junto com os
+`top_valores` grupos mais frequentes. A amostra é:
+
+- a tabela inteira (`TOP`) quando ela tem até duas vezes `amostra_linhas`
+  linhas — as estatísticas são exatas;
+- `TABLESAMPLE SYSTEM (p PERCENT)` limitado por `TOP` nas tabelas maiores;
+- só o `TOP` quando o TABLESAMPLE não se aplica (views) ou não devolve
+  linhas (amostragem por páginas em tabelas pequenas).
+
+A contagem de distintos de uma amostra é extrapolada para a tabela pelo
+estimador GEE (Charikar et al.): distintos + (sqrt(N/n) - 1) * únicos, onde
+"únicos" são os valores vistos uma única vez na amostra.
+
+As estatísticas ficam em `CacheEstatisticas` com validade por coluna: as de
+colunas de data vencem antes, porque o máximo anda com cada linha nova.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+# valores padrão (as validades são sobrescritas por user_prefs.json na MainWindow)
+DEFAULT_AMOSTRA_LINHAS = 10_000
+DEFAULT_TOP_VALORES = 20
+DEFAULT_TTL_SECONDS = 1800
+DEFAULT_TTL_DATAS_SECONDS = 300
+DEFAULT_MAX_ENTRADAS = 500
+
+# TABLESAMPLE escolhe páginas inteiras: pede-se o dobro da fração necessária
+# para que o TOP quase sempre tenha linhas suficientes
+FATOR_SOBREAMOSTRA = 2.0
+
+# tipos que não admitem GROUP BY/MIN/MAX ou cujas estatísticas não ajudam a filtrar
+# (bit não aceita MIN/MAX e tem no máximo dois valores)
+TIPOS_SEM_ESTATISTICA = frozenset((
+    'text', 'ntext', 'image', 'xml', 'geography', 'geometry', 'hierarchyid',
+    'sql_variant', 'binary', 'varbinary', 'timestamp', 'rowversion', 'bit',
+))
+
+_TIPOS_DATA = ('date', 'time')
+
+
+@dataclass
+class EstatisticasColuna:
+    """Estatísticas de uma coluna; aproximadas quando `amostrada`."""
+    linhas_amostra: int = 0
+    nulos: int = 0
+    distintos_amostra: int = 0
+    distintos_aprox: int = 0
+    minimo: Any = None
+    maximo: Any = None
+    # [(valor, ocorrências na amostra)], do mais frequente para o menos
+    frequentes: List[Tuple[Any, int]] = field(default_factory=list)
+    linhas_tabela: Optional[int] = None
+    amostrada: bool = False
+
+    def valores_sugeridos(self) -> List[str]:
+        """Valores frequentes como texto, para o autocompletar."""
+        return [str(v) for v, _ in self.frequentes if v is not None and str(v).strip()]
+
+    @property
+    def todos_os_valores(self) -> bool:
+        """True quando `frequentes` traz todos os valores distintos da coluna."""
+        return not self.amostrada and len(self.frequentes) >= self.distintos_amostra
+
+
+def coluna_com_estatistica(data_type: Optional[str]) -> bool:
+    return (data_type or '').strip().lower() not in TIPOS_SEM_ESTATISTICA
+
+
+def tipo_data(data_type: Optional[str]) -> bool:
+    dt = (data_type or '').lower()
+    return any(t in dt for t in _TIPOS_DATA)
+
+
+def _quote(nome: str) -> str:
+    return "[" + str(nome).strip('[]').replace("]", "]]") + "]"
+
+
+def sql_linhas_tabela() -> str:
+    """Linhas da tabela pelos metadados de partição (sem ler a tabela); NULL para views."""
+    return (
+        "SELECT SUM(p.rows) FROM sys.partitions p "
+        "WHERE p.object_id = OBJECT_ID(?) AND p.index_id IN (0, 1)"
+    )
+
+
+def percentual_amostra(linhas_tabela: Optional[int], amostra_linhas: int) -> Optional[float]:
+    """Percentual do TABLESAMPLE, ou None quando basta ler a tabela com TOP."""
+    if not linhas_tabela or linhas_tabela <= amostra_linhas * FATOR_SOBREAMOSTRA:
+        return None
+    return min(100.0, round(amostra_linhas * FATOR_SOBREAMOSTRA * 100.0 / linhas_tabela, 4))
+
+
+def sql_estatisticas(
+    schema: str,
+    table: str,
+    column: str,
+    amostra_linhas: int = DEFAULT_AMOSTRA_LINHAS,
+    top_valores: int = DEFAULT_TOP_VALORES,
+    percentual: Optional[float] = None,
+) -> str:
+    """Consulta única: os `top_valores` grupos mais frequentes com os totais da amostra.
+
+    Colunas: valor, ocorrências, linhas, nulos, distintos, únicos, mínimo, máximo.
+    """
+    amostra = f"SELECT TOP ({int(amostra_linhas)}) {_quote(column)} AS v FROM {_quote(schema or 'dbo')}.{_quote(table)}"
+    if percentual is not None:
+        amostra += f" TABLESAMPLE SYSTEM ({percentual:g} PERCENT)"
+    return (
+        f"SELECT TOP ({int(top_valores)}) v, n,\n"
+        "    SUM(n) OVER () AS linhas,\n"
+        "    SUM(CASE WHEN v IS NULL THEN n ELSE 0 END) OVER () AS nulos,\n"
+        "    COUNT(v) OVER () AS distintos,\n"
+        "    SUM(CASE WHEN v IS NOT NULL AND n = 1 THEN 1 ELSE 0 END) OVER () AS unicos,\n"
+        "    MIN(v) OVER () AS minimo,\n"
+        "    MAX(v) OVER () AS maximo\n"
+        f"FROM (SELECT v, COUNT(*) AS n FROM ({amostra}) a GROUP BY v) g\n"
+        "ORDER BY CASE WHEN v IS NULL THEN 1 ELSE 0 END, n DESC"
+    )
+
+
+def estimar_distintos(distintos: int, unicos: int, linhas_amostra: int, linhas_tabela: Optional[int]) -> int:
+    """Extrapola os distintos da amostra para a tabela (estimador GEE)."""
+    if not linhas_tabela or linhas_amostra <= 0 or linhas_tabela <= linhas_amostra:
+        return distintos
+    estimado = distintos + (math.sqrt(linhas_tabela / linhas_amostra) - 1.0) * unicos
+    return int(min(round(estimado), linhas_tabela))
+
+
+def analisar_linhas(
+    rows: Sequence[Sequence[Any]],
+    linhas_tabela: Optional[int] = None,
+    amostrada: bool = False,
+) -> EstatisticasColuna:
+    """Monta EstatisticasColuna a partir do resultado de `sql_estatisticas`."""
+    if not rows:
+        return EstatisticasColuna(linhas_tabela=linhas_tabela, amostrada=amostrada)
+    primeira = rows[0]
+    linhas, nulos, distintos, unicos = (int(x or 0) for x in primeira[2:6])
+    # linhas não nulas da tabela proporcionais às da amostra
+    nao_nulas_tabela = None
+    if linhas_tabela and linhas:
+        nao_nulas_tabela = linhas_tabela * (linhas - nulos) / linhas
+    return EstatisticasColuna(
+        linhas_amostra=linhas,
+        nulos=nulos,
+        distintos_amostra=distintos,
+        distintos_aprox=estimar_distintos(distintos, unicos, linhas - nulos, nao_nulas_tabela) if amostrada else distintos,
+        minimo=primeira[6],
+        maximo=primeira[7],
+        frequentes=[(r[0], int(r[1] or 0)) for r in rows if r[0] is not None],
+        linhas_tabela=linhas_tabela,
+        amostrada=amostrada,
+    )
+
+
+def coletar_estatisticas(
+    consultar: Callable[[str, Optional[tuple]], List[tuple]],
+    schema: str,
+    table: str,
+    column: str,
+    amostra_linhas: int = DEFAULT_AMOSTRA_LINHAS,
+    top_valores: int = DEFAULT_TOP_VALORES,
+) -> EstatisticasColuna:
+    """Levanta as estatísticas da coluna com `consultar(sql, params) -> linhas`.
+
+    O QueryBuilder passa a consulta de metadados (fila LANE_METADATA do pool).
+    """
+    schema = schema or 'dbo'
+    try:
+        linhas = consultar(sql_linhas_tabela(), (f"{_quote(schema)}.{_quote(table)}",))
+        linhas_tabela = int(linhas[0][0]) if linhas and linhas[0][0] is not None else None
+    except Exception:
+        linhas_tabela = None
+
+    percentual = percentual_amostra(linhas_tabela, amostra_linhas)
+    rows = None
+    if percentual is not None:
+        try:
+            rows = consultar(sql_estatisticas(schema, table, column, amostra_linhas, top_valores, percentual), None)
+        except Exception:
+            # ex.: TABLESAMPLE em view; segue com a leitura pelo TOP
+            rows = None
+        if rows is not None and not rows:
+            rows = None
+    if rows is None:
+        percentual = None
+        rows = consultar(sql_estatisticas(schema, table, column, amostra_linhas, top_valores), None)
+
+    # sem TABLESAMPLE a amostra só é a tabela inteira se o TOP não foi atingido
+    linhas_lidas = int(rows[0][2] or 0) if rows else 0
+    amostrada = percentual is not None or linhas_lidas >= amostra_linhas
+    return analisar_linhas(rows, linhas_tabela, amostrada)
+
+
+def chave_estatisticas(schema: str, table: str, column: str, db_identity: str = "") -> str:
+    return f"{db_identity}|{(schema or 'dbo').strip('[]')}.{(table or '').strip('[]')}.{(column or '').strip('[]')}".lower()
+
+
+class CacheEstatisticas:
+    """Cache LRU de estatísticas com validade própria para cada coluna.
+
+    `ttl_datas_seconds` é a validade sugerida para colunas de data; quem
+    grava decide qual usar (ver QueryBuilder.estatisticas_coluna).
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_entradas: int = DEFAULT_MAX_ENTRADAS,
+        clock: Callable[[], float] = time.time,
+        ttl_datas_seconds: float = DEFAULT_TTL_DATAS_SECONDS,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.ttl_datas_seconds = ttl_datas_seconds
+        self.max_entradas = max_entradas
+        self._clock = clock
+        self._lock = threading.Lock()
+        # chave -> (momento em que vence, estatísticas)
+        self._entradas: "OrderedDict[str, Tuple[float, EstatisticasColuna]]" = OrderedDict()
+
+    def get(self, chave: str) -> Optional[EstatisticasColuna]:
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                return None
+            if self._clock() >= entrada[0]:
+                del self._entradas[chave]
+                return None
+            self._entradas.move_to_end(chave)
+            return entrada[1]
+
+    def put(self, chave: str, estatisticas: EstatisticasColuna, ttl_seconds: Optional[float] = None):
+        """Guarda as estatísticas; `ttl_seconds` substitui a validade padrão para esta coluna."""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            self._entradas[chave] = (self._clock() + (ttl or float('inf')), estatisticas)
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > max(1, self.max_entradas):
+                self._entradas.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entradas.clear()
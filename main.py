@@ -1,15 +1,17 @@
 from PyQt5.QtWidgets import QMenu, QAction, QListWidgetItem, QApplication
 from PyQt5.QtCore import Qt, QThread, pyqtSignal, QEvent, QTimer, QDate, QObject, QPropertyAnimation
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, QStringListModel
 from PyQt5.QtGui import QIcon, QFont, QColor, QFontMetrics
 from PyQt5.QtWidgets import QToolTip, QDialog, QVBoxLayout, QTextEdit, QGraphicsOpacityEffect
 from PyQt5.QtWidgets import (
     QWidget, QLabel, QLineEdit, QComboBox, QDialogButtonBox, QMessageBox,
     QCheckBox, QHBoxLayout, QListWidget, QPushButton, QGroupBox,
     QDateEdit, QDoubleSpinBox, QSpinBox, QFileDialog, QInputDialog,
-    QProgressDialog, QToolButton, QScrollArea
+    QProgressDialog, QToolButton, QScrollArea, QTableView, QHeaderView, QCompleter
 )
 from PyQt5.QtWidgets import QSizePolicy
 from numbers import Number
+import numpy as np
 import time
 import logging
 import sys
@@ -24,12 +26,29 @@ from PyQt5.QtWidgets import QHBoxLayout
 # Imports dos módulos do projeto
 from version import Version, APP_NAME, COMPANY_NAME
 from config_manager import ConfigManager, DatabaseConfig
-from authentication import get_db_connection, verify_user
-from consulta_sql import QueryBuilder, JoinType
+from authentication import get_db_connection, verify_user, create_connection_pool, LANE_METADATA
+from catalogo import caminho_cache
+from busca import IndiceBusca
+from prefetch_metadados import CacheMetadados, PrefetcherMetadados, chave_metadados
+from consulta_sql import QueryBuilder, JoinType, DEFAULT_FETCH_BATCH_SIZE, QueryCancelToken, QueryCancelledError
+from compilador_agrupamentos import parse_table_ident
+from tokenizador_sql import extrair_clausula, partes_nome, qualificar_colunas
+from result_cache import ResultCache, DEFAULT_TTL_SECONDS, DEFAULT_MEMORY_MB, DEFAULT_DISK_MB
+from paginacao import DEFAULT_PAGE_SIZE, DEFAULT_PREVIEW_ROWS, montar_sql_previa
+from particionamento import DEFAULT_MAX_CONCORRENCIA, TAMANHO_MES
+from periodos import RotuladorPeriodos
+from estatisticas_colunas import (
+    CacheEstatisticas, DEFAULT_TTL_SECONDS as DEFAULT_STATS_TTL_SECONDS, DEFAULT_TTL_DATAS_SECONDS,
+)
+from plano_execucao import (
+    EstimativaPlano, LimitesEstimativa, avaliar_estimativa, descrever_estimativa, NIVEL_OK, NIVEL_BLOQUEAR,
+    DEFAULT_CONFIRMAR_LINHAS, DEFAULT_CONFIRMAR_CUSTO,
+)
+from result_set import ResultSet, NUMERIC_KINDS, TEMPORAL_KINDS, KIND_BOOL, DEFAULT_SPILL_THRESHOLD_MB
 from log import SessionLogger
 from saved_queries import QueryManager, SavedQuery
 from excecao import IMPEDING_COLUMNS
-from chart_generator import ChartGenerator, ChartType, AggregationType
+from chart_generator import ChartGenerator, ChartType, AggregationType, montar_sql_agregacao
 from ai_insights import AIInsightsGenerator
 from report_generator import ReportGenerator
 from valida_sql import validar_sql, validar_sql_for_save
@@ -45,22 +64,15 @@ import re
 
 def extrair_where_do_sql(sql: str) -> str:
     """
-    Extrai somente a cláusula WHERE do SQL.
+    Extrai somente a cláusula WHERE (de nível 0) do SQL.
     Retorna string vazia se não existir.
+
+    WHEREs de subconsultas e as palavras dentro de literais ou comentários
+    são ignorados (ver tokenizador_sql).
     """
     if not sql:
         return ""
-
-    match = re.search(
-        r"\bWHERE\b(.*?)(\bGROUP BY\b|\bORDER BY\b|$)",
-        sql,
-        flags=re.IGNORECASE | re.DOTALL
-    )
-
-    if match:
-        return match.group(1).strip()
-
-    return ""
+    return extrair_clausula(sql, 'WHERE')
 
 
 def _format_iso_timestamp(dt):
@@ -349,11 +361,34 @@ class LoginDialog(QDialog):
                 pass
             return
 
-    
+
+# espera após a última tecla antes de filtrar as listas de fontes/informações
+SEARCH_DEBOUNCE_MS = 150
+
+
+class _RankedListItem(QListWidgetItem):
+    """Item da lista de fontes ordenável pela posição no resultado da busca."""
+
+    def __init__(self, text: str, order: int):
+        super().__init__(text)
+        self.order = order
+        self.rank = order
+
+    def __lt__(self, other):
+        return self.rank < getattr(other, 'rank', 0)
+
+
 class QueryBuilderTab(QWidget):
     """Aba de construção de consultas"""
     
     query_executed = pyqtSignal(list, list)  # (columns, data)
+    query_batch_received = pyqtSignal(list, list, bool)  # (columns, lote, primeiro lote)
+    query_cancelled = pyqtSignal(int)  # registros recebidos antes do cancelamento
+    query_paged_started = pyqtSignal(object)  # PaginadorConsulta (modo paginado no servidor)
+    query_preview_received = pyqtSignal(list, list)  # (columns, linhas da prévia TOP (N))
+    query_full_ready = pyqtSignal(object)  # ResultSet da execução completa após a prévia
+    query_full_progress = pyqtSignal(int)  # registros já lidos pela execução completa
+    query_full_stopped = pyqtSignal(str)  # execução completa interrompida; a prévia permanece
     
     def __init__(self, query_builder: QueryBuilder, query_manager: QueryManager, session_logger: SessionLogger = None):
         super().__init__()
@@ -371,11 +406,31 @@ class QueryBuilderTab(QWidget):
         self._where_history_limit = 50
         # Carrega mapeamento de nomes amigáveis (se houver)
         self._table_name_map = {}
-        # cache de colunas por tabela (chave: 'schema.table') para reduzir consultas ao banco
-        self._columns_cache = {}
+        # cache de colunas por tabela (chave: 'schema.table') para reduzir consultas ao banco;
+        # compartilhado com o pré-carregamento de colunas/PKs/FKs em segundo plano
+        self._metadata_cache = CacheMetadados()
+        self._columns_cache = self._metadata_cache.colunas
+        self._metadata_prefetcher = PrefetcherMetadados(self.qb, self._metadata_cache, parent=self)
+        self._metadata_prefetcher.carregado.connect(self._on_metadata_prefetched)
+        self._metadata_prefetcher.falhou.connect(self._on_metadata_prefetch_failed)
+        # tabelas com grupo provisório na árvore de colunas, aguardando o pré-carregamento
+        self._columns_waiting = set()
+        self._columns_refresh_timer = QTimer(self)
+        self._columns_refresh_timer.setSingleShot(True)
+        self._columns_refresh_timer.setInterval(0)
+        self._columns_refresh_timer.timeout.connect(self._refresh_columns_after_prefetch)
+        # estatísticas de colunas para os filtros: (schema, tabela, coluna) -> callbacks
+        # aguardando a consulta em segundo plano
+        self._stats_pending = {}
+        self._stats_threads = set()
+        self._filter_stats_alvo = None
     # referência ao diálogo de progresso atual (mantida para fechar apenas
     # depois que a UI principal processar os resultados)
         self._current_progress = None
+        # worker da consulta em execução (mantido para permitir cancelamento)
+        self._query_worker = None
+        # tempo limite (segundos) da consulta salva carregada, se houver
+        self._loaded_query_timeout = None
         # debug flag: ativar logs temporários para depuração da população de filtros
         self._debug_filter_populate = True
         self.setup_ui()
@@ -428,6 +483,52 @@ class QueryBuilderTab(QWidget):
         # armazena mesmo que lista vazia
         self._columns_cache[key] = cols
         return cols
+
+    def _get_primary_keys_cached(self, schema: str, table_name: str):
+        """Retorna as colunas da PK da tabela, usando o cache de metadados da sessão."""
+        key = chave_metadados(schema, table_name)
+        if key not in self._metadata_cache.pks:
+            self._metadata_cache.pks[key] = self.qb.get_primary_keys(schema, table_name) or []
+        return self._metadata_cache.pks[key]
+
+    def _prefetch_table_item(self, item):
+        """Pede o pré-carregamento dos metadados da tabela de um item da lista de fontes."""
+        try:
+            raw = item.data(Qt.UserRole) or item.text()
+            parts = raw.split('.')
+            self._metadata_prefetcher.solicitar(parts[0].strip('[]'), parts[1].split('(')[0].strip())
+        except Exception:
+            pass
+
+    def _on_metadata_prefetched(self, schema: str, table_name: str):
+        key = chave_metadados(schema, table_name)
+        if key in self._columns_waiting:
+            self._columns_waiting.discard(key)
+            # várias tabelas chegando juntas refazem a árvore uma vez só
+            self._columns_refresh_timer.start()
+
+    def _on_metadata_prefetch_failed(self, schema: str, table_name: str, message: str):
+        key = chave_metadados(schema, table_name)
+        logging.warning(f"Falha ao carregar metadados de {schema}.{table_name}: {message}")
+        if key not in self._columns_waiting:
+            return
+        self._columns_waiting.discard(key)
+        try:
+            for gi in range(self.columns_list.topLevelItemCount()):
+                it = self.columns_list.topLevelItem(gi)
+                if it.data(0, Qt.UserRole) == key:
+                    it.setText(0, f"{table_name} (falha ao carregar as colunas)")
+                    it.setToolTip(0, message)
+        except Exception:
+            pass
+
+    def _refresh_columns_after_prefetch(self):
+        try:
+            self.update_available_columns()
+            if self.column_search.text():
+                self.filter_columns(self.column_search.text())
+        except Exception:
+            pass
     
     def setup_ui(self):
         # layout principal: barra superior (modo) + splitter abaixo
@@ -463,7 +564,13 @@ class QueryBuilderTab(QWidget):
         left_layout.addWidget(QLabel("<b>📂 De onde vêm os dados?</b>"))
         self.table_search = QLineEdit()
         self.table_search.setPlaceholderText("Pesquisar fontes...")
-        self.table_search.textChanged.connect(self.filter_tables)
+        # filtra só quando o usuário para de digitar (ver filter_tables)
+        self._table_filter_timer = QTimer(self)
+        self._table_filter_timer.setSingleShot(True)
+        self._table_filter_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self._table_filter_timer.timeout.connect(lambda: self.filter_tables(self.table_search.text()))
+        self.table_search.textChanged.connect(lambda _text: self._table_filter_timer.start())
+        self._table_index = None
         # visual improvements: ícone de lupa e botão limpar
         icon_path = os.path.join(os.path.dirname(__file__), 'assets', 'logo.ico')
         try:
@@ -490,6 +597,12 @@ class QueryBuilderTab(QWidget):
             self.tables_list.setMinimumHeight(220)
         except Exception:
             pass
+        # apontar uma tabela já pré-carrega suas colunas e chaves
+        try:
+            self.tables_list.setMouseTracking(True)
+            self.tables_list.itemEntered.connect(self._prefetch_table_item)
+        except Exception:
+            pass
         left_layout.addWidget(self.tables_list)
         
     # (Botão 'Adicionar fontes selecionadas' removido - operação feita via duplo-clique/toggle)
@@ -550,7 +663,12 @@ class QueryBuilderTab(QWidget):
         self.column_search = QLineEdit()
         self.column_search.setPlaceholderText("Pesquisar informações...")
         self.column_search.setClearButtonEnabled(True)
-        self.column_search.textChanged.connect(self.filter_columns)
+        self._column_filter_timer = QTimer(self)
+        self._column_filter_timer.setSingleShot(True)
+        self._column_filter_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self._column_filter_timer.timeout.connect(lambda: self.filter_columns(self.column_search.text()))
+        self.column_search.textChanged.connect(lambda _text: self._column_filter_timer.start())
+        self._column_index = None
         manual_layout.addWidget(self.column_search)
 
         # Mostrar colunas agrupadas por tabela usando QTreeWidget para permitir
@@ -561,6 +679,13 @@ class QueryBuilderTab(QWidget):
         # permitir seleção múltipla de colunas
         self.columns_list.setSelectionMode(QAbstractItemView.MultiSelection)
         manual_layout.addWidget(self.columns_list)
+        # o índice de busca das colunas é refeito quando a árvore muda
+        try:
+            model = self.columns_list.model()
+            for sig in (model.rowsInserted, model.rowsRemoved, model.modelReset):
+                sig.connect(self._invalidate_column_index)
+        except Exception:
+            pass
         # conectar sinais para trocar ícone ao expandir/recolher grupos
         try:
             self.columns_list.itemExpanded.connect(self._on_columns_group_expanded)
@@ -1034,6 +1159,9 @@ QListView::item:selected { background-color: #3874f2; color: #ffffff; }
         # 1) Texto livre (QLineEdit)
         self.filter_value_input = QLineEdit()
         self.filter_value_input.setPlaceholderText("Valor (ou lista separada por , para IN)")
+        # autocompletar com os valores mais frequentes da coluna (estatísticas em segundo plano)
+        self._filter_values_model = QStringListModel(self)
+        self.filter_value_input.setCompleter(self._make_values_completer(self._filter_values_model, self.filter_value_input))
         filters_layout.addWidget(self.filter_value_input)
         # campo "to" para BETWEEN em texto (visível somente quando necessário)
         self.filter_value_input_to = QLineEdit()
@@ -1074,6 +1202,11 @@ QListView::item:selected { background-color: #3874f2; color: #ffffff; }
         self.filter_num2.setDecimals(4)
         self.filter_num2.setVisible(False)
         filters_layout.addWidget(self.filter_num2)
+        # intervalo e distintos da coluna (estatísticas da amostra)
+        self.filter_stats_hint = QLabel("")
+        self.filter_stats_hint.setStyleSheet("color: #666666;")
+        self.filter_stats_hint.setVisible(False)
+        filters_layout.addWidget(self.filter_stats_hint)
         # Connector selector (AND/OR) for panel-based filter creation
         self.filter_connector_combo = QComboBox()
         self.filter_connector_combo.addItems(["AND", "OR"])
@@ -1271,12 +1404,41 @@ QListView::item:selected { background-color: #3874f2; color: #ffffff; }
 
         btn_execute = QPushButton("▶️ Executar consulta")
         btn_execute.setToolTip("Executa a consulta SQL gerada")
-        btn_execute.clicked.connect(self.execute_query)
+        btn_execute.clicked.connect(lambda: self.execute_query())
         btn_execute.setStyleSheet("background-color: #2ecc71; color: white; font-weight: bold;")
         btn_execute.setMinimumWidth(140)
         btn_execute.setSizePolicy(QSizePolicy.Minimum, QSizePolicy.Fixed)
         action_layout.addWidget(btn_execute)
 
+        btn_refresh = QPushButton("⟳ Forçar atualização")
+        btn_refresh.setToolTip("Executa a consulta no servidor ignorando o resultado em cache")
+        btn_refresh.clicked.connect(lambda: self.execute_query(force_refresh=True))
+        btn_refresh.setMinimumWidth(140)
+        btn_refresh.setSizePolicy(QSizePolicy.Minimum, QSizePolicy.Fixed)
+        action_layout.addWidget(btn_refresh)
+
+        self.paged_mode_cb = QCheckBox("Paginar no servidor")
+        self.paged_mode_cb.setToolTip(
+            "Busca o resultado em páginas conforme a rolagem da tabela, em vez de carregar tudo na memória"
+        )
+        try:
+            self.paged_mode_cb.setChecked(bool(self._load_user_pref('paged_results', False)))
+        except Exception:
+            pass
+        self.paged_mode_cb.toggled.connect(lambda checked: self._save_user_pref('paged_results', bool(checked)))
+        action_layout.addWidget(self.paged_mode_cb)
+
+        self.partitioned_mode_cb = QCheckBox("Particionar por período")
+        self.partitioned_mode_cb.setToolTip(
+            "Divide o filtro de datas do agrupamento em partições (por mês) executadas em paralelo"
+        )
+        try:
+            self.partitioned_mode_cb.setChecked(bool(self._load_user_pref('partitioned_execution', False)))
+        except Exception:
+            pass
+        self.partitioned_mode_cb.toggled.connect(lambda checked: self._save_user_pref('partitioned_execution', bool(checked)))
+        action_layout.addWidget(self.partitioned_mode_cb)
+
         btn_save = QPushButton("💾 Salvar consulta")
         btn_save.setToolTip("Salva a consulta SQL atual")
         btn_save.clicked.connect(self.save_query)
@@ -1527,19 +1689,61 @@ QListView::item:selected { background-color: #3874f2; color: #ffffff; }
         try:
             tables = self.qb.get_tables_and_views()
             self.tables_list.clear()
-            for table in tables:
+            for order, table in enumerate(tables):
                 # mostra apenas o identificador técnico [schema].TableName — não exibe o sufixo de tipo (TABLE/VIEW)
                 raw = f"[{table.schema}].{table.name}"
                 # exibe nome amigável se existir — mostra ambos: "Amigável — [schema].Tabela (...)"
                 key = f"{table.schema}.{table.name}"
                 friendly = self._table_name_map.get(key)
                 display = f"{friendly} — {raw}" if friendly else raw
-                it = QListWidgetItem(display)
+                it = _RankedListItem(display, order)
                 # sempre preserve o texto técnico bruto no UserRole para construir SQL
                 it.setData(Qt.UserRole, raw)
                 self.tables_list.addItem(it)
+            self._build_table_index()
         except Exception as e:
             QMessageBox.critical(self, "Erro", f"Erro ao carregar tabelas:\n{str(e)}")
+            return
+        # catálogo lido do arquivo local: confere no banco sem bloquear a tela
+        if getattr(self.qb, 'catalogo_validado', True) is False:
+            self._start_catalog_revalidation()
+
+    def _start_catalog_revalidation(self):
+        """Revalida o catálogo do esquema em segundo plano (QueryBuilder.revalidar_catalogo).
+
+        Se algo mudou no banco, a lista de tabelas e o cache de colunas são
+        atualizados quando a revalidação termina.
+        """
+        if getattr(self, '_catalog_thread', None) is not None:
+            return
+        thread = _BackgroundCall(self.qb.revalidar_catalogo)
+
+        def _done(changed):
+            try:
+                if getattr(self, 'session_logger', None):
+                    self.session_logger.log('schema_catalog_revalidated', 'Catálogo do esquema revalidado', {'changed_objects': changed})
+            except Exception:
+                pass
+            if changed:
+                self._metadata_cache.clear()
+                self.load_tables()
+                try:
+                    self.filter_tables(self.table_search.text())
+                except Exception:
+                    pass
+
+        def _failed(msg):
+            logging.warning(f"Falha ao revalidar o catálogo do esquema: {msg}")
+
+        def _finished():
+            self._catalog_thread = None
+            thread.deleteLater()
+
+        thread.done.connect(_done)
+        thread.failed.connect(_failed)
+        thread.finished.connect(_finished)
+        self._catalog_thread = thread
+        thread.start()
                 
     def _update_filters_list_max_height(self):
         """Calcula e aplica uma altura máxima para `self.filters_list` com base
@@ -1637,7 +1841,7 @@ QListView::item:selected { background-color: #3874f2; color: #ffffff; }
             table_name = parts[1].split('(')[0].strip()
 
             deps = self.qb.get_table_dependencies(schema, table_name)
-            pk_cols = self.qb.get_primary_keys(schema, table_name)
+            pk_cols = self._get_primary_keys_cached(schema, table_name)
 
             html = f"<b>{schema}.{table_name}</b><br>"
             if pk_cols:
@@ -1856,11 +2060,20 @@ QListView::item:selected { background-color: #3874f2; color: #ffffff; }
             table_name = parts[1].split('(')[0].strip()
             
             try:
-                columns = self._get_columns_cached(schema, table_name)
-                pk_cols = self.qb.get_primary_keys(schema, table_name)
+                from PyQt5.QtWidgets import QTreeWidgetItem
+                meta = self._metadata_prefetcher.obter(schema, table_name)
+                if meta is None:
+                    # carregando em segundo plano: grupo provisório, a árvore é refeita quando chegar
+                    self._columns_waiting.add(chave_metadados(schema, table_name))
+                    waiting = QTreeWidgetItem([f"{table_name} (carregando...)"])
+                    waiting.setData(0, Qt.UserRole, chave_metadados(schema, table_name))
+                    waiting.setFlags(Qt.ItemIsEnabled)
+                    self.columns_list.addTopLevelItem(waiting)
+                    continue
+                columns = meta.colunas
+                pk_cols = meta.pks
                 # grupo (tabela) como item de topo
                 try:
-                    from PyQt5.QtWidgets import QTreeWidgetItem
                     grp = QTreeWidgetItem([f"{table_name}"])
                     # destacar em negrito
                     try:
@@ -2172,46 +2385,66 @@ QListView::item:selected { background-color: #3874f2; color: #ffffff; }
         except Exception as e:
             print(f"Erro ao alternar seleção de tabela: {e}")
 
+    def _build_table_index(self):
+        """Índice de busca das fontes: nome técnico e nome amigável de cada tabela."""
+        index = IndiceBusca()
+        for i in range(self.tables_list.count()):
+            item = self.tables_list.item(i)
+            raw = item.data(Qt.UserRole) or item.text()
+            key = raw.replace('[', '').replace(']', '')
+            index.adicionar(raw, raw, self._table_name_map.get(key))
+        self._table_index = index
+        return index
+
+    def _invalidate_column_index(self, *args):
+        self._column_index = None
+
+    def _build_column_index(self):
+        """Índice de busca das colunas: texto do item e rótulo de mapping.FIELD_LABEL_OVERRIDES.
+
+        Chaves: (grupo, None) para o grupo/tabela e (grupo, filho) para as colunas.
+        """
+        index = IndiceBusca()
+        modulo = getattr(self, 'current_modulo', None)
+        for gi in range(self.columns_list.topLevelItemCount()):
+            group = self.columns_list.topLevelItem(gi)
+            group_text = group.text(0) or ''
+            if group.childCount() == 0:
+                # coluna sem grupo (fallback de update_available_columns)
+                index.adicionar((gi, None), group_text, get_field_label(modulo, group_text.split(' (')[0]))
+                continue
+            index.adicionar((gi, None), group_text)
+            for ci in range(group.childCount()):
+                child_text = group.child(ci).text(0) or ''
+                column = child_text.split(' (')[0]
+                index.adicionar((gi, ci), child_text, get_field_label(modulo, column))
+        self._column_index = index
+        return index
+
     def filter_columns(self, text: str):
-        """Filtra a lista de colunas disponíveis por nome (case-insensitive)."""
+        """Filtra a lista de colunas disponíveis pelo índice de busca
+        (sem acentos, por trecho ou aproximado, incluindo os rótulos amigáveis).
+        """
         try:
             q = (text or '').strip().lower()
             # Suporta tanto QListWidget quanto QTreeWidget (grupos de colunas)
-            # QTreeWidget: iterar top-level groups e seus filhos
             if hasattr(self.columns_list, 'topLevelItemCount'):
+                index = self._column_index or self._build_column_index()
+                matches = set(index.buscar(q)) if q else None
                 for gi in range(self.columns_list.topLevelItemCount()):
                     group = self.columns_list.topLevelItem(gi)
-                    group_text = ''
-                    try:
-                        group_text = (group.text(0) or '').lower()
-                    except Exception:
-                        try:
-                            group_text = (group.text() or '').lower()
-                        except Exception:
-                            group_text = ''
-
+                    group_match = matches is None or (gi, None) in matches
                     any_child_visible = False
                     for ci in range(group.childCount()):
                         child = group.child(ci)
-                        try:
-                            child_text = (child.text(0) or '').lower()
-                        except Exception:
-                            try:
-                                child_text = (child.text() or '').lower()
-                            except Exception:
-                                child_text = ''
-
-                        if not q or q in child_text or q in group_text:
-                            child.setHidden(False)
-                            any_child_visible = True
-                        else:
-                            child.setHidden(True)
-
-                    # esconder o grupo se nenhum filho visível e o próprio grupo não combinar
-                    try:
-                        group.setHidden(False if (not q or any_child_visible or q in group_text) else True)
-                    except Exception:
-                        pass
+                        # o grupo combinando mostra todas as suas colunas
+                        hidden = not (group_match or (gi, ci) in matches)
+                        any_child_visible = any_child_visible or not hidden
+                        if child.isHidden() != hidden:
+                            child.setHidden(hidden)
+                    hidden = not (group_match or any_child_visible)
+                    if group.isHidden() != hidden:
+                        group.setHidden(hidden)
             else:
                 # QListWidget fallback
                 q = (text or '').strip().lower()
@@ -2228,12 +2461,27 @@ QListView::item:selected { background-color: #3874f2; color: #ffffff; }
             print(f"Erro ao filtrar colunas: {e}")
 
     def filter_tables(self, text: str):
-        """Filtra a lista de tabelas por nome/termo de busca."""
+        """Mostra só as fontes que combinam com o termo, das mais relevantes
+        para as menos (ver busca.IndiceBusca); sem termo, volta à ordem original.
+        """
         try:
-            term = (text or '').strip().lower()
-            for i in range(self.tables_list.count()):
+            index = self._table_index or self._build_table_index()
+            ranking = {raw: pos for pos, raw in enumerate(index.buscar(text or ''))}
+            total = self.tables_list.count()
+            for i in range(total):
                 item = self.tables_list.item(i)
-                item.setHidden(False if not term else term not in item.text().lower())
+                pos = ranking.get(item.data(Qt.UserRole) or item.text())
+                hidden = pos is None
+                if item.isHidden() != hidden:
+                    item.setHidden(hidden)
+                if isinstance(item, _RankedListItem):
+                    item.rank = pos if pos is not None else total + item.order
+            self.tables_list.sortItems()
+            # os primeiros resultados da busca provavelmente serão escolhidos
+            if (text or '').strip():
+                for raw in list(ranking)[:3]:
+                    parts = raw.split('.')
+                    self._metadata_prefetcher.solicitar(parts[0].strip('[]'), parts[1].split('(')[0].strip())
         except Exception as e:
             print(f"Erro ao filtrar tabelas: {e}")
 
@@ -2272,6 +2520,7 @@ QListView::item:selected { background-color: #3874f2; color: #ffffff; }
                     friendly_val = self._table_name_map.get(key)
                     display = f"{friendly_val} — {raw}" if friendly_val else raw
                     item.setText(display)
+                    self._table_index = None
                     # atualizar selected_tables_list se houver referência
                     for i in range(self.selected_tables_list.count()):
                         it = self.selected_tables_list.item(i)
@@ -2947,7 +3196,7 @@ QListView::item:selected { background-color: #3874f2; color: #ffffff; }
                     schema = parts[0].strip('[]')
                     table_name = parts[1].split('(')[0].strip()
                     deps = self.qb.get_table_dependencies(schema, table_name)
-                    pk_cols = self.qb.get_primary_keys(schema, table_name)
+                    pk_cols = self._get_primary_keys_cached(schema, table_name)
 
                     html = f"<b>{schema}.{table_name}</b><br>"
                     if pk_cols:
@@ -3273,8 +3522,7 @@ QListView::item:selected { background-color: #3874f2; color: #ffffff; }
             # tenta construir aliases para as tabelas referenciadas no agrupamento
             aliases = {}
             try:
-                agrup_meta = self.qb.carregar_agrupamentos(self.current_modulo)
-                agrup = next((a for a in agrup_meta.get('agrupamentos', []) if a.get('id') == self.current_agrupamento_id), None)
+                agrup = self.qb.obter_agrupamento(self.current_modulo, self.current_agrupamento_id)
                 tables = []
                 if agrup:
                     # principal
@@ -3290,14 +3538,7 @@ QListView::item:selected { background-color: #3874f2; color: #ffffff; }
                 parsed = []
                 for t in tables:
                     try:
-                        parts = re.split(r"\.|\[|\]", t)
-                        parts = [p for p in parts if p]
-                        if len(parts) == 1:
-                            parsed.append(('dbo', parts[0]))
-                        elif len(parts) == 2:
-                            parsed.append((parts[0], parts[1]))
-                        else:
-                            parsed.append((parts[-2], parts[-1]))
+                        parsed.append(parse_table_ident(t))
                     except Exception:
                         continue
                 # build alias map
@@ -3305,65 +3546,6 @@ QListView::item:selected { background-color: #3874f2; color: #ffffff; }
             except Exception:
                 aliases = {}
 
-            # --- Auto-qualify simple column references in textual WHERE clauses ---
-            def _replace_unquoted(s: str, pattern, repl):
-                """Substitui ocorrências de pattern por repl fora de literais entre aspas simples.
-                pattern deve ser um compiled regex."""
-                out = []
-                i = 0
-                L = len(s)
-                while i < L:
-                    if s[i] == "'":
-                        # copy quoted literal as-is, handle doubled single-quote escape
-                        j = i + 1
-                        while j < L:
-                            if s[j] == "'":
-                                if j+1 < L and s[j+1] == "'":
-                                    # escaped quote, skip both
-                                    j += 2
-                                    continue
-                                else:
-                                    j += 1
-                                    break
-                            j += 1
-                        out.append(s[i:j])
-                        i = j
-                    else:
-                        # find next quote or end
-                        j = s.find("'", i)
-                        segment = s[i:j] if j != -1 else s[i:]
-                        # apply replacement on this segment
-                        segment = pattern.sub(repl, segment)
-                        out.append(segment)
-                        if j == -1:
-                            break
-                        i = j
-                return ''.join(out)
-
-            def _qualify_where_text(text: str, main_alias: Optional[str], columns: List[str]) -> str:
-                """Qualifica ocorrências simples de nomes de coluna em `text` usando `main_alias`.
-                Não altera referências já qualificadas (contendo '.') e preserva literais.
-                """
-                if not text or not main_alias or not columns:
-                    return text
-                # compile a regex that matches any of the column names as whole words
-                # but not when preceded by a dot (i.e., already qualified)
-                cols_sorted = sorted(columns, key=lambda x: -len(x))
-                # escape for regex
-                pat = r"\b(" + '|'.join(re.escape(c) for c in cols_sorted) + r")\b"
-                compiled = re.compile(pat, re.IGNORECASE)
-
-                def repl(m):
-                    start = m.start()
-                    # check previous char in the segment (we are in a segment without quotes)
-                    # if previous char is '.' then skip replacement (already qualified)
-                    # can't access absolute position here easily, so rely on lookbehind: ensure not preceded by '.'
-                    # use a simple check on the match string
-                    return f"{main_alias}.{m.group(1)}"
-
-                # use _replace_unquoted to avoid changing literals
-                return _replace_unquoted(text, compiled, repl)
-
             # if we have a textual where_clause (not parametrized) try to qualify
             try:
                 # get main table and alias
@@ -3372,16 +3554,9 @@ QListView::item:selected { background-color: #3874f2; color: #ffffff; }
                     main_table = agrup.get('tabela')
                 main_alias = None
                 if main_table:
-                    parts = re.split(r"\.|\[|\]", main_table)
-                    parts = [p for p in parts if p]
-                    if len(parts) == 1:
-                        main_schema, main_tbl = 'dbo', parts[0]
-                    elif len(parts) == 2:
-                        main_schema, main_tbl = parts[0], parts[1]
-                    else:
-                        main_schema, main_tbl = parts[-2], parts[-1]
-                    if aliases and (main_schema, main_tbl) in aliases:
-                        main_alias = aliases[(main_schema, main_tbl)]
+                    main_key = parse_table_ident(main_table)
+                    if aliases and main_key in aliases:
+                        main_alias = aliases[main_key]
 
                 # collect candidate column names from agrupamento (dimensoes + metricas)
                 candidate_cols = []
@@ -3393,15 +3568,15 @@ QListView::item:selected { background-color: #3874f2; color: #ffffff; }
                             fld = d
                         if isinstance(fld, str) and fld:
                             # strip possible qualification
-                            candidate_cols.append(fld.split('.')[-1].strip('[]'))
+                            candidate_cols.append((partes_nome(fld) or (fld,))[-1])
                     for m in agrup.get('metricas', []):
                         fld = m.get('campo') if isinstance(m, dict) else m
                         if isinstance(fld, str) and fld:
-                            candidate_cols.append(fld.split('.')[-1].strip('[]'))
+                            candidate_cols.append((partes_nome(fld) or (fld,))[-1])
 
                 # apply qualification to where_clause and to filtros entries that are plain strings
                 if where_clause:
-                    new_where = _qualify_where_text(where_clause, main_alias, candidate_cols)
+                    new_where = qualificar_colunas(where_clause, main_alias, candidate_cols)
                     if new_where != where_clause:
                         where_clause = new_where
                         filtros = [where_clause]
@@ -3410,7 +3585,7 @@ QListView::item:selected { background-color: #3874f2; color: #ffffff; }
                     modified = False
                     for it in filtros:
                         if isinstance(it, str):
-                            new = _qualify_where_text(it, main_alias, candidate_cols)
+                            new = qualificar_colunas(it, main_alias, candidate_cols)
                             new_filters.append(new)
                             if new != it:
                                 modified = True
@@ -3582,6 +3757,27 @@ QListView::item:selected { background-color: #3874f2; color: #ffffff; }
             self.current_sql = sql
             self.current_sql_params = sql_params
 
+            # rótulos das colunas de período (MesAno, Trimestre...): a SQL
+            # agrupa pela data de início e o rótulo é montado no cliente
+            try:
+                self.current_period_labeler = (sql, qb.rotulador_periodos(self.current_modulo, self.current_agrupamento_id))
+            except Exception:
+                self.current_period_labeler = None
+
+            # plano da execução particionada por período (usado se o modo
+            # estiver ativo e a SQL não for alterada até a execução)
+            try:
+                self.current_partition_plan = qb.planejar_particoes(
+                    self.current_modulo,
+                    self.current_agrupamento_id,
+                    filtros=filtros,
+                    aliases=aliases,
+                    tamanho=self._load_user_pref('partition_size', TAMANHO_MES),
+                )
+            except Exception as e:
+                logging.getLogger(__name__).warning("Planejamento da execução particionada falhou: %s", e)
+                self.current_partition_plan = None
+
             # Log de sessão (se existir)
             try:
                 if getattr(self, 'session_logger', None):
@@ -3842,7 +4038,27 @@ QListView::item:selected { background-color: #3874f2; color: #ffffff; }
                 except Exception:
                     return []
 
-            existing_parsed = parse_existing_conditions(existing_on) if existing_on else []
+            # sem condição prévia, sugere o ON pelo grafo de relacionamentos (FKs)
+            suggested_on = None
+            if not existing_on:
+                try:
+                    suggested_on = self.qb.sugerir_on(prior_tables, current_table)
+                except Exception:
+                    suggested_on = None
+                if not suggested_on:
+                    # sem FK direta: indica as tabelas intermediárias do caminho
+                    try:
+                        passos = self.qb.sugerir_juncoes(list(prior_tables) + [tuple(current_table)])
+                        intermediarias = [f"{p.schema}.{p.tabela}" for p in passos if p.intermediaria]
+                        if intermediarias and any(p.relacionamento for p in passos):
+                            v.addWidget(QLabel(
+                                f"Sem relacionamento direto com {current_table[1]}. "
+                                f"Caminho sugerido passando por: {', '.join(intermediarias)}"
+                            ))
+                    except Exception:
+                        pass
+
+            existing_parsed = parse_existing_conditions(existing_on or suggested_on) if (existing_on or suggested_on) else []
 
             def on_add():
                 try:
@@ -4193,6 +4409,250 @@ QListView::item:selected { background-color: #3874f2; color: #ffffff; }
                 self.filter_value_input_to.setVisible(self.combo_filter_op.currentText() == 'BETWEEN')
         except Exception as e:
             print(f"Erro ao atualizar widgets de filtro: {e}")
+        try:
+            data = self.combo_filter_field.itemData(index) or self.combo_filter_field.currentData()
+            self._filter_stats_alvo = self._filter_stats_target(data)
+            self._request_filter_stats(self._filter_stats_alvo, self._apply_filter_stats)
+        except Exception:
+            pass
+
+    # --- Estatísticas de colunas (sugestões nos filtros) ---
+    def _make_values_completer(self, model: QStringListModel, parent) -> QCompleter:
+        completer = QCompleter(model, parent)
+        completer.setCaseSensitivity(Qt.CaseInsensitive)
+        completer.setFilterMode(Qt.MatchContains)
+        completer.setCompletionMode(QCompleter.PopupCompletion)
+        return completer
+
+    def _filter_stats_target(self, meta) -> Optional[tuple]:
+        """(schema, tabela, coluna) do campo de filtro, ou None para expressões.
+
+        Campos sem tabela (dimensões do agrupamento) são da tabela principal
+        do agrupamento atual.
+        """
+        if not isinstance(meta, dict):
+            return None
+        col = meta.get('column_name')
+        table = meta.get('table_name')
+        schema = meta.get('schema')
+        if not col:
+            expr = (meta.get('expr') or '').strip()
+            if not re.match(r"^\[?\w+\]?$", expr):
+                return None
+            col = expr.strip('[]')
+        if not table:
+            try:
+                agrup = self.qb.obter_agrupamento(getattr(self, 'current_modulo', None),
+                                                  getattr(self, 'current_agrupamento_id', None))
+                partes = [p for p in re.split(r"\.|\[|\]", (agrup or {}).get('tabela') or '') if p]
+            except Exception:
+                partes = []
+            if not partes:
+                return None
+            table = partes[-1]
+            if not schema and len(partes) >= 2:
+                schema = partes[-2]
+        return (schema or 'dbo', table, col)
+
+    def _request_filter_stats(self, alvo: Optional[tuple], apply):
+        """Entrega a `apply(alvo, estatisticas)` as estatísticas da coluna.
+
+        Do cache a entrega é imediata; senão `apply` recebe None na hora e as
+        estatísticas quando a consulta em segundo plano (fila de metadados do
+        pool) terminar. Sem pool — conexão única, que não pode ser usada por
+        duas threads — não há sugestões.
+        """
+        if alvo is None:
+            apply(alvo, None)
+            return
+        try:
+            cached = self.qb.estatisticas_em_cache(*alvo)
+        except Exception:
+            cached = None
+        apply(alvo, cached)
+        if cached is not None or getattr(self.qb, 'pool', None) is None:
+            return
+        if alvo in self._stats_pending:
+            self._stats_pending[alvo].append(apply)
+            return
+        self._stats_pending[alvo] = [apply]
+        thread = _BackgroundCall(lambda: self.qb.estatisticas_coluna(*alvo))
+
+        def _deliver(est):
+            for callback in self._stats_pending.pop(alvo, []):
+                try:
+                    callback(alvo, est)
+                except Exception:
+                    pass
+
+        def _failed(msg):
+            self._stats_pending.pop(alvo, None)
+            logging.info(f"Estatísticas indisponíveis para {'.'.join(alvo)}: {msg}")
+
+        thread.done.connect(_deliver)
+        thread.failed.connect(_failed)
+        self._stats_threads.add(thread)
+        thread.finished.connect(lambda t=thread: self._stats_threads.discard(t))
+        thread.finished.connect(thread.deleteLater)
+        thread.start()
+
+    def _pick_distinct_values(self, alvo: tuple, parent=None) -> Optional[List[str]]:
+        """Diálogo para marcar valores existentes da coluna (QueryBuilder.pagina_valores_distintos).
+
+        As páginas chegam conforme a lista é rolada; digitar no campo de busca
+        filtra pelo início do valor no servidor, cancelando a consulta anterior.
+        Retorna os valores marcados (como texto) ou None se cancelado.
+        """
+        schema, table, column = alvo
+        dlg = QDialog(parent or self)
+        dlg.setWindowTitle(f"Valores de {column}")
+        dlg.setMinimumSize(360, 420)
+        layout = QVBoxLayout(dlg)
+        busca = QLineEdit()
+        busca.setPlaceholderText('Começa com...')
+        layout.addWidget(busca)
+        lista = QListWidget()
+        layout.addWidget(lista)
+        status = QLabel('')
+        status.setStyleSheet("color: #666666;")
+        layout.addWidget(status)
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(dlg.accept)
+        buttons.rejected.connect(dlg.reject)
+        layout.addWidget(buttons)
+
+        # valores marcados, na ordem em que foram marcados (sobrevivem às trocas de prefixo)
+        marcados = []
+        estado = {'prefixo': '', 'numero': 0, 'tem_mais': True, 'carregando': False,
+                  'token': None, 'geracao': 0}
+        assincrono = getattr(self.qb, 'pool', None) is not None
+
+        def _mostrar(pagina, geracao):
+            if geracao != estado['geracao']:
+                return
+            estado['carregando'] = False
+            estado['numero'] += 1
+            estado['tem_mais'] = pagina.tem_mais
+            lista.blockSignals(True)
+            for valor in pagina.valores:
+                texto = self._format_stats_value(valor) if isinstance(valor, (_dt.datetime, _dt.date)) else str(valor)
+                it = QListWidgetItem(texto)
+                it.setFlags(it.flags() | Qt.ItemIsUserCheckable)
+                it.setCheckState(Qt.Checked if texto in marcados else Qt.Unchecked)
+                lista.addItem(it)
+            lista.blockSignals(False)
+            status.setText(f"{lista.count()} valores" + (" (role para ver mais)" if pagina.tem_mais else ""))
+            # a página não encheu a lista: sem barra de rolagem não haveria como pedir a próxima
+            if pagina.tem_mais and lista.isVisible() and lista.verticalScrollBar().maximum() == 0:
+                _proxima()
+
+        def _falhou(msg, geracao):
+            if geracao != estado['geracao']:
+                return
+            estado['carregando'] = False
+            status.setText(f"Falha ao buscar valores: {msg}")
+
+        def _proxima():
+            if estado['carregando'] or not estado['tem_mais']:
+                return
+            estado['carregando'] = True
+            status.setText('Carregando...')
+            geracao, prefixo, numero = estado['geracao'], estado['prefixo'], estado['numero']
+            token = QueryCancelToken()
+            estado['token'] = token
+
+            def _buscar():
+                return self.qb.pagina_valores_distintos(
+                    schema, table, column, prefixo, numero, cancel_token=token)
+
+            if not assincrono:
+                # conexão única: não pode ser usada por outra thread
+                try:
+                    _mostrar(_buscar(), geracao)
+                except Exception as e:
+                    _falhou(str(e), geracao)
+                return
+            thread = _BackgroundCall(_buscar)
+            thread.done.connect(lambda pagina: _mostrar(pagina, geracao))
+            thread.failed.connect(lambda msg: _falhou(msg, geracao))
+            self._stats_threads.add(thread)
+            thread.finished.connect(lambda t=thread: self._stats_threads.discard(t))
+            thread.finished.connect(thread.deleteLater)
+            thread.start()
+
+        def _recomecar():
+            if estado['token'] is not None:
+                estado['token'].cancel()
+            estado.update(prefixo=busca.text().strip(), numero=0, tem_mais=True, carregando=False,
+                          token=None, geracao=estado['geracao'] + 1)
+            lista.clear()
+            _proxima()
+
+        def _marcar(item):
+            texto = item.text()
+            if item.checkState() == Qt.Checked and texto not in marcados:
+                marcados.append(texto)
+            elif item.checkState() != Qt.Checked and texto in marcados:
+                marcados.remove(texto)
+
+        def _rolou(valor):
+            if valor >= lista.verticalScrollBar().maximum() - 2:
+                _proxima()
+
+        timer = QTimer(dlg)
+        timer.setSingleShot(True)
+        timer.setInterval(SEARCH_DEBOUNCE_MS)
+        timer.timeout.connect(_recomecar)
+        busca.textChanged.connect(lambda _: timer.start())
+        lista.itemChanged.connect(_marcar)
+        lista.verticalScrollBar().valueChanged.connect(_rolou)
+
+        _recomecar()
+        aceito = dlg.exec_() == QDialog.Accepted
+        # descarta respostas que chegarem depois do fechamento
+        if estado['token'] is not None:
+            estado['token'].cancel()
+        estado['geracao'] += 1
+        return list(marcados) if aceito else None
+
+    def _format_stats_value(self, value) -> str:
+        if isinstance(value, (_dt.datetime, _dt.date)):
+            try:
+                return value.strftime(getattr(self.window(), 'date_format', '%m-%d-%Y'))
+            except Exception:
+                return str(value)
+        return str(value)
+
+    def _describe_column_stats(self, est) -> str:
+        """Texto curto com intervalo e distintos ("≈" quando vem de amostra)."""
+        if est is None or not est.linhas_amostra:
+            return ""
+        aprox = "≈" if est.amostrada else ""
+        partes = []
+        if est.minimo is not None and est.maximo is not None:
+            partes.append(f"de {self._format_stats_value(est.minimo)} a {self._format_stats_value(est.maximo)}")
+        partes.append(f"{aprox}{est.distintos_aprox} valores distintos")
+        return "; ".join(partes)
+
+    def _stats_tooltip(self, est) -> str:
+        if est is None or not est.frequentes:
+            return ""
+        linhas = [f"{self._format_stats_value(v)} ({n})" for v, n in est.frequentes[:10]]
+        origem = "na amostra" if est.amostrada else "na tabela"
+        return f"Valores mais frequentes {origem}:\n" + "\n".join(linhas)
+
+    def _apply_filter_stats(self, alvo, est):
+        """Aplica as estatísticas ao painel de filtros se o campo ainda for o mesmo."""
+        if alvo != self._filter_stats_alvo:
+            return
+        try:
+            self._filter_values_model.setStringList(est.valores_sugeridos() if est else [])
+            texto = self._describe_column_stats(est)
+            self.filter_stats_hint.setText(texto)
+            self.filter_stats_hint.setToolTip(self._stats_tooltip(est))
+            self.filter_stats_hint.setVisible(bool(texto))
+        except Exception:
+            pass
 
     def _on_filter_op_changed(self, op: str):
         """Atualiza visibilidade do segundo valor quando operador é BETWEEN"""
@@ -4336,7 +4796,10 @@ QListView::item:selected { background-color: #3874f2; color: #ffffff; }
                     agrup_meta = agrup_meta or {}
 
             if agrupamento_id and 'agrupamentos' in agrup_meta:
-                agrup = next((a for a in agrup_meta.get('agrupamentos', []) if a.get('id') == agrupamento_id), None)
+                try:
+                    agrup = self.qb.obter_agrupamento(getattr(self, 'current_modulo', None), agrupamento_id)
+                except Exception:
+                    agrup = None
             if agrup is None and 'agrupamentos' in agrup_meta:
                 agrup = agrup_meta.get('agrupamentos', [])[0] if agrup_meta.get('agrupamentos') else None
 
@@ -4346,26 +4809,24 @@ QListView::item:selected { background-color: #3874f2; color: #ffffff; }
             try:
                 module = getattr(self, 'current_modulo', None)
                 if module:
-                    mod_meta = self.qb.carregar_modulo(module)
-                    for tbl_key, tbl_def in (mod_meta.get('tabelas', {}) or {}).items():
-                        for section in ('padrao', 'avancado'):
-                            for c in (tbl_def.get('campos', {}).get(section, []) if isinstance(tbl_def.get('campos', {}), dict) else []):
-                                try:
-                                    nome = c.get('campo') if isinstance(c, dict) else str(c)
-                                    # prefer explicit mapping override when available
-                                    try:
-                                        override = get_field_label(module, nome)
-                                    except Exception:
-                                        override = None
-                                    if isinstance(c, dict) and c.get('label'):
-                                        label = c.get('label')
-                                    elif override:
-                                        label = override
-                                    else:
-                                        label = nome
-                                    field_label_map[nome.lower()] = label
-                                except Exception:
-                                    pass
+                    # índice de campos do módulo (registro de metadados do QueryBuilder)
+                    for chave, (_, c) in self.qb.metadados.campos(module).items():
+                        try:
+                            nome = c.get('campo') or chave
+                            # prefer explicit mapping override when available
+                            try:
+                                override = get_field_label(module, nome)
+                            except Exception:
+                                override = None
+                            if c.get('label'):
+                                label = c.get('label')
+                            elif override:
+                                label = override
+                            else:
+                                label = nome
+                            field_label_map[chave] = label
+                        except Exception:
+                            pass
             except Exception:
                 field_label_map = {}
             if agrup:
@@ -5224,8 +5685,12 @@ QListView::item:selected { background-color: #3874f2; color: #ffffff; }
             token_input = QLineEdit()
             token_input.setPlaceholderText('Adicionar valor e pressionar Enter')
             token_add_btn = QPushButton('+')
+            # escolher entre os valores existentes na coluna (consulta paginada)
+            token_pick_btn = QPushButton('Valores...')
+            token_pick_btn.setToolTip('Escolher entre os valores existentes no campo')
             token_input_layout.addWidget(token_input)
             token_input_layout.addWidget(token_add_btn)
+            token_input_layout.addWidget(token_pick_btn)
             # helper to add token
             def _add_token():
                 txt = token_input.text().strip()
@@ -5239,6 +5704,18 @@ QListView::item:selected { background-color: #3874f2; color: #ffffff; }
                 token_widget.addItem(it)
                 token_input.clear()
             token_add_btn.clicked.connect(_add_token)
+
+            def _pick_tokens():
+                alvo = dlg_stats.get('alvo')
+                if alvo is None:
+                    QMessageBox.information(dlg, 'Informação', 'Não foi possível identificar a tabela deste campo.')
+                    return
+                existentes = {token_widget.item(i).text() for i in range(token_widget.count())}
+                for valor in self._pick_distinct_values(alvo, dlg) or []:
+                    if valor not in existentes:
+                        token_widget.addItem(QListWidgetItem(valor))
+                        existentes.add(valor)
+            token_pick_btn.clicked.connect(_pick_tokens)
             token_input.returnPressed.connect(_add_token)
 
             # suporte a remoção/edição via tecla Delete e menu de contexto
@@ -5406,6 +5883,40 @@ QListView::item:selected { background-color: #3874f2; color: #ffffff; }
 
             layout.addLayout(val_area)
 
+            # sugestões: valores frequentes no autocompletar e intervalo da coluna
+            values_model = QStringListModel(dlg)
+            txt_single.setCompleter(self._make_values_completer(values_model, txt_single))
+            token_input.setCompleter(self._make_values_completer(values_model, token_input))
+            stats_hint = QLabel('')
+            stats_hint.setStyleSheet("color: #666666;")
+            stats_hint.setVisible(False)
+            layout.addWidget(stats_hint)
+            dlg_stats = {'alvo': None}
+
+            def _apply_dialog_stats(alvo, est):
+                if alvo != dlg_stats['alvo']:
+                    return
+                try:
+                    values_model.setStringList(est.valores_sugeridos() if est else [])
+                    texto = self._describe_column_stats(est)
+                    stats_hint.setText(f"Valores: {texto}" if texto else '')
+                    stats_hint.setToolTip(self._stats_tooltip(est))
+                    stats_hint.setVisible(bool(texto))
+                except RuntimeError:
+                    # diálogo já fechado
+                    pass
+
+            def _on_dialog_field_changed(_=None):
+                try:
+                    dlg_stats['alvo'] = self._filter_stats_target(field_combo.currentData())
+                    self._request_filter_stats(dlg_stats['alvo'], _apply_dialog_stats)
+                except Exception:
+                    pass
+
+            field_combo.currentIndexChanged.connect(_on_dialog_field_changed)
+            _on_dialog_field_changed()
+            dlg.finished.connect(lambda _: dlg_stats.update(alvo=None))
+
             # helper para ajustar visibilidade
             def update_value_widgets(op_text=None, dtype=None):
                 if op_text is None:
@@ -5414,7 +5925,7 @@ QListView::item:selected { background-color: #3874f2; color: #ffffff; }
                     o = op_text
                 dtp = dtype or detected_type
                 # hide all initially
-                for w in (txt_single, token_widget, token_input, token_add_btn, num_single, num_a, num_b, date_single, date_a, date_b):
+                for w in (txt_single, token_widget, token_input, token_add_btn, token_pick_btn, num_single, num_a, num_b, date_single, date_a, date_b):
                     try:
                         w.setVisible(False)
                     except Exception:
@@ -5424,6 +5935,7 @@ QListView::item:selected { background-color: #3874f2; color: #ffffff; }
                 if o == 'IN':
                     # show token editor for IN values
                     token_widget.setVisible(True); token_input.setVisible(True); token_add_btn.setVisible(True)
+                    token_pick_btn.setVisible(True)
                     return
                 if o == 'BETWEEN':
                     if dtp == 'numeric':
@@ -6036,8 +6548,12 @@ QListView::item:selected { background-color: #3874f2; color: #ffffff; }
         except Exception:
             pass
 
-    def execute_query(self):
-        """Executa a consulta"""
+    def execute_query(self, force_refresh: bool = False):
+        """Executa a consulta.
+
+        `force_refresh=True` ignora o cache de resultados e reexecuta a
+        consulta no servidor (o cache é atualizado com o novo resultado).
+        """
         sql = self.sql_preview.toPlainText().strip()
         
         if not sql:
@@ -6089,7 +6605,7 @@ QListView::item:selected { background-color: #3874f2; color: #ffffff; }
         
         try:
             if getattr(self, 'session_logger', None):
-                self.session_logger.log('execute_query_attempt', 'Tentativa de execução', {'sql_preview': sql[:200]})
+                self.session_logger.log('execute_query_attempt', 'Tentativa de execução', {'sql_preview': sql[:200], 'force_refresh': bool(force_refresh)})
             # Prefer executing the parameterized SQL stored in `self.current_sql`.
             # The preview (`self.sql_preview`) may have had '?' substituted for legibility
             # and thus not contain parameter markers while `self.current_sql_params` is set.
@@ -6108,7 +6624,9 @@ QListView::item:selected { background-color: #3874f2; color: #ffffff; }
             # Execute the query in a worker thread to keep the UI responsive and
             # show a progress dialog / timer while the query runs.
             # --- Validação adicional (modo manual): se a tabela principal tiver
-            # colunas de data e nenhuma delas aparece no SQL/WHERE, avisar o usuário ---
+            # colunas de data e nenhuma delas aparece no SQL/WHERE, avisar o usuário
+            # (junto com a estimativa do plano, ver _confirm_preflight) ---
+            missing_date_filter = False
             try:
                 modo = getattr(self, 'modo_consulta', None)
                 if modo == 'manual' and self.selected_tables_list.count() > 0:
@@ -6173,23 +6691,45 @@ QListView::item:selected { background-color: #3874f2; color: #ffffff; }
                                     except Exception:
                                         continue
                                 if not found:
-                                    reply = QMessageBox.question(self, 'Filtro de data ausente',
-                                        "A tabela principal contém colunas de data e nenhum filtro de data foi encontrado no WHERE.\n" +
-                                        "A consulta pode retornar muitos registros e demorar. Deseja continuar?",
-                                        QMessageBox.Yes | QMessageBox.No)
-                                    if reply == QMessageBox.No:
-                                        return
+                                    missing_date_filter = True
                         except Exception:
                             pass
             except Exception:
                 pass
-            progress = QProgressDialog("Executando consulta...", None, 0, 0, self)
-            progress.setWindowTitle("Executando")
-            progress.setWindowModality(Qt.ApplicationModal)
+            # a estimativa roda em segundo plano; a execução segue na confirmação
+            self._confirm_preflight(
+                exec_sql, params, missing_date_filter, force_refresh,
+                lambda: self._run_confirmed_query(exec_sql, params, force_refresh),
+            )
+        except Exception as e:
+            QMessageBox.critical(self, "Erro", f"Erro ao executar consulta:\n{str(e)}")
+
+    def _run_confirmed_query(self, exec_sql: str, params, force_refresh: bool = False):
+        """Executa a consulta já confirmada pela estimativa prévia (ver execute_query)."""
+        try:
+            # uma execução completa ainda em segundo plano (após a prévia) é
+            # substituída pela nova
+            self.cancel_running_query()
+            # SQL/parâmetros do resultado exibido: o gráfico agrega sobre ela no servidor
+            self.last_executed_query = (exec_sql, params)
+            rotular = self._period_labeler_for(exec_sql)
+            self.last_period_labeler = rotular
             try:
-                progress.setCancelButton(None)
+                paged = bool(getattr(self, 'paged_mode_cb', None) and self.paged_mode_cb.isChecked())
             except Exception:
-                pass
+                paged = False
+            if paged:
+                self._start_paged_query(exec_sql, params, rotular)
+                return
+            plano = self._partition_plan_for(exec_sql, params)
+            preview_sql = None if plano is not None else self._preview_sql_for(exec_sql)
+
+            progress = QProgressDialog("Executando consulta...", "Cancelar", 0, 0, self)
+            progress.setWindowTitle("Executando")
+            progress.setWindowModality(Qt.ApplicationModal)
+            # o diálogo só é fechado explicitamente (sucesso, erro ou cancelamento)
+            progress.setAutoClose(False)
+            progress.setAutoReset(False)
             progress.setMinimumDuration(0)
             progress.show()
             QApplication.processEvents()
@@ -6200,24 +6740,151 @@ QListView::item:selected { background-color: #3874f2; color: #ffffff; }
             except Exception:
                 self._current_progress = None
 
+            try:
+                batch_size = int(self._load_user_pref('fetch_batch_size', DEFAULT_FETCH_BATCH_SIZE))
+            except Exception:
+                batch_size = DEFAULT_FETCH_BATCH_SIZE
+            timeout = self._resolve_query_timeout()
+
             class _QueryWorker(QThread):
                 finished_signal = pyqtSignal(list, list)
+                batch_signal = pyqtSignal(list, list, bool)
                 error_signal = pyqtSignal(str)
+                cancelled_signal = pyqtSignal()
+                preview_signal = pyqtSignal(list, list)
+                full_progress_signal = pyqtSignal(int)
+                full_ready_signal = pyqtSignal(object)
 
-                def __init__(self, qb, sql, params):
+                def __init__(self, qb, sql, params, batch_size, timeout, force_refresh, plano=None, max_concurrency=None, preview_sql=None, rotular=None):
                     super().__init__()
                     self._qb = qb
+                    self._rotular = rotular
+                    self._plano = plano
+                    self._max_concurrency = max_concurrency
+                    self._preview_sql = preview_sql
+                    self.preview_shown = False
                     self._sql = sql
                     self._params = params
+                    self._batch_size = batch_size
+                    self._timeout = timeout
+                    self._force_refresh = force_refresh
+                    self._cancel_token = QueryCancelToken()
+
+                def cancel(self):
+                    """Solicita o cancelamento (cursor.cancel) da consulta em execução."""
+                    self._cancel_token.cancel()
+
+                def _rotuladas(self, cols, rows):
+                    """Linhas com os rótulos das colunas de período (ver periodos.py)."""
+                    return self._rotular(cols, rows) if self._rotular else rows
+
+                def _run_preview_then_full(self):
+                    """Prévia TOP (N) entregue de imediato; o resultado completo é
+                    montado em um ResultSet separado e entregue ao final."""
+                    # com o mesmo token da execução completa: Cancelar interrompe a prévia
+                    cols, rows = [], []
+                    for cols, lote in self._qb.executar_sql_em_lotes(
+                            self._preview_sql, self._params, self._batch_size,
+                            timeout=self._timeout, cancel_token=self._cancel_token):
+                        rows.extend(lote)
+                    if self._cancel_token.cancelled:
+                        raise QueryCancelledError("Consulta cancelada pelo usuário")
+                    self.preview_shown = True
+                    self.preview_signal.emit(list(cols), list(self._rotuladas(cols, rows)))
+                    rs = None
+                    try:
+                        for cols, lote in self._qb.execute_query_stream(
+                                self._sql, self._params, self._batch_size,
+                                timeout=self._timeout, cancel_token=self._cancel_token,
+                                force_refresh=self._force_refresh):
+                            if rs is None:
+                                rs = self._qb.novo_result_set(list(cols))
+                            rs.extend(self._rotuladas(cols, lote))
+                            self.full_progress_signal.emit(len(rs))
+                    except BaseException:
+                        if rs is not None:
+                            rs.close()
+                        raise
+                    if rs is None:
+                        rs = self._qb.novo_result_set(list(cols))
+                    self.full_ready_signal.emit(rs)
 
                 def run(self):
                     try:
-                        cols, rows = self._qb.execute_query(self._sql, self._params)
-                        self.finished_signal.emit(cols, rows)
+                        if self._preview_sql:
+                            self._run_preview_then_full()
+                            return
+                        if self._plano is not None:
+                            # partições executadas em paralelo e combinadas no cliente
+                            cols, rows = self._qb.executar_particionado(
+                                self._plano, timeout=self._timeout,
+                                max_concorrencia=self._max_concurrency,
+                                cancel_token=self._cancel_token)
+                            self.batch_signal.emit(list(cols), list(self._rotuladas(cols, rows)), True)
+                            self.finished_signal.emit(list(cols), [])
+                            return
+                        # lê o resultado em lotes (fetchmany) e entrega cada lote
+                        # assim que chega, para a aba de resultados exibir os
+                        # primeiros registros sem esperar o término da consulta
+                        stream = getattr(self._qb, 'execute_query_stream', None)
+                        if stream is None:
+                            cols, rows = self._qb.execute_query(self._sql, self._params)
+                            self.finished_signal.emit(cols, list(self._rotuladas(cols, rows)))
+                            return
+                        cols = []
+                        first = True
+                        # os lotes não são acumulados aqui: a aba de resultados
+                        # já os guarda no ResultSet colunar
+                        for cols, lote in stream(self._sql, self._params, self._batch_size,
+                                                 timeout=self._timeout, cancel_token=self._cancel_token,
+                                                 force_refresh=self._force_refresh):
+                            self.batch_signal.emit(list(cols), list(self._rotuladas(cols, lote)), first)
+                            first = False
+                        self.finished_signal.emit(list(cols), [])
+                    except QueryCancelledError:
+                        self.cancelled_signal.emit()
                     except Exception as exc:
-                        self.error_signal.emit(str(exc))
+                        if self._cancel_token.cancelled:
+                            self.cancelled_signal.emit()
+                        else:
+                            self.error_signal.emit(str(exc))
+
+            try:
+                max_concurrency = int(self._load_user_pref('partition_max_concurrency', DEFAULT_MAX_CONCORRENCIA))
+            except Exception:
+                max_concurrency = DEFAULT_MAX_CONCORRENCIA
+            if plano is not None:
+                try:
+                    if getattr(self, 'session_logger', None):
+                        self.session_logger.log('execute_query_partitioned', 'Execução particionada por período',
+                                                {'partitions': len(plano.particoes), 'max_concurrency': max_concurrency})
+                except Exception:
+                    pass
+            worker = _QueryWorker(self.qb, exec_sql, params, batch_size, timeout, force_refresh, plano, max_concurrency, preview_sql, rotular)
+            self._query_worker = worker
+
+            streamed = {'rows': 0}
+
+            def _on_worker_batch(cols, rows, first):
+                try:
+                    self.query_batch_received.emit(cols, rows, first)
+                except Exception:
+                    pass
+                try:
+                    streamed['rows'] += len(rows)
+                    if not worker._cancel_token.cancelled:
+                        progress.setLabelText(f"Executando consulta... {streamed['rows']} registros recebidos")
+                except Exception:
+                    pass
 
-            worker = _QueryWorker(self.qb, exec_sql, params)
+            def _on_cancel_requested():
+                try:
+                    progress.setLabelText("Cancelando consulta...")
+                    progress.setCancelButton(None)
+                    progress.show()
+                except Exception:
+                    pass
+                worker.cancel()
 
             def _on_worker_finished(cols, rows):
                 try:
@@ -6226,7 +6893,8 @@ QListView::item:selected { background-color: #3874f2; color: #ffffff; }
                     # de resultados. Registramos apenas o log aqui.
                     if getattr(self, 'session_logger', None):
                         try:
-                            self.session_logger.log('execute_query_success', f'Retorno {len(rows)} registros', {'rows': len(rows)})
+                            total = max(len(rows), streamed['rows'])
+                            self.session_logger.log('execute_query_success', f'Retorno {total} registros', {'rows': total})
                         except Exception:
                             pass
                 except Exception:
@@ -6235,35 +6903,381 @@ QListView::item:selected { background-color: #3874f2; color: #ffffff; }
                     self.query_executed.emit(cols, rows)
                 except Exception:
                     pass
+
+            def _close_progress():
                 try:
-                    worker.deleteLater()
+                    progress.close()
                 except Exception:
                     pass
+                self._current_progress = None
 
-            def _on_worker_error(msg):
+            def _on_worker_preview(cols, rows):
+                # a prévia vai para a aba de resultados; o diálogo modal fecha e a
+                # execução completa segue em segundo plano
+                try:
+                    self.query_preview_received.emit(cols, rows)
+                except Exception:
+                    pass
+                try:
+                    # fechar o QProgressDialog emite `canceled`: desliga antes
+                    progress.canceled.disconnect(_on_cancel_requested)
+                except Exception:
+                    pass
+                _close_progress()
                 try:
+                    if getattr(self, 'session_logger', None):
+                        self.session_logger.log('execute_query_preview', f'Prévia com {len(rows)} registros', {'rows': len(rows)})
+                except Exception:
+                    pass
+
+            def _on_worker_full_progress(rows_count):
+                if self._query_worker is worker:
+                    self.query_full_progress.emit(rows_count)
+
+            def _on_worker_full_ready(result_set):
+                if self._query_worker is not worker or worker._cancel_token.cancelled:
+                    # parada pelo usuário ou substituída por outra execução: descarta o resultado
                     try:
-                        progress.close()
+                        result_set.close()
                     except Exception:
                         pass
+                    return
+                try:
+                    if getattr(self, 'session_logger', None):
+                        self.session_logger.log('execute_query_success', f'Retorno {len(result_set)} registros', {'rows': len(result_set), 'after_preview': True})
+                except Exception:
+                    pass
+                self.query_full_ready.emit(result_set)
+
+            def _on_worker_error(msg):
+                _close_progress()
+                if worker.preview_shown:
+                    if self._query_worker is worker:
+                        self.query_full_stopped.emit(f"erro na execução completa: {msg}")
+                        QMessageBox.critical(self, "Erro", f"Erro ao executar a consulta completa (a prévia foi mantida):\n{msg}")
+                    return
+                QMessageBox.critical(self, "Erro", f"Erro ao executar consulta:\n{msg}")
+
+            def _on_worker_cancelled():
+                _close_progress()
+                if worker.preview_shown:
+                    # interrompida depois da prévia: os registros da prévia permanecem
                     try:
-                        self._current_progress = None
+                        if getattr(self, 'session_logger', None):
+                            self.session_logger.log('execute_query_stopped_after_preview', 'Execução completa interrompida após a prévia', {})
                     except Exception:
                         pass
+                    if self._query_worker is worker:
+                        self.query_full_stopped.emit("execução completa interrompida")
+                    return
+                try:
+                    if getattr(self, 'session_logger', None):
+                        self.session_logger.log('execute_query_cancelled', 'Consulta cancelada pelo usuário', {'rows': streamed['rows']})
                 except Exception:
                     pass
-                QMessageBox.critical(self, "Erro", f"Erro ao executar consulta:\n{msg}")
+                try:
+                    self.query_cancelled.emit(streamed['rows'])
+                except Exception:
+                    pass
+                QMessageBox.information(self, "Cancelada", "A consulta foi cancelada.")
+
+            def _on_thread_finished():
+                # libera o worker somente depois que a thread terminou de fato
+                if self._query_worker is worker:
+                    self._query_worker = None
                 try:
                     worker.deleteLater()
                 except Exception:
                     pass
 
+            progress.canceled.connect(_on_cancel_requested)
+            worker.batch_signal.connect(_on_worker_batch)
             worker.finished_signal.connect(_on_worker_finished)
             worker.error_signal.connect(_on_worker_error)
+            worker.cancelled_signal.connect(_on_worker_cancelled)
+            worker.preview_signal.connect(_on_worker_preview)
+            worker.full_ready_signal.connect(_on_worker_full_ready)
+            worker.full_progress_signal.connect(_on_worker_full_progress)
+            worker.finished.connect(_on_thread_finished)
             worker.start()
         except Exception as e:
             QMessageBox.critical(self, "Erro", f"Erro ao executar consulta:\n{str(e)}")
-    
+
+    def cancel_running_query(self, wait_ms: int = 0) -> bool:
+        """Cancela a consulta em execução (se houver).
+
+        Com `wait_ms` > 0 aguarda o término da thread; retorna True quando
+        não há mais consulta em andamento.
+        """
+        worker = getattr(self, '_query_worker', None)
+        if worker is None:
+            return True
+        try:
+            worker.cancel()
+            if wait_ms > 0:
+                return bool(worker.wait(wait_ms))
+            return not worker.isRunning()
+        except Exception:
+            return False
+
+    def _confirm_preflight(self, exec_sql: str, params, missing_date_filter: bool = False,
+                           force_refresh: bool = False, on_confirmed=None):
+        """Estimativa prévia (SHOWPLAN_XML) e confirmação antes de executar.
+
+        A estimativa é obtida em segundo plano (`_BackgroundCall`), com um
+        diálogo de progresso que permite desistir; a decisão é tomada quando
+        ela chega (ver `_preflight_decision`) e `on_confirmed` é chamado se a
+        execução deve prosseguir.
+        """
+        def _decidir(estimativa):
+            if self._preflight_decision(estimativa, missing_date_filter) and on_confirmed is not None:
+                on_confirmed()
+
+        if not self._load_user_pref('preflight_enabled', True):
+            _decidir(None)
+            return
+        try:
+            timeout = int(self._load_user_pref('preflight_timeout_seconds', 15) or 0) or None
+        except Exception:
+            timeout = 15
+
+        progress = QProgressDialog("Estimando o custo da consulta...", "Cancelar", 0, 0, self)
+        progress.setWindowTitle("Estimativa")
+        progress.setWindowModality(Qt.ApplicationModal)
+        progress.setAutoClose(False)
+        progress.setAutoReset(False)
+        progress.setMinimumDuration(0)
+        estado = {'cancelada': False}
+        thread = _BackgroundCall(lambda: self.qb.estimar_plano(exec_sql, params, timeout=timeout, force_refresh=force_refresh))
+        # referência mantida até a thread terminar
+        self._preflight_thread = thread
+
+        def _on_cancel():
+            # o SHOWPLAN não é interrompido; o resultado é apenas descartado
+            estado['cancelada'] = True
+
+        def _close():
+            try:
+                progress.canceled.disconnect(_on_cancel)
+            except Exception:
+                pass
+            try:
+                progress.close()
+            except Exception:
+                pass
+
+        def _on_done(estimativa):
+            _close()
+            if estado['cancelada']:
+                return
+            _decidir(estimativa if isinstance(estimativa, EstimativaPlano) else None)
+
+        def _on_failed(msg):
+            _close()
+            logging.info(f"Estimativa do plano indisponível: {msg}")
+            if not estado['cancelada']:
+                _decidir(None)
+
+        def _on_finished():
+            if getattr(self, '_preflight_thread', None) is thread:
+                self._preflight_thread = None
+            thread.deleteLater()
+
+        progress.canceled.connect(_on_cancel)
+        thread.done.connect(_on_done)
+        thread.failed.connect(_on_failed)
+        thread.finished.connect(_on_finished)
+        progress.show()
+        thread.start()
+
+    def _preflight_decision(self, estimativa, missing_date_filter: bool = False) -> bool:
+        """Decide, a partir da estimativa do plano, se a execução prossegue.
+
+        Bloqueia a execução acima de `preflight_block_rows`/`preflight_block_cost`
+        e pede confirmação acima de `preflight_confirm_rows`/`preflight_confirm_cost`
+        (user_prefs.json; 0 desativa o limite). Sem estimativa (preferência
+        `preflight_enabled` desligada ou servidor sem suporte) vale apenas o
+        aviso de filtro de data ausente. Retorna False se a execução não deve
+        prosseguir.
+        """
+        date_msg = ("A tabela principal contém colunas de data e nenhum filtro de data foi encontrado no WHERE.\n"
+                    "A consulta pode retornar muitos registros e demorar.")
+        if estimativa is None:
+            if not missing_date_filter:
+                return True
+            reply = QMessageBox.question(self, 'Filtro de data ausente', date_msg + " Deseja continuar?",
+                                         QMessageBox.Yes | QMessageBox.No)
+            return reply == QMessageBox.Yes
+
+        def _limit(key, default):
+            try:
+                return float(self._load_user_pref(key, default) or 0) or None
+            except Exception:
+                return default
+
+        limites = LimitesEstimativa(
+            confirmar_linhas=_limit('preflight_confirm_rows', DEFAULT_CONFIRMAR_LINHAS),
+            confirmar_custo=_limit('preflight_confirm_cost', DEFAULT_CONFIRMAR_CUSTO),
+            bloquear_linhas=_limit('preflight_block_rows', None),
+            bloquear_custo=_limit('preflight_block_cost', None),
+        )
+        nivel, motivos = avaliar_estimativa(estimativa, limites)
+        try:
+            if getattr(self, 'session_logger', None):
+                self.session_logger.log('execute_query_preflight', 'Estimativa do plano', {
+                    'estimated_rows': estimativa.linhas_estimadas,
+                    'estimated_cost': estimativa.custo_estimado,
+                    'missing_indexes': len(estimativa.indices_ausentes),
+                    'level': nivel,
+                })
+        except Exception:
+            pass
+        detalhes = descrever_estimativa(estimativa)
+        if nivel == NIVEL_BLOQUEAR:
+            QMessageBox.critical(self, 'Consulta bloqueada',
+                                 "A execução foi bloqueada pelos limites configurados (" + "; ".join(motivos) + ").\n\n" +
+                                 detalhes + "\n\nRestrinja os filtros e tente novamente.")
+            return False
+        if nivel == NIVEL_OK and not missing_date_filter:
+            return True
+        texto = detalhes
+        if motivos:
+            texto = "Atenção: " + "; ".join(motivos) + ".\n\n" + texto
+        if missing_date_filter:
+            texto = date_msg + "\n\n" + texto
+        reply = QMessageBox.question(self, 'Confirmar execução', texto + "\n\nDeseja continuar?",
+                                     QMessageBox.Yes | QMessageBox.No)
+        return reply == QMessageBox.Yes
+
+    def _preview_sql_for(self, exec_sql: str) -> Optional[str]:
+        """SQL da prévia (TOP N) exibida antes da execução completa, ou None.
+
+        Preferências: `preview_enabled` e `preview_rows`. Sem prévia quando o
+        modo particionado está ativo ou a consulta não admite TOP (ver
+        paginacao.montar_sql_previa).
+        """
+        try:
+            if not self._load_user_pref('preview_enabled', True):
+                return None
+            rows = int(self._load_user_pref('preview_rows', DEFAULT_PREVIEW_ROWS))
+        except Exception:
+            rows = DEFAULT_PREVIEW_ROWS
+        return montar_sql_previa(exec_sql, rows)
+
+    def _current_periods(self) -> Optional[dict]:
+        """Colunas de período -> tipo da SQL atual, salvas junto com a consulta."""
+        atual = getattr(self, 'current_period_labeler', None)
+        if not atual or not atual[1]:
+            return None
+        try:
+            texto = self.sql_preview.toPlainText().strip()
+        except Exception:
+            texto = None
+        # SQL gerada pelo agrupamento ou consulta carregada sem alteração
+        if atual[0] not in (getattr(self, 'current_sql', None), texto):
+            return None
+        return dict(atual[1].periodos)
+
+    def _period_labeler_for(self, exec_sql: str):
+        """Rotulador das colunas de período, se `exec_sql` é a SQL gerada pelo agrupamento."""
+        atual = getattr(self, 'current_period_labeler', None)
+        if not atual or atual[0] != exec_sql or not atual[1]:
+            return None
+        return atual[1]
+
+    def _partition_plan_for(self, exec_sql: str, params):
+        """Plano particionado da consulta atual, se o modo estiver ativo.
+
+        O plano só vale para a SQL gerada pelo agrupamento; se o usuário
+        alterou a consulta depois de gerá-la, a execução é a normal.
+        """
+        try:
+            if not (getattr(self, 'partitioned_mode_cb', None) and self.partitioned_mode_cb.isChecked()):
+                return None
+        except Exception:
+            return None
+        plano = getattr(self, 'current_partition_plan', None)
+        if plano is None:
+            return None
+        if plano.sql_base != exec_sql or list(plano.params_base) != list(params or []):
+            return None
+        return plano
+
+    def _start_paged_query(self, exec_sql: str, params, rotular=None):
+        """Inicia a execução paginada no servidor (ver paginacao.PaginadorConsulta).
+
+        A aba de resultados busca as páginas sob demanda, conforme a rolagem.
+        """
+        try:
+            page_size = int(self._load_user_pref('paged_page_size', DEFAULT_PAGE_SIZE))
+        except Exception:
+            page_size = DEFAULT_PAGE_SIZE
+        paginador = self.qb.paginar(
+            exec_sql,
+            params,
+            tamanho_pagina=page_size,
+            chaves_candidatas=self._paging_key_candidates(),
+            timeout=self._resolve_query_timeout(),
+            rotular=rotular,
+        )
+        try:
+            if getattr(self, 'session_logger', None):
+                self.session_logger.log('execute_query_paged', 'Execução paginada no servidor', {'page_size': paginador.tamanho_pagina})
+        except Exception:
+            pass
+        self.query_paged_started.emit(paginador)
+
+    def _paging_key_candidates(self) -> list:
+        """Colunas únicas que permitem paginação keyset (ex.: NumRegistro).
+
+        Modo pré-definido: `chave_primaria` dos metadados do módulo; modo
+        manual: chave primária da tabela principal selecionada. O paginador
+        só usa keyset quando a consulta lê uma única tabela (com JOINs a
+        chave pode se repetir).
+        """
+        try:
+            if getattr(self, 'modo_consulta', 'metadados') != 'manual':
+                modulo = getattr(self, 'current_modulo', None)
+                return self.qb.obter_chaves_paginacao(modulo) if modulo else []
+            if self.selected_tables_list.count() > 0:
+                main_raw = self._get_selected_table_raw_text(self.selected_tables_list.item(0))
+                parts = main_raw.split('.')
+                schema = parts[0].strip('[]')
+                table = parts[1].split('(')[0].strip().strip('[]')
+                pks = self._get_primary_keys_cached(schema, table)
+                return pks if len(pks) == 1 else []
+        except Exception:
+            pass
+        return []
+
+    def _resolve_query_timeout(self) -> Optional[int]:
+        """Tempo limite (segundos) da próxima execução; None = sem limite.
+
+        Prioridade: consulta salva carregada, agrupamento selecionado (modo
+        pré-definido, `timeout_segundos` em `*_agrupamentos.json`) e por fim a
+        preferência `query_timeout_seconds` de user_prefs.json.
+        """
+        try:
+            t = getattr(self, '_loaded_query_timeout', None)
+            if isinstance(t, int) and t > 0:
+                return t
+        except Exception:
+            pass
+        try:
+            if getattr(self, 'modo_consulta', 'metadados') != 'manual':
+                modulo = getattr(self, 'current_modulo', None)
+                if modulo:
+                    t = self.qb.obter_timeout_agrupamento(modulo, getattr(self, 'current_agrupamento_id', None))
+                    if isinstance(t, int) and t > 0:
+                        return t
+        except Exception:
+            pass
+        try:
+            t = int(self._load_user_pref('query_timeout_seconds', 0) or 0)
+            return t if t > 0 else None
+        except Exception:
+            return None
+    
     def close_progress_and_notify_success(self, rows_count: int | None = None):
         """Fecha o diálogo de progresso (se existir) e notifica o usuário.
 
@@ -6370,6 +7384,15 @@ QListView::item:selected { background-color: #3874f2; color: #ffffff; }
             v.addWidget(QLabel("Descrição (opcional):"))
             desc_edit = QLineEdit()
             v.addWidget(desc_edit)
+            v.addWidget(QLabel("Tempo limite de execução em segundos (0 = padrão):"))
+            timeout_spin = QSpinBox()
+            timeout_spin.setRange(0, 86400)
+            timeout_spin.setSingleStep(30)
+            try:
+                timeout_spin.setValue(int(getattr(self, '_loaded_query_timeout', None) or 0))
+            except Exception:
+                pass
+            v.addWidget(timeout_spin)
 
             btns = QHBoxLayout()
             btn_save = QPushButton("Salvar")
@@ -6393,7 +7416,9 @@ QListView::item:selected { background-color: #3874f2; color: #ffffff; }
 
             name = name_edit.text().strip()
             description = desc_edit.text().strip()
+            timeout_segundos = int(timeout_spin.value()) or None
         except Exception:
+            timeout_segundos = getattr(self, '_loaded_query_timeout', None)
             # fallback para entrada simples
             name, ok = QInputDialog.getText(
                 self,
@@ -6474,8 +7499,11 @@ QListView::item:selected { background-color: #3874f2; color: #ffffff; }
                 created_by="Usuario",  # Pode passar o usuário logado
                 tags=[tag],
                 ui_state=ui_state,
-                overwrite=(existing is not None)
+                overwrite=(existing is not None),
+                timeout_segundos=timeout_segundos,
+                periodos=self._current_periods()
             )
+            self._loaded_query_timeout = timeout_segundos
             try:
                 if getattr(self, 'session_logger', None):
                     self.session_logger.log('save_query', f"Salvou consulta '{name}'", {'name': name})
@@ -6543,6 +7571,8 @@ QListView::item:selected { background-color: #3874f2; color: #ffffff; }
             self._loading_query = False
             return
 
+        self._loaded_query_timeout = getattr(query, 'timeout_segundos', None)
+
         # ==========================
         # SQL COMPLETO → Consulta gerada
         # ==========================
@@ -6558,6 +7588,15 @@ QListView::item:selected { background-color: #3874f2; color: #ffffff; }
             self.sql_preview.setPlainText(sql)
             self.sql_preview.blockSignals(False)
 
+        # a execução passa a usar o texto carregado (não a SQL gerada antes,
+        # nem o seu plano particionado); os rótulos de período salvos com a
+        # consulta valem enquanto o texto não for alterado
+        self.current_sql = None
+        self.current_sql_params = None
+        self.current_partition_plan = None
+        periodos = getattr(query, 'periodos', None)
+        self.current_period_labeler = (sql.strip(), RotuladorPeriodos(periodos)) if periodos else None
+
         # ==========================
         # Atualiza nome / label
         # ==========================
@@ -7064,8 +8103,177 @@ class ManageQueriesDialog(QDialog):
         reload_items()
         dlg.exec_()
 
+class _BackgroundCall(QThread):
+    """Executa `fn` em uma thread e entrega o retorno pelo sinal `done`.
+
+    `after`, se informado, roda na mesma thread depois da entrega (ex.:
+    pré-carregar a próxima página enquanto o usuário vê a atual).
+    """
+    done = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, fn, after=None, parent=None):
+        super().__init__(parent)
+        self._fn = fn
+        self._after = after
+
+    def run(self):
+        try:
+            result = self._fn()
+        except Exception as exc:
+            self.failed.emit(str(exc))
+            return
+        self.done.emit(result)
+        if self._after is not None:
+            try:
+                self._after()
+            except Exception:
+                pass
+
+
+class ResultSetTableModel(QAbstractTableModel):
+    """Modelo da grade de resultados lido diretamente do ResultSet colunar.
+
+    Apenas as células visíveis são formatadas; a ordenação por coluna guarda
+    uma permutação das linhas (argsort do NumPy) em vez de mover os dados.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rs = None
+        self._rows = 0
+        # tipo de exibição de cada coluna ('numeric', 'date', 'text'); None
+        # enquanto a coluna só tiver nulos
+        self._types = []
+        self._order = None
+        self._sort = None
+        self.decimals = 2
+        self.date_fmt = '%m-%d-%Y'
+
+    def set_result_set(self, result_set):
+        self.beginResetModel()
+        self._rs = result_set
+        self._rows = len(result_set) if result_set is not None else 0
+        self._types = [None] * (len(result_set.columns) if result_set is not None else 0)
+        self._order = None
+        self._sort = None
+        self._refresh_types()
+        self.endResetModel()
+
+    def rows_appended(self):
+        """Notifica a grade sobre as linhas acrescentadas ao ResultSet."""
+        if self._rs is None:
+            return
+        new_count = len(self._rs)
+        if new_count <= self._rows:
+            return
+        self.beginInsertRows(QModelIndex(), self._rows, new_count - 1)
+        if self._order is not None:
+            self._order = np.concatenate([self._order, np.arange(self._rows, new_count)])
+        self._rows = new_count
+        self.endInsertRows()
+        if self._refresh_types():
+            self.headerDataChanged.emit(Qt.Horizontal, 0, len(self._types) - 1)
+        if self._sort is not None:
+            self.sort(*self._sort)
+
+    def _refresh_types(self) -> bool:
+        changed = False
+        for i, t in enumerate(self._types):
+            if t is not None:
+                continue
+            new_type = _column_display_type(self._rs.column(i))
+            if new_type is not None:
+                self._types[i] = new_type
+                changed = True
+        return changed
+
+    def column_type(self, col: int):
+        return self._types[col] if col < len(self._types) else None
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._rows
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid() or self._rs is None:
+            return 0
+        return len(self._rs.columns)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or self._rs is None:
+            return None
+        if role not in (Qt.DisplayRole, Qt.TextAlignmentRole):
+            return None
+        row = index.row()
+        if self._order is not None:
+            row = int(self._order[row])
+        col = index.column()
+        value = self._rs.value(row, col)
+        display, align = ResultsTab._format_cell(value, self._types[col] or 'text', self.decimals, self.date_fmt)
+        return display if role == Qt.DisplayRole else int(align)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Vertical:
+            return str(section + 1) if role == Qt.DisplayRole else None
+        if self._rs is None or section >= len(self._rs.columns):
+            return None
+        if role == Qt.DisplayRole:
+            return self._rs.columns[section]
+        if role == Qt.FontRole:
+            # estilo do cabeçalho: negrito
+            f = QFont()
+            f.setBold(True)
+            return f
+        if role == Qt.TextAlignmentRole:
+            if self._types[section] in ('numeric', 'date'):
+                return int(Qt.AlignCenter)
+            return int(Qt.AlignLeft | Qt.AlignVCenter)
+        return None
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        if self._rs is None:
+            return
+        self.layoutAboutToBeChanged.emit()
+        if column < 0 or column >= len(self._rs.columns):
+            # sem indicador de ordenação: ordem original do resultado
+            self._order = None
+            self._sort = None
+        else:
+            self._order = self._rs.argsort(column, descending=(order == Qt.DescendingOrder))
+            self._sort = (column, order)
+        self.layoutChanged.emit()
+
+
+def _column_display_type(column):
+    """Tipo de exibição ('numeric', 'date', 'text') de uma coluna do ResultSet.
+
+    Retorna None quando a coluna ainda não tem valor não-nulo.
+    """
+    kind = column.kind
+    if kind is None:
+        return None
+    if kind in NUMERIC_KINDS or kind == KIND_BOOL:
+        return 'numeric'
+    if kind in TEMPORAL_KINDS:
+        return 'date'
+    val = column.first_value()
+    if isinstance(val, Number):
+        return 'numeric'
+    if isinstance(val, (_dt.datetime, _dt.date)):
+        return 'date'
+    # string that looks like ISO datetime
+    try:
+        if isinstance(val, str) and len(val) >= 10 and val[:10].count('-') == 2 and (':' in val or 'T' in val or ' ' in val):
+            return 'date'
+    except Exception:
+        pass
+    return 'text'
+
+
 class ResultsTab(QWidget):
     """Aba de resultados"""
+
+    stop_full_requested = pyqtSignal()  # usuário parou a execução completa após a prévia
     
     def __init__(self, ai_generator: AIInsightsGenerator, chart_gen: ChartGenerator, 
                  report_gen: ReportGenerator):
@@ -7073,10 +8281,30 @@ class ResultsTab(QWidget):
         self.ai_gen = ai_generator
         self.chart_gen = chart_gen
         self.report_gen = report_gen
-        self.current_data = []
+        # resultado atual em formato colunar (ver result_set.ResultSet)
+        self.current_data = ResultSet([])
+        # cria o ResultSet de cada consulta (MainWindow usa QueryBuilder.novo_result_set)
+        self.result_set_factory = ResultSet
         self.current_columns = []
         self.insights_text = None
         self.chart_figure = None
+        # execução paginada no servidor (ver begin_paged)
+        self._paginador = None
+        self._paging_generation = 0
+        self._page_loading = False
+        self._next_page = 0
+        self._paged_total = None
+        self._paging_threads = set()
+        # prévia (TOP N) exibida enquanto a execução completa segue em segundo plano
+        self._preview_active = False
+        # consulta (sql, params) do resultado exibido e executor da agregação
+        # do gráfico no servidor (MainWindow usa _run_chart_query); sem eles o
+        # gráfico agrega as linhas carregadas
+        self.source_query = None
+        self.chart_query_runner = None
+        # rótulos das colunas de período da consulta (a série do servidor vem com as datas)
+        self.source_labeler = None
+        self._chart_threads = set()
         self.setup_ui()
     
     def setup_ui(self):
@@ -7108,141 +8336,284 @@ class ResultsTab(QWidget):
         toolbar.addStretch()
         layout.addLayout(toolbar)
         
-        # Tabela de resultados
-        self.results_table = QTableWidget()
+        # Tabela de resultados: modelo sobre o ResultSet, sem um item por célula
+        self.results_model = ResultSetTableModel(self)
+        self.results_table = QTableView()
+        self.results_table.setModel(self.results_model)
+        self.results_table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        # sem indicador inicial: o resultado aparece na ordem do servidor
+        self.results_table.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
         self.results_table.setSortingEnabled(True)
+        # no modo paginado, chegar ao fim da rolagem busca a próxima página
+        self.results_table.verticalScrollBar().valueChanged.connect(self._on_results_scrolled)
         layout.addWidget(self.results_table)
         
         # Status
+        status_row = QHBoxLayout()
         self.status_label = QLabel("Nenhum resultado carregado")
-        layout.addWidget(self.status_label)
+        status_row.addWidget(self.status_label, 1)
+        self.btn_stop_full = QPushButton("Parar na prévia")
+        self.btn_stop_full.setToolTip("Interrompe a execução completa e mantém apenas os registros da prévia")
+        self.btn_stop_full.clicked.connect(self.stop_full_requested.emit)
+        self.btn_stop_full.setVisible(False)
+        status_row.addWidget(self.btn_stop_full)
+        layout.addLayout(status_row)
         
         self.setLayout(layout)
     
     def load_data(self, columns: list, data: list):
         """Carrega dados na tabela"""
+        self.begin_stream(columns)
+        self._streaming = False
+        self.append_rows(data)
+        self.results_table.resizeColumnsToContents()
+        self.status_label.setText(f"{len(self.current_data)} registros carregados")
+
+    def begin_stream(self, columns: list, _paged: bool = False):
+        """Prepara a tabela para receber o resultado em lotes (ver `append_rows`)."""
+        if not _paged:
+            self._stop_paging()
+        self._preview_active = False
+        self.btn_stop_full.setVisible(False)
         self.current_columns = columns
-        self.current_data = data
-        self.results_table.clear()
-        self.results_table.setRowCount(len(data))
-        self.results_table.setColumnCount(len(columns))
-
-        # Detect column types based on first non-null value in each column
-        col_types = []  # 'numeric', 'date', 'text'
-        for col_idx in range(len(columns)):
-            ctype = 'text'
-            for r in range(len(data)):
-                try:
-                    val = data[r][col_idx]
-                except Exception:
-                    val = None
-                if val is None:
-                    continue
-                # numeric
-                if isinstance(val, Number):
-                    ctype = 'numeric'
-                    break
-                # datetime/date
-                try:
-                    import datetime as _d
-                    if isinstance(val, (_d.datetime, _d.date)):
-                        ctype = 'date'
-                        break
-                except Exception:
-                    pass
-                # string that looks like ISO datetime
-                try:
-                    if isinstance(val, str) and len(val) >= 10 and val[:10].count('-') == 2 and (':' in val or 'T' in val or ' ' in val):
-                        ctype = 'date'
-                        break
-                except Exception:
-                    pass
-            col_types.append(ctype)
+        self.results_table.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self._replace_result_set(self.result_set_factory(columns))
+        self._streaming = True
+        self.status_label.setText("Recebendo registros...")
 
-        # set headers with alignment
-        for i, col in enumerate(columns):
-            hi = QTableWidgetItem(col)
-            # estilo do cabeçalho: negrito
-            try:
-                f = hi.font()
-                f.setBold(True)
-                hi.setFont(f)
-            except Exception:
-                pass
+    def _replace_result_set(self, result_set):
+        """Troca o resultado exibido, liberando os arquivos do anterior."""
+        previous = self.current_data
+        self.current_data = result_set
+        self.results_model.set_result_set(result_set)
+        try:
+            if previous is not None and previous is not result_set:
+                previous.close()
+        except Exception:
+            pass
 
-            if col_types[i] in ('numeric', 'date'):
-                hi.setTextAlignment(Qt.AlignCenter)
-            else:
-                hi.setTextAlignment(Qt.AlignLeft | Qt.AlignVCenter)
-            self.results_table.setHorizontalHeaderItem(i, hi)
-
-        for row_idx, row_data in enumerate(data):
-            for col_idx, value in enumerate(row_data):
-                display = ""
-                align = Qt.AlignLeft | Qt.AlignVCenter
-                if value is None:
-                    display = ""
-                else:
-                    if col_types[col_idx] == 'numeric' and isinstance(value, Number):
-                        # Use main window preferences for decimal places when available
-                        try:
-                            main = self.window()
-                            decimals = int(getattr(main, 'number_decimals', 2))
-                        except Exception:
-                            decimals = 2
+    def append_rows(self, rows: list):
+        """Acrescenta um lote de linhas ao final da tabela de resultados."""
+        if not rows:
+            return
+        first_rows = not self.current_data
+        self.current_data.extend(rows)
 
-                        try:
-                            # format floats with configured decimals; ints stay as-is
-                            if isinstance(value, float):
-                                display = f"{value:.{decimals}f}"
-                            else:
-                                display = str(value)
-                        except Exception:
-                            display = str(value)
+        # preferências de formatação lidas uma vez por lote
+        try:
+            main = self.window()
+            self.results_model.decimals = int(getattr(main, 'number_decimals', 2))
+            self.results_model.date_fmt = getattr(main, 'date_format', '%m-%d-%Y')
+        except Exception:
+            self.results_model.decimals = 2
+            self.results_model.date_fmt = '%m-%d-%Y'
+        self.results_model.rows_appended()
 
-                        align = Qt.AlignCenter
-                    elif col_types[col_idx] == 'date':
-                        # format date-only using user preference if set in MainWindow
-                        try:
-                            main = self.window()
-                            date_fmt = getattr(main, 'date_format', '%m-%d-%Y')
-                        except Exception:
-                            date_fmt = '%m-%d-%Y'
+        if first_rows:
+            self.results_table.resizeColumnsToContents()
+        if getattr(self, '_streaming', False):
+            self.status_label.setText(f"{len(self.current_data)} registros recebidos (carregando...)")
 
-                        try:
-                            import datetime as _d
-                            if isinstance(value, (_d.datetime, _d.date)):
-                                display = value.strftime(date_fmt)
-                            elif isinstance(value, str):
-                                # try to extract date part and reformat if possible
-                                raw = value.split('T')[0].split(' ')[0]
-                                # try parsing ISO-like YYYY-MM-DD
-                                try:
-                                    parts = raw.split('-')
-                                    if len(parts) == 3:
-                                        y, m, d = parts
-                                        dt = _d.date(int(y), int(m), int(d))
-                                        display = dt.strftime(date_fmt)
-                                    else:
-                                        display = raw
-                                except Exception:
-                                    display = raw
-                            else:
-                                display = str(value)
-                        except Exception:
-                            display = str(value)
+    def finish_stream(self, cancelled: bool = False):
+        """Finaliza o recebimento em lotes iniciado por `begin_stream`."""
+        self._streaming = False
+        self.results_table.resizeColumnsToContents()
+        if cancelled:
+            # consulta interrompida pelo usuário: o gráfico usa só as linhas parciais
+            self.source_query = None
+            self.status_label.setText(f"Consulta cancelada: {len(self.current_data)} registros parciais carregados")
+        else:
+            self.status_label.setText(f"{len(self.current_data)} registros carregados")
+
+    def is_streaming(self) -> bool:
+        return bool(getattr(self, '_streaming', False))
+
+    # ----------------------------------------------------------
+    # Prévia seguida da execução completa
+    # ----------------------------------------------------------
+    def show_preview(self, columns: list, rows: list):
+        """Exibe a prévia (estado parcial) enquanto a consulta completa executa."""
+        self.load_data(columns, rows)
+        self._preview_active = True
+        self.btn_stop_full.setVisible(True)
+        self.btn_stop_full.setEnabled(True)
+        self.status_label.setText(f"Prévia: {len(self.current_data)} registros (parcial) — executando a consulta completa...")
+
+    def update_full_progress(self, rows: int):
+        if self._preview_active:
+            self.status_label.setText(
+                f"Prévia: {len(self.current_data)} registros (parcial) — consulta completa: {rows} registros lidos...")
+
+    def complete_preview(self, result_set):
+        """Troca a prévia pelo resultado completo (estado completo)."""
+        self._preview_active = False
+        self.btn_stop_full.setVisible(False)
+        self.current_columns = list(result_set.columns)
+        self.results_table.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self._replace_result_set(result_set)
+        self.results_table.resizeColumnsToContents()
+        self.status_label.setText(f"{len(self.current_data)} registros carregados (completo)")
 
-                        align = Qt.AlignCenter
-                    else:
-                        display = str(value)
-                        align = Qt.AlignLeft | Qt.AlignVCenter
+    def end_preview(self, reason: str = ""):
+        """Mantém apenas a prévia: a execução completa foi interrompida."""
+        if not self._preview_active:
+            return
+        self._preview_active = False
+        self.btn_stop_full.setVisible(False)
+        self.source_query = None
+        suffix = f" — {reason}" if reason else ""
+        self.status_label.setText(f"Prévia: {len(self.current_data)} registros (parcial){suffix}")
+
+    def is_preview(self) -> bool:
+        return bool(self._preview_active)
+
+    # ----------------------------------------------------------
+    # Modo paginado no servidor
+    # ----------------------------------------------------------
+    def begin_paged(self, paginador):
+        """Exibe o resultado buscando as páginas no servidor sob demanda.
+
+        A primeira página é carregada imediatamente; as seguintes quando a
+        rolagem chega ao fim da tabela. O total de registros é contado em
+        segundo plano.
+        """
+        self._stop_paging()
+        self._preview_active = False
+        self.btn_stop_full.setVisible(False)
+        self._paginador = paginador
+        self._next_page = 0
+        self._paged_total = None
+        self.current_columns = []
+        self._replace_result_set(ResultSet([]))
+        self.status_label.setText("Carregando a primeira página...")
+        self._request_next_page()
+
+        generation = self._paging_generation
+        counter = _BackgroundCall(paginador.contar_total)
+        counter.done.connect(lambda total: self._on_total_counted(generation, total))
+        counter.failed.connect(lambda msg: self._on_total_counted(generation, None))
+        self._start_paging_thread(counter)
+
+    def is_paged(self) -> bool:
+        return self._paginador is not None
+
+    def _stop_paging(self):
+        # resultados de threads antigas são descartados pela geração
+        self._paging_generation += 1
+        self._paginador = None
+        self._page_loading = False
+
+    def _start_paging_thread(self, thread: QThread):
+        self._paging_threads.add(thread)
+        thread.finished.connect(lambda t=thread: self._paging_threads.discard(t))
+        thread.finished.connect(thread.deleteLater)
+        thread.start()
+
+    def _request_next_page(self):
+        pag = self._paginador
+        if pag is None or self._page_loading:
+            return
+        if pag.ultima_pagina is not None and self._next_page > pag.ultima_pagina:
+            return
+        self._page_loading = True
+        numero = self._next_page
+        generation = self._paging_generation
+        worker = _BackgroundCall(
+            lambda: pag.buscar_pagina(numero),
+            after=lambda: pag.prefetch(numero + 1),
+        )
+        worker.done.connect(lambda rows: self._on_page_loaded(generation, numero, rows))
+        worker.failed.connect(lambda msg: self._on_page_failed(generation, msg))
+        self._start_paging_thread(worker)
 
-                item = QTableWidgetItem(display)
-                item.setTextAlignment(align)
-                self.results_table.setItem(row_idx, col_idx, item)
+    def _on_page_loaded(self, generation: int, numero: int, rows: list):
+        if generation != self._paging_generation or self._paginador is None:
+            return
+        self._page_loading = False
+        if numero == 0:
+            self.begin_stream(list(self._paginador.colunas), _paged=True)
+            self._streaming = False
+        self.append_rows(rows)
+        self._next_page = numero + 1
+        self._update_paged_status()
+
+    def _on_page_failed(self, generation: int, msg: str):
+        if generation != self._paging_generation:
+            return
+        self._page_loading = False
+        self._paginador = None
+        self.status_label.setText(f"Erro ao carregar página: {msg}")
+        QMessageBox.critical(self, "Erro", f"Erro ao buscar página de resultados:\n{msg}")
 
-        self.results_table.resizeColumnsToContents()
-        self.status_label.setText(f"{len(data)} registros carregados")
+    def _on_total_counted(self, generation: int, total):
+        if generation != self._paging_generation:
+            return
+        self._paged_total = total
+        self._update_paged_status()
+
+    def _update_paged_status(self):
+        pag = self._paginador
+        if pag is None:
+            return
+        loaded = len(self.current_data)
+        # a última página pode já ser conhecida pelo pré-carregamento
+        done = pag.ultima_pagina is not None and self._next_page > pag.ultima_pagina
+        if self._paged_total is not None:
+            total = f" de {self._paged_total}"
+        elif done:
+            total = ""
+        else:
+            total = " (contando total...)"
+        if done:
+            self.status_label.setText(f"{loaded}{total} registros carregados")
+        else:
+            self.status_label.setText(f"{loaded}{total} registros carregados — role até o fim para carregar mais")
+
+    def _on_results_scrolled(self, value: int):
+        if self._paginador is None:
+            return
+        bar = self.results_table.verticalScrollBar()
+        if value >= bar.maximum() - bar.pageStep():
+            self._request_next_page()
+
+    @staticmethod
+    def _format_cell(value, ctype, decimals: int, date_fmt: str):
+        """Retorna (texto, alinhamento) de uma célula conforme o tipo da coluna."""
+        if value is None:
+            return "", Qt.AlignLeft | Qt.AlignVCenter
+        if ctype == 'numeric' and isinstance(value, Number):
+            try:
+                # format floats with configured decimals; ints stay as-is
+                if isinstance(value, float):
+                    display = f"{value:.{decimals}f}"
+                else:
+                    display = str(value)
+            except Exception:
+                display = str(value)
+            return display, Qt.AlignCenter
+        if ctype == 'date':
+            try:
+                if isinstance(value, (_dt.datetime, _dt.date)):
+                    display = value.strftime(date_fmt)
+                elif isinstance(value, str):
+                    # try to extract date part and reformat if possible
+                    raw = value.split('T')[0].split(' ')[0]
+                    # try parsing ISO-like YYYY-MM-DD
+                    try:
+                        parts = raw.split('-')
+                        if len(parts) == 3:
+                            y, m, d = parts
+                            display = _dt.date(int(y), int(m), int(d)).strftime(date_fmt)
+                        else:
+                            display = raw
+                    except Exception:
+                        display = raw
+                else:
+                    display = str(value)
+            except Exception:
+                display = str(value)
+            return display, Qt.AlignCenter
+        return str(value), Qt.AlignLeft | Qt.AlignVCenter
     
     def generate_insights(self):
         """Gera insights com IA"""
@@ -7300,47 +8671,129 @@ class ResultsTab(QWidget):
             QMessageBox.critical(self, "Erro", f"Erro ao gerar insights:\n{str(e)}")
     
     def generate_chart(self):
-        """Gera gráfico"""
+        """Gera gráfico.
+
+        Com a consulta de origem conhecida, a agregação é feita no servidor
+        (ver chart_generator.montar_sql_agregacao) e só a série agregada é
+        transferida; caso contrário — ou se a SQL agregada falhar — agrega as
+        linhas carregadas no cliente.
+        """
         if not self.current_data:
             QMessageBox.warning(self, "Aviso", "Nenhum dado carregado")
             return
         
         # Dialog para configurar gráfico
         dialog = ChartConfigDialog(self.current_columns, self)
-        if dialog.exec_() == QDialog.Accepted:
-            config = dialog.get_config()
-            
+        if dialog.exec_() != QDialog.Accepted:
+            return
+        config = dialog.get_config()
+
+        sql_agg = None
+        try:
+            if self.source_query is not None and self.chart_query_runner is not None:
+                sql_agg = montar_sql_agregacao(
+                    self.source_query[0], self.current_columns,
+                    config['x_column'], config['y_column'], config['aggregation'])
+        except Exception:
+            sql_agg = None
+        if sql_agg is None:
+            self._create_client_chart(config)
+            return
+        self._start_server_chart(config, sql_agg, self.source_query[1])
+
+    def _start_server_chart(self, config: dict, sql_agg: str, params):
+        """Executa a SQL agregada em segundo plano e desenha a série retornada."""
+        token = QueryCancelToken()
+        progress = QProgressDialog("Agregando dados no servidor...", "Cancelar", 0, 0, self)
+        progress.setWindowTitle("Gráfico")
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setAutoClose(False)
+        progress.setAutoReset(False)
+        progress.setMinimumDuration(0)
+        progress.canceled.connect(token.cancel)
+        runner = self.chart_query_runner
+        worker = _BackgroundCall(lambda: runner(sql_agg, params, token))
+
+        def _close_progress():
+            try:
+                progress.canceled.disconnect(token.cancel)
+            except Exception:
+                pass
+            progress.close()
+
+        def _on_done(rows):
+            _close_progress()
             try:
-                self.chart_figure = self.chart_gen.create_chart(
-                    self.current_data,
-                    self.current_columns,
+                if self.source_labeler:
+                    rows = self.source_labeler([config['x_column'], config['y_column']], rows)
+                self.chart_figure = self.chart_gen.create_chart_from_aggregate(
+                    rows,
                     config['x_column'],
                     config['y_column'],
                     config['aggregation'],
                     config['chart_type'],
                     config['title']
                 )
-                
-                # Mostra gráfico
-                from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
-                
-                chart_dialog = QDialog(self)
-                chart_dialog.setWindowTitle("Gráfico")
-                chart_dialog.setMinimumSize(800, 600)
-                
-                layout = QVBoxLayout()
-                canvas = FigureCanvasQTAgg(self.chart_figure)
-                layout.addWidget(canvas)
-                
-                btn_close = QPushButton("Fechar")
-                btn_close.clicked.connect(chart_dialog.accept)
-                layout.addWidget(btn_close)
-                
-                chart_dialog.setLayout(layout)
-                chart_dialog.exec_()
-                
             except Exception as e:
                 QMessageBox.critical(self, "Erro", f"Erro ao gerar gráfico:\n{str(e)}")
+                return
+            self._show_chart(self.chart_figure)
+
+        def _on_failed(msg):
+            _close_progress()
+            if token.cancelled:
+                return
+            # ex.: coluna Y não numérica para SUM no servidor; o cliente converte
+            logging.getLogger(__name__).info("Agregação do gráfico no servidor falhou (%s); agregando no cliente", msg)
+            self._create_client_chart(config)
+
+        worker.done.connect(_on_done)
+        worker.failed.connect(_on_failed)
+        self._chart_threads.add(worker)
+        worker.finished.connect(lambda t=worker: self._chart_threads.discard(t))
+        worker.finished.connect(worker.deleteLater)
+        progress.show()
+        worker.start()
+
+    def _create_client_chart(self, config: dict):
+        """Agrega as linhas carregadas no cliente (pandas) e mostra o gráfico."""
+        try:
+            self.chart_figure = self.chart_gen.create_chart(
+                self.current_data,
+                self.current_columns,
+                config['x_column'],
+                config['y_column'],
+                config['aggregation'],
+                config['chart_type'],
+                config['title']
+            )
+        except Exception as e:
+            QMessageBox.critical(self, "Erro", f"Erro ao gerar gráfico:\n{str(e)}")
+            return
+        self._show_chart(self.chart_figure)
+
+    def _show_chart(self, figure):
+        """Mostra a figura em um diálogo."""
+        try:
+            from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
+            
+            chart_dialog = QDialog(self)
+            chart_dialog.setWindowTitle("Gráfico")
+            chart_dialog.setMinimumSize(800, 600)
+            
+            layout = QVBoxLayout()
+            canvas = FigureCanvasQTAgg(figure)
+            layout.addWidget(canvas)
+            
+            btn_close = QPushButton("Fechar")
+            btn_close.clicked.connect(chart_dialog.accept)
+            layout.addWidget(btn_close)
+            
+            chart_dialog.setLayout(layout)
+            chart_dialog.exec_()
+            
+        except Exception as e:
+            QMessageBox.critical(self, "Erro", f"Erro ao gerar gráfico:\n{str(e)}")
     
     def export_pdf(self):
         """Exporta relatório em PDF"""
@@ -7640,45 +9093,49 @@ class MainWindow(QMainWindow):
         super().__init__()
         self.user_data = user_data
         self.db_config = db_config
-        self.conn = None
+        self.conn_pool = None
         self.setup_connection()
         self.setup_ui()
     
     def setup_connection(self):
-        """Estabelece conexão com o banco"""
+        """Estabelece o pool de conexões com o banco"""
         try:
-            self.conn = get_db_connection(self.db_config)
+            # metadados e consultas usam filas separadas do pool para que a
+            # navegação no catálogo não espere uma consulta longa terminar
+            self.conn_pool = create_connection_pool(self.db_config)
+            self.conn_pool.prefill()
             # Após estabelecer conexão, obtém informações do servidor SQL para exibir no rodapé
             try:
                 sql_info = None
-                cur = self.conn.cursor()
-                try:
-                    cur.execute(
-                        """
-                        SELECT
-                            SERVERPROPERTY('ProductVersion') AS Versao,
-                            SERVERPROPERTY('ProductLevel')   AS ServicePack,
-                            SERVERPROPERTY('Edition')        AS Edicao,
-                            @@SERVERNAME                     AS InstanceName,
-                            DB_NAME()                        AS DatabaseName
-                        """
-                    )
-                    row = cur.fetchone()
-                    if row:
-                        versao = row[0] or ''
-                        servicepack = row[1] or ''
-                        edicao = row[2] or ''
-                        instance = row[3] or ''
-                        dbname = row[4] or (self.db_config.db_name if getattr(self, 'db_config', None) else '')
-                        sql_info = (
-                            f"Microsoft SQL Server versão {versao} | Service Pack {servicepack} | "
-                            f"Versão {edicao} | Instância: {str(instance).upper()} | Banco de dados: {dbname}"
-                        )
-                finally:
+                with self.conn_pool.connection(LANE_METADATA) as conn:
+                    cur = conn.cursor()
                     try:
-                        cur.close()
-                    except Exception:
-                        pass
+                        cur.execute(
+                            """
+                            SELECT
+                                SERVERPROPERTY('ProductVersion') AS Versao,
+                                SERVERPROPERTY('ProductLevel')   AS ServicePack,
+                                SERVERPROPERTY('Edition')        AS Edicao,
+                                @@SERVERNAME                     AS InstanceName,
+                                DB_NAME()                        AS DatabaseName
+                            """
+                        )
+                        row = cur.fetchone()
+                        if row:
+                            versao = row[0] or ''
+                            servicepack = row[1] or ''
+                            edicao = row[2] or ''
+                            instance = row[3] or ''
+                            dbname = row[4] or (self.db_config.db_name if getattr(self, 'db_config', None) else '')
+                            sql_info = (
+                                f"Microsoft SQL Server versão {versao} | Service Pack {servicepack} | "
+                                f"Versão {edicao} | Instância: {str(instance).upper()} | Banco de dados: {dbname}"
+                            )
+                    finally:
+                        try:
+                            cur.close()
+                        except Exception:
+                            pass
                 # armazena para que o setup_ui possa usar ao criar o label
                 self._sql_info_str = sql_info
             except Exception:
@@ -7714,7 +9171,36 @@ class MainWindow(QMainWindow):
         tabs = QTabWidget()
         
         # Inicializa componentes
-        query_builder = QueryBuilder(self.conn)
+        result_cache = self._create_result_cache()
+        db_identity = f"{getattr(self.db_config, 'server_name', '')}/{getattr(self.db_config, 'db_name', '')}"
+        # o usuário logado faz parte da chave do cache de resultados (gravado em
+        # disco): em uma máquina compartilhada um usuário não recebe o resultado de outro
+        try:
+            usuario = self.user_data.get('CodUsuario', self.user_data.get('NomeUsuario', '')) if self.user_data else ''
+        except Exception:
+            usuario = ''
+        query_builder = QueryBuilder(
+            pool=self.conn_pool,
+            result_cache=result_cache,
+            db_identity=f"{db_identity}/{usuario}",
+            schema_cache_path=self._schema_cache_path(db_identity),
+            relationships_csv=self._relationships_csv_path(),
+            column_stats_cache=self._create_column_stats_cache(),
+            **self._result_spill_options()
+        )
+        self.query_builder = query_builder
+        # catálogo do esquema (tabelas, colunas, PKs e FKs): do arquivo local quando
+        # houver — a aba de consultas o revalida em segundo plano — ou carregado de
+        # uma vez no banco; sem ele, os metadados são consultados tabela a tabela
+        try:
+            catalogo = query_builder.carregar_catalogo_em_cache()
+            origem = 'cache local'
+            if catalogo is None:
+                catalogo = query_builder.carregar_catalogo()
+                origem = 'banco'
+            logging.info(f"Catálogo do esquema ({origem}): {len(catalogo)} tabelas, {catalogo.total_colunas()} colunas")
+        except Exception:
+            logging.exception("Erro carregando o catálogo do esquema")
         query_manager = QueryManager()
         ai_generator = AIInsightsGenerator()
         chart_generator = ChartGenerator()
@@ -7726,6 +9212,9 @@ class MainWindow(QMainWindow):
             self.session_logger = SessionLogger(self.user_data.get('NomeUsuario') if self.user_data else 'unknown', login_em)
         except Exception:
             self.session_logger = None
+        # acertos/faltas do cache de resultados vão para o log da sessão
+        if result_cache is not None:
+            result_cache.logger = self.session_logger
 
         # Aba 1: Query Builder
         self.query_tab = QueryBuilderTab(query_builder, query_manager, session_logger=self.session_logger)
@@ -7733,13 +9222,25 @@ class MainWindow(QMainWindow):
         
         # Aba 2: Resultados
         self.results_tab = ResultsTab(ai_generator, chart_generator, report_generator)
+        # resultados grandes vão para arquivos mapeados na pasta da sessão
+        self.results_tab.result_set_factory = query_builder.novo_result_set
+        # gráficos agregados no servidor sobre a consulta exibida
+        self.results_tab.chart_query_runner = self._run_chart_query
         tabs.addTab(self.results_tab, "Resultados e Análise")
 
         # Expor tabs como atributo para acesso robusto por callbacks externos
         self.tabs = tabs
         
         # Conecta sinais
+        self.query_tab.query_batch_received.connect(self.on_query_batch)
+        self.query_tab.query_cancelled.connect(self.on_query_cancelled)
+        self.query_tab.query_paged_started.connect(self.on_query_paged)
         self.query_tab.query_executed.connect(self.on_query_executed)
+        self.query_tab.query_preview_received.connect(self.on_query_preview)
+        self.query_tab.query_full_progress.connect(self.results_tab.update_full_progress)
+        self.query_tab.query_full_ready.connect(self.on_query_full_ready)
+        self.query_tab.query_full_stopped.connect(self.results_tab.end_preview)
+        self.results_tab.stop_full_requested.connect(self.query_tab.cancel_running_query)
         
         layout.addWidget(tabs)
         
@@ -7797,9 +9298,192 @@ class MainWindow(QMainWindow):
         about_action.triggered.connect(self.show_about)
         help_menu.addAction(about_action)
     
+    def _create_result_cache(self):
+        """Cria o cache de resultados conforme user_prefs.json.
+
+        Preferências: `result_cache_enabled`, `result_cache_ttl_seconds`,
+        `result_cache_memory_mb`, `result_cache_disk_mb` e `result_cache_dir`
+        (pasta para gravar em disco o que não couber na memória; "" desativa).
+        """
+        prefs = {}
+        try:
+            p = os.path.join(os.path.dirname(__file__), 'user_prefs.json')
+            if os.path.exists(p):
+                with open(p, 'r', encoding='utf-8') as f:
+                    prefs = json.load(f) or {}
+        except Exception:
+            prefs = {}
+        if not prefs.get('result_cache_enabled', True):
+            return None
+        try:
+            spill_dir = prefs.get('result_cache_dir')
+            if spill_dir is None:
+                spill_dir = os.path.join(os.path.dirname(__file__), 'Cache', 'resultados')
+            return ResultCache(
+                ttl_seconds=float(prefs.get('result_cache_ttl_seconds', DEFAULT_TTL_SECONDS)),
+                max_memory_mb=float(prefs.get('result_cache_memory_mb', DEFAULT_MEMORY_MB)),
+                spill_dir=spill_dir or None,
+                max_disk_mb=float(prefs.get('result_cache_disk_mb', DEFAULT_DISK_MB)),
+            )
+        except Exception:
+            logging.exception("Erro criando o cache de resultados")
+            return None
+
+    def _schema_cache_path(self, db_identity: str) -> Optional[str]:
+        """Arquivo local do catálogo do esquema deste servidor/banco (user_prefs.json).
+
+        Preferências: `schema_cache_enabled` e `schema_cache_dir` (padrão:
+        Cache/esquema ao lado do programa).
+        """
+        prefs = {}
+        try:
+            p = os.path.join(os.path.dirname(__file__), 'user_prefs.json')
+            if os.path.exists(p):
+                with open(p, 'r', encoding='utf-8') as f:
+                    prefs = json.load(f) or {}
+        except Exception:
+            prefs = {}
+        if not prefs.get('schema_cache_enabled', True):
+            return None
+        pasta = prefs.get('schema_cache_dir') or os.path.join(os.path.dirname(__file__), 'Cache', 'esquema')
+        return caminho_cache(pasta, db_identity)
+
+    def _relationships_csv_path(self) -> Optional[str]:
+        """Planilha de relacionamentos usada pelo grafo de JOINs antes do catálogo
+        (preferência `relationships_csv`; padrão: Planilhas/Identificar relacionamentos.csv).
+        """
+        prefs = {}
+        try:
+            p = os.path.join(os.path.dirname(__file__), 'user_prefs.json')
+            if os.path.exists(p):
+                with open(p, 'r', encoding='utf-8') as f:
+                    prefs = json.load(f) or {}
+        except Exception:
+            prefs = {}
+        caminho = prefs.get('relationships_csv') or os.path.join(
+            os.path.dirname(__file__), 'Planilhas', 'Identificar relacionamentos.csv')
+        return caminho if os.path.exists(caminho) else None
+
+    def _create_column_stats_cache(self) -> CacheEstatisticas:
+        """Cache das estatísticas de colunas dos filtros (user_prefs.json).
+
+        Preferências: `column_stats_ttl_seconds` e `column_stats_date_ttl_seconds`
+        (validade para colunas de data, cujo máximo muda a cada linha nova).
+        """
+        prefs = {}
+        try:
+            p = os.path.join(os.path.dirname(__file__), 'user_prefs.json')
+            if os.path.exists(p):
+                with open(p, 'r', encoding='utf-8') as f:
+                    prefs = json.load(f) or {}
+        except Exception:
+            prefs = {}
+        try:
+            return CacheEstatisticas(
+                ttl_seconds=float(prefs.get('column_stats_ttl_seconds', DEFAULT_STATS_TTL_SECONDS)),
+                ttl_datas_seconds=float(prefs.get('column_stats_date_ttl_seconds', DEFAULT_TTL_DATAS_SECONDS)),
+            )
+        except Exception:
+            return CacheEstatisticas()
+
+    def _result_spill_options(self) -> dict:
+        """Opções de gravação em disco dos resultados grandes (user_prefs.json).
+
+        Preferências: `result_spill_enabled`, `result_spill_threshold_mb`
+        (tamanho em memória a partir do qual o resultado vai para arquivos
+        mapeados) e `result_spill_dir` (pasta base; padrão: temporária do
+        sistema).
+        """
+        prefs = {}
+        try:
+            p = os.path.join(os.path.dirname(__file__), 'user_prefs.json')
+            if os.path.exists(p):
+                with open(p, 'r', encoding='utf-8') as f:
+                    prefs = json.load(f) or {}
+        except Exception:
+            prefs = {}
+        if not prefs.get('result_spill_enabled', True):
+            return {}
+        try:
+            return {
+                'spill_dir': prefs.get('result_spill_dir') or None,
+                'spill_threshold_mb': float(prefs.get('result_spill_threshold_mb', DEFAULT_SPILL_THRESHOLD_MB)),
+            }
+        except Exception:
+            return {}
+
+    def _sync_chart_source(self):
+        """Associa ao resultado exibido a consulta que o gerou (ver ResultsTab.generate_chart)."""
+        try:
+            self.results_tab.source_query = getattr(self.query_tab, 'last_executed_query', None)
+            self.results_tab.source_labeler = getattr(self.query_tab, 'last_period_labeler', None)
+        except Exception:
+            self.results_tab.source_query = None
+            self.results_tab.source_labeler = None
+
+    def _run_chart_query(self, sql: str, params, cancel_token) -> list:
+        """Executa a SQL agregada do gráfico (em thread) e devolve as linhas."""
+        rows = []
+        for _cols, lote in self.query_builder.execute_query_stream(
+                sql, params, timeout=self.query_tab._resolve_query_timeout(), cancel_token=cancel_token):
+            rows.extend(lote)
+        return rows
+
+    def on_query_batch(self, columns: list, rows: list, first: bool):
+        """Callback para cada lote recebido durante a execução da consulta.
+
+        O primeiro lote prepara a aba de resultados e a torna visível, para
+        que o usuário veja os registros enquanto o restante ainda chega.
+        """
+        if first:
+            self.results_tab.begin_stream(columns)
+            self._sync_chart_source()
+            try:
+                if hasattr(self, 'tabs') and self.tabs is not None:
+                    self.tabs.setCurrentIndex(1)
+            except Exception:
+                pass
+        self.results_tab.append_rows(rows)
+
+    def on_query_preview(self, columns: list, rows: list):
+        """Callback da prévia: exibida já, enquanto a consulta completa executa."""
+        self.results_tab.show_preview(columns, rows)
+        self._sync_chart_source()
+        try:
+            if hasattr(self, 'tabs') and self.tabs is not None:
+                self.tabs.setCurrentIndex(1)
+        except Exception:
+            pass
+        self.statusBar().showMessage("Prévia carregada — executando a consulta completa em segundo plano")
+
+    def on_query_full_ready(self, result_set):
+        """Callback do resultado completo após a prévia: substitui a prévia."""
+        self.results_tab.complete_preview(result_set)
+        self.statusBar().showMessage(f"Consulta completa: {len(result_set)} registros", 10000)
+
+    def on_query_paged(self, paginador):
+        """Callback da execução paginada: a aba de resultados busca as páginas."""
+        self.results_tab.begin_paged(paginador)
+        self._sync_chart_source()
+        try:
+            if hasattr(self, 'tabs') and self.tabs is not None:
+                self.tabs.setCurrentIndex(1)
+        except Exception:
+            pass
+
+    def on_query_cancelled(self, rows_received: int):
+        """Callback quando a consulta é cancelada pelo usuário."""
+        if self.results_tab.is_streaming():
+            self.results_tab.finish_stream(cancelled=True)
+
     def on_query_executed(self, columns: list, data: list):
         """Callback quando consulta é executada"""
-        self.results_tab.load_data(columns, data)
+        if self.results_tab.is_streaming():
+            # as linhas já foram exibidas lote a lote em `on_query_batch`
+            self.results_tab.finish_stream()
+        else:
+            self.results_tab.load_data(columns, data)
+            self._sync_chart_source()
         # Muda para aba de resultados - usa self.tabs quando disponível para evitar
         # acessar diretamente a estrutura do layout (que pode ter mudado).
         try:
@@ -7824,7 +9508,7 @@ class MainWindow(QMainWindow):
         try:
             if hasattr(self, 'query_tab') and getattr(self, 'query_tab') is not None:
                 try:
-                    self.query_tab.close_progress_and_notify_success(len(data) if data is not None else 0)
+                    self.query_tab.close_progress_and_notify_success(len(self.results_tab.current_data))
                 except Exception:
                     pass
         except Exception:
@@ -7869,10 +9553,30 @@ class MainWindow(QMainWindow):
     
     def closeEvent(self, event):
         """Evento de fechamento"""
-        # fecha conexão com o banco
+        # interrompe consulta em andamento antes de fechar a conexão
+        try:
+            if getattr(self, 'query_tab', None) is not None:
+                self.query_tab.cancel_running_query(wait_ms=5000)
+                self.query_tab._metadata_prefetcher.encerrar()
+                # estatísticas de filtros ainda sendo calculadas (consultas curtas)
+                for thread in list(self.query_tab._stats_threads):
+                    thread.wait(2000)
+        except Exception:
+            pass
+
+        # fecha o pool de conexões com o banco
+        try:
+            if self.conn_pool:
+                self.conn_pool.close()
+        except Exception:
+            pass
+
+        # remove os resultados gravados em disco durante a sessão
         try:
-            if self.conn:
-                self.conn.close()
+            if getattr(self, 'results_tab', None) is not None:
+                self.results_tab.current_data.close()
+            if getattr(self, 'query_builder', None) is not None:
+                self.query_builder.limpar_resultados_em_disco()
         except Exception:
             pass
 
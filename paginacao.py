@@ -0,0 +1,475 @@
+"""
+Paginação no servidor para CSData Studio
+
+Em vez de trazer o resultado inteiro para a aba de resultados, a consulta
+é executada página a página:
+
+- keyset (seek): ``WHERE [chave] > ? ORDER BY [chave]`` quando o resultado
+  contém uma coluna-chave única (ex.: `NumRegistro`, a `chave_primaria`
+  dos metadados), a consulta lê uma única tabela — com JOINs a chave de
+  uma tabela pode se repetir e o ``>`` pularia linhas entre as páginas —
+  e não pede outra ordem nem TOP; o custo de cada página independe da
+  posição;
+- OFFSET/FETCH: ``ORDER BY … OFFSET ? ROWS FETCH NEXT ? ROWS ONLY`` nos
+  demais casos. As páginas seguem o ORDER BY da consulta, completado pelas
+  demais colunas do resultado, para que a ordem seja total e nenhuma linha
+  se repita ou falte entre as páginas. Com TOP (ou OFFSET) o ORDER BY
+  original fica dentro da tabela derivada, onde escolhe as linhas do TOP.
+
+O total de registros é obtido à parte com ``COUNT_BIG(*)``.
+"""
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from tokenizador_sql import clausulas, nome_unico, tokenizar
+
+
+# tamanho padrão da página (sobrescrito por user_prefs.json)
+DEFAULT_PAGE_SIZE = 1000
+
+# linhas da prévia exibida antes da execução completa (ver montar_sql_previa)
+DEFAULT_PREVIEW_ROWS = 200
+
+MODO_KEYSET = "keyset"
+MODO_OFFSET = "offset"
+
+_RE_ORDER_BY = re.compile(r"\bORDER\s+BY\b", re.IGNORECASE)
+_RE_OFFSET = re.compile(r"\bOFFSET\b", re.IGNORECASE)
+_RE_SELECT_TOP = re.compile(r"^\s*SELECT\s+(?:(?:DISTINCT|ALL)\s+)?TOP\b", re.IGNORECASE)
+_RE_SELECT_INICIO = re.compile(r"^\s*SELECT\s+(?:(?:DISTINCT|ALL)\s+)?", re.IGNORECASE)
+
+
+def _mascarar_aninhados(sql: str) -> str:
+    """Substitui por espaços o conteúdo de literais, identificadores
+    delimitados, comentários e parênteses, preservando as posições.
+
+    Assim as buscas por palavras-chave enxergam apenas o nível externo.
+    """
+    out = list(sql)
+    n = len(sql)
+    i = 0
+    depth = 0
+    while i < n:
+        ch = sql[i]
+        if ch in ("'", '"', '['):
+            close = ']' if ch == '[' else ch
+            j = i + 1
+            while j < n:
+                if sql[j] == close:
+                    if j + 1 < n and sql[j + 1] == close:
+                        j += 2
+                        continue
+                    break
+                j += 1
+            for k in range(i, min(j + 1, n)):
+                out[k] = ' '
+            i = j + 1
+            continue
+        if sql.startswith('--', i):
+            j = sql.find('\n', i)
+            j = n if j == -1 else j
+            for k in range(i, j):
+                out[k] = ' '
+            i = j
+            continue
+        if sql.startswith('/*', i):
+            j = sql.find('*/', i + 2)
+            j = n if j == -1 else j + 2
+            for k in range(i, j):
+                out[k] = ' '
+            i = j
+            continue
+        if ch == '(':
+            depth += 1
+            out[i] = ' '
+        elif ch == ')':
+            depth = max(0, depth - 1)
+            out[i] = ' '
+        elif depth > 0:
+            out[i] = ' '
+        i += 1
+    return ''.join(out)
+
+
+def separar_order_by(sql: str) -> Tuple[str, Optional[str]]:
+    """Separa o ORDER BY final (nível externo) da consulta.
+
+    Retorna (sql_sem_order_by, clausula_order_by) — a cláusula sem o ';'
+    final, ou None quando não houver ORDER BY no nível externo.
+    """
+    texto = (sql or '').rstrip().rstrip(';').rstrip()
+    mascara = _mascarar_aninhados(texto)
+    ultimo = None
+    for m in _RE_ORDER_BY.finditer(mascara):
+        ultimo = m
+    if ultimo is None:
+        return texto, None
+    return texto[:ultimo.start()].rstrip(), texto[ultimo.start():].strip()
+
+
+def _exige_encapsular(sql: str) -> bool:
+    """True quando OFFSET/FETCH não pode ser anexado diretamente à consulta
+    (SELECT TOP ou OFFSET já presentes no nível externo)."""
+    mascara = _mascarar_aninhados(sql)
+    return bool(_RE_SELECT_TOP.search(mascara) or _RE_OFFSET.search(mascara))
+
+
+def _ident(nome: str) -> str:
+    return "[" + str(nome).replace("]", "]]") + "]"
+
+
+def itens_order_by(order_by: str) -> List[Tuple[str, bool]]:
+    """Itens de uma cláusula ORDER BY como (expressão, descendente).
+
+    Para no OFFSET/OPTION que possa seguir os itens.
+    """
+    tokens = tokenizar(order_by)
+    grupos: List[list] = [[]]
+    profundidade = 0
+    for tok in tokens[2:]:  # sem o próprio ORDER BY
+        if tok.texto == '(':
+            profundidade += 1
+        elif tok.texto == ')':
+            profundidade -= 1
+        elif profundidade == 0 and tok.palavra in ('OFFSET', 'OPTION'):
+            break
+        elif profundidade == 0 and tok.texto == ',':
+            grupos.append([])
+            continue
+        grupos[-1].append(tok)
+    itens = []
+    for grupo in grupos:
+        descendente = bool(grupo) and grupo[-1].palavra == 'DESC'
+        if grupo and grupo[-1].palavra in ('ASC', 'DESC'):
+            grupo = grupo[:-1]
+        if grupo:
+            itens.append((order_by[grupo[0].inicio:grupo[-1].fim], descendente))
+    return itens
+
+
+def _coluna_do_item(expressao: str, colunas: Sequence[str]) -> Optional[str]:
+    """Coluna do resultado a que o item do ORDER BY se refere: a posição
+    (ORDER BY 2) ou um nome simples, que o SQL Server resolve primeiro
+    pelos aliases da lista do SELECT. None para expressões e nomes
+    qualificados."""
+    if expressao.isdigit():
+        posicao = int(expressao)
+        return colunas[posicao - 1] if 1 <= posicao <= len(colunas) else None
+    partes = nome_unico(expressao)
+    if not partes or len(partes) != 1:
+        return None
+    por_nome = {str(c).lower(): c for c in colunas}
+    return por_nome.get(partes[0].lower())
+
+
+def _com_colunas_de_ordem(base: str, expressoes: Sequence[str]) -> Optional[str]:
+    """Acrescenta `expressao AS [_ordN]` ao fim da lista do SELECT externo.
+
+    None quando a consulta não tem um único SELECT no nível externo
+    (UNION, várias instruções...).
+    """
+    tokens = tokenizar(base)
+    partes = clausulas(tokens)
+    nomes = [c.nome for c in partes]
+    if any(c.instrucao for c in partes) or nomes.count('SELECT') != 1:
+        return None
+    if set(nomes) & {'UNION', 'UNION ALL', 'EXCEPT', 'INTERSECT', 'INTO'}:
+        return None
+    select = partes[nomes.index('SELECT')]
+    if select.fim <= select.ini:
+        return None
+    pos = tokens[select.fim - 1].fim
+    extras = "".join(f", {e} AS [_ord{i}]" for i, e in enumerate(expressoes, 1))
+    return f"{base[:pos]}{extras}{base[pos:]}"
+
+
+def montar_sql_offset(sql: str, colunas: Optional[Sequence[str]] = None) -> str:
+    """Consulta paginada por OFFSET/FETCH; parâmetros extras: (offset, tamanho).
+
+    Com as `colunas` do resultado, pagina sobre a consulta como tabela
+    derivada, ordenando pelos itens do ORDER BY original e, para desempate,
+    pelas demais colunas — ordem total, páginas estáveis. Itens que não são
+    colunas do resultado (expressões, colunas fora do SELECT) entram na
+    tabela derivada como `_ordN`, fora das colunas devolvidas. Com
+    TOP/OFFSET o ORDER BY original continua dentro da tabela derivada,
+    escolhendo as linhas.
+
+    Sem as colunas, mantém o ORDER BY original ou ordena pela primeira coluna.
+    """
+    base, order_by = separar_order_by(sql)
+    # TOP/OFFSET no nível externo: o ORDER BY decide quais linhas entram
+    encapsular = _exige_encapsular(sql)
+    if colunas:
+        ordem, extras, usadas = [], [], set()
+        for expressao, descendente in (itens_order_by(order_by) if order_by else []):
+            coluna = _coluna_do_item(expressao, colunas)
+            if coluna is None:
+                extras.append(expressao)
+                ordem.append(f"_pag.[_ord{len(extras)}]{' DESC' if descendente else ''}")
+            elif str(coluna).lower() not in usadas:
+                usadas.add(str(coluna).lower())
+                ordem.append(f"_pag.{_ident(coluna)}{' DESC' if descendente else ''}")
+        interna = _com_colunas_de_ordem(base, extras) if extras else base
+        if interna is None:
+            # ORDER BY de UNION com expressões: sem como reproduzir fora
+            ordem, extras, usadas, interna = [], [], set(), base
+        if ordem or order_by is None or encapsular:
+            ordem += [f"_pag.{_ident(c)}" for c in colunas if str(c).lower() not in usadas]
+            if encapsular and order_by:
+                interna = f"{interna}\n{order_by}"
+            lista = "*" if not extras else ", ".join(f"_pag.{_ident(c)}" for c in colunas)
+            return (
+                f"SELECT {lista} FROM (\n{interna}\n) AS _pag\nORDER BY {', '.join(ordem)}\n"
+                "OFFSET ? ROWS FETCH NEXT ? ROWS ONLY"
+            )
+    if encapsular:
+        interna = f"{base}\n{order_by}" if order_by else base
+        return f"SELECT * FROM (\n{interna}\n) AS _pag\nORDER BY 1\nOFFSET ? ROWS FETCH NEXT ? ROWS ONLY"
+    return f"{base}\n{order_by or 'ORDER BY 1'}\nOFFSET ? ROWS FETCH NEXT ? ROWS ONLY"
+
+
+def keyset_preserva_ordem(sql: str, chave: str, colunas: Sequence[str]) -> bool:
+    """True quando paginar por `chave` não muda o resultado pedido: sem
+    TOP/OFFSET e sem ORDER BY, ou com ORDER BY apenas pela chave, ascendente."""
+    if _exige_encapsular(sql):
+        return False
+    _, order_by = separar_order_by(sql)
+    if order_by is None:
+        return True
+    itens = itens_order_by(order_by)
+    if len(itens) != 1 or itens[0][1]:
+        return False
+    coluna = _coluna_do_item(itens[0][0], colunas)
+    return coluna is not None and str(coluna).lower() == str(chave).lower()
+
+
+def consulta_de_tabela_unica(sql: str) -> bool:
+    """True quando o nível externo da consulta lê uma única tabela: sem JOIN,
+    APPLY, lista de tabelas, tabela derivada, GROUP BY ou operadores de
+    conjunto. Só assim uma coluna única da tabela é única no resultado."""
+    tokens = tokenizar(sql)
+    partes = clausulas(tokens)
+    nomes = [c.nome for c in partes]
+    if any(c.instrucao for c in partes) or nomes.count('FROM') != 1:
+        return False
+    if not set(nomes) <= {'SELECT', 'FROM', 'WHERE', 'ORDER BY'}:
+        return False
+    origem = partes[nomes.index('FROM')]
+    profundidade = 0
+    for i in range(origem.ini, origem.fim):
+        tok = tokens[i]
+        if tok.texto == '(':
+            # só a dica de tabela: WITH (NOLOCK)
+            if profundidade == 0 and tokens[i - 1].palavra != 'WITH':
+                return False
+            profundidade += 1
+        elif tok.texto == ')':
+            profundidade -= 1
+        elif profundidade == 0 and (tok.texto == ',' or tok.palavra in ('JOIN', 'APPLY')):
+            return False
+    return True
+
+
+def montar_sql_keyset(sql: str, chave: str, primeira: bool) -> str:
+    """Consulta paginada por keyset sobre a coluna `chave` do resultado.
+
+    Parâmetros extras: (tamanho,) na primeira página e (tamanho, ultima_chave)
+    nas seguintes — o tamanho vem antes dos parâmetros da consulta original.
+    """
+    base, _ = separar_order_by(sql)
+    col = _ident(chave)
+    where = "" if primeira else f"\nWHERE _pag.{col} > ?"
+    return f"SELECT TOP (?) * FROM (\n{base}\n) AS _pag{where}\nORDER BY _pag.{col}"
+
+
+def montar_sql_previa(sql: str, linhas: int = DEFAULT_PREVIEW_ROWS) -> Optional[str]:
+    """Consulta de prévia: a mesma SQL limitada a `linhas` com ``TOP (n)``.
+
+    O TOP é inserido logo após ``SELECT [DISTINCT]``, mantendo ORDER BY e
+    parâmetros da consulta original. Retorna None quando a prévia não se
+    aplica: a consulta não começa com SELECT (ex.: CTE) ou já tem TOP/OFFSET.
+    """
+    try:
+        n = int(linhas)
+    except (TypeError, ValueError):
+        return None
+    if n <= 0:
+        return None
+    texto = (sql or '').rstrip().rstrip(';').rstrip()
+    mascara = _mascarar_aninhados(texto)
+    m = _RE_SELECT_INICIO.match(mascara)
+    if not m or _exige_encapsular(texto):
+        return None
+    return f"{texto[:m.end()]}TOP ({n}) {texto[m.end():]}"
+
+
+def montar_sql_contagem(sql: str) -> str:
+    """Consulta que conta as linhas do resultado (COUNT_BIG)."""
+    base, _ = separar_order_by(sql)
+    return f"SELECT COUNT_BIG(*) FROM (\n{base}\n) AS _cnt"
+
+
+def montar_sql_colunas(sql: str) -> str:
+    """Consulta sem linhas usada para descobrir as colunas do resultado."""
+    base, _ = separar_order_by(sql)
+    return f"SELECT TOP 0 * FROM (\n{base}\n) AS _pag"
+
+
+class PaginadorConsulta:
+    """Busca o resultado de uma consulta página a página.
+
+    `executar` recebe (sql, params, timeout) e retorna (colunas, linhas) —
+    normalmente `QueryBuilder.executar_sql`. `chaves_candidatas` lista
+    colunas únicas (ex.: chave primária) que habilitam o modo keyset quando
+    presentes no resultado de uma consulta de tabela única
+    (`consulta_de_tabela_unica`) cuja ordem o keyset preserva
+    (`keyset_preserva_ordem`).
+
+    As páginas já lidas ficam em um pequeno cache LRU; `prefetch` carrega a
+    próxima página antecipadamente. Quando `serializar` é True (conexão
+    única, sem pool) as idas ao banco, inclusive a contagem, são feitas uma
+    por vez.
+    """
+
+    def __init__(
+        self,
+        executar: Callable[[str, Optional[List], Optional[int]], Tuple[List[str], List[tuple]]],
+        sql: str,
+        params: Optional[Sequence] = None,
+        tamanho_pagina: int = DEFAULT_PAGE_SIZE,
+        chaves_candidatas: Optional[Sequence[str]] = None,
+        timeout: Optional[int] = None,
+        max_paginas_cache: int = 4,
+        serializar: bool = False,
+    ):
+        self._executar = executar
+        self.sql = sql
+        self.params = list(params or [])
+        self.tamanho_pagina = int(tamanho_pagina) if tamanho_pagina and int(tamanho_pagina) > 0 else DEFAULT_PAGE_SIZE
+        self.chaves_candidatas = [c for c in (chaves_candidatas or []) if c]
+        self.timeout = timeout
+        self.max_paginas_cache = max(1, int(max_paginas_cache))
+        self._db_lock = threading.Lock() if serializar else None
+        self._lock = threading.RLock()
+
+        self.modo: Optional[str] = None
+        self.chave: Optional[str] = None
+        self._indice_chave: Optional[int] = None
+        # colunas do ORDER BY das páginas no modo OFFSET (None = primeira coluna)
+        self._ordem: Optional[List[str]] = None
+        self.colunas: List[str] = []
+        self.total: Optional[int] = None
+        # última chave de cada página lida (modo keyset)
+        self._ultimas_chaves: Dict[int, object] = {}
+        self._paginas: "OrderedDict[int, List[tuple]]" = OrderedDict()
+        # índice da última página (conhecida quando uma página vem incompleta)
+        self.ultima_pagina: Optional[int] = None
+
+    # ----------------------------------------------------------
+    # API
+    # ----------------------------------------------------------
+    def buscar_pagina(self, numero: int) -> List[tuple]:
+        """Retorna as linhas da página `numero` (0 = primeira)."""
+        if numero < 0:
+            raise ValueError("Número de página inválido")
+        with self._lock:
+            if numero in self._paginas:
+                self._paginas.move_to_end(numero)
+                return self._paginas[numero]
+            if self.ultima_pagina is not None and numero > self.ultima_pagina:
+                return []
+            if self.modo is None:
+                self._definir_modo()
+            if self.modo == MODO_KEYSET:
+                # o keyset precisa da última chave da página anterior
+                for anterior in range(numero):
+                    if anterior not in self._ultimas_chaves and (self.ultima_pagina is None or anterior <= self.ultima_pagina):
+                        self._carregar(anterior)
+                if self.ultima_pagina is not None and numero > self.ultima_pagina:
+                    return []
+            return self._carregar(numero)
+
+    def prefetch(self, numero: int):
+        """Carrega a página antecipadamente (erros são ignorados)."""
+        try:
+            self.buscar_pagina(numero)
+        except Exception:
+            pass
+
+    def contar_total(self) -> Optional[int]:
+        """Executa o COUNT_BIG do resultado e guarda em `total`."""
+        sql = montar_sql_contagem(self.sql)
+        _, linhas = self._executar_no_banco(sql, list(self.params))
+        try:
+            self.total = int(linhas[0][0]) if linhas else 0
+        except Exception:
+            self.total = None
+        return self.total
+
+    @property
+    def terminou(self) -> bool:
+        return self.ultima_pagina is not None
+
+    # ----------------------------------------------------------
+    # Auxiliares
+    # ----------------------------------------------------------
+    def _definir_modo(self):
+        """Escolhe keyset quando uma chave candidata existe no resultado; no
+        OFFSET guarda as colunas que dão a ordem total das páginas."""
+        self.modo = MODO_OFFSET
+        try:
+            colunas, _ = self._executar_no_banco(montar_sql_colunas(self.sql), list(self.params))
+        except Exception:
+            # ex.: colunas com nomes repetidos não podem ser tabela derivada
+            return
+        self._ordem = list(colunas)
+        if not self.chaves_candidatas or not consulta_de_tabela_unica(self.sql):
+            return
+        por_nome = {str(c).lower(): i for i, c in enumerate(colunas)}
+        for chave in self.chaves_candidatas:
+            idx = por_nome.get(str(chave).lower())
+            if idx is not None and keyset_preserva_ordem(self.sql, colunas[idx], colunas):
+                self.modo = MODO_KEYSET
+                self.chave = colunas[idx]
+                self._indice_chave = idx
+                self.colunas = list(colunas)
+                return
+
+    def _carregar(self, numero: int) -> List[tuple]:
+        if self.modo == MODO_KEYSET:
+            primeira = numero == 0
+            sql = montar_sql_keyset(self.sql, self.chave, primeira)
+            params = [self.tamanho_pagina] + list(self.params)
+            if not primeira:
+                params.append(self._ultimas_chaves[numero - 1])
+        else:
+            sql = montar_sql_offset(self.sql, self._ordem)
+            params = list(self.params) + [numero * self.tamanho_pagina, self.tamanho_pagina]
+        try:
+            colunas, linhas = self._executar_no_banco(sql, params)
+        except Exception:
+            if self.modo == MODO_KEYSET or not self._ordem or numero != 0:
+                raise
+            # ex.: colunas text/ntext/image não podem ser ordenadas; volta à
+            # ordem pela primeira coluna
+            self._ordem = None
+            return self._carregar(numero)
+        linhas = list(linhas)
+        if colunas:
+            self.colunas = list(colunas)
+        if self.modo == MODO_KEYSET and linhas:
+            self._ultimas_chaves[numero] = linhas[-1][self._indice_chave]
+        if len(linhas) < self.tamanho_pagina:
+            self.ultima_pagina = numero
+        self._paginas[numero] = linhas
+        while len(self._paginas) > self.max_paginas_cache:
+            self._paginas.popitem(last=False)
+        return linhas
+
+    def _executar_no_banco(self, sql: str, params: List):
+        if self._db_lock is None:
+            return self._executar(sql, params or None, self.timeout)
+        with self._db_lock:
+            return self._executar(sql, params or None, self.timeout)
@@ -0,0 +1,328 @@
+"""
+Execução particionada por intervalos de datas para CSData Studio
+
+Agrupamentos como `default` (vendas) agrupam por mês sobre `DataMovimento`;
+um filtro de um ano inteiro vira uma única varredura serial no servidor.
+No modo particionado o filtro de datas é dividido em N intervalos (por mês
+ou por um número de dias), cada intervalo é executado em paralelo em uma
+conexão do pool e os agregados parciais são combinados no cliente:
+
+- SUM e COUNT são somados; MIN e MAX comparados;
+- AVG é reconstruído a partir de SUM e COUNT, que as partições retornam
+  no lugar da média (ver `gerar_sql_por_agrupamento(metricas_parciais=True)`).
+
+Os intervalos cobrem exatamente o BETWEEN original: ``>= início AND < fim``
+em cada partição; a última termina em ``< fim + 1 dia`` quando o fim é só
+uma data (ou ``<= fim`` quando traz hora).
+
+`intervalo_semiaberto` reescreve ``campo BETWEEN início AND fim`` com datas
+sem hora como ``campo >= início AND campo < fim + 1 dia``: em colunas
+datetime o BETWEEN deixava de fora as horas do último dia, e a forma
+semiaberta coincide com os limites dos períodos (ver periodos.py).
+"""
+import datetime as _dt
+import re
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import List, Optional, Sequence, Tuple, Union
+
+from tokenizador_sql import nome_unico
+
+
+# limite padrão de partições executadas ao mesmo tempo (protege o servidor)
+DEFAULT_MAX_CONCORRENCIA = 4
+
+# tamanho da partição: um mês de calendário (ou um número de dias)
+TAMANHO_MES = "mes"
+
+# sufixo da coluna de contagem que acompanha cada AVG nas partições
+SUFIXO_CONTAGEM = "__n"
+
+# funções de agregação que podem ser combinadas entre partições
+FUNCOES_COMBINAVEIS = ("SUM", "COUNT", "COUNT_BIG", "MIN", "MAX", "AVG")
+
+_RE_BETWEEN_PARAM = re.compile(r"^\s*(?P<campo>.+?)\s+BETWEEN\s+\?\s+AND\s+\?\s*$", re.IGNORECASE)
+_RE_BETWEEN_LITERAL = re.compile(
+    r"^\s*(?P<campo>.+?)\s+BETWEEN\s+'(?P<inicio>[^']+)'\s+AND\s+'(?P<fim>[^']+)'\s*$",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class MetricaParticionada:
+    label: str
+    funcao: str
+
+
+@dataclass
+class PlanoParticionado:
+    """Consultas de cada partição e o necessário para combinar os resultados."""
+    particoes: List[Tuple[str, List]]
+    n_dimensoes: int
+    metricas: List[MetricaParticionada]
+    intervalos: List[Tuple[object, object]] = field(default_factory=list)
+    # SQL e parâmetros da consulta não particionada equivalente
+    sql_base: str = ""
+    params_base: List = field(default_factory=list)
+
+
+def para_data(valor) -> Optional[Union[_dt.date, _dt.datetime]]:
+    """Converte date/datetime ou texto ISO ('YYYY-MM-DD[ HH:MM[:SS]]') em data."""
+    if isinstance(valor, (_dt.date, _dt.datetime)):
+        return valor
+    if not isinstance(valor, str):
+        return None
+    texto = valor.strip()
+    try:
+        if len(texto) == 10:
+            return _dt.date.fromisoformat(texto)
+        return _dt.datetime.fromisoformat(texto.replace('T', ' '))
+    except ValueError:
+        return None
+
+
+def _mesmo_formato(valor: Union[_dt.date, _dt.datetime], original):
+    """Devolve `valor` no formato do parâmetro original (texto ISO ou objeto)."""
+    if isinstance(original, str):
+        if isinstance(valor, _dt.datetime):
+            return valor.isoformat(sep=' ') if len(original.strip()) > 10 else valor.date().isoformat()
+        return valor.isoformat()
+    if isinstance(original, _dt.datetime) and not isinstance(valor, _dt.datetime):
+        return _dt.datetime(valor.year, valor.month, valor.day)
+    return valor
+
+
+def _inicio_do_proximo_mes(d):
+    ano, mes = (d.year + 1, 1) if d.month == 12 else (d.year, d.month + 1)
+    if isinstance(d, _dt.datetime):
+        return _dt.datetime(ano, mes, 1)
+    return _dt.date(ano, mes, 1)
+
+
+def gerar_intervalos(inicio, fim, tamanho: Union[str, int] = TAMANHO_MES) -> List[Tuple[object, object]]:
+    """Divide [inicio, fim] em intervalos [a, b) — o último termina em `fim`.
+
+    `tamanho` é TAMANHO_MES (meses de calendário) ou um número de dias.
+    """
+    if fim < inicio:
+        return []
+    limites = [inicio]
+    atual = inicio
+    while True:
+        if tamanho == TAMANHO_MES:
+            proximo = _inicio_do_proximo_mes(atual)
+        else:
+            dias = int(tamanho)
+            if dias <= 0:
+                raise ValueError("Tamanho de partição inválido")
+            proximo = atual + _dt.timedelta(days=dias)
+        if proximo > fim:
+            break
+        limites.append(proximo)
+        atual = proximo
+    return list(zip(limites, limites[1:] + [fim]))
+
+
+def _nome_coluna(expr: str) -> str:
+    return expr.strip().split('.')[-1].strip('[]').lower()
+
+
+def _campo_between(m) -> Optional[str]:
+    """Campo do BETWEEN casado por `m`, somente quando é um único nome de coluna.
+
+    O grupo `campo` das expressões regulares aceita qualquer texto: em
+    ``a = 1 OR Data BETWEEN ...`` ou ``Data NOT BETWEEN ...`` reescrever o
+    filtro mudaria o resultado (ou geraria SQL inválido).
+    """
+    campo = m.group('campo').strip()
+    return campo if nome_unico(campo) is not None else None
+
+
+def _mesmo_tipo(inicio, fim):
+    """Limites comparáveis: com um deles datetime, a data sem hora vira
+    meia-noite (o que o SQL Server faz ao comparar com uma coluna datetime)."""
+    if isinstance(inicio, _dt.datetime) and _somente_data(fim):
+        fim = _dt.datetime(fim.year, fim.month, fim.day)
+    elif isinstance(fim, _dt.datetime) and _somente_data(inicio):
+        inicio = _dt.datetime(inicio.year, inicio.month, inicio.day)
+    return inicio, fim
+
+
+def localizar_filtro_data(filtros: Sequence, campos: Sequence[str]):
+    """Encontra o filtro BETWEEN de datas a ser particionado.
+
+    Procura primeiro nos `campos` indicados (ex.: o campo da dimensão
+    `mes_ano`) e depois em qualquer BETWEEN com datas. Retorna
+    (índice, expressão do campo, início, fim, parâmetros originais) ou None.
+    """
+    achados = []
+    for i, f in enumerate(filtros or []):
+        if isinstance(f, (list, tuple)) and len(f) >= 1:
+            expr = str(f[0])
+            params = list(f[1]) if len(f) > 1 and isinstance(f[1], (list, tuple)) else []
+        else:
+            expr = str(f)
+            params = []
+        m = _RE_BETWEEN_PARAM.match(expr)
+        if m and len(params) == 2:
+            inicio, fim = para_data(params[0]), para_data(params[1])
+            originais = params
+        else:
+            m = _RE_BETWEEN_LITERAL.match(expr)
+            if not m:
+                continue
+            inicio, fim = para_data(m.group('inicio')), para_data(m.group('fim'))
+            originais = [m.group('inicio'), m.group('fim')]
+        campo = _campo_between(m)
+        if inicio is None or fim is None or campo is None:
+            continue
+        inicio, fim = _mesmo_tipo(inicio, fim)
+        achados.append((i, campo, inicio, fim, originais))
+    if not achados:
+        return None
+    preferidos = {c.split('.')[-1].strip('[]').lower() for c in campos if c}
+    for achado in achados:
+        if _nome_coluna(achado[1]) in preferidos:
+            return achado
+    return achados[0]
+
+
+def _somente_data(valor) -> bool:
+    return isinstance(valor, _dt.date) and not isinstance(valor, _dt.datetime)
+
+
+def filtro_da_particao(campo: str, a, b, ultima: bool, originais: Sequence) -> Tuple[str, List]:
+    """Filtro (expr, params) de uma partição: [a, b); na última o fim é
+    incluído (o dia inteiro, quando `b` é só uma data)."""
+    op = "<"
+    if ultima:
+        if _somente_data(b):
+            b = b + _dt.timedelta(days=1)
+        else:
+            op = "<="
+    return (
+        f"{campo} >= ? AND {campo} {op} ?",
+        [_mesmo_formato(a, originais[0]), _mesmo_formato(b, originais[1])],
+    )
+
+
+def intervalo_semiaberto(filtro):
+    """`campo BETWEEN início AND fim` com datas sem hora -> `>= início AND < fim + 1 dia`.
+
+    Aceita a forma parametrizada (expr, [início, fim]) e a com literais,
+    com um único nome de coluna antes do BETWEEN; outros filtros (NOT
+    BETWEEN, condições com AND/OR, expressões) são devolvidos sem alteração.
+    """
+    if isinstance(filtro, (list, tuple)) and len(filtro) >= 1:
+        expr = str(filtro[0])
+        params = list(filtro[1]) if len(filtro) > 1 and isinstance(filtro[1], (list, tuple)) else None
+    else:
+        expr, params = str(filtro), None
+    m = _RE_BETWEEN_PARAM.match(expr)
+    if m and params is not None and len(params) == 2:
+        originais = params
+    else:
+        m = _RE_BETWEEN_LITERAL.match(expr)
+        if not m:
+            return filtro
+        originais = [m.group('inicio'), m.group('fim')]
+    inicio, fim = para_data(originais[0]), para_data(originais[1])
+    campo = _campo_between(m)
+    if campo is None or not (_somente_data(inicio) and _somente_data(fim)):
+        return filtro
+    limites = [_mesmo_formato(inicio, originais[0]), _mesmo_formato(fim + _dt.timedelta(days=1), originais[1])]
+    if originais is params:
+        return (f"{campo} >= ? AND {campo} < ?", limites)
+    novo = f"{campo} >= '{limites[0]}' AND {campo} < '{limites[1]}'"
+    return (novo, params) if isinstance(filtro, (list, tuple)) else novo
+
+
+def _somar(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    if (isinstance(a, Decimal) and isinstance(b, float)) or (isinstance(a, float) and isinstance(b, Decimal)):
+        return float(a) + float(b)
+    return a + b
+
+
+def _minimo(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return b if b < a else a
+
+
+def _maximo(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return b if b > a else a
+
+
+def _media(soma, contagem):
+    if soma is None or not contagem:
+        return None
+    if isinstance(soma, int):
+        # AVG de inteiros no SQL Server trunca em direção a zero
+        return int(soma / contagem)
+    return soma / contagem
+
+
+def combinar_parciais(plano: PlanoParticionado, resultados: Sequence[Tuple[List[str], List[tuple]]]) -> Tuple[List[str], List[tuple]]:
+    """Combina os resultados das partições em um único (colunas, linhas).
+
+    As linhas saem na ordem em que cada grupo apareceu pela primeira vez,
+    percorrendo as partições em ordem cronológica.
+    """
+    nd = plano.n_dimensoes
+    colunas_parciais = []
+    for cols, _ in resultados:
+        if cols:
+            colunas_parciais = list(cols)
+            break
+    colunas = colunas_parciais[:nd] + [m.label for m in plano.metricas]
+
+    grupos: "OrderedDict[tuple, list]" = OrderedDict()
+    for _, linhas in resultados:
+        for linha in linhas:
+            chave = tuple(linha[:nd])
+            acc = grupos.get(chave)
+            pos = nd
+            if acc is None:
+                acc = []
+                for m in plano.metricas:
+                    if m.funcao == "AVG":
+                        acc.append([linha[pos], linha[pos + 1]])
+                        pos += 2
+                    else:
+                        acc.append(linha[pos])
+                        pos += 1
+                grupos[chave] = acc
+                continue
+            for k, m in enumerate(plano.metricas):
+                if m.funcao == "AVG":
+                    acc[k][0] = _somar(acc[k][0], linha[pos])
+                    acc[k][1] = _somar(acc[k][1], linha[pos + 1])
+                    pos += 2
+                    continue
+                valor = linha[pos]
+                pos += 1
+                if m.funcao in ("SUM", "COUNT", "COUNT_BIG"):
+                    acc[k] = _somar(acc[k], valor)
+                elif m.funcao == "MIN":
+                    acc[k] = _minimo(acc[k], valor)
+                else:
+                    acc[k] = _maximo(acc[k], valor)
+
+    linhas_finais = []
+    for chave, acc in grupos.items():
+        valores = []
+        for k, m in enumerate(plano.metricas):
+            valores.append(_media(acc[k][0], acc[k][1]) if m.funcao == "AVG" else acc[k])
+        linhas_finais.append(chave + tuple(valores))
+    return colunas, linhas_finais
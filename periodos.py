@@ -0,0 +1,150 @@
+"""
+Períodos de datas das dimensões de agrupamento para CSData Studio
+
+A dimensão `mes_ano` era gerada como FORMAT(campo, 'yyyy-MM'): FORMAT é
+executado pelo CLR do .NET linha a linha e devolve texto, o que encarece
+o GROUP BY justamente nas consultas de maior volume. Aqui cada período é
+uma expressão com funções nativas que devolve a data de início do período
+(YEAR/MONTH/DATEFROMPARTS/DATEADD), e o agrupamento é feito sobre essa
+data:
+
+- ``dia``: ``CAST(campo AS date)``;
+- ``semana``: a segunda-feira da semana (1900-01-01 foi uma segunda);
+- ``mes_ano``: ``DATEFROMPARTS(YEAR(campo), MONTH(campo), 1)``;
+- ``trimestre``: o primeiro dia do trimestre;
+- ``ano``: ``DATEFROMPARTS(YEAR(campo), 1, 1)``.
+
+O rótulo ('2025-03', '2025-W10', '2025-T1', '2025') é montado no cliente,
+depois da agregação, apenas sobre as linhas do resultado
+(`RotuladorPeriodos`). O dia permanece uma data e é exibido no formato de
+data das preferências.
+"""
+import datetime as _dt
+from typing import Callable, Dict, List, Optional, Sequence
+
+PERIODO_DIA = "dia"
+PERIODO_SEMANA = "semana"
+PERIODO_MES = "mes_ano"
+PERIODO_TRIMESTRE = "trimestre"
+PERIODO_ANO = "ano"
+
+# "tipo" da dimensão no agrupamento -> nome da coluna no resultado
+COLUNAS_PERIODO = {
+    PERIODO_DIA: "Dia",
+    PERIODO_SEMANA: "Semana",
+    PERIODO_MES: "MesAno",
+    PERIODO_TRIMESTRE: "Trimestre",
+    PERIODO_ANO: "Ano",
+}
+TIPOS_PERIODO = tuple(COLUNAS_PERIODO)
+
+# {c} = campo já qualificado; todas devolvem a data de início do período
+_EXPRESSOES = {
+    PERIODO_DIA: "CAST({c} AS date)",
+    # dias desde uma segunda-feira (1900-01-01) módulo 7 = dias desde a segunda
+    PERIODO_SEMANA: "DATEADD(DAY, -(DATEDIFF(DAY, '19000101', {c}) % 7), CAST({c} AS date))",
+    PERIODO_MES: "DATEFROMPARTS(YEAR({c}), MONTH({c}), 1)",
+    PERIODO_TRIMESTRE: "DATEFROMPARTS(YEAR({c}), (MONTH({c}) - 1) / 3 * 3 + 1, 1)",
+    PERIODO_ANO: "DATEFROMPARTS(YEAR({c}), 1, 1)",
+}
+
+
+def _rotulo_semana(d: _dt.date) -> str:
+    ano, semana, _ = d.isocalendar()
+    return f"{ano}-W{semana:02d}"
+
+
+# rótulos gerados no cliente; o dia não tem rótulo (continua sendo data)
+_ROTULOS: Dict[str, Callable[[_dt.date], str]] = {
+    PERIODO_SEMANA: _rotulo_semana,
+    PERIODO_MES: lambda d: f"{d.year}-{d.month:02d}",
+    PERIODO_TRIMESTRE: lambda d: f"{d.year}-T{(d.month - 1) // 3 + 1}",
+    PERIODO_ANO: lambda d: f"{d.year}",
+}
+
+
+def expressao_periodo(campo: str, tipo: str) -> str:
+    """Expressão SQL com a data de início do período de `campo`."""
+    try:
+        return _EXPRESSOES[tipo].format(c=campo)
+    except KeyError:
+        raise ValueError(f"Período de data inválido: {tipo}") from None
+
+
+def inicio_periodo(valor, tipo: str) -> Optional[_dt.date]:
+    """Data de início do período de `valor` (date, datetime ou texto ISO)."""
+    d = _para_date(valor)
+    if d is None:
+        return None
+    if tipo == PERIODO_SEMANA:
+        return d - _dt.timedelta(days=d.weekday())
+    if tipo == PERIODO_MES:
+        return d.replace(day=1)
+    if tipo == PERIODO_TRIMESTRE:
+        return _dt.date(d.year, (d.month - 1) // 3 * 3 + 1, 1)
+    if tipo == PERIODO_ANO:
+        return _dt.date(d.year, 1, 1)
+    return d
+
+
+def rotulo_periodo(valor, tipo: str):
+    """Rótulo do período que começa em `valor`; sem rótulo, o próprio valor."""
+    formatar = _ROTULOS.get(tipo)
+    if formatar is None or valor is None:
+        return valor
+    d = _para_date(valor)
+    if d is None:
+        return valor
+    return formatar(d)
+
+
+def _para_date(valor) -> Optional[_dt.date]:
+    if isinstance(valor, _dt.datetime):
+        return valor.date()
+    if isinstance(valor, _dt.date):
+        return valor
+    if isinstance(valor, str):
+        try:
+            return _dt.date.fromisoformat(valor.strip()[:10])
+        except ValueError:
+            return None
+    return None
+
+
+def periodos_do_agrupamento(agrupamento: Optional[dict]) -> Dict[str, str]:
+    """Colunas de período do resultado do agrupamento -> tipo do período."""
+    periodos = {}
+    for dim in (agrupamento or {}).get("dimensoes", []):
+        if isinstance(dim, dict) and dim.get("tipo") in COLUNAS_PERIODO:
+            periodos[COLUNAS_PERIODO[dim["tipo"]]] = dim["tipo"]
+    return periodos
+
+
+class RotuladorPeriodos:
+    """Troca, nas linhas já agregadas, o início de cada período pelo rótulo.
+
+    Chamado com (colunas, linhas); as colunas são localizadas pelo nome
+    (sem diferenciar maiúsculas). Sem coluna com rótulo, as linhas são
+    devolvidas sem cópia.
+    """
+
+    def __init__(self, periodos: Optional[Dict[str, str]] = None):
+        self.periodos = {str(c).lower(): t for c, t in (periodos or {}).items() if t in _ROTULOS}
+
+    def __bool__(self) -> bool:
+        return bool(self.periodos)
+
+    def __call__(self, colunas: Sequence[str], linhas: List) -> List:
+        if not self.periodos or not linhas:
+            return linhas
+        indices = [(i, self.periodos[str(c).lower()]) for i, c in enumerate(colunas or [])
+                   if str(c).lower() in self.periodos]
+        if not indices:
+            return linhas
+        rotuladas = []
+        for linha in linhas:
+            valores = list(linha)
+            for i, tipo in indices:
+                valores[i] = rotulo_periodo(valores[i], tipo)
+            rotuladas.append(tuple(valores))
+        return rotuladas
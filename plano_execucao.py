@@ -0,0 +1,212 @@
+"""
+Estimativa prévia do custo de uma consulta para CSData Studio
+
+Antes de executar, a consulta é compilada pelo SQL Server com
+`SET SHOWPLAN_XML ON` — o servidor devolve o plano estimado sem executar a
+instrução. Do XML são extraídos:
+
+- linhas estimadas (StatementEstRows) e custo estimado (StatementSubTreeCost);
+- sugestões de índices ausentes (MissingIndexGroup), com o impacto estimado;
+- avisos do otimizador (ex.: NoJoinPredicate, PlanAffectingConvert).
+
+A análise do XML (`analisar_showplan`) não depende de conexão e é testada
+a partir de planos gravados em arquivo. As estimativas ficam em cache pela
+impressão digital da SQL (`result_cache.gerar_chave`), para que execuções
+repetidas da mesma consulta não paguem a compilação novamente.
+"""
+import re
+import threading
+import time
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Tuple
+
+
+# valores padrão (sobrescritos por user_prefs.json na MainWindow)
+DEFAULT_CONFIRMAR_LINHAS = 1_000_000
+DEFAULT_CONFIRMAR_CUSTO = 100.0
+DEFAULT_TTL_SECONDS = 600
+DEFAULT_MAX_ENTRADAS = 200
+
+# resultado da avaliação da estimativa contra os limites
+NIVEL_OK = "ok"
+NIVEL_CONFIRMAR = "confirmar"
+NIVEL_BLOQUEAR = "bloquear"
+
+_NS = "{http://schemas.microsoft.com/sqlserver/2004/07/showplan}"
+_RE_DECLARACAO = re.compile(r"^\ufeff?\s*<\?xml[^>]*\?>")
+
+
+@dataclass
+class IndiceAusente:
+    tabela: str
+    impacto: float
+    igualdade: List[str] = field(default_factory=list)
+    desigualdade: List[str] = field(default_factory=list)
+    incluidas: List[str] = field(default_factory=list)
+
+    def sugestao_sql(self) -> str:
+        """CREATE INDEX sugerido (nome genérico; revisar antes de aplicar)."""
+        chave = ", ".join(self.igualdade + self.desigualdade)
+        sql = f"CREATE NONCLUSTERED INDEX [IX_sugerido] ON {self.tabela} ({chave})"
+        if self.incluidas:
+            sql += f" INCLUDE ({', '.join(self.incluidas)})"
+        return sql
+
+
+@dataclass
+class EstimativaPlano:
+    linhas_estimadas: float
+    custo_estimado: float
+    indices_ausentes: List[IndiceAusente] = field(default_factory=list)
+    avisos: List[str] = field(default_factory=list)
+
+
+@dataclass
+class LimitesEstimativa:
+    """Limites da estimativa; 0 ou None desativa o limite."""
+    confirmar_linhas: Optional[float] = DEFAULT_CONFIRMAR_LINHAS
+    confirmar_custo: Optional[float] = DEFAULT_CONFIRMAR_CUSTO
+    bloquear_linhas: Optional[float] = None
+    bloquear_custo: Optional[float] = None
+
+
+def _float(valor, padrao: float = 0.0) -> float:
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        return padrao
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit('}', 1)[-1]
+
+
+def analisar_showplan(xml_texto) -> EstimativaPlano:
+    """Extrai a estimativa de um (ou mais) documentos ShowPlanXML.
+
+    Com várias instruções no lote, os custos são somados e as linhas
+    estimadas são as do último SELECT. Levanta ValueError para XML inválido.
+    """
+    documentos = xml_texto if isinstance(xml_texto, (list, tuple)) else [xml_texto]
+    custo = 0.0
+    linhas = None
+    ultimo = 0.0
+    indices: List[IndiceAusente] = []
+    avisos: List[str] = []
+    for doc in documentos:
+        if isinstance(doc, bytes):
+            doc = doc.decode('utf-8', errors='replace')
+        # planos salvos pelo SSMS (.sqlplan) declaram encoding="utf-16", que não
+        # vale para o texto já decodificado
+        doc = _RE_DECLARACAO.sub('', doc, count=1)
+        try:
+            raiz = ET.fromstring(doc)
+        except ET.ParseError as e:
+            raise ValueError(f"Plano de execução inválido: {e}") from e
+        for stmt in raiz.iter(f"{_NS}StmtSimple"):
+            custo += _float(stmt.get("StatementSubTreeCost"))
+            est = _float(stmt.get("StatementEstRows"))
+            ultimo = est
+            if (stmt.get("StatementType") or "").upper().startswith("SELECT"):
+                linhas = est
+            for grupo in stmt.iter(f"{_NS}MissingIndexGroup"):
+                impacto = _float(grupo.get("Impact"))
+                for mi in grupo.iter(f"{_NS}MissingIndex"):
+                    tabela = ".".join(p for p in (mi.get("Schema"), mi.get("Table")) if p)
+                    indice = IndiceAusente(tabela=tabela, impacto=impacto)
+                    for cg in mi.iter(f"{_NS}ColumnGroup"):
+                        nomes = [c.get("Name") for c in cg.iter(f"{_NS}Column") if c.get("Name")]
+                        uso = (cg.get("Usage") or "").upper()
+                        if uso == "EQUALITY":
+                            indice.igualdade.extend(nomes)
+                        elif uso == "INEQUALITY":
+                            indice.desigualdade.extend(nomes)
+                        else:
+                            indice.incluidas.extend(nomes)
+                    indices.append(indice)
+            for bloco in stmt.iter(f"{_NS}Warnings"):
+                for aviso in bloco:
+                    nome = _local(aviso.tag)
+                    if nome not in avisos:
+                        avisos.append(nome)
+    indices.sort(key=lambda i: i.impacto, reverse=True)
+    return EstimativaPlano(
+        linhas_estimadas=linhas if linhas is not None else ultimo,
+        custo_estimado=custo,
+        indices_ausentes=indices,
+        avisos=avisos,
+    )
+
+
+def avaliar_estimativa(estimativa: EstimativaPlano, limites: LimitesEstimativa) -> Tuple[str, List[str]]:
+    """Compara a estimativa com os limites: (nível, motivos)."""
+    def excede(valor, limite):
+        return bool(limite) and valor > limite
+
+    motivos = []
+    if excede(estimativa.linhas_estimadas, limites.bloquear_linhas):
+        motivos.append(f"linhas estimadas acima de {limites.bloquear_linhas:,.0f}")
+    if excede(estimativa.custo_estimado, limites.bloquear_custo):
+        motivos.append(f"custo estimado acima de {limites.bloquear_custo:,.2f}")
+    if motivos:
+        return NIVEL_BLOQUEAR, motivos
+    if excede(estimativa.linhas_estimadas, limites.confirmar_linhas):
+        motivos.append(f"linhas estimadas acima de {limites.confirmar_linhas:,.0f}")
+    if excede(estimativa.custo_estimado, limites.confirmar_custo):
+        motivos.append(f"custo estimado acima de {limites.confirmar_custo:,.2f}")
+    return (NIVEL_CONFIRMAR if motivos else NIVEL_OK), motivos
+
+
+def descrever_estimativa(estimativa: EstimativaPlano, max_indices: int = 3) -> str:
+    """Texto da estimativa para os diálogos de confirmação."""
+    linhas = [
+        f"Linhas estimadas: {estimativa.linhas_estimadas:,.0f}",
+        f"Custo estimado: {estimativa.custo_estimado:,.2f}",
+    ]
+    if estimativa.avisos:
+        linhas.append("Avisos do otimizador: " + ", ".join(estimativa.avisos))
+    if estimativa.indices_ausentes:
+        linhas.append("Índices sugeridos pelo servidor:")
+        for indice in estimativa.indices_ausentes[:max_indices]:
+            linhas.append(f"  • ({indice.impacto:.0f}% de melhoria) {indice.sugestao_sql()}")
+    return "\n".join(linhas)
+
+
+class CacheEstimativas:
+    """Cache LRU (com TTL) de estimativas, indexado pela impressão digital da SQL."""
+
+    def __init__(
+        self,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_entradas: int = DEFAULT_MAX_ENTRADAS,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entradas = max_entradas
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entradas: "OrderedDict[str, Tuple[float, EstimativaPlano]]" = OrderedDict()
+
+    def get(self, chave: str) -> Optional[EstimativaPlano]:
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                return None
+            if self.ttl_seconds and self._clock() - entrada[0] > self.ttl_seconds:
+                del self._entradas[chave]
+                return None
+            self._entradas.move_to_end(chave)
+            return entrada[1]
+
+    def put(self, chave: str, estimativa: EstimativaPlano):
+        with self._lock:
+            self._entradas[chave] = (self._clock(), estimativa)
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > max(1, self.max_entradas):
+                self._entradas.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entradas.clear()
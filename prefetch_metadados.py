@@ -0,0 +1,168 @@
+"""
+Pré-carregamento de metadados (colunas, PKs e FKs) para CSData Studio
+
+A árvore de colunas da aba de consultas precisava das colunas e das chaves
+primárias de cada tabela selecionada e as buscava na thread da interface, a
+cada mudança de seleção (as PKs nem ficavam em cache). Sem o catálogo em
+memória (ou para tabelas fora dele) isso significa consultas ao
+INFORMATION_SCHEMA com a tela travada.
+
+- `CacheMetadados` guarda, por tabela, colunas, PKs e FKs; é o cache
+  compartilhado pela aba (o dicionário de colunas é o próprio
+  `_columns_cache` da QueryBuilderTab).
+- `PrefetcherMetadados` aquece esse cache em um pool de threads quando a
+  tabela é apontada com o mouse, aparece no topo de uma busca ou é
+  selecionada. O resultado volta para a thread da interface por sinal Qt, é
+  gravado no cache e anunciado por `carregado(schema, tabela)`.
+
+As consultas usam os métodos do QueryBuilder, que já tomam conexões da fila
+de metadados do pool (authentication.LANE_METADATA). Sem pool (conexão
+única, que não pode ser usada por duas threads) o carregamento continua
+síncrono.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+# threads do pool de pré-carregamento (a fila de metadados do pool de
+# conexões limita, de todo modo, as consultas simultâneas)
+DEFAULT_PREFETCH_WORKERS = 2
+
+
+def chave_metadados(schema: str, table: str) -> str:
+    """Chave do cache: 'schema.tabela' em minúsculas (igual à do `_columns_cache`)."""
+    return f"{(schema or 'dbo').strip('[]')}.{(table or '').strip('[]')}".lower()
+
+
+@dataclass
+class MetadadosTabela:
+    colunas: list = field(default_factory=list)
+    pks: List[str] = field(default_factory=list)
+    fks: list = field(default_factory=list)
+
+
+class CacheMetadados:
+    """Colunas, PKs e FKs por tabela; `colunas` é compartilhado como dicionário."""
+
+    def __init__(self):
+        self.colunas: Dict[str, list] = {}
+        self.pks: Dict[str, List[str]] = {}
+        self.fks: Dict[str, list] = {}
+
+    def completo(self, schema: str, table: str) -> bool:
+        chave = chave_metadados(schema, table)
+        return chave in self.colunas and chave in self.pks and chave in self.fks
+
+    def guardar(self, schema: str, table: str, dados: MetadadosTabela):
+        chave = chave_metadados(schema, table)
+        self.colunas[chave] = dados.colunas
+        self.pks[chave] = dados.pks
+        self.fks[chave] = dados.fks
+
+    def clear(self):
+        # limpa no lugar: quem guardou referência ao dicionário continua vendo o cache
+        self.colunas.clear()
+        self.pks.clear()
+        self.fks.clear()
+
+
+def carregar_metadados(qb, schema: str, table: str) -> MetadadosTabela:
+    """Consulta colunas, PKs e FKs de uma tabela pelo QueryBuilder."""
+    return MetadadosTabela(
+        colunas=qb.get_table_columns(schema, table) or [],
+        pks=qb.get_primary_keys(schema, table) or [],
+        fks=qb.get_foreign_keys(schema, table) or [],
+    )
+
+
+class PrefetcherMetadados(QObject):
+    """Aquece o `CacheMetadados` em segundo plano.
+
+    `solicitar` pode ser chamado à vontade (a cada item apontado, por
+    exemplo): tabelas já em cache ou já pedidas são ignoradas.
+    """
+
+    carregado = pyqtSignal(str, str)
+    falhou = pyqtSignal(str, str, str)
+    # uso interno: entrega o resultado da thread de trabalho à thread do objeto
+    _concluido = pyqtSignal(str, str, object, str)
+
+    def __init__(self, qb, cache: CacheMetadados, max_workers: int = DEFAULT_PREFETCH_WORKERS, parent=None):
+        super().__init__(parent)
+        self.qb = qb
+        self.cache = cache
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="prefetch-metadados")
+        self._pendentes: Set[str] = set()
+        self._lock = threading.Lock()
+        self._encerrado = False
+        self.assincrono = getattr(qb, 'pool', None) is not None
+        self._concluido.connect(self._entregar)
+
+    def em_memoria(self, schema: str, table: str) -> bool:
+        """True quando o catálogo em memória responde pela tabela (sem ir ao banco)."""
+        catalogo = getattr(self.qb, 'schema_catalog', None)
+        try:
+            return catalogo is not None and catalogo.tem_tabela(schema, table)
+        except Exception:
+            return False
+
+    def obter(self, schema: str, table: str) -> Optional[MetadadosTabela]:
+        """Metadados já disponíveis sem consultar o banco; senão None (e pede o pré-carregamento).
+
+        Sem pool de conexões a consulta é feita aqui mesmo, como antes.
+        """
+        chave = chave_metadados(schema, table)
+        if not self.cache.completo(schema, table) and (self.em_memoria(schema, table) or not self.assincrono):
+            self.cache.guardar(schema, table, carregar_metadados(self.qb, schema, table))
+        if self.cache.completo(schema, table):
+            return MetadadosTabela(self.cache.colunas[chave], self.cache.pks[chave], self.cache.fks[chave])
+        self.solicitar(schema, table)
+        return None
+
+    def solicitar(self, schema: str, table: str) -> bool:
+        """Agenda o carregamento; False se já está em cache, pendente ou encerrado."""
+        chave = chave_metadados(schema, table)
+        with self._lock:
+            if (not self.assincrono or self._encerrado or chave in self._pendentes
+                    or self.cache.completo(schema, table)):
+                return False
+            self._pendentes.add(chave)
+        try:
+            self._executor.submit(self._trabalhar, schema, table)
+        except RuntimeError:
+            with self._lock:
+                self._pendentes.discard(chave)
+            return False
+        return True
+
+    def pendente(self, schema: str, table: str) -> bool:
+        with self._lock:
+            return chave_metadados(schema, table) in self._pendentes
+
+    def _trabalhar(self, schema: str, table: str):
+        try:
+            dados = carregar_metadados(self.qb, schema, table)
+            erro = ""
+        except Exception as e:
+            dados, erro = None, str(e) or e.__class__.__name__
+        if not self._encerrado:
+            self._concluido.emit(schema, table, dados, erro)
+
+    def _entregar(self, schema: str, table: str, dados, erro: str):
+        with self._lock:
+            self._pendentes.discard(chave_metadados(schema, table))
+        if dados is None:
+            self.falhou.emit(schema, table, erro)
+            return
+        self.cache.guardar(schema, table, dados)
+        self.carregado.emit(schema, table)
+
+    def encerrar(self):
+        """Descarta o que ainda não começou; consultas em andamento terminam sozinhas."""
+        with self._lock:
+            self._encerrado = True
+            self._pendentes.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,125 @@
+"""
+Registro em memória dos metadados de módulos (metadados/*.json) para CSData Studio
+
+`QueryBuilder.carregar_modulo` e `carregar_agrupamentos` abriam e
+decodificavam o JSON a cada chamada — e são chamados a cada interação da
+interface (geração de SQL, campos de filtro, aliases...). O registro lê
+cada arquivo uma vez e o mantém em memória enquanto a assinatura do
+arquivo (mtime e tamanho) não muda; editar o JSON com o programa aberto
+continua funcionando.
+
+Na leitura o documento é validado (estrutura mínima) e indexado:
+
+- `<modulo>_agrupamentos.json`: agrupamento por id;
+- `<modulo>.json`: campo por nome (sem diferenciar maiúsculas), com a
+  chave da tabela em que aparece primeiro.
+
+Os dicionários devolvidos são compartilhados entre as chamadas e devem ser
+tratados como somente leitura.
+"""
+import json
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+
+@dataclass
+class _Documento:
+    assinatura: Tuple[int, int]
+    dados: dict
+    # id -> agrupamento (arquivos *_agrupamentos.json)
+    agrupamentos: Dict[str, dict] = field(default_factory=dict)
+    # nome do campo (minúsculo) -> (chave da tabela, definição do campo)
+    campos: Dict[str, Tuple[str, dict]] = field(default_factory=dict)
+
+
+def _validar(nome: str, dados) -> dict:
+    """Confere a estrutura mínima do documento; ValueError quando inválido."""
+    if not isinstance(dados, dict):
+        raise ValueError(f"Metadados inválidos em {nome}: o documento deve ser um objeto JSON")
+    tabelas = dados.get("tabelas")
+    if tabelas is not None and not (isinstance(tabelas, dict) and all(isinstance(t, dict) for t in tabelas.values())):
+        raise ValueError(f"Metadados inválidos em {nome}: 'tabelas' deve ser um objeto de tabelas")
+    agrupamentos = dados.get("agrupamentos")
+    if agrupamentos is not None:
+        if not isinstance(agrupamentos, list) or not all(isinstance(a, dict) for a in agrupamentos):
+            raise ValueError(f"Metadados inválidos em {nome}: 'agrupamentos' deve ser uma lista de objetos")
+        sem_id = [i for i, a in enumerate(agrupamentos) if not a.get("id")]
+        if sem_id:
+            raise ValueError(f"Metadados inválidos em {nome}: agrupamento sem 'id' na posição {sem_id[0]}")
+    return dados
+
+
+def _indexar(doc: _Documento):
+    for agrupamento in doc.dados.get("agrupamentos") or []:
+        doc.agrupamentos.setdefault(agrupamento["id"], agrupamento)
+    for chave_tabela, tabela in (doc.dados.get("tabelas") or {}).items():
+        campos = tabela.get("campos")
+        if not isinstance(campos, dict):
+            continue
+        for secao in ("padrao", "avancado"):
+            for campo in campos.get(secao) or []:
+                nome = campo.get("campo") if isinstance(campo, dict) else str(campo)
+                if nome:
+                    definicao = campo if isinstance(campo, dict) else {"campo": nome}
+                    doc.campos.setdefault(nome.lower(), (chave_tabela, definicao))
+
+
+class RegistroMetadados:
+    """Documentos JSON de uma pasta de metadados, lidos uma vez e revalidados por mtime/tamanho."""
+
+    def __init__(self, pasta: str):
+        self.pasta = pasta
+        self._lock = threading.Lock()
+        self._documentos: Dict[str, _Documento] = {}
+        # leituras efetivas do disco (diagnóstico/testes)
+        self.leituras = 0
+
+    def _obter(self, nome: str) -> _Documento:
+        caminho = os.path.join(self.pasta, nome)
+        try:
+            st = os.stat(caminho)
+        except OSError:
+            with self._lock:
+                self._documentos.pop(nome, None)
+            raise FileNotFoundError(f"Arquivo de metadados não encontrado: {nome}")
+        assinatura = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            doc = self._documentos.get(nome)
+            if doc is not None and doc.assinatura == assinatura:
+                return doc
+        with open(caminho, encoding="utf-8") as f:
+            dados = _validar(nome, json.load(f))
+        doc = _Documento(assinatura=assinatura, dados=dados)
+        _indexar(doc)
+        with self._lock:
+            self._documentos[nome] = doc
+            self.leituras += 1
+        return doc
+
+    def documento(self, nome: str) -> dict:
+        """Conteúdo do arquivo `nome` da pasta (FileNotFoundError se não existir)."""
+        return self._obter(nome).dados
+
+    def modulo(self, modulo: str) -> dict:
+        return self._obter(f"{modulo}.json").dados
+
+    def agrupamentos(self, modulo: str) -> dict:
+        return self._obter(f"{modulo}_agrupamentos.json").dados
+
+    def agrupamento(self, modulo: str, agrupamento_id: str) -> Optional[dict]:
+        """Agrupamento pelo id, ou None quando não existe."""
+        return self._obter(f"{modulo}_agrupamentos.json").agrupamentos.get(agrupamento_id)
+
+    def campo(self, modulo: str, nome: str) -> Optional[Tuple[str, dict]]:
+        """(chave da tabela, definição) do campo do módulo, sem diferenciar maiúsculas."""
+        return self._obter(f"{modulo}.json").campos.get((nome or "").lower())
+
+    def campos(self, modulo: str) -> Dict[str, Tuple[str, dict]]:
+        """Índice nome (minúsculo) -> (chave da tabela, definição) de todos os campos do módulo."""
+        return self._obter(f"{modulo}.json").campos
+
+    def limpar(self):
+        with self._lock:
+            self._documentos.clear()
@@ -0,0 +1,252 @@
+"""
+Grafo de relacionamentos (chaves estrangeiras) para CSData Studio
+
+As chaves estrangeiras do banco — do `SchemaCatalog`, de
+`get_foreign_keys` ou da planilha "Identificar relacionamentos.csv"
+(~780 relacionamentos) — formam um grafo não direcionado em que cada
+tabela é um vértice e cada FK é uma aresta com peso (1 por padrão, ou seja,
+o custo de um caminho é o número de JOINs).
+
+Sobre esse grafo:
+
+- `relacoes_diretas` devolve as FKs entre duas tabelas (para o ON);
+- `caminho` devolve o caminho mais barato entre duas tabelas (Dijkstra);
+- `arvore_juncao` liga um conjunto de tabelas com o menor número de JOINs
+  possível, incluindo as tabelas intermediárias necessárias. É o problema da
+  árvore de Steiner, resolvido pela heurística de Takahashi–Matsuyama: a
+  partir da primeira tabela, acrescenta-se a cada passo a tabela selecionada
+  mais próxima da árvore já montada, junto com o caminho até ela.
+
+FKs compostas (mesma constraint em várias colunas) viram uma única aresta
+com todos os pares de colunas no ON.
+"""
+import heapq
+import itertools
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from catalogo import ForeignKey, chave_tabela, linhas_fk_planilha
+
+
+@dataclass
+class Relacionamento:
+    """Uma FK (possivelmente composta): fk_table.fk_col -> pk_table.pk_col."""
+    constraint_name: Optional[str]
+    fk_schema: str
+    fk_table: str
+    pk_schema: str
+    pk_table: str
+    pares: List[Tuple[str, str]] = field(default_factory=list)
+    peso: float = 1.0
+
+    # compatibilidade com ForeignKey (primeiro par de colunas)
+    @property
+    def fk_column(self) -> Optional[str]:
+        return self.pares[0][0] if self.pares else None
+
+    @property
+    def pk_column(self) -> Optional[str]:
+        return self.pares[0][1] if self.pares else None
+
+    @property
+    def chave_fk(self) -> Tuple[str, str]:
+        return chave_tabela(self.fk_schema, self.fk_table)
+
+    @property
+    def chave_pk(self) -> Tuple[str, str]:
+        return chave_tabela(self.pk_schema, self.pk_table)
+
+    def condicao_on(self) -> str:
+        """Expressão ON com todos os pares de colunas da FK."""
+        return " AND ".join(
+            f"[{self.fk_schema}].[{self.fk_table}].[{fc}] = [{self.pk_schema}].[{self.pk_table}].[{pc}]"
+            for fc, pc in self.pares
+        )
+
+
+@dataclass
+class PassoJuncao:
+    """Tabela a juntar e a FK que a liga a uma tabela já presente no FROM.
+
+    `relacionamento` é None para a primeira tabela e para tabelas sem
+    caminho até as demais (o chamador decide o ON nesses casos).
+    """
+    schema: str
+    tabela: str
+    relacionamento: Optional[Relacionamento] = None
+    intermediaria: bool = False
+
+
+class GrafoRelacionamentos:
+    """Grafo não direcionado de tabelas ligadas por chaves estrangeiras."""
+
+    def __init__(self, relacionamentos: Iterable[Relacionamento] = ()):
+        # chave -> [(vizinho, relacionamento)]
+        self._adjacencias: Dict[Tuple[str, str], List[Tuple[Tuple[str, str], Relacionamento]]] = {}
+        # chave -> (schema, tabela) com a grafia original
+        self._nomes: Dict[Tuple[str, str], Tuple[str, str]] = {}
+        # nome da tabela (minúsculo) -> chaves, para buscas sem esquema
+        self._por_nome: Dict[str, List[Tuple[str, str]]] = {}
+        self.total_relacionamentos = 0
+        for rel in relacionamentos:
+            self.adicionar(rel)
+
+    # ------------------------------------------------------------------
+    # Construção
+    # ------------------------------------------------------------------
+    @classmethod
+    def from_foreign_keys(cls, fks: Iterable) -> "GrafoRelacionamentos":
+        """Monta o grafo a partir de ForeignKey (uma por coluna)."""
+        agrupados: Dict[tuple, Relacionamento] = {}
+        for fk in fks:
+            chave = (fk.constraint_name, chave_tabela(fk.fk_schema or 'dbo', fk.fk_table),
+                     chave_tabela(fk.pk_schema or 'dbo', fk.pk_table))
+            rel = agrupados.get(chave)
+            if rel is None:
+                rel = agrupados[chave] = Relacionamento(
+                    constraint_name=fk.constraint_name,
+                    fk_schema=fk.fk_schema or 'dbo', fk_table=fk.fk_table,
+                    pk_schema=fk.pk_schema or 'dbo', pk_table=fk.pk_table,
+                )
+            par = (fk.fk_column, fk.pk_column)
+            if par not in rel.pares:
+                rel.pares.append(par)
+        return cls(agrupados.values())
+
+    @classmethod
+    def from_catalogo(cls, catalogo) -> "GrafoRelacionamentos":
+        """Monta o grafo com todas as FKs de um SchemaCatalog."""
+        fks = []
+        for t in catalogo.tabelas():
+            fks.extend(catalogo.chaves_estrangeiras(t.schema, t.name) or [])
+        return cls.from_foreign_keys(fks)
+
+    @classmethod
+    def from_csv(cls, caminho: str, schema: str = 'dbo') -> "GrafoRelacionamentos":
+        """Lê a planilha "Identificar relacionamentos.csv".
+
+        Formato (separado por ';', sem cabeçalho):
+        constraint;tabela_pk;coluna_pk;tabela_fk;coluna_fk
+        """
+        return cls.from_foreign_keys(
+            ForeignKey(constraint_name=r[0], fk_schema=r[1], fk_table=r[2], fk_column=r[3],
+                       pk_schema=r[4], pk_table=r[5], pk_column=r[6])
+            for r in linhas_fk_planilha(caminho, schema)
+        )
+
+    def adicionar(self, rel: Relacionamento):
+        a, b = rel.chave_fk, rel.chave_pk
+        for chave, schema, tabela in ((a, rel.fk_schema, rel.fk_table), (b, rel.pk_schema, rel.pk_table)):
+            if chave not in self._nomes:
+                self._nomes[chave] = (schema, tabela)
+                self._adjacencias[chave] = []
+                self._por_nome.setdefault(chave[1], []).append(chave)
+        self.total_relacionamentos += 1
+        # auto-relacionamentos (ex.: hierarquias) não ajudam a ligar tabelas
+        if a == b:
+            return
+        self._adjacencias[a].append((b, rel))
+        self._adjacencias[b].append((a, rel))
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+    def __len__(self) -> int:
+        return len(self._nomes)
+
+    def resolver(self, tabela) -> List[Tuple[str, str]]:
+        """Chaves do grafo para (schema, tabela) ou para um nome sem esquema."""
+        if isinstance(tabela, (tuple, list)):
+            chave = chave_tabela(tabela[0], tabela[1])
+            return [chave] if chave in self._nomes else []
+        return list(self._por_nome.get(chave_tabela('', tabela)[1], []))
+
+    def relacoes_diretas(self, tabela1, tabela2) -> List[Relacionamento]:
+        """FKs que ligam diretamente as duas tabelas (em qualquer direção)."""
+        destinos = set(self.resolver(tabela2))
+        encontrados = []
+        for chave in self.resolver(tabela1):
+            for vizinho, rel in self._adjacencias.get(chave, []):
+                if vizinho in destinos and rel not in encontrados:
+                    encontrados.append(rel)
+        return encontrados
+
+    def _dijkstra(self, origens, alvos):
+        """Menor caminho de qualquer vértice de `origens` até o alvo mais próximo.
+
+        Retorna (alvo, [(vértice, relacionamento usado para chegar nele), ...])
+        ou None quando nenhum alvo é alcançável.
+        """
+        contador = itertools.count()
+        distancias = {o: 0.0 for o in origens}
+        anteriores: Dict[Tuple[str, str], Tuple[Tuple[str, str], Relacionamento]] = {}
+        fila = [(0.0, next(contador), o) for o in origens]
+        heapq.heapify(fila)
+        while fila:
+            dist, _, atual = heapq.heappop(fila)
+            if dist > distancias.get(atual, float('inf')):
+                continue
+            if atual in alvos:
+                alvo, caminho = atual, []
+                while atual in anteriores:
+                    anterior, rel = anteriores[atual]
+                    caminho.append((atual, rel))
+                    atual = anterior
+                caminho.reverse()
+                return alvo, caminho
+            for vizinho, rel in self._adjacencias.get(atual, []):
+                nova = dist + rel.peso
+                if nova < distancias.get(vizinho, float('inf')):
+                    distancias[vizinho] = nova
+                    anteriores[vizinho] = (atual, rel)
+                    heapq.heappush(fila, (nova, next(contador), vizinho))
+        return None
+
+    def caminho(self, origem, destino) -> Optional[List[Relacionamento]]:
+        """FKs do caminho mais barato entre duas tabelas (None se desconectadas)."""
+        origens = self.resolver(origem)
+        alvos = set(self.resolver(destino))
+        if not origens or not alvos:
+            return None
+        achado = self._dijkstra(origens, alvos)
+        if achado is None:
+            return None
+        return [rel for _, rel in achado[1]]
+
+    def arvore_juncao(self, tabelas: List[Tuple[str, str]]) -> List[PassoJuncao]:
+        """Ordem de JOIN que liga todas as `tabelas` (schema, tabela).
+
+        A primeira tabela é a do FROM; cada passo seguinte traz o
+        relacionamento com uma tabela já incluída. Tabelas intermediárias
+        necessárias para ligar as selecionadas entram marcadas como
+        `intermediaria`. Tabelas fora do grafo ou sem caminho até as demais
+        entram sem relacionamento.
+        """
+        passos: List[PassoJuncao] = []
+        if not tabelas:
+            return passos
+        pendentes: Dict[Tuple[str, str], Tuple[str, str]] = {}
+        for schema, tabela in tabelas:
+            pendentes.setdefault(chave_tabela(schema, tabela), (schema, tabela))
+
+        primeira = next(iter(pendentes))
+        arvore = {primeira}
+        passos.append(PassoJuncao(*pendentes.pop(primeira)))
+        while pendentes:
+            alvos = {k for k in pendentes if k in self._nomes}
+            achado = self._dijkstra(arvore & self._nomes.keys(), alvos) if alvos else None
+            if achado is None:
+                # o que sobrou não tem caminho até a árvore: entra sem ON
+                chave = next(iter(pendentes))
+                arvore.add(chave)
+                passos.append(PassoJuncao(*pendentes.pop(chave)))
+                continue
+            for chave, rel in achado[1]:
+                if chave in arvore:
+                    continue
+                arvore.add(chave)
+                if chave in pendentes:
+                    passos.append(PassoJuncao(*pendentes.pop(chave), relacionamento=rel))
+                else:
+                    passos.append(PassoJuncao(*self._nomes[chave], relacionamento=rel, intermediaria=True))
+        return passos
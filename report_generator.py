@@ -68,7 +68,7 @@ class ReportGenerator:
             chart_figure: Figura matplotlib
             include_table: Incluir tabela de dados
             columns: Nomes das colunas
-            data: Dados da tabela
+            data: Dados da tabela (ResultSet ou lista de tuplas)
         """
         try:
             # Define pagesize
@@ -239,7 +239,7 @@ class ReportGenerator:
         Args:
             output_path: caminho do CSV de saída
             columns: lista de nomes de colunas
-            data: lista de tuplas/linhas
+            data: ResultSet ou lista de tuplas/linhas (lido em blocos, sem cópia integral)
             date_format: formato de datas
             number_decimals: casas decimais para floats/Decimal
             encoding: codificação do arquivo (padrão utf-8-sig para compatibilidade Excel)
@@ -0,0 +1,276 @@
+"""
+Cache de resultados de consultas para CSData Studio
+
+Guarda (colunas, linhas) de consultas já executadas, indexadas pela SQL
+normalizada + parâmetros + identificação do banco, para que a mesma
+consulta salva executada várias vezes ao dia não refaça a agregação no
+servidor a cada execução.
+
+- expiração por tempo (TTL);
+- orçamento de memória em MB com descarte LRU;
+- opcionalmente, entradas descartadas da memória (ou grandes demais para
+  ela) são gravadas em uma pasta local e lidas de volta quando pedidas.
+"""
+import hashlib
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from tokenizador_sql import normalizar
+
+
+# valores padrão (sobrescritos por user_prefs.json na MainWindow)
+DEFAULT_TTL_SECONDS = 900
+DEFAULT_MEMORY_MB = 256
+DEFAULT_DISK_MB = 1024
+
+
+def normalizar_sql(sql: str) -> str:
+    """Normaliza a SQL para a chave do cache.
+
+    Remove comentários, colapsa espaços e quebras de linha e descarta o ';'
+    final, preservando literais ('...') e identificadores ([...], "...")
+    exatamente como foram escritos (ver tokenizador_sql.normalizar).
+    """
+    return normalizar(sql)
+
+
+def gerar_chave(sql: str, params: Optional[Sequence] = None, db_identity: str = '') -> str:
+    """Gera a chave (sha256) a partir da SQL normalizada, parâmetros e banco."""
+    h = hashlib.sha256()
+    h.update((db_identity or '').encode('utf-8'))
+    h.update(b'\x00')
+    h.update(normalizar_sql(sql).encode('utf-8'))
+    h.update(b'\x00')
+    for p in (params or ()):
+        # o tipo entra na chave: 1 e '1' produzem resultados diferentes
+        h.update(f"{type(p).__name__}:{p!r}".encode('utf-8'))
+        h.update(b'\x01')
+    return h.hexdigest()
+
+
+class ResultCache:
+    """Cache LRU de resultados com TTL e gravação opcional em disco.
+
+    Thread-safe: é consultado pela thread de execução das consultas.
+    `logger`, quando informado, deve expor `log(action, message, data)`
+    (ex.: SessionLogger) e recebe os acertos/faltas do cache.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_memory_mb: float = DEFAULT_MEMORY_MB,
+        spill_dir: Optional[str] = None,
+        max_disk_mb: float = DEFAULT_DISK_MB,
+        logger=None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_memory_bytes = int(max_memory_mb * 1024 * 1024)
+        self.spill_dir = spill_dir
+        self.max_disk_bytes = int(max_disk_mb * 1024 * 1024)
+        self.logger = logger
+        self._clock = clock
+        self._lock = threading.Lock()
+        # chave -> (criado_em, colunas, linhas, tamanho em bytes)
+        self._entries: "OrderedDict[str, Tuple[float, List[str], List[tuple], int]]" = OrderedDict()
+        self._memory_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        if spill_dir:
+            try:
+                os.makedirs(spill_dir, exist_ok=True)
+            except Exception:
+                self.spill_dir = None
+
+    # ----------------------------------------------------------
+    # API
+    # ----------------------------------------------------------
+    def get(self, key: str) -> Optional[Tuple[List[str], List[tuple]]]:
+        """Retorna (colunas, linhas) em cache ou None (expirado/ausente)."""
+        result = None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self._expired(entry[0]):
+                    self._remove_memory(key)
+                else:
+                    self._entries.move_to_end(key)
+                    result = (list(entry[1]), list(entry[2]))
+        if result is None:
+            disk = self._read_disk(key)
+            if disk is not None:
+                created, colunas, linhas = disk
+                result = (list(colunas), linhas)
+                # volta para a memória como entrada usada mais recentemente;
+                # o arquivo só é removido se a memória passar a guardá-la
+                if self._store(key, created, colunas, linhas, spill_on_overflow=False):
+                    self._remove_disk(key)
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            hits, misses = self.hits, self.misses
+        self._log('result_cache_hit' if result is not None else 'result_cache_miss', key, hits, misses)
+        return result
+
+    def put(self, key: str, colunas: Sequence[str], linhas: Sequence) -> bool:
+        """Armazena o resultado; retorna False se não couber em memória nem em disco."""
+        linhas = [tuple(r) for r in linhas]
+        return self._store(key, self._clock(), list(colunas), linhas, spill_on_overflow=True)
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._remove_memory(key)
+        self._remove_disk(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._memory_bytes = 0
+        if self.spill_dir:
+            for path, _, _ in self._disk_files():
+                self._unlink(path)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'memory_bytes': self._memory_bytes,
+            }
+
+    # ----------------------------------------------------------
+    # Memória
+    # ----------------------------------------------------------
+    def _store(self, key, created, colunas, linhas, spill_on_overflow: bool) -> bool:
+        try:
+            payload = pickle.dumps((created, colunas, linhas), protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            # valores não serializáveis: não entram no cache
+            return False
+        size = len(payload)
+        if size > self.max_memory_bytes:
+            # grande demais para a memória: vai direto para o disco
+            with self._lock:
+                self._remove_memory(key)
+            return self._write_disk(key, payload) if spill_on_overflow else False
+
+        evicted = []
+        with self._lock:
+            self._remove_memory(key)
+            self._entries[key] = (created, colunas, linhas, size)
+            self._memory_bytes += size
+            while self._memory_bytes > self.max_memory_bytes and self._entries:
+                old_key, old = self._entries.popitem(last=False)
+                self._memory_bytes -= old[3]
+                if not self._expired(old[0]):
+                    evicted.append((old_key, old))
+        if self.spill_dir:
+            for old_key, old in evicted:
+                try:
+                    self._write_disk(old_key, pickle.dumps(old[:3], protocol=pickle.HIGHEST_PROTOCOL))
+                except Exception:
+                    pass
+        return True
+
+    def _remove_memory(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._memory_bytes -= entry[3]
+
+    def _expired(self, created: float) -> bool:
+        return bool(self.ttl_seconds) and (self._clock() - created) > self.ttl_seconds
+
+    # ----------------------------------------------------------
+    # Disco
+    # ----------------------------------------------------------
+    def _path(self, key: str) -> str:
+        return os.path.join(self.spill_dir, f"{key}.pkl")
+
+    def _write_disk(self, key: str, payload: bytes) -> bool:
+        if not self.spill_dir or len(payload) > self.max_disk_bytes:
+            return False
+        path = self._path(key)
+        tmp = path + '.tmp'
+        try:
+            with open(tmp, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp, path)
+        except Exception:
+            self._unlink(tmp)
+            return False
+        self._prune_disk()
+        return True
+
+    def _read_disk(self, key: str):
+        if not self.spill_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                created, colunas, linhas = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # arquivo corrompido/incompleto
+            self._unlink(path)
+            return None
+        if self._expired(created):
+            self._unlink(path)
+            return None
+        return created, colunas, linhas
+
+    def _remove_disk(self, key: str):
+        if self.spill_dir:
+            self._unlink(self._path(key))
+
+    def _disk_files(self):
+        """Lista (caminho, mtime, tamanho) dos arquivos do cache em disco."""
+        files = []
+        try:
+            for name in os.listdir(self.spill_dir):
+                if not name.endswith('.pkl'):
+                    continue
+                path = os.path.join(self.spill_dir, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                files.append((path, st.st_mtime, st.st_size))
+        except OSError:
+            pass
+        return files
+
+    def _prune_disk(self):
+        """Remove os arquivos mais antigos até respeitar `max_disk_bytes`."""
+        files = self._disk_files()
+        total = sum(f[2] for f in files)
+        if total <= self.max_disk_bytes:
+            return
+        for path, _, size in sorted(files, key=lambda f: f[1]):
+            if total <= self.max_disk_bytes:
+                break
+            self._unlink(path)
+            total -= size
+
+    @staticmethod
+    def _unlink(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _log(self, action: str, key: str, hits: int, misses: int):
+        if self.logger is None:
+            return
+        try:
+            self.logger.log(action, 'Cache de resultados', {'key': key[:16], 'hits': hits, 'misses': misses})
+        except Exception:
+            pass
@@ -0,0 +1,869 @@
+"""
+Resultado de consulta em formato colunar para CSData Studio
+
+Um `ResultSet` guarda cada coluna em um array NumPy (com máscara de nulos)
+em vez de uma lista de objetos `Row`/tuplas por linha:
+
+- inteiros, datas e booleanos em arrays tipados;
+- decimais (DECIMAL/NUMERIC/MONEY) como inteiros escalados (int64 com a
+  escala da coluna), devolvidos como `Decimal` sem perda de precisão;
+- textos codificados em dicionário (códigos int32 + lista de valores
+  distintos), o que reduz muito a memória de colunas repetitivas como
+  NomeVendedor ou NomeCliente;
+- demais tipos em arrays de objetos.
+
+É montado uma vez a partir do cursor (ou dos lotes recebidos) e lido sem
+cópias pela grade de resultados, pelos gráficos, pelos insights de IA e
+pelas exportações. Para compatibilidade ainda se comporta como sequência
+de tuplas (`len`, índice, fatias e iteração).
+
+Resultados maiores que a memória: com `spill_dir` e `spill_threshold_bytes`
+o ResultSet passa a gravar as colunas em arquivos mapeados em memória
+(`np.memmap`) assim que ultrapassa o limite — arrays de largura fixa e, para
+textos, um buffer de offsets + bytes UTF-8. O sistema operacional só carrega
+as páginas efetivamente lidas (rolagem da grade, exportação em blocos).
+"""
+import datetime as _dt
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+
+KIND_INT = "int"
+KIND_FLOAT = "float"
+KIND_DECIMAL = "decimal"
+KIND_BOOL = "bool"
+KIND_DATETIME = "datetime"
+KIND_DATE = "date"
+KIND_STRING = "string"
+KIND_OBJECT = "object"
+
+NUMERIC_KINDS = (KIND_INT, KIND_FLOAT, KIND_DECIMAL)
+TEMPORAL_KINDS = (KIND_DATETIME, KIND_DATE)
+
+_DTYPES = {
+    KIND_INT: np.int64,
+    KIND_FLOAT: np.float64,
+    KIND_DECIMAL: np.int64,  # valor * 10**escala (ver ResultColumn.scale)
+    KIND_BOOL: np.bool_,
+    KIND_DATETIME: "datetime64[us]",
+    KIND_DATE: "datetime64[D]",
+    KIND_STRING: np.int32,
+    KIND_OBJECT: object,
+}
+
+# tamanho em memória (MB) a partir do qual o resultado vai para o disco
+# (padrão da MainWindow; sobrescrito por user_prefs.json)
+DEFAULT_SPILL_THRESHOLD_MB = 512
+
+# linhas decodificadas por vez ao iterar o ResultSet como tuplas
+_ITER_BLOCK = 4096
+
+# linhas convertidas por vez ao mudar o tipo de uma coluna gravada em disco
+_CONVERT_BLOCK = 65536
+
+# custo aproximado (bytes) de cada texto distinto guardado no dicionário
+_STR_OVERHEAD = 49
+
+# bytes iniciais de cada texto em disco usados como chave de ordenação
+_SORT_PREFIX = 8
+
+# maior escala representável em int64 (10**18 < 2**63)
+_MAX_DECIMAL_SCALE = 18
+
+
+def _kind_of(value) -> str:
+    # bool antes de int: bool é subclasse de int
+    if isinstance(value, bool):
+        return KIND_BOOL
+    if isinstance(value, int):
+        return KIND_INT
+    if isinstance(value, float):
+        return KIND_FLOAT
+    if isinstance(value, Decimal):
+        return KIND_DECIMAL
+    if isinstance(value, _dt.datetime):
+        return KIND_DATETIME if value.tzinfo is None else KIND_OBJECT
+    if isinstance(value, _dt.date):
+        return KIND_DATE
+    if isinstance(value, str):
+        return KIND_STRING
+    return KIND_OBJECT
+
+
+def _decimal_scale(values: Sequence) -> Optional[int]:
+    """Maior número de casas decimais entre os `Decimal` de `values`.
+
+    None quando algum valor não cabe em um inteiro escalado (NaN, infinito
+    ou mais de `_MAX_DECIMAL_SCALE` casas).
+    """
+    scale = 0
+    for v in values:
+        if isinstance(v, Decimal):
+            exp = v.as_tuple().exponent
+            if not isinstance(exp, int) or -exp > _MAX_DECIMAL_SCALE:
+                return None
+            if -exp > scale:
+                scale = -exp
+    return scale
+
+
+def _merge_kinds(a: Optional[str], b: str) -> str:
+    """Tipo resultante ao combinar valores dos tipos `a` e `b`."""
+    if a is None or a == b:
+        return b
+    pair = {a, b}
+    if pair <= {KIND_INT, KIND_FLOAT, KIND_DECIMAL}:
+        # float já é aproximado: misturado a decimais, a coluna vira float
+        return KIND_DECIMAL if KIND_FLOAT not in pair else KIND_FLOAT
+    if pair == {KIND_DATE, KIND_DATETIME}:
+        return KIND_DATETIME
+    return KIND_OBJECT
+
+
+class _Buffer:
+    """Array 1-D que cresce por duplicação, em memória ou em arquivo mapeado.
+
+    Em disco, cada crescimento grava um arquivo novo (`<nome>.<geração>.bin`)
+    em vez de redimensionar o atual: no Windows um arquivo não pode mudar de
+    tamanho enquanto houver visões mapeadas sobre ele.
+    """
+
+    __slots__ = ("dtype", "_arr", "_n", "_dir", "_name", "_gen", "_path")
+
+    def __init__(self, dtype, directory: Optional[str] = None, name: str = "buf"):
+        self.dtype = np.dtype(dtype)
+        self._arr = np.empty(0, dtype=self.dtype)
+        self._n = 0
+        self._dir = directory if self.dtype != np.dtype(object) else None
+        self._name = name
+        self._gen = 0
+        self._path = None
+
+    def __len__(self) -> int:
+        return self._n
+
+    @property
+    def on_disk(self) -> bool:
+        return self._dir is not None
+
+    @property
+    def memory_bytes(self) -> int:
+        return 0 if self.on_disk else self._arr.nbytes
+
+    def _allocate(self, capacity: int):
+        if self._dir is None:
+            return np.empty(capacity, dtype=self.dtype), None
+        self._gen += 1
+        path = os.path.join(self._dir, f"{self._name}.{self._gen}.bin")
+        return np.memmap(path, dtype=self.dtype, mode="w+", shape=(capacity,)), path
+
+    def _grow(self, capacity: int):
+        new_arr, new_path = self._allocate(capacity)
+        new_arr[:self._n] = self._arr[:self._n]
+        self._replace(new_arr, new_path)
+
+    def _replace(self, new_arr, new_path):
+        old_path = self._path
+        self._arr, self._path = new_arr, new_path
+        if old_path:
+            _remove_file(old_path)
+
+    def reserve(self, size: int):
+        if size > len(self._arr):
+            self._grow(max(size, len(self._arr) * 2, 1024))
+
+    def append(self, values: np.ndarray):
+        k = len(values)
+        if k == 0:
+            return
+        self.reserve(self._n + k)
+        self._arr[self._n:self._n + k] = values
+        self._n += k
+
+    def view(self, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        stop = self._n if stop is None else min(stop, self._n)
+        return self._arr[start:stop]
+
+    def get(self, i: int):
+        return self._arr[i]
+
+    def to_disk(self, directory: str):
+        """Move o conteúdo atual para um arquivo mapeado em `directory`."""
+        if self.on_disk or self.dtype == np.dtype(object):
+            return
+        self._dir = directory
+        new_arr, new_path = self._allocate(max(self._n, 1024))
+        new_arr[:self._n] = self._arr[:self._n]
+        self._replace(new_arr, new_path)
+
+    def release(self):
+        path = self._path
+        self._arr = np.empty(0, dtype=self.dtype)
+        self._n = 0
+        self._path = None
+        if path:
+            _remove_file(path)
+
+
+def _remove_file(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        # ainda mapeado por outra visão (Windows): removido junto com a pasta
+        pass
+
+
+class _TextStore:
+    """Textos de largura variável: offsets (int64) + bytes UTF-8 concatenados.
+
+    Usado pelas colunas de texto gravadas em disco, onde um dicionário em
+    memória cresceria com a quantidade de valores distintos.
+    """
+
+    __slots__ = ("_offsets", "_chars")
+
+    def __init__(self, directory: str, name: str):
+        self._offsets = _Buffer(np.int64, directory, f"{name}.off")
+        self._chars = _Buffer(np.uint8, directory, f"{name}.txt")
+        self._offsets.append(np.zeros(1, dtype=np.int64))
+
+    def append(self, values: Sequence):
+        encoded = [b"" if v is None else str(v).encode("utf-8") for v in values]
+        lengths = np.fromiter((len(b) for b in encoded), dtype=np.int64, count=len(encoded))
+        last = self._offsets.get(len(self._offsets) - 1)
+        self._offsets.append(last + np.cumsum(lengths))
+        self._chars.append(np.frombuffer(b"".join(encoded), dtype=np.uint8))
+
+    def get(self, i: int) -> str:
+        start, stop = self._offsets.view(i, i + 2)
+        return self._chars.view(int(start), int(stop)).tobytes().decode("utf-8")
+
+    def to_list(self, start: int, stop: int) -> List[str]:
+        offs = self._offsets.view(start, stop + 1)
+        base = int(offs[0])
+        blob = self._chars.view(base, int(offs[-1])).tobytes()
+        rel = (offs - base).tolist()
+        return [blob[rel[i]:rel[i + 1]].decode("utf-8") for i in range(len(rel) - 1)]
+
+    def ranks(self) -> np.ndarray:
+        """Posição de cada texto na ordem alfabética, sem decodificar tudo.
+
+        Ordena pelos primeiros `_SORT_PREFIX` bytes (lidos direto do arquivo
+        mapeado, em blocos) e pelo tamanho; a ordem dos bytes UTF-8 é a mesma
+        dos textos. Só os grupos de textos longos com o mesmo prefixo são
+        decodificados para desempatar, um grupo por vez.
+        """
+        n = len(self._offsets) - 1
+        prefix = np.zeros(n, dtype=np.uint64)
+        length = np.empty(n, dtype=np.int64)
+        chars = self._chars.view()
+        for start in range(0, n, _CONVERT_BLOCK):
+            stop = min(start + _CONVERT_BLOCK, n)
+            offs = self._offsets.view(start, stop + 1)
+            first, ends = offs[:-1], offs[1:]
+            length[start:stop] = ends - first
+            key = prefix[start:stop]
+            for k in range(_SORT_PREFIX):
+                pos = first + k
+                inside = pos < ends
+                byte = np.zeros(stop - start, dtype=np.uint64)
+                byte[inside] = chars[pos[inside]]
+                key <<= np.uint64(8)
+                key |= byte
+        order = np.lexsort((length, prefix))
+        # desempate: textos mais longos que o prefixo, com o mesmo prefixo
+        longs = np.flatnonzero(length[order] > _SORT_PREFIX)
+        if len(longs):
+            p = prefix[order[longs]]
+            cuts = np.flatnonzero((p[1:] != p[:-1]) | (longs[1:] != longs[:-1] + 1)) + 1
+            for group in np.split(longs, cuts):
+                if len(group) > 1:
+                    rows = order[group]
+                    order[group] = rows[sorted(range(len(rows)), key=[self.get(int(i)) for i in rows].__getitem__)]
+        ranks = np.empty(n, dtype=np.int64)
+        ranks[order] = np.arange(n)
+        return ranks
+
+    def release(self):
+        self._offsets.release()
+        self._chars.release()
+
+
+class ResultColumn:
+    """Uma coluna do ResultSet: valores, máscara de nulos e dicionário (textos).
+
+    Os arrays crescem por duplicação de capacidade, de modo que acrescentar
+    lotes durante o streaming custa O(lote). `values`/`mask` são visões sem
+    cópia das `len(self)` posições preenchidas; em colunas decimais `values`
+    traz os inteiros escalados (valor * 10**`scale`).
+    """
+
+    __slots__ = (
+        "name", "kind", "_values", "_mask", "_n", "_categories", "_codes_by_value",
+        "_dict_bytes", "_text", "_dir", "_file_name", "_scale",
+    )
+
+    def __init__(self, name: str, file_name: str = "col"):
+        self.name = name
+        self.kind: Optional[str] = None  # None enquanto só houver nulos
+        self._values: Optional[_Buffer] = None
+        self._mask = _Buffer(np.bool_, None, f"{file_name}.nul")
+        self._n = 0
+        self._categories: List[str] = []
+        self._codes_by_value = {}
+        self._dict_bytes = 0
+        # textos em disco (ver spill): substitui códigos + dicionário
+        self._text: Optional[_TextStore] = None
+        self._dir: Optional[str] = None
+        self._file_name = file_name
+        # casas decimais dos inteiros escalados (colunas decimais)
+        self._scale = 0
+
+    def __len__(self) -> int:
+        return self._n
+
+    @property
+    def values(self) -> np.ndarray:
+        """Array de valores sem cópia.
+
+        Exceção: numa coluna de texto gravada em disco os textos são
+        decodificados todos em um array de objetos; para percorrer colunas
+        grandes use `to_list` em blocos (como a iteração do ResultSet).
+        """
+        if self._text is not None:
+            return np.array(self.to_list(), dtype=object)
+        if self._values is None:
+            return np.zeros(self._n, dtype=object)
+        return self._values.view()
+
+    @property
+    def scale(self) -> int:
+        """Casas decimais de uma coluna decimal (0 nos demais tipos)."""
+        return self._scale
+
+    @property
+    def mask(self) -> np.ndarray:
+        """True onde o valor é nulo."""
+        return self._mask.view()
+
+    @property
+    def categories(self) -> List[str]:
+        """Valores distintos de uma coluna de texto (índice = código)."""
+        return self._categories
+
+    @property
+    def null_count(self) -> int:
+        return int(self.mask.sum())
+
+    @property
+    def on_disk(self) -> bool:
+        return self._dir is not None
+
+    @property
+    def memory_bytes(self) -> int:
+        total = self._mask.memory_bytes + self._dict_bytes
+        if self._values is not None:
+            total += self._values.memory_bytes
+        return total
+
+    def first_value(self):
+        """Primeiro valor não-nulo da coluna (None se não houver)."""
+        if self.kind is None:
+            return None
+        valid = np.flatnonzero(~self.mask[:_CONVERT_BLOCK])
+        if len(valid):
+            return self.value(int(valid[0]))
+        valid = np.flatnonzero(~self.mask)
+        return self.value(int(valid[0])) if len(valid) else None
+
+    # ----------------------------------------------------------
+    # Escrita
+    # ----------------------------------------------------------
+    def extend(self, values: Sequence):
+        n = len(values)
+        if n == 0:
+            return
+        kind = self.kind
+        for v in values:
+            if v is not None:
+                vk = _kind_of(v)
+                if vk != kind:
+                    kind = _merge_kinds(kind, vk)
+        if kind != self.kind:
+            self._convert(kind)
+        if self.kind == KIND_DECIMAL:
+            scale = _decimal_scale(values)
+            if scale is None:
+                self._convert(KIND_OBJECT)
+            elif scale > self._scale:
+                self._rescale(scale)
+        self._mask.append(np.fromiter((v is None for v in values), dtype=np.bool_, count=n))
+        if self._text is not None:
+            self._text.append(values)
+        elif self.kind is not None:
+            # _encode pode trocar o buffer (estouro de 64 bits -> objetos)
+            encoded = self._encode(values)
+            self._values.append(encoded)
+        self._n += n
+
+    def _encode(self, values: Sequence) -> np.ndarray:
+        kind = self.kind
+        n = len(values)
+        if kind == KIND_STRING:
+            codes = self._codes_by_value
+            cats = self._categories
+            out = np.empty(n, dtype=np.int32)
+            for i, v in enumerate(values):
+                if v is None:
+                    out[i] = -1
+                    continue
+                c = codes.get(v)
+                if c is None:
+                    c = len(cats)
+                    codes[v] = c
+                    cats.append(v)
+                    self._dict_bytes += len(v) + _STR_OVERHEAD
+                out[i] = c
+            return out
+        if kind == KIND_FLOAT:
+            return np.fromiter((np.nan if v is None else float(v) for v in values), dtype=np.float64, count=n)
+        if kind in (KIND_INT, KIND_DECIMAL):
+            if kind == KIND_INT:
+                ints = (0 if v is None else v for v in values)
+            else:
+                factor = 10 ** self._scale
+                ints = (0 if v is None else int(v * factor) for v in values)
+            try:
+                return np.fromiter(ints, dtype=np.int64, count=n)
+            except OverflowError:
+                # fora de 64 bits: a coluna passa a guardar objetos
+                self._convert(KIND_OBJECT)
+                return self._encode(values)
+        if kind == KIND_BOOL:
+            return np.fromiter((bool(v) for v in values), dtype=np.bool_, count=n)
+        if kind in TEMPORAL_KINDS:
+            return np.array(list(values), dtype=_DTYPES[kind])
+        out = np.empty(n, dtype=object)
+        out[:] = list(values)
+        return out
+
+    def _new_values(self, kind: str) -> _Buffer:
+        return _Buffer(_DTYPES[kind], self._dir, f"{self._file_name}.val")
+
+    def _convert(self, kind: str):
+        """Converte os valores já armazenados para o tipo `kind`."""
+        n = self._n
+        old_kind = self.kind
+        if kind == KIND_STRING and self._dir is not None:
+            # coluna em disco: textos vão para offsets + bytes
+            new_text = _TextStore(self._dir, self._file_name)
+            new_text.append([None] * n)
+            self._text = new_text
+            self.kind = kind
+            return
+        new_vals = self._new_values(kind)
+        new_vals.reserve(n)
+        if old_kind is None:
+            # apenas nulos até aqui
+            if kind == KIND_STRING:
+                new_vals.append(np.full(n, -1, dtype=np.int32))
+            elif kind == KIND_FLOAT:
+                new_vals.append(np.full(n, np.nan))
+            elif kind == KIND_OBJECT:
+                new_vals.append(np.full(n, None, dtype=object))
+            else:
+                new_vals.append(np.zeros(n, dtype=_DTYPES[kind]))
+        else:
+            for start in range(0, n, _CONVERT_BLOCK):
+                stop = min(start + _CONVERT_BLOCK, n)
+                if kind == KIND_OBJECT:
+                    chunk = np.empty(stop - start, dtype=object)
+                    chunk[:] = self.to_list(start, stop)
+                elif old_kind == KIND_DECIMAL:
+                    # decimal -> float (mistura com valores float)
+                    chunk = self._values.view(start, stop) / 10 ** self._scale
+                    chunk[self._mask.view(start, stop)] = np.nan
+                else:
+                    # promoções numéricas (int -> decimal com escala 0) e data -> data/hora
+                    chunk = self._values.view(start, stop).astype(_DTYPES[kind])
+                    if kind == KIND_FLOAT:
+                        chunk[self._mask.view(start, stop)] = np.nan
+                new_vals.append(chunk)
+            self._release_values()
+        self._values = new_vals
+        self.kind = kind
+        self._scale = 0
+
+    def _rescale(self, scale: int):
+        """Aumenta a escala da coluna decimal para `scale` casas.
+
+        Sem espaço em int64 para os valores já armazenados, a coluna passa a
+        guardar objetos (`Decimal`).
+        """
+        factor = 10 ** (scale - self._scale)
+        limit = np.iinfo(np.int64).max // factor
+        for start in range(0, self._n, _CONVERT_BLOCK):
+            chunk = self._values.view(start, min(start + _CONVERT_BLOCK, self._n))
+            if len(chunk) and int(np.abs(chunk).max()) > limit:
+                self._convert(KIND_OBJECT)
+                return
+        for start in range(0, self._n, _CONVERT_BLOCK):
+            # em disco, escrita direta no arquivo mapeado
+            self._values.view(start, min(start + _CONVERT_BLOCK, self._n))[:] *= factor
+        self._scale = scale
+
+    def _release_values(self):
+        if self._values is not None:
+            self._values.release()
+            self._values = None
+        if self._text is not None:
+            self._text.release()
+            self._text = None
+        self._categories = []
+        self._codes_by_value = {}
+        self._dict_bytes = 0
+
+    def spill(self, directory: str):
+        """Passa a guardar a coluna em arquivos mapeados em `directory`."""
+        if self._dir is not None:
+            return
+        self._dir = directory
+        self._mask.to_disk(directory)
+        if self.kind == KIND_STRING:
+            text = _TextStore(directory, self._file_name)
+            for start in range(0, self._n, _CONVERT_BLOCK):
+                text.append(self.to_list(start, start + _CONVERT_BLOCK))
+            self._release_values()
+            self._text = text
+        elif self._values is not None:
+            # colunas de objetos (tipos mistos) continuam em memória
+            self._values.to_disk(directory)
+
+    def release(self):
+        self._release_values()
+        self._mask.release()
+        self._n = 0
+
+    # ----------------------------------------------------------
+    # Leitura
+    # ----------------------------------------------------------
+    def value(self, i: int):
+        if i < 0:
+            i += self._n
+        if i < 0 or i >= self._n:
+            raise IndexError(i)
+        if self.kind is None or self._mask.get(i):
+            return None
+        if self._text is not None:
+            return self._text.get(i)
+        v = self._values.get(i)
+        kind = self.kind
+        if kind == KIND_STRING:
+            return self._categories[v]
+        if kind == KIND_OBJECT:
+            return v
+        if kind == KIND_DECIMAL:
+            return Decimal(int(v)).scaleb(-self._scale)
+        return v.item()
+
+    def to_list(self, start: int = 0, stop: Optional[int] = None) -> list:
+        """Valores Python (None para nulos) das linhas [start, stop)."""
+        stop = self._n if stop is None else min(stop, self._n)
+        if start >= stop:
+            return []
+        if self.kind is None:
+            return [None] * (stop - start)
+        mask = self._mask.view(start, stop)
+        if self._text is not None:
+            out = self._text.to_list(start, stop)
+        elif self.kind == KIND_STRING:
+            cats = self._categories
+            return [None if c < 0 else cats[c] for c in self._values.view(start, stop).tolist()]
+        elif self.kind == KIND_DECIMAL:
+            exp = -self._scale
+            out = [Decimal(v).scaleb(exp) for v in self._values.view(start, stop).tolist()]
+        else:
+            out = self._values.view(start, stop).tolist()
+        if mask.any():
+            for i in np.flatnonzero(mask).tolist():
+                out[i] = None
+        return out
+
+    def to_numpy(self) -> np.ndarray:
+        """Array para análise: float64 com NaN (números), datetime64 com NaT
+        (datas) ou objetos com None. Sem cópia quando não há nulos."""
+        kind = self.kind
+        if self._text is not None or kind in (KIND_STRING, KIND_OBJECT, None):
+            return np.array(self.to_list(), dtype=object)
+        vals = self.values
+        mask = self.mask
+        has_nulls = bool(mask.any())
+        if kind == KIND_FLOAT:
+            return vals
+        if kind == KIND_DECIMAL:
+            # análise (gráficos, pandas) em float64; a precisão exata fica em value/to_list
+            out = vals / 10 ** self._scale
+            if has_nulls:
+                out[mask] = np.nan
+            return out
+        if kind == KIND_INT:
+            return vals.astype(np.float64) if has_nulls else vals
+        if kind in TEMPORAL_KINDS:
+            if not has_nulls:
+                return vals
+            out = np.array(vals)
+            out[mask] = np.datetime64("NaT")
+            return out
+        if not has_nulls:
+            return vals
+        return np.array(self.to_list(), dtype=object)
+
+
+def _categorical_from_text(pd, col: ResultColumn):
+    """Categorical de uma coluna de texto em disco, montado em blocos."""
+    n = len(col)
+    codes = np.empty(n, dtype=np.int64)
+    by_value = {}
+    for start in range(0, n, _CONVERT_BLOCK):
+        stop = min(start + _CONVERT_BLOCK, n)
+        block_codes, uniques = pd.factorize(np.array(col.to_list(start, stop), dtype=object))
+        remap = np.array([by_value.setdefault(u, len(by_value)) for u in uniques], dtype=np.int64)
+        codes[start:stop] = np.where(block_codes < 0, -1, remap[np.maximum(block_codes, 0)] if len(remap) else -1)
+    cats = list(by_value)
+    order = np.argsort(np.array(cats, dtype=object)) if cats else np.zeros(0, dtype=np.int64)
+    rank = np.empty(len(cats), dtype=np.int64)
+    rank[order] = np.arange(len(cats))
+    codes = np.where(codes < 0, -1, rank[np.maximum(codes, 0)] if len(cats) else -1)
+    return pd.Categorical.from_codes(codes, categories=[cats[i] for i in order.tolist()])
+
+
+class ResultSet:
+    """Resultado tabular colunar (ver docstring do módulo).
+
+    Uso:
+        rs = ResultSet(colunas)
+        rs.extend(lote)             # lotes de linhas (tuplas/Row)
+        rs.column('Valor').values   # array NumPy sem cópia
+        df = rs.to_pandas()
+
+    Com `spill_dir` e `spill_threshold_bytes`, ao ultrapassar o limite de
+    memória as colunas são movidas para arquivos mapeados em uma subpasta
+    própria de `spill_dir`, removida por `close()`.
+    """
+
+    def __init__(
+        self,
+        columns: Sequence[str],
+        rows: Optional[Iterable] = None,
+        spill_dir: Optional[str] = None,
+        spill_threshold_bytes: Optional[int] = None,
+    ):
+        self.columns = [str(c) for c in columns]
+        self._cols = [ResultColumn(c, f"c{i}") for i, c in enumerate(self.columns)]
+        self._n = 0
+        self.spill_dir = spill_dir
+        self.spill_threshold_bytes = spill_threshold_bytes
+        self._storage_dir: Optional[str] = None
+        if rows is not None:
+            self.extend(rows)
+
+    @classmethod
+    def from_rows(cls, columns: Sequence[str], rows: Iterable) -> "ResultSet":
+        return cls(columns, rows)
+
+    @classmethod
+    def from_cursor(cls, cursor, batch_size: int = 5000, **kwargs) -> "ResultSet":
+        """Monta o ResultSet lendo o cursor em lotes (`fetchmany`)."""
+        columns = [c[0] for c in cursor.description] if cursor.description else []
+        rs = cls(columns, **kwargs)
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            rs.extend(batch)
+        return rs
+
+    # ----------------------------------------------------------
+    # Escrita
+    # ----------------------------------------------------------
+    def extend(self, rows: Iterable):
+        """Acrescenta linhas (tuplas, listas ou pyodbc.Row)."""
+        rows = rows if isinstance(rows, list) else list(rows)
+        if not rows:
+            return
+        ncols = len(self._cols)
+        if any(len(r) != ncols for r in rows):
+            raise ValueError(
+                f"Inconsistência entre número de colunas ({ncols}) e tamanho das linhas retornadas"
+            )
+        # transpõe o lote: uma lista de valores por coluna
+        for col, values in zip(self._cols, zip(*rows)):
+            col.extend(values)
+        self._n += len(rows)
+        if (
+            self._storage_dir is None
+            and self.spill_dir
+            and self.spill_threshold_bytes is not None
+            and self.memory_bytes() > self.spill_threshold_bytes
+        ):
+            self.spill()
+
+    def spill(self):
+        """Move as colunas para arquivos mapeados em memória (ver módulo)."""
+        if self._storage_dir is not None:
+            return
+        base = self.spill_dir or tempfile.gettempdir()
+        os.makedirs(base, exist_ok=True)
+        self._storage_dir = tempfile.mkdtemp(prefix="rs_", dir=base)
+        for col in self._cols:
+            col.spill(self._storage_dir)
+
+    @property
+    def spilled(self) -> bool:
+        return self._storage_dir is not None
+
+    @property
+    def storage_dir(self) -> Optional[str]:
+        return self._storage_dir
+
+    def close(self):
+        """Libera os arrays e remove os arquivos gravados em disco."""
+        for col in self._cols:
+            col.release()
+        self._n = 0
+        if self._storage_dir is not None:
+            shutil.rmtree(self._storage_dir, ignore_errors=True)
+            self._storage_dir = None
+
+    # ----------------------------------------------------------
+    # Acesso colunar
+    # ----------------------------------------------------------
+    def column(self, key) -> ResultColumn:
+        if isinstance(key, int):
+            return self._cols[key]
+        try:
+            return self._cols[self.columns.index(key)]
+        except ValueError:
+            raise KeyError(key) from None
+
+    @property
+    def kinds(self) -> List[Optional[str]]:
+        return [c.kind for c in self._cols]
+
+    def value(self, row: int, col: int):
+        return self._cols[col].value(row)
+
+    def argsort(self, col: int, descending: bool = False) -> np.ndarray:
+        """Ordem das linhas pela coluna `col`; nulos sempre ao final."""
+        c = self._cols[col]
+        n = self._n
+        mask = c.mask
+        if c.kind is None:
+            return np.arange(n)
+        if c._text is not None:
+            # texto em disco: ordenado pelos bytes, sem decodificar a coluna
+            keys = c._text.ranks()
+        elif c.kind == KIND_STRING:
+            # posição de cada código na ordem alfabética dos valores distintos
+            cats = c.categories
+            rank = np.empty(len(cats), dtype=np.int64)
+            rank[np.argsort(np.array(cats, dtype=object))] = np.arange(len(cats))
+            keys = np.where(mask, 0, rank[np.maximum(c.values, 0)]) if len(cats) else np.zeros(n, dtype=np.int64)
+        elif c.kind == KIND_OBJECT:
+            vals = c.to_list()
+            keys = np.empty(n, dtype=np.int64)
+            order = sorted(range(n), key=lambda i: (vals[i] is None, str(vals[i])))
+            keys[np.array(order, dtype=np.int64)] = np.arange(n)
+        else:
+            keys = c.values
+        valid = np.flatnonzero(~mask)
+        order = valid[np.argsort(keys[valid], kind="stable")]
+        if descending:
+            order = order[::-1]
+        return np.concatenate([order, np.flatnonzero(mask)])
+
+    def to_pandas(self, columns: Optional[Sequence[str]] = None):
+        """DataFrame com as colunas pedidas (todas por padrão).
+
+        Números e datas usam os próprios arrays (sem cópia quando não há
+        nulos — em disco, visões do arquivo mapeado); textos viram
+        `Categorical` com categorias em ordem alfabética, reaproveitando o
+        dicionário. Textos em disco são lidos em blocos e só os valores
+        distintos ficam em memória (mais os códigos); ainda assim o
+        DataFrame inteiro vive em RAM — para exportar resultados grandes,
+        percorra o ResultSet em blocos (ver `ReportGenerator.create_csv`).
+        """
+        import pandas as pd
+
+        names = list(columns) if columns is not None else list(self.columns)
+        data = {}
+        for name in names:
+            c = self.column(name)
+            if c.kind == KIND_STRING:
+                if c._text is not None:
+                    data[name] = _categorical_from_text(pd, c)
+                    continue
+                cats = c.categories
+                order = np.argsort(np.array(cats, dtype=object)) if cats else np.zeros(0, dtype=np.int64)
+                remap = np.empty(len(cats), dtype=np.int32)
+                remap[order] = np.arange(len(cats), dtype=np.int32)
+                codes = np.where(c.mask, -1, remap[np.maximum(c.values, 0)] if len(cats) else -1)
+                sorted_cats = [cats[i] for i in order.tolist()]
+                data[name] = pd.Categorical.from_codes(codes, categories=sorted_cats)
+            else:
+                data[name] = c.to_numpy()
+        return pd.DataFrame(data, columns=names, copy=False)
+
+    # ----------------------------------------------------------
+    # Compatibilidade com lista de tuplas
+    # ----------------------------------------------------------
+    def __len__(self) -> int:
+        return self._n
+
+    def __bool__(self) -> bool:
+        return self._n > 0
+
+    def row(self, i: int) -> tuple:
+        if i < 0:
+            i += self._n
+        if i < 0 or i >= self._n:
+            raise IndexError(i)
+        return tuple(c.value(i) for c in self._cols)
+
+    def rows(self, start: int = 0, stop: Optional[int] = None) -> List[tuple]:
+        stop = self._n if stop is None else min(stop, self._n)
+        if start >= stop:
+            return []
+        if not self._cols:
+            return [()] * (stop - start)
+        return list(zip(*(c.to_list(start, stop) for c in self._cols)))
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self._n)
+            if step == 1:
+                return self.rows(start, stop)
+            return [self.row(i) for i in range(start, stop, step)]
+        return self.row(key)
+
+    def __iter__(self) -> Iterator[tuple]:
+        for start in range(0, self._n, _ITER_BLOCK):
+            yield from self.rows(start, start + _ITER_BLOCK)
+
+    def memory_bytes(self) -> int:
+        """Memória aproximada ocupada em RAM (arrays + dicionários de texto)."""
+        return sum(c.memory_bytes for c in self._cols)
+
+    def nbytes(self) -> int:
+        """Memória aproximada dos arrays (sem contar os textos distintos)."""
+        total = 0
+        for c in self._cols:
+            total += c.mask.nbytes
+            if c.kind is not None and c._text is None:
+                total += c.values.nbytes
+        return total
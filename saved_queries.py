@@ -19,12 +19,21 @@ class SavedQuery:
     created_by: str
     tags: List[str]
     ui_state: Optional[Dict] = None
+    # tempo limite de execução em segundos (None = usar padrão do agrupamento/preferências)
+    timeout_segundos: Optional[int] = None
+    # colunas de período do resultado -> tipo ('MesAno' -> 'mes_ano'), para
+    # rotular as datas de início de período ao executar (ver periodos.py)
+    periodos: Optional[Dict[str, str]] = None
     
     def to_dict(self) -> Dict:
         d = asdict(self)
         # ensure ui_state is serializable (it should be dict/list primitives)
         if d.get('ui_state') is None:
             d.pop('ui_state', None)
+        if d.get('timeout_segundos') is None:
+            d.pop('timeout_segundos', None)
+        if not d.get('periodos'):
+            d.pop('periodos', None)
         return d
     
     @staticmethod
@@ -38,7 +47,9 @@ class SavedQuery:
             modified_at=data.get('modified_at', ''),
             created_by=data.get('created_by', ''),
             tags=data.get('tags', []),
-            ui_state=data.get('ui_state')
+            ui_state=data.get('ui_state'),
+            timeout_segundos=data.get('timeout_segundos'),
+            periodos=data.get('periodos') or None
         )
 
 class QueryManager:
@@ -97,7 +108,9 @@ class QueryManager:
         created_by: str = "",
         tags: List[str] = None,
         ui_state: Optional[Dict] = None,
-        overwrite: bool = False
+        overwrite: bool = False,
+        timeout_segundos: Optional[int] = None,
+        periodos: Optional[Dict[str, str]] = None
     ) -> bool:
         """
         Adiciona uma nova consulta.
@@ -109,6 +122,8 @@ class QueryManager:
             created_by: Nome do usuário que criou
             tags: Lista de tags para categorização
             overwrite: Se True, sobrescreve consulta existente
+            timeout_segundos: Tempo limite de execução (None/0 = sem limite próprio)
+            periodos: Colunas de período do resultado -> tipo (rótulos no cliente)
         
         Returns:
             True se adicionou com sucesso
@@ -120,6 +135,7 @@ class QueryManager:
             raise ValueError(f"Consulta '{name}' já existe. Use overwrite=True para sobrescrever.")
         
         now = datetime.now().replace(microsecond=0).strftime("%Y-%m-%d %H:%M:%S")
+        timeout_segundos = int(timeout_segundos) if timeout_segundos else None
         
         if name in self._queries:
             # Atualiza consulta existente
@@ -129,6 +145,8 @@ class QueryManager:
             query.modified_at = now
             query.tags = tags or []
             query.ui_state = ui_state
+            query.timeout_segundos = timeout_segundos
+            query.periodos = dict(periodos) if periodos else None
         else:
             # Cria nova consulta
             query = SavedQuery(
@@ -139,7 +157,9 @@ class QueryManager:
                 modified_at=now,
                 created_by=created_by,
                 tags=tags or [],
-                ui_state=ui_state
+                ui_state=ui_state,
+                timeout_segundos=timeout_segundos,
+                periodos=dict(periodos) if periodos else None
             )
             self._queries[name] = query
         
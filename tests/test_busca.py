@@ -0,0 +1,48 @@
+import unittest
+
+from busca import IndiceBusca, normalizar
+
+
+class TestNormalizacao(unittest.TestCase):
+
+    def test_acentos_maiusculas_e_camel_case(self):
+        self.assertEqual(normalizar('NotaSaídaItens'), 'nota saida itens')
+        self.assertEqual(normalizar('[dbo].CnsDadosNFe'), 'dbo cns dados n fe')
+        self.assertEqual(normalizar('Código Cliente'), 'codigo cliente')
+        self.assertEqual(normalizar(None), '')
+
+
+class TestIndiceBusca(unittest.TestCase):
+
+    def setUp(self):
+        self.indice = IndiceBusca()
+        for nome, amigavel in [
+            ('[dbo].CnsNotaSaida', None),
+            ('[dbo].NotaSaida', 'Notas de saída'),
+            ('[dbo].NotaSaidaItens', None),
+            ('[dbo].Clientes', 'Cadastro de clientes'),
+            ('[dbo].ClientesContatos', None),
+            ('[dbo].Movimento', None),
+        ]:
+            self.indice.adicionar(nome, nome, amigavel)
+
+    def test_ranking_palavra_inteira_antes_de_trecho(self):
+        self.assertEqual(self.indice.buscar('saida'),
+                         ['[dbo].NotaSaida', '[dbo].CnsNotaSaida', '[dbo].NotaSaidaItens'])
+        self.assertEqual(self.indice.buscar('clientes')[:2], ['[dbo].Clientes', '[dbo].ClientesContatos'])
+
+    def test_varias_palavras_e_nome_amigavel(self):
+        self.assertEqual(self.indice.buscar('nota itens'), ['[dbo].NotaSaidaItens'])
+        self.assertEqual(self.indice.buscar('cadastro'), ['[dbo].Clientes'])
+        self.assertEqual(self.indice.buscar('SAÍDA', limite=1), ['[dbo].NotaSaida'])
+
+    def test_aproximado_e_termos_curtos(self):
+        # erro de digitação ainda encontra, depois das combinações exatas
+        self.assertEqual(self.indice.buscar('clientse')[0], '[dbo].Clientes')
+        self.assertEqual(self.indice.buscar('mo'), ['[dbo].Movimento'])
+        self.assertEqual(self.indice.buscar('xyz'), [])
+        self.assertEqual(len(self.indice.buscar('')), 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
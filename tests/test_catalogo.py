@@ -0,0 +1,215 @@
+import datetime as dt
+import os
+import tempfile
+import unittest
+
+from catalogo import SchemaCatalog, SQL_CATALOGO, SQL_ASSINATURA, SQL_OBJETOS, caminho_cache
+from consulta_sql import QueryBuilder, ColumnInfo
+
+
+D1 = dt.datetime(2025, 1, 1)
+TABELAS = [('dbo', 'Clientes', 'U ', D1, 10), ('dbo', 'Vendas', 'U ', D1, 20), ('rel', 'VwVendas', 'V ', D1, 30)]
+COLUNAS = [
+    ('dbo', 'Clientes', 'CodCliente', 'nvarchar', False),
+    ('dbo', 'Clientes', 'NomeCliente', 'nvarchar', True),
+    ('dbo', 'Vendas', 'NumRegistro', 'int', False),
+    ('dbo', 'Vendas', 'CodCliente', 'nvarchar', False),
+    ('dbo', 'Vendas', 'DataMovimento', 'datetime', False),
+    ('rel', 'VwVendas', 'Total', 'decimal', True),
+]
+PKS = [('dbo', 'Clientes', 'CodCliente'), ('dbo', 'Vendas', 'NumRegistro')]
+FKS = [('FK_Vendas_Clientes', 'dbo', 'Vendas', 'CodCliente', 'dbo', 'Clientes', 'CodCliente')]
+
+
+class _CursorCatalogo:
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._conjuntos = []
+        self.description = None
+
+    def execute(self, sql, params=None):
+        conn = self.conn
+        conn.consultas.append(sql)
+        assinatura = [(max(t[3] for t in conn.tabelas), len(conn.tabelas))]
+        if sql == SQL_CATALOGO:
+            self._conjuntos = [assinatura, conn.tabelas, conn.colunas, PKS, FKS]
+        elif sql == SQL_ASSINATURA:
+            self._conjuntos = [assinatura]
+        elif sql == SQL_OBJETOS:
+            self._conjuntos = [conn.tabelas]
+        elif 'sys.' in sql:
+            # lote incremental: colunas dos objetos em "object_id IN (...)", PKs e FKs
+            conjuntos = []
+            if 'sys.columns c\nJOIN' in sql.split('sys.indexes')[0]:
+                ids = sql.split('object_id IN (')[1].split(')')[0]
+                alvo = {t[1] for t in conn.tabelas if str(t[4]) in ids.split(', ')}
+                conjuntos.append([c for c in conn.colunas if c[1] in alvo])
+            self._conjuntos = conjuntos + [PKS, FKS]
+        else:
+            raise AssertionError("consulta de metadados fora do catálogo: " + sql)
+        self.description = [('c',)]
+
+    def fetchall(self):
+        return list(self._conjuntos[0])
+
+    def fetchone(self):
+        return self._conjuntos[0][0]
+
+    def nextset(self):
+        self._conjuntos.pop(0)
+        return bool(self._conjuntos)
+
+    def close(self):
+        pass
+
+
+class _ConexaoCatalogo:
+
+    def __init__(self):
+        self.consultas = []
+        self.tabelas = list(TABELAS)
+        self.colunas = list(COLUNAS)
+
+    def cursor(self):
+        return _CursorCatalogo(self)
+
+
+class TestSchemaCatalog(unittest.TestCase):
+
+    def setUp(self):
+        self.cat = SchemaCatalog.from_rows(TABELAS, COLUNAS, PKS, FKS)
+
+    def test_indices_por_esquema_e_tabela(self):
+        self.assertEqual(len(self.cat), 3)
+        self.assertEqual([(t.schema, t.name, t.type) for t in self.cat.tabelas()],
+                         [('dbo', 'Clientes', 'TABLE'), ('dbo', 'Vendas', 'TABLE'), ('rel', 'VwVendas', 'VIEW')])
+        # colunas em ordem ordinal; nomes sem diferenciar maiúsculas nem colchetes
+        self.assertEqual([c.column_name for c in self.cat.colunas('DBO', '[vendas]')],
+                         ['NumRegistro', 'CodCliente', 'DataMovimento'])
+        self.assertEqual(self.cat.chaves_primarias('dbo', 'Vendas'), ['NumRegistro'])
+        self.assertEqual(self.cat.chaves_primarias('rel', 'VwVendas'), [])
+        self.assertEqual(self.cat.chaves_estrangeiras('dbo', 'Vendas')[0].pk_table, 'Clientes')
+        self.assertEqual(self.cat.referenciada_por('dbo', 'Clientes')[0].fk_table, 'Vendas')
+        self.assertIsNone(self.cat.colunas('dbo', 'NaoExiste'))
+        self.assertEqual(self.cat.total_colunas(), 6)
+
+    def test_carga_em_um_lote(self):
+        conn = _ConexaoCatalogo()
+        cat = SchemaCatalog.from_connection(conn)
+        self.assertEqual(conn.consultas, [SQL_CATALOGO])
+        self.assertEqual(cat.colunas('dbo', 'Clientes')[1].is_nullable, True)
+
+
+class TestCatalogoEmDisco(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.caminho = caminho_cache(self._tmp.name, 'SRV\\SQL2019/Vendas')
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_arquivo_por_servidor_e_banco(self):
+        self.assertNotEqual(self.caminho, caminho_cache(self._tmp.name, 'SRV\\SQL2019/Compras'))
+        self.assertTrue(os.path.basename(self.caminho).startswith('catalogo_SRV_SQL2019_Vendas_'))
+
+    def test_cache_valido_nao_recarrega(self):
+        conn = _ConexaoCatalogo()
+        QueryBuilder(conn, schema_cache_path=self.caminho).carregar_catalogo()
+        conn.consultas.clear()
+
+        qb = QueryBuilder(conn, schema_cache_path=self.caminho)
+        cat = qb.carregar_catalogo_em_cache()
+        self.assertEqual(len(cat), 3)
+        self.assertFalse(qb.catalogo_validado)
+        self.assertEqual(qb.get_primary_keys('dbo', 'Vendas'), ['NumRegistro'])
+        self.assertEqual(conn.consultas, [])
+        self.assertEqual(qb.revalidar_catalogo(), 0)
+        self.assertTrue(qb.catalogo_validado)
+        self.assertIs(qb.schema_catalog, cat)
+        self.assertEqual(conn.consultas, [SQL_ASSINATURA])
+
+    def test_recarrega_somente_objetos_alterados(self):
+        conn = _ConexaoCatalogo()
+        QueryBuilder(conn, schema_cache_path=self.caminho).carregar_catalogo()
+        # Clientes ganhou uma coluna, VwVendas foi removida e Produtos criada
+        d2 = dt.datetime(2025, 2, 1)
+        conn.tabelas = [('dbo', 'Clientes', 'U ', d2, 10), ('dbo', 'Produtos', 'U ', d2, 40), ('dbo', 'Vendas', 'U ', D1, 20)]
+        conn.colunas = COLUNAS[:2] + [('dbo', 'Clientes', 'Email', 'varchar', True),
+                                      ('dbo', 'Produtos', 'CodProduto', 'int', False)] + COLUNAS[2:5]
+        conn.consultas.clear()
+
+        qb = QueryBuilder(conn, schema_cache_path=self.caminho)
+        qb.carregar_catalogo_em_cache()
+        self.assertEqual(qb.revalidar_catalogo(), 3)
+        self.assertEqual(conn.consultas[:2], [SQL_ASSINATURA, SQL_OBJETOS])
+        self.assertIn('object_id IN (10, 40)', conn.consultas[2])
+        self.assertEqual([c.column_name for c in qb.get_table_columns('dbo', 'Clientes')],
+                         ['CodCliente', 'NomeCliente', 'Email'])
+        self.assertEqual(len(qb.get_table_columns('dbo', 'Vendas')), 3)
+        self.assertEqual([t.name for t in qb.get_tables_and_views()], ['Clientes', 'Produtos', 'Vendas'])
+        # o arquivo local passa a refletir o catálogo atualizado
+        self.assertEqual(len(SchemaCatalog.carregar_arquivo(self.caminho).colunas('dbo', 'Clientes')), 3)
+
+    def test_arquivo_invalido_e_ignorado(self):
+        with open(self.caminho, 'wb') as f:
+            f.write(b'lixo')
+        self.assertIsNone(QueryBuilder(None, schema_cache_path=self.caminho).carregar_catalogo_em_cache())
+
+
+class TestCatalogoDasPlanilhas(unittest.TestCase):
+
+    def test_planilhas_exportadas(self):
+        pasta = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Planilhas')
+        qb = QueryBuilder(None)
+        cat = qb.carregar_catalogo_planilhas(pasta)
+        self.assertGreater(len(cat), 1000)
+        self.assertGreater(cat.total_colunas(), 20000)
+        self.assertEqual(qb.get_primary_keys('dbo', 'Agenda'), ['CodAgenda'])
+        cols = qb.get_table_columns('dbo', 'Agenda')
+        self.assertEqual((cols[0].column_name, cols[0].data_type, cols[0].is_nullable), ('CodAgenda', 'int', False))
+        self.assertIn('AgendaEventos', [r[2] for r in qb.get_table_dependencies('dbo', 'Agenda')['referenced_by']])
+        # strings repetidas são compartilhadas
+        self.assertIs(cols[0].table_name, cols[1].table_name)
+        self.assertIs(cols[0].data_type, qb.get_table_columns('dbo', 'AgendaEventos')[0].data_type)
+
+    def test_planilhas_opcionais(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            with open(os.path.join(pasta, 'Lista de campos de cada tabela.csv'), 'w', encoding='utf-8-sig') as f:
+                f.write("dbo;T;A;int;4;NO;\ndbo;T;B;varchar;10;YES;('')\nlinha incompleta\ndbo;U;C;int;4;NO;\n")
+            cat = SchemaCatalog.from_planilhas(pasta)
+        self.assertEqual([(t.name, t.type) for t in cat.tabelas()], [('T', 'TABLE'), ('U', 'TABLE')])
+        self.assertEqual([c.is_nullable for c in cat.colunas('dbo', 'T')], [False, True])
+        self.assertEqual(cat.chaves_primarias('dbo', 'T'), [])
+
+
+class TestQueryBuilderComCatalogo(unittest.TestCase):
+
+    def test_metodos_de_metadados_usam_o_catalogo(self):
+        conn = _ConexaoCatalogo()
+        qb = QueryBuilder(conn)
+        qb.carregar_catalogo()
+        self.assertEqual(len(qb.get_tables_and_views()), 3)
+        cols = qb.get_table_columns('dbo', 'Clientes')
+        self.assertIsInstance(cols[0], ColumnInfo)
+        self.assertEqual(qb.get_primary_keys('dbo', 'Clientes'), ['CodCliente'])
+        self.assertEqual(qb.get_foreign_keys('dbo', 'Vendas')[0].constraint_name, 'FK_Vendas_Clientes')
+        deps = qb.get_table_dependencies('dbo', 'Clientes')
+        self.assertEqual(deps['references'], [])
+        self.assertEqual(deps['referenced_by'],
+                         [('FK_Vendas_Clientes', 'dbo', 'Vendas', 'CodCliente', 'dbo', 'Clientes', 'CodCliente')])
+        # nenhuma consulta além do lote do catálogo
+        self.assertEqual(conn.consultas, [SQL_CATALOGO])
+
+    def test_tabela_fora_do_catalogo_consulta_o_banco(self):
+        conn = _ConexaoCatalogo()
+        qb = QueryBuilder(conn)
+        qb.carregar_catalogo()
+        with self.assertRaises(AssertionError):
+            qb.get_table_columns('dbo', 'TabelaNova')
+        self.assertIn('INFORMATION_SCHEMA.COLUMNS', conn.consultas[-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,166 @@
+import json
+import os
+import tempfile
+import unittest
+
+from compilador_agrupamentos import CompiladorAgrupamentos, compilar_agrupamento
+from consulta_sql import QueryBuilder
+
+AGRUPAMENTO = {
+    'id': 'a',
+    'tabela': 'dbo.Vendas',
+    'dimensoes': [{'campo': 'Nome', 'tabela': 'clientes'}, 'Serie', {'campo': 'Data', 'tipo': 'mes_ano'}],
+    'metricas': [{'campo': 'Valor', 'funcao': 'AVG', 'label': 'Media'}],
+    'joins': [{'tabela': 'dbo.Clientes', 'on': 'dbo.Vendas.CodCli = Clientes.CodCli'}],
+}
+
+PODA = {
+    'id': 'p',
+    'tabela': '[dbo].[Vendas]',
+    'dimensoes': ['Serie', {'campo': 'Nome', 'tabela': 'Produtos'}],
+    'metricas': [{'campo': 'Valor', 'funcao': 'SUM', 'label': 'Total'}],
+    'joins': [
+        # LEFT pela chave: removível
+        {'tabela': '[dbo].[Clientes]', 'tipo': 'left', 'on': '[dbo].[Vendas].CodCli = [dbo].[Clientes].CodCli'},
+        # INNER: descarta vendas sem vendedor, fica
+        {'tabela': '[dbo].[Vendedores]', 'on': '[dbo].[Vendas].CodVen = [dbo].[Vendedores].CodVen'},
+        # LEFT sem a chave inteira no ON: pode multiplicar linhas, fica
+        {'tabela': '[dbo].[Precos]', 'tipo': 'left', 'on': '[dbo].[Vendas].CodPro = [dbo].[Precos].CodPro'},
+        # usado pela dimensão Nome
+        {'tabela': '[dbo].[Produtos]', 'tipo': 'left', 'on': '[dbo].[Vendas].CodPro = [dbo].[Produtos].CodPro'},
+        # LEFT pela chave, mas OR no ON
+        {'tabela': '[dbo].[Regioes]', 'tipo': 'left',
+         'on': '[dbo].[Vendas].CodReg = [dbo].[Regioes].CodReg OR [dbo].[Regioes].Padrao = 1'},
+        # removível; a chave vem do catálogo
+        {'tabela': '[dbo].[Grupos]', 'tipo': 'left',
+         'on': '[dbo].[Grupos].CodGrupo = [dbo].[Clientes].CodGrupo AND [dbo].[Grupos].Ativo = 1'},
+    ],
+}
+
+MODULO = {
+    'modulo': 'm',
+    'tabelas': {
+        'Vendas': {'tipo': 'principal', 'chave_primaria': ['NumRegistro'],
+                   'campos': {'padrao': [{'campo': 'Serie'}, {'campo': 'Valor'}, {'campo': 'Data'}]}},
+        'Clientes': {'chave_primaria': 'CodCli'},
+        'Produtos': {'chave_primaria': ['CodPro']},
+        'Precos': {'chave_primaria': ['CodPro', 'Tabela']},
+        'Regioes': {'chave_primaria': ['CodReg']},
+    },
+}
+
+
+class _Catalogo:
+    def chaves_primarias(self, schema, tabela):
+        return {'grupos': ['CodGrupo']}.get(tabela.lower())
+
+    def colunas(self, schema, tabela):
+        return None
+
+
+def _tabelas_juntadas(sql):
+    return [linha.split()[2] for linha in sql.splitlines() if ' JOIN ' in linha]
+
+
+class TestCompiladorAgrupamentos(unittest.TestCase):
+
+    def test_modelo_com_aliases(self):
+        aliases = {('dbo', 'Vendas'): 'v', ('x', 'Clientes'): 'c2', ('dbo', 'Clientes'): 'c'}
+        sql, params = compilar_agrupamento(AGRUPAMENTO, aliases).montar([("v.Serie = ?", ['A']), "v.Valor > 0"])
+        self.assertIn("c2.Nome, v.Serie, DATEFROMPARTS(YEAR(v.Data), MONTH(v.Data), 1) AS MesAno, AVG(v.Valor) AS [Media]", sql)
+        self.assertIn("FROM [dbo].[Vendas] v", sql)
+        # o primeiro alias com o nome da tabela vence, como antes
+        self.assertIn("INNER JOIN [dbo].[Clientes] c ON v.CodCli = c2.CodCli", sql)
+        self.assertTrue(sql.endswith("WHERE v.Serie = ? AND v.Valor > 0\nGROUP BY c2.Nome, v.Serie, DATEFROMPARTS(YEAR(v.Data), MONTH(v.Data), 1)"))
+        self.assertEqual(params, ['A'])
+
+    def test_metricas_parciais_e_sem_aliases(self):
+        sql, params = compilar_agrupamento(AGRUPAMENTO, None, metricas_parciais=True).montar()
+        self.assertIn("SUM(Valor) AS [Media], COUNT(Valor) AS [Media__n]", sql)
+        self.assertIn("INNER JOIN dbo.Clientes ON dbo.Vendas.CodCli = Clientes.CodCli", sql)
+        self.assertNotIn("WHERE", sql)
+        self.assertEqual(params, [])
+
+    def test_cache_por_aliases_e_documento(self):
+        compilador = CompiladorAgrupamentos(max_modelos=2)
+        m1 = compilador.obter('m', AGRUPAMENTO, {('dbo', 'Vendas'): 'v'})
+        self.assertIs(compilador.obter('m', AGRUPAMENTO, {('dbo', 'Vendas'): 'v'}), m1)
+        self.assertIsNot(compilador.obter('m', AGRUPAMENTO, {('dbo', 'Vendas'): 'x'}), m1)
+        # outro objeto para o mesmo id (arquivo relido) recompila
+        compilador.obter('m', dict(AGRUPAMENTO), {('dbo', 'Vendas'): 'v'})
+        self.assertEqual(compilador.compilacoes, 3)
+
+    def test_query_builder_recompila_quando_o_json_muda(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, 'm_agrupamentos.json')
+            with open(os.path.join(pasta, 'm.json'), 'w', encoding='utf-8') as f:
+                json.dump({'modulo': 'm'}, f)
+            with open(caminho, 'w', encoding='utf-8') as f:
+                json.dump({'agrupamentos': [AGRUPAMENTO]}, f)
+            qb = QueryBuilder(None, pasta_metadados=pasta)
+            for _ in range(3):
+                sql, _ = qb.gerar_sql_por_agrupamento('m', 'a', [("Serie = ?", ['A'])])
+            self.assertEqual(qb.compilador_agrupamentos.compilacoes, 1)
+            alterado = dict(AGRUPAMENTO, metricas=[{'campo': 'Valor', 'funcao': 'SUM', 'label': 'Total'}])
+            with open(caminho, 'w', encoding='utf-8') as f:
+                json.dump({'agrupamentos': [alterado]}, f)
+            os.utime(caminho, (2_000_000, 2_000_000))
+            sql, _ = qb.gerar_sql_por_agrupamento('m', 'a')
+            self.assertIn("SUM(Valor) AS [Total]", sql)
+            self.assertEqual(qb.compilador_agrupamentos.compilacoes, 2)
+
+
+    def test_poda_de_joins(self):
+        modelo = compilar_agrupamento(PODA, None, modulo_meta=MODULO, catalogo=_Catalogo())
+        sql, _ = modelo.montar([("Serie = ?", ['A']), "Valor > 0 AND [dbo].[Vendas].Data >= '2025-12-01'"])
+        self.assertEqual(_tabelas_juntadas(sql),
+                         ['[dbo].[Vendedores]', '[dbo].[Precos]', '[dbo].[Produtos]', '[dbo].[Regioes]'])
+        self.assertIn("LEFT JOIN [dbo].[Produtos] ON", sql)
+        # Grupos só sai junto com Clientes: seu ON cita Clientes
+        sql, _ = modelo.montar(["[dbo].[Grupos].Nome = 'X'"])
+        self.assertIn('[dbo].[Clientes]', _tabelas_juntadas(sql))
+        self.assertIn('[dbo].[Grupos]', _tabelas_juntadas(sql))
+        # nome sem qualificação fora da tabela principal: nada sai
+        sql, _ = modelo.montar(["NomeCliente LIKE 'A%'"])
+        self.assertEqual(len(_tabelas_juntadas(sql)), 6)
+        # sem os metadados do módulo, todos os JOINs como antes
+        self.assertEqual(len(_tabelas_juntadas(compilar_agrupamento(PODA).montar()[0])), 6)
+
+    def test_poda_com_aliases_e_tipo_invalido(self):
+        aliases = {('dbo', 'Vendas'): 'v', ('dbo', 'Clientes'): 'c', ('dbo', 'Grupos'): 'g'}
+        modelo = compilar_agrupamento(PODA, aliases, modulo_meta=MODULO, catalogo=_Catalogo())
+        self.assertNotIn('[dbo].[Clientes] c', modelo.montar()[0])
+        sql, _ = modelo.montar(["c.Ativo = 1"])
+        self.assertIn("LEFT JOIN [dbo].[Clientes] c ON v.CodCli = c.CodCli", sql)
+        self.assertNotIn('[dbo].[Grupos]', sql)
+        invalido = dict(PODA, joins=[dict(PODA['joins'][0], tipo='full')])
+        with self.assertRaises(ValueError):
+            compilar_agrupamento(invalido)
+
+    def test_query_builder_poda_com_metadados_do_modulo(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            modulo = os.path.join(pasta, 'm.json')
+            with open(modulo, 'w', encoding='utf-8') as f:
+                json.dump(MODULO, f)
+            with open(os.path.join(pasta, 'm_agrupamentos.json'), 'w', encoding='utf-8') as f:
+                json.dump({'agrupamentos': [PODA]}, f)
+            qb = QueryBuilder(None, pasta_metadados=pasta)
+            sql, _ = qb.gerar_sql_por_agrupamento('m', 'p', ["Serie = 'A'"])
+            # sem catálogo a chave de Grupos é desconhecida; seu ON mantém Clientes
+            self.assertIn('[dbo].[Clientes]', sql)
+            qb.schema_catalog = _Catalogo()
+            sql, _ = qb.gerar_sql_por_agrupamento('m', 'p', ["Serie = 'A'"])
+            self.assertNotIn('[dbo].[Clientes]', sql)
+            # sem a chave de Clientes nos metadados (arquivo alterado), o JOIN volta
+            sem_chave = json.loads(json.dumps(MODULO))
+            del sem_chave['tabelas']['Clientes']
+            with open(modulo, 'w', encoding='utf-8') as f:
+                json.dump(sem_chave, f)
+            os.utime(modulo, (2_000_000, 2_000_000))
+            sql, _ = qb.gerar_sql_por_agrupamento('m', 'p', ["Serie = 'A'"])
+            self.assertIn('[dbo].[Clientes]', sql)
+            self.assertEqual(qb.compilador_agrupamentos.compilacoes, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import sqlite3
+import threading
+import unittest
+
+from authentication import ConnectionPool, PoolTimeoutError, LANE_METADATA, LANE_QUERY
+from consulta_sql import QueryBuilder
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingFactory:
+    """Abre conexões sqlite3 em memória contando quantas foram criadas."""
+
+    def __init__(self):
+        self.created = []
+
+    def __call__(self):
+        conn = sqlite3.connect(':memory:', check_same_thread=False)
+        self.created.append(conn)
+        return conn
+
+
+class TestConnectionPool(unittest.TestCase):
+
+    def setUp(self):
+        self.factory = CountingFactory()
+        self.pool = ConnectionPool(
+            self.factory,
+            lanes={LANE_METADATA: (1, 1), LANE_QUERY: (0, 2)},
+            idle_timeout=60.0,
+            checkout_timeout=0.1,
+        )
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_reutiliza_conexao_devolvida(self):
+        with self.pool.connection(LANE_QUERY) as c1:
+            pass
+        with self.pool.connection(LANE_QUERY) as c2:
+            pass
+        self.assertIs(c1, c2)
+        self.assertEqual(len(self.factory.created), 1)
+
+    def test_filas_sao_independentes(self):
+        # a fila de metadados continua disponível com a de consultas esgotada
+        a = self.pool.acquire(LANE_QUERY)
+        b = self.pool.acquire(LANE_QUERY)
+        with self.assertRaises(PoolTimeoutError):
+            self.pool.acquire(LANE_QUERY)
+        with self.pool.connection(LANE_METADATA) as meta:
+            self.assertIsNotNone(meta)
+        self.pool.release(a, LANE_QUERY)
+        self.pool.release(b, LANE_QUERY)
+
+    def test_espera_devolucao_de_outra_thread(self):
+        pool = ConnectionPool(self.factory, lanes={LANE_QUERY: (0, 1)}, checkout_timeout=2.0)
+        conn = pool.acquire(LANE_QUERY)
+        threading.Timer(0.05, pool.release, args=(conn, LANE_QUERY)).start()
+        again = pool.acquire(LANE_QUERY)
+        self.assertIs(conn, again)
+        pool.release(again, LANE_QUERY)
+        pool.close()
+
+    def test_conexao_quebrada_e_substituida(self):
+        with self.pool.connection(LANE_QUERY) as c1:
+            pass
+        c1.close()
+        with self.pool.connection(LANE_QUERY) as c2:
+            self.assertIsNot(c1, c2)
+        self.assertEqual(self.pool.stats()[LANE_QUERY]['total'], 1)
+
+    def test_erro_no_bloco_devolve_conexao(self):
+        with self.assertRaises(ZeroDivisionError):
+            with self.pool.connection(LANE_QUERY):
+                1 / 0
+        self.assertEqual(self.pool.stats()[LANE_QUERY], {'idle': 1, 'in_use': 0, 'total': 1})
+
+    def test_evict_idle_respeita_minimo(self):
+        clock = FakeClock()
+        pool = ConnectionPool(
+            self.factory,
+            lanes={LANE_METADATA: (1, 1), LANE_QUERY: (0, 2)},
+            idle_timeout=60.0,
+            clock=clock,
+        )
+        pool.prefill()
+        with pool.connection(LANE_QUERY):
+            pass
+        clock.now = 120.0
+        self.assertEqual(pool.evict_idle(), 1)
+        stats = pool.stats()
+        pool.close()
+        self.assertEqual(stats[LANE_QUERY]['total'], 0)
+        self.assertEqual(stats[LANE_METADATA]['total'], 1)
+
+    def test_pool_fechado_recusa_emprestimo(self):
+        self.pool.close()
+        with self.assertRaises(RuntimeError):
+            self.pool.acquire(LANE_QUERY)
+
+
+class TestQueryBuilderComPool(unittest.TestCase):
+
+    def test_execucao_usa_conexao_da_fila_de_consultas(self):
+        factory = CountingFactory()
+        pool = ConnectionPool(factory, lanes={LANE_METADATA: (0, 1), LANE_QUERY: (0, 1)})
+        qb = QueryBuilder(pool=pool)
+
+        colunas, dados = qb.execute_query("SELECT 1 AS Um")
+        self.assertEqual(colunas, ['Um'])
+        self.assertEqual([tuple(r) for r in dados], [(1,)])
+
+        lotes = list(qb.execute_query_stream("SELECT 2 AS Dois", batch_size=10))
+        self.assertEqual(lotes[0][0], ['Dois'])
+        stats = pool.stats()
+        self.assertEqual(stats[LANE_QUERY], {'idle': 1, 'in_use': 0, 'total': 1})
+        self.assertEqual(stats[LANE_METADATA]['total'], 0)
+        pool.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
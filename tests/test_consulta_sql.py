@@ -1,6 +1,6 @@
 import unittest
 
-from consulta_sql import QueryBuilder, ForeignKey
+from consulta_sql import QueryBuilder, ForeignKey, QueryCancelToken, QueryCancelledError
 
 
 class DummyQB(QueryBuilder):
@@ -85,5 +85,69 @@ class TestQueryBuilderJoinOrder(unittest.TestCase):
                       msg=f'ON gerado incorreto para relacionamento:\n{sql}')
 
 
+class TestExecucaoEmLotes(unittest.TestCase):
+    """Execução em lotes (fetchmany) usando sqlite3 como banco local."""
+
+    def setUp(self):
+        import sqlite3
+        self.conn = sqlite3.connect(':memory:')
+        self.conn.execute('CREATE TABLE Vendas (Id INTEGER, Valor REAL)')
+        self.conn.executemany('INSERT INTO Vendas VALUES (?, ?)', [(i, i * 1.5) for i in range(25)])
+        self.qb = QueryBuilder(self.conn)
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_lotes_respeitam_tamanho(self):
+        lotes = list(self.qb.execute_query_stream('SELECT Id, Valor FROM Vendas ORDER BY Id', batch_size=10))
+        self.assertEqual([len(l) for _, l in lotes], [10, 10, 5])
+        self.assertEqual(lotes[0][0], ['Id', 'Valor'])
+        self.assertEqual(lotes[-1][1][-1][0], 24)
+
+    def test_resultado_vazio_gera_um_lote_com_colunas(self):
+        lotes = list(self.qb.execute_query_stream('SELECT Id FROM Vendas WHERE Id < ?', [0], batch_size=10))
+        self.assertEqual(lotes, [(['Id'], [])])
+
+    def test_cancelamento_interrompe_no_proximo_lote(self):
+        token = QueryCancelToken()
+        stream = self.qb.execute_query_stream('SELECT Id FROM Vendas', batch_size=10, cancel_token=token)
+        next(stream)
+        token.cancel()
+        with self.assertRaises(QueryCancelledError):
+            next(stream)
+
+    def test_timeout_aplicado_ao_criar_cursor_e_restaurado(self):
+        vistos = []
+
+        class ConnComTimeout:
+            timeout = 0
+
+            def __init__(self, conn):
+                self._conn = conn
+
+            def cursor(self):
+                vistos.append(self.timeout)
+                return self._conn.cursor()
+
+        conn = ConnComTimeout(self.conn)
+        qb = QueryBuilder(conn)
+        list(qb.execute_query_stream('SELECT Id FROM Vendas', timeout=30))
+        self.assertEqual(vistos, [30])
+        self.assertEqual(conn.timeout, 0)
+
+    def test_timeout_por_agrupamento(self):
+        import os
+        pasta = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'metadados')
+        qb = QueryBuilder(None, pasta_metadados=pasta)
+        self.assertEqual(qb.obter_timeout_agrupamento('vendas', 'default'), 600)
+        # sem valor no agrupamento: usa o padrão do arquivo
+        self.assertEqual(qb.obter_timeout_agrupamento('vendas', 'por_nomevendedor'), 300)
+
+    def test_execute_query_mantem_contrato(self):
+        cols, rows = self.qb.execute_query('SELECT Id FROM Vendas WHERE Id < ?', [3])
+        self.assertEqual(cols, ['Id'])
+        self.assertEqual([r[0] for r in rows], [0, 1, 2])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -107,6 +107,36 @@ class TestValidacaoSQL(unittest.TestCase):
         self.assertFalse(is_valid)
         self.assertIn("UNION", msg)
 
+    def test_palavras_em_literais_e_comentarios(self):
+        """Testa que literais, colchetes e comentários não são analisados"""
+        sql = "SELECT [Delete] FROM Clientes -- drop\nWHERE Nome = 'Update Ltda; exec'"
+        self.assertEqual(self.validar_sql(sql), (True, ""))
+        self.assertEqual(self.validar_sql("SELECT * FROM t WHERE a = 1;"), (True, ""))
+
+    def test_segunda_instrucao_sem_ponto_e_virgula(self):
+        """Testa que um segundo SELECT de nível 0 conta como outra statement"""
+        is_valid, msg = self.validar_sql("SELECT * FROM t WHERE a = 1 SELECT * FROM sys.sql_logins")
+        self.assertFalse(is_valid)
+        self.assertIn(";", msg)
+
+    def test_where_em_cada_ramo(self):
+        """Testa que cada ramo do UNION ALL precisa de WHERE"""
+        sql = "SELECT a FROM t WHERE 1=1 UNION ALL SELECT a FROM u"
+        self.assertEqual(self.validar_sql(sql), (False, "Falta cláusula WHERE"))
+        sql = "SELECT a FROM t WHERE 1=1 UNION ALL (SELECT a FROM u WHERE b = 2)"
+        self.assertTrue(self.validar_sql(sql)[0])
+        sql = "SELECT a FROM t WHERE a IN (SELECT b FROM u)"
+        self.assertTrue(self.validar_sql(sql)[0])
+
+    def test_veredito_em_cache_pela_impressao_digital(self):
+        """Testa que a mesma SQL (a menos de espaços e caixa) não é analisada de novo"""
+        from valida_sql import cache_vereditos
+        cache_vereditos.clear()
+        hits = cache_vereditos.hits
+        self.validar_sql("select * from Vendas where Ano = 2024")
+        self.validar_sql_for_save("SELECT *\n  FROM Vendas WHERE Ano = 2024 -- salvo")
+        self.assertEqual(cache_vereditos.hits, hits + 1)
+
 # Testes de Gerenciador de Consultas
 class TestQueryManager(unittest.TestCase):
     """Testes para gerenciador de consultas salvas"""
@@ -300,6 +330,49 @@ class TestChartGenerator(unittest.TestCase):
         
         self.assertIsNotNone(fig)
 
+    def test_sql_agregacao_encapsula_consulta(self):
+        """Testa a SQL de agregação no servidor e os casos sem encapsulamento"""
+        from chart_generator import AggregationType, montar_sql_agregacao
+
+        cols = ['Produto', 'Quantidade']
+        sql = montar_sql_agregacao("SELECT Produto, Quantidade FROM v WHERE a = ? ORDER BY Quantidade;",
+                                   cols, 'Produto', 'Quantidade', AggregationType.AVG)
+        self.assertIn("FROM (\nSELECT Produto, Quantidade FROM v WHERE a = ?\n) AS _graf", sql)
+        self.assertIn("AVG(CAST(_graf.[Quantidade] AS float))", sql)
+        self.assertIn("GROUP BY _graf.[Produto]", sql)
+        top = montar_sql_agregacao("SELECT TOP 5 Produto, Quantidade FROM v ORDER BY Quantidade DESC",
+                                   cols, 'Produto', 'Quantidade', AggregationType.SUM)
+        self.assertIn("ORDER BY Quantidade DESC\n) AS _graf", top)
+        for nao in ("WITH c AS (SELECT 1 AS x) SELECT * FROM c",
+                    "SELECT * INTO #t FROM v",
+                    "SELECT Produto FROM v; SELECT 1",
+                    "SELECT Produto, Quantidade FROM v ORDER BY CASE WHEN Produto = ? THEN 0 END"):
+            self.assertIsNone(montar_sql_agregacao(nao, cols, 'Produto', 'Quantidade', AggregationType.SUM))
+        self.assertIsNone(montar_sql_agregacao("SELECT a, a FROM v", ['a', 'a'], 'a', 'a', AggregationType.COUNT))
+
+    def test_agregacao_no_servidor_igual_ao_cliente(self):
+        """Testa que a série agregada pela SQL coincide com a agregação no cliente"""
+        import sqlite3
+        from chart_generator import AggregationType, montar_sql_agregacao
+
+        dados = [('A', 10), ('B', 3), ('A', 5), (None, 7), ('C', None), ('B', 4)]
+        conn = sqlite3.connect(':memory:')
+        conn.execute("CREATE TABLE v (Produto TEXT, Quantidade INTEGER)")
+        conn.executemany("INSERT INTO v VALUES (?, ?)", dados)
+        cols = ['Produto', 'Quantidade']
+        for agg in (AggregationType.COUNT, AggregationType.SUM, AggregationType.AVG, AggregationType.MAX):
+            sql = montar_sql_agregacao("SELECT Produto, Quantidade FROM v WHERE Quantidade > ? ORDER BY 1",
+                                       cols, 'Produto', 'Quantidade', agg)
+            servidor = self.cg.create_chart_from_aggregate(conn.execute(sql, (0,)).fetchall(),
+                                                           'Produto', 'Quantidade', agg)
+            linhas = [r for r in dados if r[1] is not None and r[1] > 0]
+            cliente = self.cg.create_chart(linhas, cols, 'Produto', 'Quantidade', agg)
+            self.assertEqual([round(b.get_height(), 6) for b in servidor.axes[0].patches],
+                             [round(b.get_height(), 6) for b in cliente.axes[0].patches])
+            self.assertEqual([t.get_text() for t in servidor.axes[0].get_xticklabels()],
+                             [t.get_text() for t in cliente.axes[0].get_xticklabels()])
+        conn.close()
+
 # Runner
 def run_tests():
     """Executa todos os testes"""
@@ -0,0 +1,105 @@
+import datetime
+import unittest
+
+from consulta_sql import QueryBuilder
+from estatisticas_colunas import (
+    CacheEstatisticas, EstatisticasColuna, coletar_estatisticas, estimar_distintos, sql_estatisticas,
+)
+
+
+def _linhas(grupos, top=20):
+    """Simula o resultado de sql_estatisticas a partir de {valor: ocorrências}."""
+    nao_nulos = [v for v in grupos if v is not None]
+    totais = (
+        sum(grupos.values()),
+        grupos.get(None, 0),
+        len(nao_nulos),
+        sum(1 for v in nao_nulos if grupos[v] == 1),
+        min(nao_nulos) if nao_nulos else None,
+        max(nao_nulos) if nao_nulos else None,
+    )
+    ordem = sorted(grupos.items(), key=lambda kv: (kv[0] is None, -kv[1]))[:top]
+    return [(v, n) + totais for v, n in ordem]
+
+
+class _Banco:
+    """Responde às consultas de coletar_estatisticas e registra o SQL recebido."""
+
+    def __init__(self, linhas_tabela, grupos, tablesample_falha=False):
+        self.linhas_tabela = linhas_tabela
+        self.grupos = grupos
+        self.tablesample_falha = tablesample_falha
+        self.sqls = []
+
+    def __call__(self, sql, params=None):
+        self.sqls.append(sql)
+        if 'sys.partitions' in sql:
+            return [(self.linhas_tabela,)]
+        if 'TABLESAMPLE' in sql and self.tablesample_falha:
+            raise RuntimeError('TABLESAMPLE não pode ser usado em views')
+        return _linhas(self.grupos)
+
+
+class TestEstatisticasColunas(unittest.TestCase):
+
+    def test_tabela_pequena_e_lida_inteira_e_exata(self):
+        banco = _Banco(6, {'SP': 3, 'RJ': 2, 'MG': 1})
+        est = coletar_estatisticas(banco, 'dbo', 'Clientes', 'UF')
+        self.assertNotIn('TABLESAMPLE', banco.sqls[-1])
+        self.assertFalse(est.amostrada)
+        self.assertEqual(est.distintos_aprox, 3)
+        self.assertEqual((est.minimo, est.maximo), ('MG', 'SP'))
+        self.assertEqual(est.valores_sugeridos(), ['SP', 'RJ', 'MG'])
+        self.assertTrue(est.todos_os_valores)
+
+    def test_tabela_grande_usa_tablesample_e_extrapola(self):
+        grupos = {i: 1 for i in range(100)}
+        grupos.update({i: 5 for i in range(100, 120)})
+        banco = _Banco(1_000_000, grupos)
+        est = coletar_estatisticas(banco, 'dbo', 'Vendas', 'CodProduto', amostra_linhas=200)
+        self.assertIn('TABLESAMPLE SYSTEM (0.04 PERCENT)', banco.sqls[-1])
+        self.assertTrue(est.amostrada)
+        self.assertEqual(est.distintos_amostra, 120)
+        # 100 valores vistos uma vez: muitos outros ficaram fora da amostra
+        self.assertEqual(est.distintos_aprox, estimar_distintos(120, 100, 200, 1_000_000))
+        self.assertGreater(est.distintos_aprox, 5000)
+
+    def test_view_cai_para_top(self):
+        banco = _Banco(None, {datetime.date(2024, 1, 1): 2, datetime.date(2024, 3, 1): 1, None: 4})
+        est = coletar_estatisticas(banco, 'dbo', 'CnsVendas', 'DataMovimento')
+        self.assertEqual((est.nulos, est.minimo, est.maximo), (4, datetime.date(2024, 1, 1), datetime.date(2024, 3, 1)))
+        self.assertEqual([v for v, _ in est.frequentes], [datetime.date(2024, 1, 1), datetime.date(2024, 3, 1)])
+        falha = _Banco(1_000_000, {'A': 1}, tablesample_falha=True)
+        coletar_estatisticas(falha, 'dbo', 'CnsVendas', 'Nome')
+        self.assertNotIn('TABLESAMPLE', falha.sqls[-1])
+        self.assertIn("FROM [dbo].[CnsVendas]", sql_estatisticas('dbo', '[CnsVendas]', 'Nome'))
+
+    def test_cache_com_validade_por_coluna(self):
+        agora = [0.0]
+        cache = CacheEstatisticas(ttl_seconds=100, clock=lambda: agora[0])
+        cache.put('texto', EstatisticasColuna())
+        cache.put('data', EstatisticasColuna(), ttl_seconds=10)
+        agora[0] = 50
+        self.assertIsNone(cache.get('data'))
+        self.assertIsNotNone(cache.get('texto'))
+
+    def test_query_builder_guarda_em_cache_e_ignora_tipos_sem_estatistica(self):
+        qb = QueryBuilder(None)
+        consultas = []
+
+        def consultar(sql, params=None):
+            consultas.append(sql)
+            return [(10,)] if 'sys.partitions' in sql else _linhas({'A': 10})
+
+        qb._consultar_metadados = consultar
+        self.assertIsNone(qb.estatisticas_coluna('dbo', 'Notas', 'Observacao', data_type='ntext'))
+        self.assertIsNone(qb.estatisticas_coluna('dbo', 'Notas', 'Cancelada', data_type='BIT'))
+        self.assertEqual(consultas, [])
+        est = qb.estatisticas_coluna('dbo', 'Notas', 'Serie', data_type='varchar')
+        self.assertIs(qb.estatisticas_coluna('dbo', 'Notas', 'serie', data_type='varchar'), est)
+        self.assertIs(qb.estatisticas_em_cache('dbo', '[Notas]', 'Serie'), est)
+        self.assertEqual(len(consultas), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,201 @@
+import unittest
+
+from paginacao import (
+    PaginadorConsulta, MODO_KEYSET, MODO_OFFSET,
+    separar_order_by, montar_sql_offset, montar_sql_keyset, montar_sql_contagem, montar_sql_previa,
+    consulta_de_tabela_unica,
+)
+
+
+class FakeServer:
+    """Simula o servidor para as consultas geradas pelo paginador."""
+
+    def __init__(self, colunas, linhas, falhar_tabela_derivada=False):
+        self.colunas = colunas
+        self.linhas = linhas
+        self.falhar_tabela_derivada = falhar_tabela_derivada
+        self.chamadas = []
+
+    def __call__(self, sql, params, timeout):
+        params = list(params or [])
+        self.chamadas.append((sql, params))
+        if 'TOP 0' in sql:
+            if self.falhar_tabela_derivada:
+                raise RuntimeError("The column 'Codigo' was specified multiple times for '_pag'")
+            return self.colunas, []
+        if 'COUNT_BIG' in sql:
+            return ['n'], [(len(self.linhas),)]
+        if 'OFFSET ? ROWS' in sql:
+            offset, tamanho = params[-2], params[-1]
+            return self.colunas, self.linhas[offset:offset + tamanho]
+        if 'TOP (?)' in sql:
+            tamanho = params[0]
+            idx = 0
+            linhas = self.linhas
+            if 'WHERE _pag.' in sql:
+                ultima = params[-1]
+                linhas = [r for r in linhas if r[idx] > ultima]
+            return self.colunas, linhas[:tamanho]
+        raise AssertionError(f"SQL inesperada: {sql}")
+
+
+class TestMontagemSql(unittest.TestCase):
+
+    def test_separa_apenas_order_by_externo(self):
+        sql = "SELECT a, (SELECT TOP 1 b FROM t ORDER BY b) AS x FROM v ORDER BY a DESC;"
+        base, order = separar_order_by(sql)
+        self.assertEqual(order, "ORDER BY a DESC")
+        self.assertIn("ORDER BY b)", base)
+
+    def test_order_by_em_literal_ignorado(self):
+        base, order = separar_order_by("SELECT 'ORDER BY x' AS t FROM v")
+        self.assertIsNone(order)
+
+    def test_offset_mantem_order_by_original(self):
+        sql = montar_sql_offset("SELECT a FROM v ORDER BY a")
+        self.assertTrue(sql.endswith("ORDER BY a\nOFFSET ? ROWS FETCH NEXT ? ROWS ONLY"))
+        sql = montar_sql_offset("SELECT a FROM v")
+        self.assertIn("ORDER BY 1", sql)
+
+    def test_offset_ordena_por_todas_as_colunas(self):
+        sql = montar_sql_offset("SELECT a, b FROM v", ['a', 'b'])
+        self.assertIn(") AS _pag\nORDER BY _pag.[a], _pag.[b]\nOFFSET", sql)
+
+    def test_offset_segue_order_by_da_consulta_com_desempate(self):
+        sql = montar_sql_offset("SELECT a, b FROM v ORDER BY b DESC", ['a', 'b'])
+        self.assertEqual(sql, "SELECT * FROM (\nSELECT a, b FROM v\n) AS _pag\n"
+                              "ORDER BY _pag.[b] DESC, _pag.[a]\nOFFSET ? ROWS FETCH NEXT ? ROWS ONLY")
+        # posição e expressão: a expressão vira coluna oculta da tabela derivada
+        sql = montar_sql_offset("SELECT a, b FROM v ORDER BY 2, YEAR(c) DESC", ['a', 'b'])
+        self.assertTrue(sql.startswith("SELECT _pag.[a], _pag.[b] FROM (\nSELECT a, b, YEAR(c) AS [_ord1] FROM v\n)"))
+        self.assertIn("ORDER BY _pag.[b], _pag.[_ord1] DESC, _pag.[a]\nOFFSET", sql)
+
+    def test_offset_com_top_mantem_order_by_dentro(self):
+        sql = montar_sql_offset(
+            "SELECT TOP 100 NumRegistro, Valor FROM dbo.Vendas WHERE x=? ORDER BY DataMovimento DESC",
+            ['NumRegistro', 'Valor'])
+        self.assertEqual(sql, (
+            "SELECT _pag.[NumRegistro], _pag.[Valor] FROM (\n"
+            "SELECT TOP 100 NumRegistro, Valor, DataMovimento AS [_ord1] FROM dbo.Vendas WHERE x=?\n"
+            "ORDER BY DataMovimento DESC\n) AS _pag\n"
+            "ORDER BY _pag.[_ord1] DESC, _pag.[NumRegistro], _pag.[Valor]\n"
+            "OFFSET ? ROWS FETCH NEXT ? ROWS ONLY"))
+        sql = montar_sql_offset("SELECT TOP 10 a, b FROM v ORDER BY b", ['a', 'b'])
+        self.assertIn("SELECT TOP 10 a, b FROM v\nORDER BY b\n) AS _pag\nORDER BY _pag.[b], _pag.[a]", sql)
+        # sem as colunas o ORDER BY continua escolhendo as linhas do TOP
+        self.assertIn("FROM v\nORDER BY b\n) AS _pag\nORDER BY 1", montar_sql_offset("SELECT TOP 10 a, b FROM v ORDER BY b"))
+
+    def test_tabela_unica(self):
+        self.assertTrue(consulta_de_tabela_unica("SELECT * FROM v WITH (NOLOCK) WHERE x IN (SELECT y FROM w) ORDER BY a"))
+        for sql in ("SELECT * FROM a INNER JOIN b ON a.k = b.k",
+                    "SELECT * FROM a, b",
+                    "SELECT * FROM a CROSS APPLY f(a.k)",
+                    "SELECT * FROM (SELECT * FROM a JOIN b ON 1=1) x",
+                    "SELECT k, COUNT(*) FROM a GROUP BY k",
+                    "SELECT k FROM a UNION ALL SELECT k FROM b"):
+            self.assertFalse(consulta_de_tabela_unica(sql), sql)
+
+    def test_offset_encapsula_select_top(self):
+        sql = montar_sql_offset("SELECT TOP 100 a FROM v")
+        self.assertTrue(sql.startswith("SELECT * FROM ("))
+
+    def test_keyset_e_contagem_removem_order_by(self):
+        sql = montar_sql_keyset("SELECT NumRegistro, a FROM v ORDER BY a", "NumRegistro", primeira=False)
+        self.assertNotIn("ORDER BY a", sql)
+        self.assertIn("WHERE _pag.[NumRegistro] > ?", sql)
+        self.assertTrue(sql.endswith("ORDER BY _pag.[NumRegistro]"))
+        self.assertNotIn("ORDER BY", montar_sql_contagem("SELECT a FROM v ORDER BY a"))
+
+    def test_previa_insere_top_apos_select(self):
+        self.assertEqual(
+            montar_sql_previa("SELECT DISTINCT a, (SELECT TOP 1 b FROM w) FROM v WHERE c = ? ORDER BY a;", 50),
+            "SELECT DISTINCT TOP (50) a, (SELECT TOP 1 b FROM w) FROM v WHERE c = ? ORDER BY a",
+        )
+        self.assertIsNone(montar_sql_previa("SELECT TOP 10 a FROM v"))
+        self.assertIsNone(montar_sql_previa("WITH x AS (SELECT 1 AS a) SELECT a FROM x"))
+        self.assertIsNone(montar_sql_previa("SELECT a FROM v", 0))
+
+
+class TestPaginadorConsulta(unittest.TestCase):
+
+    def setUp(self):
+        self.linhas = [(i, f"v{i}") for i in range(1, 26)]
+
+    def test_keyset_quando_chave_no_resultado(self):
+        srv = FakeServer(['NumRegistro', 'Valor'], self.linhas)
+        pag = PaginadorConsulta(srv, "SELECT NumRegistro, Valor FROM v WHERE x = ?", [7],
+                                tamanho_pagina=10, chaves_candidatas=['numregistro'])
+        self.assertEqual(pag.buscar_pagina(0), self.linhas[:10])
+        self.assertEqual(pag.modo, MODO_KEYSET)
+        self.assertEqual(pag.buscar_pagina(1), self.linhas[10:20])
+        sql, params = srv.chamadas[-1]
+        # TOP (?) antes dos parâmetros da consulta; última chave no fim
+        self.assertEqual(params, [10, 7, 10])
+        self.assertEqual(pag.buscar_pagina(2), self.linhas[20:])
+        self.assertTrue(pag.terminou)
+        self.assertEqual(pag.buscar_pagina(3), [])
+
+    def test_keyset_pula_para_pagina_carregando_anteriores(self):
+        srv = FakeServer(['NumRegistro', 'Valor'], self.linhas)
+        pag = PaginadorConsulta(srv, "SELECT * FROM v", tamanho_pagina=10, chaves_candidatas=['NumRegistro'])
+        self.assertEqual(pag.buscar_pagina(2), self.linhas[20:])
+
+    def test_offset_sem_chave_ou_com_colunas_repetidas(self):
+        srv = FakeServer(['NumRegistro', 'Valor'], self.linhas, falhar_tabela_derivada=True)
+        pag = PaginadorConsulta(srv, "SELECT a.NumRegistro, b.Valor FROM a JOIN b ON 1=1",
+                                tamanho_pagina=10, chaves_candidatas=['NumRegistro'])
+        self.assertEqual(pag.buscar_pagina(1), self.linhas[10:20])
+        self.assertEqual(pag.modo, MODO_OFFSET)
+        self.assertEqual(srv.chamadas[-1][1], [10, 10])
+
+    def test_keyset_so_quando_preserva_a_ordem_pedida(self):
+        for sql, modo in (("SELECT NumRegistro, Valor FROM v ORDER BY NumRegistro", MODO_KEYSET),
+                          ("SELECT NumRegistro, Valor FROM v ORDER BY Valor", MODO_OFFSET),
+                          ("SELECT NumRegistro, Valor FROM v ORDER BY NumRegistro DESC", MODO_OFFSET),
+                          ("SELECT TOP 20 NumRegistro, Valor FROM v", MODO_OFFSET)):
+            srv = FakeServer(['NumRegistro', 'Valor'], self.linhas)
+            pag = PaginadorConsulta(srv, sql, tamanho_pagina=10, chaves_candidatas=['NumRegistro'])
+            pag.buscar_pagina(0)
+            self.assertEqual(pag.modo, modo, sql)
+            if 'ORDER BY Valor' in sql:
+                self.assertIn("ORDER BY _pag.[Valor], _pag.[NumRegistro]", srv.chamadas[-1][0])
+
+    def test_chave_repetida_por_join_usa_offset(self):
+        srv = FakeServer(['NumRegistro', 'Item'], self.linhas)
+        pag = PaginadorConsulta(srv, "SELECT v.NumRegistro, i.Item FROM v JOIN i ON i.Num = v.NumRegistro",
+                                tamanho_pagina=10, chaves_candidatas=['NumRegistro'])
+        self.assertEqual(pag.buscar_pagina(1), self.linhas[10:20])
+        self.assertEqual(pag.modo, MODO_OFFSET)
+        self.assertIn("ORDER BY _pag.[NumRegistro], _pag.[Item]", srv.chamadas[-1][0])
+
+    def test_offset_volta_a_primeira_coluna_se_a_ordem_falhar(self):
+        srv = FakeServer(['Id', 'Obs'], self.linhas)
+        original = srv.__call__
+
+        def servidor(sql, params, timeout):
+            if '_pag.[Obs]' in sql:
+                raise RuntimeError("The ntext data type cannot be compared or sorted")
+            return original(sql, params, timeout)
+
+        pag = PaginadorConsulta(servidor, "SELECT Id, Obs FROM v", tamanho_pagina=10)
+        self.assertEqual(pag.buscar_pagina(0), self.linhas[:10])
+        self.assertIn("ORDER BY 1", srv.chamadas[-1][0])
+
+    def test_paginas_em_cache_e_prefetch(self):
+        srv = FakeServer(['Id', 'Valor'], self.linhas)
+        pag = PaginadorConsulta(srv, "SELECT Id, Valor FROM v", tamanho_pagina=10)
+        pag.buscar_pagina(0)
+        pag.prefetch(1)
+        chamadas = len(srv.chamadas)
+        self.assertEqual(pag.buscar_pagina(1), self.linhas[10:20])
+        self.assertEqual(len(srv.chamadas), chamadas)
+
+    def test_contar_total(self):
+        srv = FakeServer(['Id', 'Valor'], self.linhas)
+        pag = PaginadorConsulta(srv, "SELECT Id, Valor FROM v ORDER BY Id", tamanho_pagina=10, serializar=True)
+        self.assertEqual(pag.contar_total(), 25)
+        self.assertNotIn("ORDER BY", srv.chamadas[-1][0])
+
+
+if __name__ == '__main__':
+    unittest.main()
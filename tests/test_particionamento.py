@@ -0,0 +1,214 @@
+import datetime as dt
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from decimal import Decimal
+
+from authentication import ConnectionPool, LANE_METADATA, LANE_QUERY
+from consulta_sql import QueryBuilder, QueryCancelledError
+from particionamento import (
+    PlanoParticionado, MetricaParticionada, gerar_intervalos, localizar_filtro_data, combinar_parciais,
+)
+
+PASTA_METADADOS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'metadados')
+
+
+class TestIntervalos(unittest.TestCase):
+
+    def test_meses_cobrem_o_periodo(self):
+        intervalos = gerar_intervalos(dt.date(2024, 1, 15), dt.date(2024, 4, 10))
+        self.assertEqual(intervalos, [
+            (dt.date(2024, 1, 15), dt.date(2024, 2, 1)),
+            (dt.date(2024, 2, 1), dt.date(2024, 3, 1)),
+            (dt.date(2024, 3, 1), dt.date(2024, 4, 1)),
+            (dt.date(2024, 4, 1), dt.date(2024, 4, 10)),
+        ])
+
+    def test_tamanho_em_dias(self):
+        intervalos = gerar_intervalos(dt.date(2024, 1, 1), dt.date(2024, 1, 20), 7)
+        self.assertEqual([a.day for a, _ in intervalos], [1, 8, 15])
+        self.assertEqual(intervalos[-1][1], dt.date(2024, 1, 20))
+
+    def test_localiza_filtro_do_campo_mes_ano(self):
+        filtros = [
+            ("Outra BETWEEN ? AND ?", ['2024-01-01', '2024-02-01']),
+            ("CodVendedor = ?", [3]),
+            ("[dbo].[CnsVendasRefPeriodo].DataMovimento BETWEEN ? AND ?", ['2024-01-01', '2024-12-31']),
+        ]
+        indice, campo, inicio, fim, _ = localizar_filtro_data(filtros, ['DataMovimento'])
+        self.assertEqual(indice, 2)
+        self.assertEqual(campo, '[dbo].[CnsVendasRefPeriodo].DataMovimento')
+        self.assertEqual((inicio, fim), (dt.date(2024, 1, 1), dt.date(2024, 12, 31)))
+        self.assertIsNone(localizar_filtro_data(["CodVendedor = 3"], ['DataMovimento']))
+
+    def test_limites_data_e_data_hora_misturados(self):
+        filtros = [("DataMovimento BETWEEN ? AND ?", ['2025-01-01', '2025-12-31 23:59'])]
+        _, _, inicio, fim, _ = localizar_filtro_data(filtros, ['DataMovimento'])
+        self.assertEqual((inicio, fim), (dt.datetime(2025, 1, 1), dt.datetime(2025, 12, 31, 23, 59)))
+        intervalos = gerar_intervalos(inicio, fim)
+        self.assertEqual(len(intervalos), 12)
+        self.assertEqual(intervalos[-1], (dt.datetime(2025, 12, 1), dt.datetime(2025, 12, 31, 23, 59)))
+        _, _, inicio, fim, _ = localizar_filtro_data([("Data BETWEEN ? AND ?", [dt.datetime(2025, 1, 1, 8), dt.date(2025, 1, 31)])], [])
+        self.assertEqual(fim, dt.datetime(2025, 1, 31))
+
+    def test_nao_particiona_filtros_compostos(self):
+        datas = ['2024-01-01', '2024-12-31']
+        for expr in ("DataMovimento NOT BETWEEN ? AND ?",
+                     "CodVendedor = 3 OR DataMovimento BETWEEN ? AND ?",
+                     "CodVendedor = 3 AND DataMovimento BETWEEN ? AND ?",
+                     "CAST(DataMovimento AS date) BETWEEN ? AND ?"):
+            self.assertIsNone(localizar_filtro_data([(expr, datas)], ['DataMovimento']), expr)
+        self.assertIsNone(localizar_filtro_data(
+            ["DataMovimento NOT BETWEEN '2024-01-01' AND '2024-12-31'"], ['DataMovimento']))
+
+
+class TestCombinacao(unittest.TestCase):
+
+    def test_soma_contagem_min_max_e_media(self):
+        plano = PlanoParticionado(particoes=[], n_dimensoes=1, metricas=[
+            MetricaParticionada('Total', 'SUM'),
+            MetricaParticionada('N', 'COUNT'),
+            MetricaParticionada('Menor', 'MIN'),
+            MetricaParticionada('Maior', 'MAX'),
+            MetricaParticionada('Media', 'AVG'),
+        ])
+        cols = ['Vendedor', 'Total', 'N', 'Menor', 'Maior', 'Media', 'Media__n']
+        resultados = [
+            (cols, [('A', Decimal('10'), 2, 1, 9, Decimal('10'), 2), ('B', None, 0, None, None, None, 0)]),
+            (cols, [('A', Decimal('5'), 1, 0, 5, Decimal('5'), 1), ('B', Decimal('4'), 1, 4, 4, Decimal('4'), 1)]),
+        ]
+        colunas, linhas = combinar_parciais(plano, resultados)
+        self.assertEqual(colunas, ['Vendedor', 'Total', 'N', 'Menor', 'Maior', 'Media'])
+        self.assertEqual(linhas, [
+            ('A', Decimal('15'), 3, 0, 9, Decimal('5')),
+            ('B', Decimal('4'), 1, 4, 4, Decimal('4')),
+        ])
+
+
+class TestPlanejamento(unittest.TestCase):
+
+    def test_plano_do_agrupamento_default(self):
+        qb = QueryBuilder(None, pasta_metadados=PASTA_METADADOS)
+        filtros = [("[dbo].[CnsVendasRefPeriodo].DataMovimento BETWEEN ? AND ?", ['2024-01-01', '2024-12-31'])]
+        plano = qb.planejar_particoes('vendas', 'default', filtros)
+        self.assertEqual(len(plano.particoes), 12)
+        sql, params = plano.particoes[0]
+        self.assertIn("DataMovimento >= ? AND [dbo].[CnsVendasRefPeriodo].DataMovimento < ?", sql)
+        self.assertEqual(params, ['2024-01-01', '2024-02-01'])
+        # o último dia entra inteiro: < dia seguinte
+        self.assertEqual(plano.particoes[-1][1], ['2024-12-01', '2025-01-01'])
+        self.assertNotIn("<= ?", plano.particoes[-1][0])
+        self.assertEqual(plano.params_base, ['2024-01-01', '2025-01-01'])
+        self.assertEqual(plano.sql_base, qb.gerar_sql_por_agrupamento('vendas', 'default', filtros)[0])
+
+    def test_sem_filtro_de_data_nao_particiona(self):
+        qb = QueryBuilder(None, pasta_metadados=PASTA_METADADOS)
+        self.assertIsNone(qb.planejar_particoes('vendas', 'default', [("CodVendedor = ?", [1])]))
+
+    def test_media_gerada_como_soma_e_contagem(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            with open(os.path.join(pasta, 'm.json'), 'w', encoding='utf-8') as f:
+                f.write('{"modulo": "m", "tabelas": {}}')
+            with open(os.path.join(pasta, 'm_agrupamentos.json'), 'w', encoding='utf-8') as f:
+                f.write('{"agrupamentos": [{"id": "a", "tabela": "T", "dimensoes": ["X"],'
+                        ' "metricas": [{"campo": "V", "funcao": "AVG", "label": "Media"}]}]}')
+            qb = QueryBuilder(None, pasta_metadados=pasta)
+            sql, _ = qb.gerar_sql_por_agrupamento('m', 'a', metricas_parciais=True)
+        self.assertIn("SUM(V) AS [Media]", sql)
+        self.assertIn("COUNT(V) AS [Media__n]", sql)
+
+
+class TestExecucaoParticionada(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.db = os.path.join(self._tmp.name, 'vendas.db')
+        conn = sqlite3.connect(self.db)
+        conn.execute("CREATE TABLE Vendas (Mes INTEGER, Vendedor TEXT, Valor REAL)")
+        conn.executemany("INSERT INTO Vendas VALUES (?, ?, ?)",
+                         [(m, v, float(m * 10 + i)) for m in range(1, 7) for i, v in enumerate(['A', 'B', 'A'])])
+        conn.commit()
+        conn.close()
+        self.ativas = 0
+        self.pico = 0
+        self._lock = threading.Lock()
+        self.pool = ConnectionPool(self._factory, lanes={LANE_METADATA: (0, 1), LANE_QUERY: (0, 2)}, checkout_timeout=5)
+        self.qb = QueryBuilder(pool=self.pool)
+
+    def tearDown(self):
+        self.pool.close()
+        self._tmp.cleanup()
+
+    def _factory(self):
+        teste = self
+
+        class Conn:
+            def __init__(self):
+                self._conn = sqlite3.connect(teste.db, check_same_thread=False)
+
+            def cursor(self):
+                cur = self._conn.cursor()
+                with teste._lock:
+                    teste.ativas += 1
+                    teste.pico = max(teste.pico, teste.ativas)
+
+                class Cur:
+                    description = property(lambda s: cur.description)
+
+                    def execute(s, *a):
+                        return cur.execute(*a)
+
+                    def fetchmany(s, n):
+                        return cur.fetchmany(n)
+
+                    def close(s):
+                        with teste._lock:
+                            teste.ativas -= 1
+                        cur.close()
+
+                return Cur()
+
+            def rollback(self):
+                self._conn.rollback()
+
+            def close(self):
+                self._conn.close()
+
+        return Conn()
+
+    def _plano(self, intervalos):
+        sql = "SELECT Vendedor, SUM(Valor) AS Total, COUNT(Valor) AS N FROM Vendas WHERE Mes >= ? AND Mes < ? GROUP BY Vendedor ORDER BY Vendedor"
+        return PlanoParticionado(
+            particoes=[(sql, [a, b]) for a, b in intervalos],
+            n_dimensoes=1,
+            metricas=[MetricaParticionada('Total', 'SUM'), MetricaParticionada('N', 'COUNT')],
+        )
+
+    def test_resultado_igual_ao_serial_e_respeita_limite(self):
+        plano = self._plano([(1, 3), (3, 5), (5, 7)])
+        colunas, linhas = self.qb.executar_particionado(plano, max_concorrencia=8)
+        self.assertEqual(colunas, ['Vendedor', 'Total', 'N'])
+        esperado = {'A': (sum(m * 10 + i for m in range(1, 7) for i in (0, 2)), 12),
+                    'B': (sum(m * 10 + 1 for m in range(1, 7)), 6)}
+        self.assertEqual({v: (t, n) for v, t, n in linhas}, esperado)
+        # a fila de consultas tem 2 conexões: no máximo 2 partições ao mesmo tempo
+        self.assertLessEqual(self.pico, 2)
+
+    def test_erro_em_uma_particao(self):
+        plano = self._plano([(1, 3), (3, 5)])
+        plano.particoes.append(("SELECT * FROM TabelaInexistente", []))
+        with self.assertRaises(sqlite3.OperationalError):
+            self.qb.executar_particionado(plano)
+
+    def test_cancelamento(self):
+        from consulta_sql import QueryCancelToken
+        token = QueryCancelToken()
+        token.cancel()
+        with self.assertRaises(QueryCancelledError):
+            self.qb.executar_particionado(self._plano([(1, 3), (3, 5)]), cancel_token=token)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import datetime as dt
+import os
+import tempfile
+import unittest
+
+from compilador_agrupamentos import compilar_agrupamento, referencias_sql
+from particionamento import intervalo_semiaberto
+from saved_queries import QueryManager
+from periodos import (
+    RotuladorPeriodos, expressao_periodo, inicio_periodo, periodos_do_agrupamento, rotulo_periodo,
+)
+
+
+class TestPeriodos(unittest.TestCase):
+
+    def test_inicio_e_rotulo_de_cada_periodo(self):
+        d = dt.datetime(2025, 11, 13, 15, 30)  # quinta-feira
+        self.assertEqual(inicio_periodo(d, 'dia'), dt.date(2025, 11, 13))
+        self.assertEqual(inicio_periodo(d, 'semana'), dt.date(2025, 11, 10))
+        self.assertEqual(inicio_periodo(d, 'mes_ano'), dt.date(2025, 11, 1))
+        self.assertEqual(inicio_periodo(d, 'trimestre'), dt.date(2025, 10, 1))
+        self.assertEqual(inicio_periodo('2025-11-13', 'ano'), dt.date(2025, 1, 1))
+        self.assertEqual(rotulo_periodo(dt.date(2025, 11, 1), 'mes_ano'), '2025-11')
+        self.assertEqual(rotulo_periodo(dt.date(2025, 11, 10), 'semana'), '2025-W46')
+        # semana ISO: 29/12/2025 é a semana 1 de 2026
+        self.assertEqual(rotulo_periodo(dt.date(2025, 12, 29), 'semana'), '2026-W01')
+        self.assertEqual(rotulo_periodo('2025-10-01', 'trimestre'), '2025-T4')
+        self.assertEqual(rotulo_periodo(dt.date(2025, 1, 1), 'ano'), '2025')
+        # o dia continua data (formato das preferências)
+        self.assertEqual(rotulo_periodo(dt.date(2025, 11, 13), 'dia'), dt.date(2025, 11, 13))
+        self.assertIsNone(rotulo_periodo(None, 'mes_ano'))
+        with self.assertRaises(ValueError):
+            expressao_periodo('v.Data', 'hora')
+
+    def test_semana_do_servidor_comeca_na_segunda(self):
+        # DATEADD(DAY, -(DATEDIFF(DAY, '19000101', c) % 7), c) reproduzido em Python
+        base = dt.date(1900, 1, 1)
+        for n in range(400):
+            d = dt.date(2024, 12, 1) + dt.timedelta(days=n)
+            servidor = d - dt.timedelta(days=(d - base).days % 7)
+            self.assertEqual(servidor, inicio_periodo(d, 'semana'))
+        self.assertIn("DATEDIFF(DAY, '19000101', v.Data) % 7", expressao_periodo('v.Data', 'semana'))
+
+    def test_rotulador_aplicado_apos_a_agregacao(self):
+        agrupamento = {'dimensoes': [{'campo': 'Data', 'tipo': 'trimestre'}, 'Serie',
+                                     {'campo': 'Data', 'tipo': 'dia'}]}
+        self.assertEqual(periodos_do_agrupamento(agrupamento), {'Trimestre': 'trimestre', 'Dia': 'dia'})
+        rotular = RotuladorPeriodos(periodos_do_agrupamento(agrupamento))
+        linhas = [(dt.date(2025, 4, 1), 'A', dt.date(2025, 4, 3), 10)]
+        self.assertEqual(rotular(['trimestre', 'Serie', 'Dia', 'Total'], linhas),
+                         [('2025-T2', 'A', dt.date(2025, 4, 3), 10)])
+        # sem coluna de período: as mesmas linhas, sem cópia
+        self.assertIs(rotular(['Serie', 'Total'], linhas), linhas)
+        self.assertFalse(RotuladorPeriodos({'Dia': 'dia'}))
+
+    def test_periodos_salvos_com_a_consulta(self):
+        agrupamento = {'dimensoes': [{'campo': 'Data', 'tipo': 'mes_ano'}, {'campo': 'Data', 'tipo': 'trimestre'}]}
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, 'consultas.json')
+            rotular = RotuladorPeriodos(periodos_do_agrupamento(agrupamento))
+            QueryManager(caminho).add_query('Vendas 12/2025', 'SELECT ...', periodos=rotular.periodos)
+            QueryManager(caminho).add_query('Sem períodos', 'SELECT 1')
+            carregadas = QueryManager(caminho)
+            consulta = carregadas.get_query('Vendas 12/2025')
+            self.assertIsNone(carregadas.get_query('Sem períodos').periodos)
+        rotular = RotuladorPeriodos(consulta.periodos)
+        linhas = [(dt.date(2025, 12, 1), dt.date(2025, 10, 1), 10)]
+        self.assertEqual(rotular(['MesAno', 'Trimestre', 'Total'], linhas), [('2025-12', '2025-T4', 10)])
+
+    def test_between_de_datas_vira_intervalo_semiaberto(self):
+        self.assertEqual(intervalo_semiaberto(("v.Data BETWEEN ? AND ?", ['2024-01-01', '2024-02-29'])),
+                         ("v.Data >= ? AND v.Data < ?", ['2024-01-01', '2024-03-01']))
+        self.assertEqual(intervalo_semiaberto(("v.Data BETWEEN ? AND ?", [dt.date(2024, 12, 1), dt.date(2024, 12, 31)])),
+                         ("v.Data >= ? AND v.Data < ?", [dt.date(2024, 12, 1), dt.date(2025, 1, 1)]))
+        self.assertEqual(intervalo_semiaberto("Data BETWEEN '2024-01-01' AND '2024-01-31'"),
+                         "Data >= '2024-01-01' AND Data < '2024-02-01'")
+        # com hora, texto não ISO ou outro filtro: sem alteração
+        com_hora = ("Data BETWEEN ? AND ?", ['2024-01-01 08:00', '2024-01-31 18:00'])
+        self.assertIs(intervalo_semiaberto(com_hora), com_hora)
+        self.assertEqual(intervalo_semiaberto("Data BETWEEN '12-01-2025' AND '12-31-2025'"),
+                         "Data BETWEEN '12-01-2025' AND '12-31-2025'")
+        self.assertEqual(intervalo_semiaberto(("Serie = ?", ['A'])), ("Serie = ?", ['A']))
+
+    def test_filtros_compostos_nao_sao_reescritos(self):
+        datas = ['2024-01-01', '2024-01-31']
+        for expr in ("v.Data NOT BETWEEN ? AND ?",
+                     "Serie = 'A' OR v.Data BETWEEN ? AND ?",
+                     "Serie = 'A' AND v.Data BETWEEN ? AND ?",
+                     "NOT v.Data BETWEEN ? AND ?"):
+            filtro = (expr, datas)
+            self.assertIs(intervalo_semiaberto(filtro), filtro, expr)
+        literal = "Serie = 'A' OR Data BETWEEN '2024-01-01' AND '2024-01-31'"
+        self.assertEqual(intervalo_semiaberto(literal), literal)
+        self.assertEqual(intervalo_semiaberto("[v].[Data Mov] BETWEEN '2024-01-01' AND '2024-01-31'"),
+                         "[v].[Data Mov] >= '2024-01-01' AND [v].[Data Mov] < '2024-02-01'")
+
+    def test_periodos_no_agrupamento_sem_desligar_a_poda(self):
+        agrupamento = {
+            'id': 's', 'tabela': 'dbo.Vendas',
+            'dimensoes': [{'campo': 'Data', 'tipo': 'semana'}],
+            'metricas': [{'campo': 'Valor', 'funcao': 'SUM', 'label': 'Total'}],
+            'joins': [{'tabela': 'dbo.Clientes', 'tipo': 'left', 'on': 'Vendas.CodCli = Clientes.CodCli'}],
+        }
+        modulo = {'tabelas': {'Vendas': {'tipo': 'principal', 'campos': [{'campo': 'Data'}, {'campo': 'Valor'}]},
+                              'Clientes': {'chave_primaria': ['CodCli']}}}
+        self.assertEqual(referencias_sql("DATEADD(DAY, -1, Data)", frozenset({'data'})), set())
+        sql, _ = compilar_agrupamento(agrupamento, {('dbo', 'Vendas'): 'v'}, modulo_meta=modulo).montar()
+        self.assertIn("CAST(v.Data AS date)) AS Semana", sql)
+        self.assertNotIn("FORMAT(", sql)
+        self.assertNotIn("JOIN", sql)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import os
+import unittest
+
+from consulta_sql import QueryBuilder
+from plano_execucao import (
+    CacheEstimativas, LimitesEstimativa, analisar_showplan, avaliar_estimativa, descrever_estimativa,
+    NIVEL_OK, NIVEL_CONFIRMAR, NIVEL_BLOQUEAR,
+)
+
+PASTA_PLANOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'planos')
+
+
+def _ler_plano(nome):
+    with open(os.path.join(PASTA_PLANOS, nome), encoding='utf-8') as f:
+        return f.read()
+
+
+class TestAnaliseShowplan(unittest.TestCase):
+
+    def test_linhas_custo_e_indices_ausentes(self):
+        est = analisar_showplan(_ler_plano('vendas_indice_ausente.xml'))
+        self.assertEqual(est.linhas_estimadas, 2450000)
+        self.assertAlmostEqual(est.custo_estimado, 184.372)
+        # ordenados pelo impacto
+        self.assertEqual([i.tabela for i in est.indices_ausentes], ['[dbo].[Movimento]', '[dbo].[MovimentoItens]'])
+        self.assertEqual(est.indices_ausentes[0].igualdade, ['[CodEmpresa]'])
+        self.assertEqual(est.indices_ausentes[1].incluidas, ['[CodVendedor]', '[TotalProduto]'])
+        self.assertEqual(
+            est.indices_ausentes[1].sugestao_sql(),
+            "CREATE NONCLUSTERED INDEX [IX_sugerido] ON [dbo].[MovimentoItens] ([DataMovimento]) INCLUDE ([CodVendedor], [TotalProduto])",
+        )
+        self.assertEqual(est.avisos, ['PlanAffectingConvert', 'NoJoinPredicate'])
+        self.assertIn('Linhas estimadas: 2,450,000', descrever_estimativa(est))
+
+    def test_lote_com_varias_instrucoes(self):
+        est = analisar_showplan(_ler_plano('lote_com_duas_instrucoes.xml'))
+        self.assertEqual(est.linhas_estimadas, 1)
+        self.assertAlmostEqual(est.custo_estimado, 0.0032842)
+        self.assertEqual(est.indices_ausentes, [])
+
+    def test_xml_invalido(self):
+        with self.assertRaises(ValueError):
+            analisar_showplan('<ShowPlanXML')
+
+    def test_limites(self):
+        est = analisar_showplan(_ler_plano('vendas_indice_ausente.xml'))
+        self.assertEqual(avaliar_estimativa(est, LimitesEstimativa())[0], NIVEL_CONFIRMAR)
+        nivel, motivos = avaliar_estimativa(est, LimitesEstimativa(bloquear_custo=100))
+        self.assertEqual(nivel, NIVEL_BLOQUEAR)
+        self.assertEqual(len(motivos), 1)
+        self.assertEqual(avaliar_estimativa(est, LimitesEstimativa(confirmar_linhas=0, confirmar_custo=None))[0], NIVEL_OK)
+
+
+class _CursorShowplan:
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._linhas = []
+
+    def execute(self, sql, params=None):
+        self.conn.comandos.append(sql)
+        if sql.startswith('SET SHOWPLAN_XML'):
+            self.conn.showplan = sql.endswith('ON')
+            self._linhas = []
+        elif self.conn.showplan:
+            self._linhas = [(_ler_plano('vendas_indice_ausente.xml'),)]
+        else:
+            raise AssertionError("consulta executada sem SHOWPLAN")
+
+    def fetchall(self):
+        linhas, self._linhas = self._linhas, []
+        return linhas
+
+    def nextset(self):
+        return False
+
+    def close(self):
+        pass
+
+
+class _ConexaoShowplan:
+
+    def __init__(self):
+        self.comandos = []
+        self.showplan = False
+
+    def cursor(self):
+        return _CursorShowplan(self)
+
+
+class TestEstimarPlano(unittest.TestCase):
+
+    def test_estimativa_em_cache_por_sql(self):
+        conn = _ConexaoShowplan()
+        qb = QueryBuilder(conn, plan_cache=CacheEstimativas())
+        sql = "SELECT CodVendedor, SUM(TotalProduto) FROM Vendas WHERE DataMovimento BETWEEN ? AND ? GROUP BY CodVendedor"
+        est = qb.estimar_plano(sql, ['2024-01-01', '2024-12-31'])
+        self.assertEqual(est.linhas_estimadas, 2450000)
+        self.assertEqual(conn.comandos, ['SET SHOWPLAN_XML ON', sql, 'SET SHOWPLAN_XML OFF'])
+        self.assertFalse(conn.showplan)
+        # mesma SQL (só muda a formatação): não compila de novo
+        qb.estimar_plano(sql.replace(' FROM', '\n  FROM'), ['2024-01-01', '2024-12-31'])
+        self.assertEqual(len(conn.comandos), 3)
+        qb.estimar_plano(sql, ['2023-01-01', '2023-12-31'])
+        self.assertEqual(len(conn.comandos), 6)
+
+    def test_cache_expira(self):
+        agora = [0.0]
+        cache = CacheEstimativas(ttl_seconds=10, clock=lambda: agora[0])
+        est = analisar_showplan(_ler_plano('lote_com_duas_instrucoes.xml'))
+        cache.put('k', est)
+        self.assertIs(cache.get('k'), est)
+        agora[0] = 11
+        self.assertIsNone(cache.get('k'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import threading
+import time
+import unittest
+
+from PyQt5.QtCore import QCoreApplication
+from PyQt5.QtWidgets import QApplication
+
+from catalogo import SchemaCatalog
+from prefetch_metadados import CacheMetadados, PrefetcherMetadados
+
+
+class _QBFalso:
+    """QueryBuilder mínimo: conta as consultas e pode segurar a thread de trabalho."""
+
+    def __init__(self, pool=True):
+        self.pool = object() if pool else None
+        self.schema_catalog = None
+        self.consultas = []
+        self.liberar = threading.Event()
+        self.liberar.set()
+
+    def get_table_columns(self, schema, table):
+        self.liberar.wait(5)
+        self.consultas.append(('colunas', table, threading.current_thread().name))
+        if table == 'Quebrada':
+            raise RuntimeError('sem permissão')
+        return [f'{table}.Id']
+
+    def get_primary_keys(self, schema, table):
+        return ['Id']
+
+    def get_foreign_keys(self, schema, table):
+        return []
+
+
+class TestPrefetcherMetadados(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls._app = QApplication.instance() or QApplication([])
+
+    def _aguardar(self, condicao, limite=5.0):
+        inicio = time.time()
+        while not condicao() and time.time() - inicio < limite:
+            QCoreApplication.processEvents()
+            time.sleep(0.005)
+        self.assertTrue(condicao())
+
+    def setUp(self):
+        self.qb = _QBFalso()
+        self.cache = CacheMetadados()
+        self.prefetcher = PrefetcherMetadados(self.qb, self.cache)
+        self.carregados = []
+        self.falhas = []
+        self.prefetcher.carregado.connect(lambda s, t: self.carregados.append((s, t)))
+        self.prefetcher.falhou.connect(lambda s, t, m: self.falhas.append((t, m)))
+
+    def tearDown(self):
+        self.prefetcher.encerrar()
+
+    def test_carrega_em_segundo_plano_e_entrega_por_sinal(self):
+        self.qb.liberar.clear()
+        self.assertIsNone(self.prefetcher.obter('dbo', 'Vendas'))
+        # pedidos repetidos enquanto pendente não geram outra consulta
+        self.assertFalse(self.prefetcher.solicitar('dbo', 'Vendas'))
+        self.assertTrue(self.prefetcher.pendente('dbo', 'Vendas'))
+        self.qb.liberar.set()
+        self._aguardar(lambda: self.carregados)
+        self.assertEqual(self.carregados, [('dbo', 'Vendas')])
+        self.assertTrue(self.qb.consultas[0][2].startswith('prefetch-metadados'))
+        meta = self.prefetcher.obter('dbo', '[Vendas]')
+        self.assertEqual((meta.colunas, meta.pks), (['Vendas.Id'], ['Id']))
+        self.assertEqual(self.cache.colunas['dbo.vendas'], ['Vendas.Id'])
+        self.assertEqual(len(self.qb.consultas), 1)
+
+    def test_falha_e_anunciada(self):
+        self.prefetcher.solicitar('dbo', 'Quebrada')
+        self._aguardar(lambda: self.falhas)
+        self.assertEqual(self.falhas, [('Quebrada', 'sem permissão')])
+        self.assertFalse(self.prefetcher.pendente('dbo', 'Quebrada'))
+
+    def test_catalogo_em_memoria_e_sem_pool_sao_sincronos(self):
+        self.qb.schema_catalog = SchemaCatalog.from_rows([('dbo', 'Clientes', 'U')], [])
+        self.assertIsNotNone(self.prefetcher.obter('dbo', 'Clientes'))
+        sem_pool = PrefetcherMetadados(_QBFalso(pool=False), CacheMetadados())
+        self.assertEqual(sem_pool.obter('dbo', 'Itens').colunas, ['Itens.Id'])
+        self.assertFalse(sem_pool.solicitar('dbo', 'Outra'))
+        sem_pool.encerrar()
+
+
+if __name__ == '__main__':
+    unittest.main()
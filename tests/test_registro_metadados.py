@@ -0,0 +1,68 @@
+import json
+import os
+import tempfile
+import unittest
+
+from consulta_sql import QueryBuilder
+from registro_metadados import RegistroMetadados
+
+
+class TestRegistroMetadados(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.pasta = self._tmp.name
+        self._gravar('m.json', {'modulo': 'm', 'tabelas': {
+            'Vendas': {'campos': {'padrao': [{'campo': 'DataMovimento', 'tipo': 'date'}], 'avancado': ['Serie']}},
+        }})
+        self._gravar('m_agrupamentos.json', {'agrupamentos': [
+            {'id': 'a', 'tabela': 'Vendas'}, {'id': 'b', 'tabela': 'Itens'},
+        ]})
+        self.registro = RegistroMetadados(self.pasta)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _gravar(self, nome, dados, mtime=None):
+        caminho = os.path.join(self.pasta, nome)
+        with open(caminho, 'w', encoding='utf-8') as f:
+            json.dump(dados, f)
+        if mtime is not None:
+            os.utime(caminho, (mtime, mtime))
+
+    def test_le_uma_vez_e_indexa(self):
+        self.assertIs(self.registro.agrupamentos('m'), self.registro.agrupamentos('m'))
+        self.assertEqual(self.registro.agrupamento('m', 'b')['tabela'], 'Itens')
+        self.assertIsNone(self.registro.agrupamento('m', 'x'))
+        self.assertEqual(self.registro.campo('m', 'datamovimento'), ('Vendas', {'campo': 'DataMovimento', 'tipo': 'date'}))
+        self.assertEqual(self.registro.campo('m', 'SERIE')[0], 'Vendas')
+        self.assertEqual(self.registro.leituras, 2)
+
+    def test_relê_quando_o_arquivo_muda(self):
+        self._gravar('m_agrupamentos.json', {'agrupamentos': [{'id': 'a'}]}, mtime=1_000_000)
+        self.assertIsNotNone(self.registro.agrupamento('m', 'a'))
+        # mesmo mtime, tamanho diferente
+        self._gravar('m_agrupamentos.json', {'agrupamentos': [{'id': 'a'}, {'id': 'c'}]}, mtime=1_000_000)
+        self.assertIsNotNone(self.registro.agrupamento('m', 'c'))
+        self.assertEqual(self.registro.leituras, 2)
+        os.remove(os.path.join(self.pasta, 'm_agrupamentos.json'))
+        with self.assertRaises(FileNotFoundError):
+            self.registro.agrupamentos('m')
+
+    def test_estrutura_invalida(self):
+        self._gravar('r_agrupamentos.json', {'agrupamentos': [{'tabela': 'T'}]})
+        with self.assertRaises(ValueError):
+            self.registro.agrupamentos('r')
+
+    def test_query_builder_usa_o_registro(self):
+        qb = QueryBuilder(None, pasta_metadados=self.pasta)
+        for _ in range(5):
+            qb.gerar_sql_por_agrupamento('m', 'a')
+            qb.obter_timeout_agrupamento('m', 'a')
+        self.assertEqual(qb.metadados.leituras, 2)
+        with self.assertRaises(ValueError):
+            qb.gerar_sql_por_agrupamento('m', 'x')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import os
+import time
+import unittest
+
+from catalogo import SchemaCatalog, ForeignKey
+from consulta_sql import QueryBuilder
+from relacionamentos import GrafoRelacionamentos
+
+PLANILHA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        'Planilhas', 'Identificar relacionamentos.csv')
+
+TABELAS = [('dbo', t, 'U ') for t in ('Clientes', 'Pedidos', 'Itens', 'Produtos', 'Log')]
+FKS = [
+    ('FK_Pedidos_Clientes', 'dbo', 'Pedidos', 'CodCliente', 'dbo', 'Clientes', 'CodCliente'),
+    # FK composta
+    ('FK_Itens_Pedidos', 'dbo', 'Itens', 'CodEmpresa', 'dbo', 'Pedidos', 'CodEmpresa'),
+    ('FK_Itens_Pedidos', 'dbo', 'Itens', 'NumPedido', 'dbo', 'Pedidos', 'NumPedido'),
+    ('FK_Itens_Produtos', 'dbo', 'Itens', 'CodProduto', 'dbo', 'Produtos', 'CodProduto'),
+]
+
+
+class TestGrafoRelacionamentos(unittest.TestCase):
+
+    def setUp(self):
+        self.grafo = GrafoRelacionamentos.from_foreign_keys(
+            ForeignKey(constraint_name=r[0], fk_schema=r[1], fk_table=r[2], fk_column=r[3],
+                       pk_schema=r[4], pk_table=r[5], pk_column=r[6]) for r in FKS)
+
+    def test_fk_composta_vira_uma_aresta(self):
+        self.assertEqual(self.grafo.total_relacionamentos, 3)
+        rel, = self.grafo.relacoes_diretas(('dbo', 'Pedidos'), 'itens')
+        self.assertEqual(rel.condicao_on(),
+                         "[dbo].[Itens].[CodEmpresa] = [dbo].[Pedidos].[CodEmpresa] AND "
+                         "[dbo].[Itens].[NumPedido] = [dbo].[Pedidos].[NumPedido]")
+        self.assertEqual(self.grafo.relacoes_diretas('Clientes', 'Produtos'), [])
+
+    def test_arvore_inclui_tabelas_intermediarias(self):
+        passos = self.grafo.arvore_juncao([('dbo', 'Clientes'), ('dbo', 'Produtos'), ('dbo', 'Log')])
+        self.assertEqual([(p.tabela, p.intermediaria) for p in passos], [
+            ('Clientes', False), ('Pedidos', True), ('Itens', True), ('Produtos', False), ('Log', False),
+        ])
+        # cada JOIN usa uma tabela já presente; Log não tem caminho
+        self.assertEqual(passos[1].relacionamento.constraint_name, 'FK_Pedidos_Clientes')
+        self.assertEqual(passos[3].relacionamento.constraint_name, 'FK_Itens_Produtos')
+        self.assertIsNone(passos[4].relacionamento)
+
+    def test_planilha_de_relacionamentos(self):
+        grafo = GrafoRelacionamentos.from_csv(PLANILHA)
+        self.assertGreater(grafo.total_relacionamentos, 400)
+        caminho = grafo.caminho('Agenda', 'AgendaEventosProdutos')
+        self.assertEqual([r.fk_table for r in caminho], ['AgendaEventos', 'AgendaEventosProdutos'])
+        inicio = time.perf_counter()
+        passos = grafo.arvore_juncao([('dbo', 'NotaSaida'), ('dbo', 'Clientes'), ('dbo', 'Produtos'), ('dbo', 'Agenda')])
+        self.assertLess(time.perf_counter() - inicio, 0.5)
+        self.assertEqual(passos[0].tabela, 'NotaSaida')
+
+
+class TestQueryBuilderRelacionamentos(unittest.TestCase):
+
+    def setUp(self):
+        self.qb = QueryBuilder(None)
+        self.qb.schema_catalog = SchemaCatalog.from_rows(TABELAS, [], [], FKS)
+
+    def test_build_query_usa_fk_com_qualquer_tabela_anterior(self):
+        sql = self.qb.build_query([('dbo', 'Clientes'), ('dbo', 'Produtos'), ('dbo', 'Pedidos')], [])
+        self.assertIn("JOIN [dbo].[Produtos] ON 1=1", sql)
+        self.assertIn("JOIN [dbo].[Pedidos] ON [dbo].[Pedidos].[CodCliente] = [dbo].[Clientes].[CodCliente]", sql)
+
+    def test_build_query_completa_o_caminho(self):
+        sql = self.qb.build_query([('dbo', 'Clientes'), ('dbo', 'Produtos')], [], auto_join_path=True)
+        self.assertEqual(sql.splitlines()[1:], [
+            "FROM [dbo].[Clientes]",
+            "JOIN [dbo].[Pedidos] ON [dbo].[Pedidos].[CodCliente] = [dbo].[Clientes].[CodCliente]",
+            "JOIN [dbo].[Itens] ON [dbo].[Itens].[CodEmpresa] = [dbo].[Pedidos].[CodEmpresa]"
+            " AND [dbo].[Itens].[NumPedido] = [dbo].[Pedidos].[NumPedido]",
+            "JOIN [dbo].[Produtos] ON [dbo].[Itens].[CodProduto] = [dbo].[Produtos].[CodProduto]",
+        ])
+
+    def test_sugestao_de_on_para_o_dialogo(self):
+        on = self.qb.sugerir_on([('dbo', 'Clientes'), ('dbo', 'Produtos')], ('dbo', 'Itens'))
+        self.assertEqual(on, "[dbo].[Itens].[CodProduto] = [dbo].[Produtos].[CodProduto]")
+        self.assertIsNone(self.qb.sugerir_on([('dbo', 'Clientes')], ('dbo', 'Log')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from consulta_sql import QueryBuilder
+from result_cache import ResultCache, gerar_chave, normalizar_sql
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class RecordingLogger:
+    def __init__(self):
+        self.entries = []
+
+    def log(self, action, message='', data=None):
+        self.entries.append((action, data))
+
+
+class TestNormalizacao(unittest.TestCase):
+
+    def test_espacos_comentarios_e_ponto_e_virgula(self):
+        a = "SELECT  a,\n       b -- colunas\nFROM [dbo].[Vendas] /* tabela */ ;"
+        b = "SELECT a, b FROM [dbo].[Vendas]"
+        self.assertEqual(normalizar_sql(a), b)
+
+    def test_literais_preservados(self):
+        sql = "SELECT 'a  --  b' AS [x  y] WHERE c = 'it''s'"
+        self.assertEqual(normalizar_sql(sql), sql)
+
+    def test_chave_considera_parametros_e_banco(self):
+        sql = "SELECT * FROM Vendas WHERE Ano = ?"
+        base = gerar_chave(sql, [2025], 'srv/db')
+        self.assertEqual(base, gerar_chave(sql + '  ', [2025], 'srv/db'))
+        self.assertNotEqual(base, gerar_chave(sql, [2024], 'srv/db'))
+        self.assertNotEqual(base, gerar_chave(sql, ['2025'], 'srv/db'))
+        self.assertNotEqual(base, gerar_chave(sql, [2025], 'srv/outro'))
+
+
+class TestResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.logger = RecordingLogger()
+
+    def test_hit_miss_e_log(self):
+        cache = ResultCache(ttl_seconds=60, logger=self.logger, clock=self.clock)
+        self.assertIsNone(cache.get('k'))
+        cache.put('k', ['A'], [(1,), (2,)])
+        self.assertEqual(cache.get('k'), (['A'], [(1,), (2,)]))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual([a for a, _ in self.logger.entries], ['result_cache_miss', 'result_cache_hit'])
+
+    def test_ttl_expira(self):
+        cache = ResultCache(ttl_seconds=60, clock=self.clock)
+        cache.put('k', ['A'], [(1,)])
+        self.clock.now += 61
+        self.assertIsNone(cache.get('k'))
+        self.assertEqual(cache.stats()['entries'], 0)
+
+    def test_lru_respeita_orcamento_de_memoria(self):
+        linhas = [(i, f'{i:05d}' + 'x' * 100) for i in range(200)]  # ~25 KB por entrada
+        cache = ResultCache(max_memory_mb=0.06, clock=self.clock)
+        cache.put('a', ['I', 'S'], linhas)
+        cache.put('b', ['I', 'S'], linhas)
+        self.assertIsNotNone(cache.get('a'))  # 'a' passa a ser a mais recente
+        cache.put('c', ['I', 'S'], linhas)
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+        self.assertLessEqual(cache.stats()['memory_bytes'], cache.max_memory_bytes)
+
+    def test_descartadas_vao_para_o_disco(self):
+        linhas = [(i, f'{i:05d}' + 'x' * 100) for i in range(200)]
+        with tempfile.TemporaryDirectory() as d:
+            cache = ResultCache(max_memory_mb=0.03, spill_dir=d, clock=self.clock)
+            cache.put('a', ['I', 'S'], linhas)
+            cache.put('b', ['I', 'S'], linhas)
+            self.assertTrue(os.path.exists(os.path.join(d, 'a.pkl')))
+            self.assertEqual(cache.get('a'), (['I', 'S'], linhas))
+            # a entrada lida volta para a memória e o arquivo é removido
+            self.assertFalse(os.path.exists(os.path.join(d, 'a.pkl')))
+
+
+class TestQueryBuilderComCache(unittest.TestCase):
+
+    def setUp(self):
+        self.conn = sqlite3.connect(':memory:')
+        self.conn.execute("CREATE TABLE Vendas (Id INTEGER, Valor REAL)")
+        self.conn.executemany("INSERT INTO Vendas VALUES (?, ?)", [(i, i * 1.5) for i in range(10)])
+        self.cache = ResultCache(ttl_seconds=60)
+        self.qb = QueryBuilder(self.conn, result_cache=self.cache, db_identity='mem/test')
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_segunda_execucao_vem_do_cache(self):
+        sql = "SELECT COUNT(*) AS N FROM Vendas"
+        self.assertEqual(self.qb.execute_query(sql)[1][0][0], 10)
+        self.conn.execute("INSERT INTO Vendas VALUES (99, 0)")
+        self.assertEqual(self.qb.execute_query(sql)[1][0][0], 10)
+        # forçar atualização ignora o cache e grava o novo resultado
+        self.assertEqual(self.qb.execute_query(sql, force_refresh=True)[1][0][0], 11)
+        self.assertEqual(self.qb.execute_query(sql)[1][0][0], 11)
+
+    def test_stream_grava_e_reaproveita_em_lotes(self):
+        sql = "SELECT Id FROM Vendas ORDER BY Id"
+        primeira = list(self.qb.execute_query_stream(sql, batch_size=4))
+        self.assertEqual(self.cache.misses, 1)
+        segunda = list(self.qb.execute_query_stream(sql, batch_size=4))
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual([len(l) for _, l in segunda], [4, 4, 2])
+        self.assertEqual([tuple(r) for _, l in primeira for r in l], [r for _, l in segunda for r in l])
+
+    def test_cache_separado_por_usuario(self):
+        sql = "SELECT COUNT(*) AS N FROM Vendas"
+        self.assertEqual(self.qb.execute_query(sql)[1][0][0], 10)
+        self.conn.execute("INSERT INTO Vendas VALUES (99, 0)")
+        # mesmo banco e mesma SQL, outro login: não usa o resultado do primeiro
+        outro = QueryBuilder(self.conn, result_cache=self.cache, db_identity='mem/test/2')
+        self.assertEqual(outro.execute_query(sql)[1][0][0], 11)
+
+    def test_stream_interrompido_nao_grava(self):
+        sql = "SELECT Id FROM Vendas"
+        gen = self.qb.execute_query_stream(sql, batch_size=4)
+        next(gen)
+        gen.close()
+        self.assertEqual(self.cache.stats()['entries'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,182 @@
+import datetime as dt
+import os
+import sqlite3
+import tempfile
+import unittest
+from decimal import Decimal
+
+import numpy as np
+
+from chart_generator import ChartGenerator, AggregationType
+from consulta_sql import QueryBuilder
+from result_set import (
+    ResultSet, KIND_INT, KIND_FLOAT, KIND_DECIMAL, KIND_STRING, KIND_DATETIME, KIND_OBJECT,
+)
+
+
+class TestResultSet(unittest.TestCase):
+
+    def test_tipos_e_mascara_de_nulos(self):
+        rs = ResultSet(['Id', 'Nome', 'Valor', 'Data'])
+        rs.extend([
+            (1, 'Ana', Decimal('10.50'), dt.datetime(2025, 1, 2, 3, 4)),
+            (2, None, Decimal('3'), None),
+        ])
+        self.assertEqual(rs.kinds, [KIND_INT, KIND_STRING, KIND_DECIMAL, KIND_DATETIME])
+        self.assertEqual(rs.column('Id').values.dtype, np.int64)
+        self.assertEqual(rs.column('Nome').mask.tolist(), [False, True])
+        self.assertEqual(rs[1], (2, None, 3.0, None))
+        self.assertEqual(rs.value(0, 3), dt.datetime(2025, 1, 2, 3, 4))
+
+    def test_decimais_como_inteiros_escalados(self):
+        rs = ResultSet(['Valor'])
+        rs.extend([(Decimal('10.5'),), (None,), (3,)])
+        rs.extend([(Decimal('0.125'),), (Decimal('12345678901234.99'),)])
+        col = rs.column('Valor')
+        self.assertEqual((col.kind, col.scale, col.values.dtype), (KIND_DECIMAL, 3, np.int64))
+        self.assertEqual(col.values.tolist(), [10500, 0, 3000, 125, 12345678901234990])
+        valores = [v for (v,) in rs]
+        self.assertTrue(all(isinstance(v, Decimal) for v in valores if v is not None))
+        self.assertEqual(valores, [Decimal('10.5'), None, Decimal('3'), Decimal('0.125'),
+                                   Decimal('12345678901234.99')])
+        self.assertEqual(rs.value(4, 0), Decimal('12345678901234.990'))
+        self.assertEqual(rs.argsort(0).tolist(), [3, 2, 0, 4, 1])
+        self.assertTrue(np.isnan(col.to_numpy()[1]))
+        # sem espaço em int64 para a escala: a coluna guarda os Decimal
+        rs2 = ResultSet(['V'], [(Decimal('99999999999999999'),)])
+        rs2.extend([(Decimal('0.01'),)])
+        self.assertEqual(rs2.kinds, [KIND_OBJECT])
+        self.assertEqual(list(rs2), [(Decimal('99999999999999999'),), (Decimal('0.01'),)])
+
+    def test_textos_codificados_em_dicionario(self):
+        rs = ResultSet(['Vendedor'], [('Ana',), ('Bia',), ('Ana',), ('Ana',)])
+        col = rs.column('Vendedor')
+        self.assertEqual(col.categories, ['Ana', 'Bia'])
+        self.assertEqual(col.values.tolist(), [0, 1, 0, 0])
+
+    def test_colunas_nulas_no_inicio_e_promocao(self):
+        rs = ResultSet(['A', 'B'])
+        rs.extend([(None, 1), (None, 2)])
+        rs.extend([(5, 2.5), (6, 'x')])
+        self.assertEqual(rs.kinds, [KIND_INT, KIND_OBJECT])
+        self.assertEqual(list(rs), [(None, 1), (None, 2), (5, 2.5), (6, 'x')])
+        rs2 = ResultSet(['N'], [(1,), (2.5,)])
+        self.assertEqual(rs2.kinds, [KIND_FLOAT])
+
+    def test_crescimento_em_lotes(self):
+        rs = ResultSet(['I'])
+        for start in range(0, 5000, 700):
+            rs.extend([(i,) for i in range(start, min(start + 700, 5000))])
+        self.assertEqual(len(rs), 5000)
+        self.assertEqual(rs.column('I').values.sum(), sum(range(5000)))
+        self.assertEqual(rs[10:13], [(10,), (11,), (12,)])
+
+    def test_argsort_nulos_ao_final(self):
+        rs = ResultSet(['Nome', 'V'], [('b', 2), (None, None), ('a', 3), ('c', 1)])
+        self.assertEqual(rs.argsort(0).tolist(), [2, 0, 3, 1])
+        self.assertEqual(rs.argsort(1, descending=True).tolist(), [2, 0, 3, 1])
+
+    def test_to_pandas(self):
+        rs = ResultSet(['Cidade', 'Valor', 'Qtd'], [('Z', 1.0, 1), ('A', None, 2), ('Z', 3.0, None)])
+        df = rs.to_pandas()
+        self.assertEqual(str(df['Cidade'].dtype), 'category')
+        self.assertEqual(list(df['Cidade'].cat.categories), ['A', 'Z'])
+        self.assertTrue(np.isnan(df['Valor'][1]))
+        self.assertEqual(str(df['Qtd'].dtype), 'float64')
+        # sem nulos, o DataFrame usa o próprio array do ResultSet
+        df2 = rs.to_pandas(['Cidade'])
+        self.assertEqual(list(df2.columns), ['Cidade'])
+
+    def test_linhas_de_tamanho_errado(self):
+        rs = ResultSet(['A', 'B'])
+        with self.assertRaises(ValueError):
+            rs.extend([(1,)])
+
+    def test_from_cursor(self):
+        conn = sqlite3.connect(':memory:')
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1 AS a, 'x' AS b UNION ALL SELECT 2, 'y'")
+            rs = ResultSet.from_cursor(cur, batch_size=1)
+        finally:
+            conn.close()
+        self.assertEqual(rs.columns, ['a', 'b'])
+        self.assertEqual(list(rs), [(1, 'x'), (2, 'y')])
+
+
+class TestResultSetEmDisco(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.dir = self._tmp.name
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_ultrapassa_limite_e_grava_em_arquivos_mapeados(self):
+        rs = ResultSet(['Id', 'Nome', 'Valor', 'Data'], spill_dir=self.dir, spill_threshold_bytes=20000)
+        linhas = [(i, f'nome {i}' if i % 7 else None, i / 4, dt.date(2025, 1, 1 + i % 28)) for i in range(3000)]
+        for i in range(0, 3000, 500):
+            rs.extend(linhas[i:i + 500])
+        self.assertTrue(rs.spilled)
+        self.assertEqual(rs.memory_bytes(), 0)
+        self.assertIsInstance(rs.column('Valor').values, np.memmap)
+        self.assertEqual(list(rs), linhas)
+        self.assertEqual(rs.value(2999, 1), 'nome 2999')
+        self.assertEqual(rs.argsort(1)[:2].tolist(), [1, 10])
+        self.assertEqual(rs.to_pandas(['Valor'])['Valor'].sum(), sum(r[2] for r in linhas))
+        pasta = rs.storage_dir
+        rs.close()
+        self.assertFalse(os.path.exists(pasta))
+
+    def test_textos_em_disco_ordenados_pelos_bytes(self):
+        textos = ['', 'a', 'ab', 'ção', 'Zoo', 'cliente 10', 'cliente 2', 'cliente 10 b', 'cliente\x00', None]
+        linhas = [(textos[(i * 7) % len(textos)],) for i in range(500)]
+        rs = ResultSet(['T'], linhas, spill_dir=self.dir, spill_threshold_bytes=0)
+        em_memoria = ResultSet(['T'], linhas)
+        self.assertTrue(rs.spilled)
+        for desc in (False, True):
+            self.assertEqual(rs.argsort(0, descending=desc).tolist(),
+                             em_memoria.argsort(0, descending=desc).tolist())
+        serie = rs.to_pandas()['T']
+        self.assertEqual(list(serie.cat.categories), sorted(t for t in textos if t is not None))
+        self.assertTrue(serie.equals(em_memoria.to_pandas()['T']))
+        rs.close()
+
+    def test_promocao_de_tipo_em_disco(self):
+        rs = ResultSet(['A'], spill_dir=self.dir, spill_threshold_bytes=0)
+        rs.extend([(None,), (1,)])
+        rs.extend([(2.5,), ('x',)])
+        self.assertTrue(rs.spilled)
+        self.assertEqual(list(rs), [(None,), (1,), (2.5,), ('x',)])
+
+    def test_query_builder_usa_pasta_da_sessao(self):
+        conn = sqlite3.connect(':memory:')
+        conn.execute("CREATE TABLE Vendas (Id INTEGER, Cliente TEXT)")
+        conn.executemany("INSERT INTO Vendas VALUES (?, ?)", [(i, f'c{i % 10}') for i in range(2000)])
+        qb = QueryBuilder(conn, spill_dir=self.dir, spill_threshold_mb=0.01)
+        try:
+            rs = qb.execute_query_result_set("SELECT Id, Cliente FROM Vendas ORDER BY Id", batch_size=300)
+            self.assertEqual(len(rs), 2000)
+            self.assertTrue(rs.spilled)
+            self.assertTrue(rs.storage_dir.startswith(qb.pasta_sessao()))
+            self.assertEqual(rs[1999], (1999, 'c9'))
+            rs.close()
+        finally:
+            qb.limpar_resultados_em_disco()
+            conn.close()
+        self.assertEqual(os.listdir(self.dir), [])
+
+
+class TestConsumidores(unittest.TestCase):
+
+    def test_grafico_a_partir_do_result_set(self):
+        rs = ResultSet(['Cat', 'Val'], [('A', Decimal('10')), ('B', Decimal('20')), ('A', Decimal('5'))])
+        fig = ChartGenerator().create_chart(rs, rs.columns, 'Cat', 'Val', AggregationType.SUM)
+        self.assertIsNotNone(fig)
+        bars = fig.axes[0].patches
+        self.assertEqual(sorted(round(b.get_height()) for b in bars), [15, 20])
+
+
+if __name__ == '__main__':
+    unittest.main()
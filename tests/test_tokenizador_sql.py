@@ -0,0 +1,67 @@
+import unittest
+
+from compilador_agrupamentos import parse_table_ident
+from tokenizador_sql import (
+    PALAVRA, TEXTO, DELIMITADO, clausulas, extrair_clausula, impressao_digital, nomes_compostos,
+    normalizar, qualificar_colunas, substituir_nomes, tokenizar, texto_tokens,
+)
+
+SQL = (
+    "WITH c AS (SELECT a FROM t WHERE x = 1)\n"
+    "SELECT [a]]b].Col, 'it''s -- não é comentário' AS txt -- comentário\n"
+    "FROM c WITH (NOLOCK) /* WHERE */\n"
+    "WHERE c.a = N'group by' AND y IN (SELECT z FROM w WHERE q = 1)\n"
+    "GROUP BY a HAVING COUNT(*) > 1 ORDER BY 1"
+)
+
+
+class TestTokenizador(unittest.TestCase):
+
+    def test_literais_identificadores_e_comentarios(self):
+        tokens = tokenizar(SQL)
+        textos = [t.texto for t in tokens]
+        self.assertIn("'it''s -- não é comentário'", textos)
+        self.assertIn("N'group by'", textos)
+        self.assertNotIn('comentário', textos)
+        self.assertEqual([t.tipo for t in tokens if t.texto == '[a]]b]'], [DELIMITADO])
+        self.assertEqual(tokens[0].tipo, PALAVRA)
+        self.assertEqual(SQL[tokens[5].inicio:tokens[5].fim], tokens[5].texto)
+        self.assertEqual([t.tipo for t in tokenizar("x = 'aberto")][-1], TEXTO)
+
+    def test_clausulas_de_nivel_zero(self):
+        tokens = tokenizar(SQL)
+        nomes = [c.nome for c in clausulas(tokens)]
+        self.assertEqual(nomes, ['WITH', 'SELECT', 'FROM', 'WHERE', 'GROUP BY', 'HAVING', 'ORDER BY'])
+        self.assertEqual(extrair_clausula(SQL), "c.a = N'group by' AND y IN (SELECT z FROM w WHERE q = 1)")
+        self.assertEqual(extrair_clausula("SELECT 1 FROM t"), '')
+        dois = clausulas(tokenizar("SELECT 1 FROM a; SELECT 2 UNION ALL SELECT 3"))
+        self.assertEqual([(c.nome, c.instrucao) for c in dois],
+                         [('SELECT', 0), ('FROM', 0), ('SELECT', 1), ('UNION ALL', 1), ('SELECT', 1)])
+        self.assertEqual(texto_tokens("SELECT 1", tokenizar("SELECT 1"), 1, 2), '1')
+
+    def test_nomes_compostos_e_substituicao(self):
+        sql = "[dbo].[Fato].Cod = Dim.Cod AND ISNULL(x.y, 0) > 0 AND 'Dim.Cod' <> ''"
+        self.assertEqual([n.partes for n in nomes_compostos(tokenizar(sql))],
+                         [('dbo', 'Fato', 'Cod'), ('Dim', 'Cod'), ('x', 'y')])
+        trocado = substituir_nomes(sql, lambda p, t: f"d.{p[-1]}" if p[-2:-1] == ('Dim',) else None)
+        self.assertEqual(trocado, "[dbo].[Fato].Cod = d.Cod AND ISNULL(x.y, 0) > 0 AND 'Dim.Cod' <> ''")
+        self.assertEqual(parse_table_ident('[dbo].[Minha.Tabela]'), ('dbo', 'Minha.Tabela'))
+        self.assertEqual(parse_table_ident('Vendas'), ('dbo', 'Vendas'))
+
+    def test_qualificar_colunas(self):
+        where = "Valor > 0 AND v.Valor < 'Valor' AND [valor] = ISNULL(Valor, 0) -- Valor"
+        self.assertEqual(
+            qualificar_colunas(where, 'v', ['Valor']),
+            "v.Valor > 0 AND v.Valor < 'Valor' AND v.[valor] = ISNULL(v.Valor, 0) -- Valor",
+        )
+        self.assertEqual(qualificar_colunas(where, None, ['Valor']), where)
+
+    def test_normalizacao_e_impressao_digital(self):
+        self.assertEqual(normalizar("SELECT  a,\n b -- x\nFROM t /* y */ ; ;"), "SELECT a, b FROM t")
+        self.assertEqual(normalizar("SELECT a/*x*/FROM t"), "SELECT a FROM t")
+        self.assertEqual(impressao_digital("select a from t;"), impressao_digital("SELECT a\nFROM t"))
+        self.assertNotEqual(impressao_digital("SELECT 'a'"), impressao_digital("SELECT 'A'"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+
+from consulta_sql import QueryBuilder, QueryCancelToken
+from valores_distintos import CachePaginasDistintos, PaginaValores, escapar_like, sql_pagina_distintos
+
+NOMES = sorted([f"Cliente {i:05d}" for i in range(1000)] + ['Zeca_1', 'Zeca%2'])
+
+
+class _Banco:
+    """Executa as páginas sobre uma lista ordenada, como o SQL Server faria."""
+
+    def __init__(self):
+        self.consultas = []
+
+    def __call__(self, sql, params=None, timeout=None, cancel_token=None):
+        self.consultas.append((sql, list(params or [])))
+        valores = NOMES
+        for p in params or []:
+            if p.endswith('%'):
+                prefixo = p[:-1].replace('\\', '')
+                valores = [v for v in valores if v.lower().startswith(prefixo.lower())]
+            else:
+                valores = [v for v in valores if v > p]
+        offset = int(sql.split('OFFSET ')[1].split()[0])
+        fetch = int(sql.split('FETCH NEXT ')[1].split()[0])
+        yield ['v'], [(v,) for v in valores[offset:offset + fetch]]
+
+
+class TestValoresDistintos(unittest.TestCase):
+
+    def setUp(self):
+        self.qb = QueryBuilder(None)
+        self.banco = _Banco()
+        self.qb.executar_sql_em_lotes = self.banco
+
+    def test_sql_com_prefixo_escapado(self):
+        sql, params = sql_pagina_distintos('dbo', 'Clientes', 'Nome', 'a_b', offset=400, tamanho=200)
+        self.assertIn("[Nome] LIKE ? ESCAPE '\\'", sql)
+        self.assertTrue(sql.endswith("ORDER BY [Nome] OFFSET 400 ROWS FETCH NEXT 201 ROWS ONLY"))
+        self.assertEqual(params, ['a\\_b%'])
+        self.assertEqual(escapar_like('50%[x]'), '50\\%\\[x]')
+
+    def test_paginas_seguem_pelo_ultimo_valor(self):
+        p0 = self.qb.pagina_valores_distintos('dbo', 'Clientes', 'Nome', numero=0, tamanho=100)
+        p1 = self.qb.pagina_valores_distintos('dbo', 'Clientes', 'Nome', numero=1, tamanho=100)
+        self.assertEqual((p0.valores[0], p1.valores[0]), ('Cliente 00000', 'Cliente 00100'))
+        self.assertTrue(p1.tem_mais)
+        self.assertIn('OFFSET 0 ROWS', self.banco.consultas[1][0])
+        self.assertEqual(self.banco.consultas[1][1], ['Cliente 00099'])
+        # sem a página anterior em cache, OFFSET
+        self.qb.pagina_valores_distintos('dbo', 'Clientes', 'Nome', numero=5, tamanho=100)
+        self.assertIn('OFFSET 500 ROWS', self.banco.consultas[2][0])
+        self.qb.pagina_valores_distintos('dbo', 'Clientes', 'Nome', numero=0, tamanho=100)
+        self.assertEqual(len(self.banco.consultas), 3)
+
+    def test_prefixo_mais_longo_sai_do_cache(self):
+        pagina = self.qb.pagina_valores_distintos('dbo', 'Clientes', 'Nome', 'Ze')
+        self.assertEqual(pagina.valores, ['Zeca%2', 'Zeca_1'])
+        self.assertFalse(pagina.tem_mais)
+        derivada = self.qb.pagina_valores_distintos('dbo', 'Clientes', 'Nome', 'Zeca_')
+        self.assertEqual(derivada.valores, ['Zeca_1'])
+        self.assertEqual(len(self.banco.consultas), 1)
+
+    def test_cache_lru(self):
+        cache = CachePaginasDistintos(max_paginas=2)
+        for n in range(3):
+            cache.put('c', 'x', n, PaginaValores([n], True))
+        self.assertIsNone(cache.get('c', 'x', 0))
+        self.assertEqual(cache.ultimo_valor('c', 'x', 2), (2,))
+
+    def test_token_cancelado_nao_consulta(self):
+        qb = QueryBuilder(None)
+        token = QueryCancelToken()
+        token.cancel()
+        with self.assertRaises(Exception):
+            qb.pagina_valores_distintos('dbo', 'Clientes', 'Nome', cancel_token=token)
+
+
+if __name__ == '__main__':
+    unittest.main()
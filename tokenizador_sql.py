@@ -0,0 +1,349 @@
+"""
+Tokenizador de T-SQL e estrutura leve de consultas para CSData Studio
+
+A troca de tabelas por aliases, a extração do WHERE e a normalização da
+SQL eram feitas por expressões regulares espalhadas (consulta_sql,
+main.py, result_cache), cada uma percorrendo o texto de novo e errando
+em identificadores entre colchetes, literais e comentários — por exemplo,
+qualificando uma coluna dentro de 'texto' ou dentro de [Nome Composto].
+
+Aqui a SQL é percorrida uma vez por `tokenizar`, que separa:
+
+- literais ('...', N'...', com '' como escape);
+- identificadores delimitados ([...], com ]] como escape, e "...");
+- palavras (identificadores simples e palavras-chave), variáveis (@x),
+  números e símbolos.
+
+Espaços e comentários (-- e /* */) não viram tokens: ficam no intervalo
+entre um token e o seguinte, que é onde a normalização põe um espaço.
+A lista de tokens de cada texto é guardada (LRU), de modo que validar,
+extrair o WHERE e calcular a impressão digital da mesma SQL a percorrem
+uma vez só.
+
+Sobre a lista de tokens, em tempo linear:
+
+- `nomes_compostos` agrupa nomes de uma a quatro partes (schema.tabela.coluna);
+- `substituir_nomes` reescreve nomes compostos (troca por aliases);
+- `qualificar_colunas` prefixa colunas simples com o alias da tabela;
+- `clausulas` divide cada instrução nas cláusulas de nível 0 (SELECT,
+  FROM, WHERE, GROUP BY...), ignorando subconsultas entre parênteses;
+- `extrair_clausula` devolve o texto de uma cláusula (ex.: o WHERE);
+- `normalizar` e `impressao_digital` geram a forma canônica e o hash
+  usados como chave de cache.
+"""
+import hashlib
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+# tipos de token
+TEXTO = 'texto'
+DELIMITADO = 'delimitado'
+NUMERO = 'numero'
+VARIAVEL = 'variavel'
+PALAVRA = 'palavra'
+SIMBOLO = 'simbolo'
+
+IDENTIFICADORES = frozenset((PALAVRA, DELIMITADO))
+DEFAULT_MAX_TEXTOS = 128
+
+# cada casamento: espaços/comentários (ignorados) seguidos de um token
+_RE_TOKEN = re.compile(
+    r"""
+    (?:\s+|--[^\n]*|/\*.*?(?:\*/|\Z))*
+    (?:
+    (?P<palavra>(?![Nn]')[^\W\d][\w$#@]*|\#[\w$#@]*)
+    |(?P<texto>[Nn]?'[^']*(?:''[^']*)*'?)
+    |(?P<delimitado>\[[^\]]*(?:\]\][^\]]*)*\]?|"[^"]*(?:""[^"]*)*"?)
+    |(?P<numero>0[xX][0-9A-Fa-f]*|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+    |(?P<variavel>@@?[\w$#@]*)
+    |(?P<simbolo><>|!=|!<|!>|<=|>=|\|\||.)
+    |\Z
+    )
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+# palavras que iniciam uma cláusula de nível 0; as compostas aparecem pela primeira palavra
+_INICIO_CLAUSULA = {
+    'SELECT': None, 'FROM': None, 'WHERE': None, 'HAVING': None, 'WITH': None,
+    'GROUP': 'BY', 'ORDER': 'BY', 'OPTION': None, 'INTO': None,
+    'UNION': None, 'EXCEPT': None, 'INTERSECT': None,
+}
+
+PALAVRAS_CHAVE = frozenset("""
+    ADD ALL ALTER AND ANY AS ASC BETWEEN BY CASE CAST CONVERT CREATE CROSS DELETE DESC
+    DISTINCT DROP ELSE END EXCEPT EXEC EXECUTE EXISTS FETCH FOR FROM FULL GROUP HAVING IN
+    INNER INSERT INTERSECT INTO IS JOIN LEFT LIKE MERGE NEXT NOT NULL OFFSET ON OPTION OR
+    ORDER OUTER OVER PARTITION PERCENT RIGHT ROWS SELECT SET THEN TOP TRUNCATE UNION UPDATE
+    VALUES WHEN WHERE WITH ONLY APPLY NOLOCK
+""".split())
+
+
+class Token(NamedTuple):
+    tipo: str
+    texto: str
+    inicio: int
+
+    @property
+    def fim(self) -> int:
+        return self.inicio + len(self.texto)
+
+    @property
+    def palavra(self) -> str:
+        """Texto em maiúsculas quando é uma palavra simples; '' nos demais tipos."""
+        return self.texto.upper() if self.tipo == PALAVRA else ''
+
+
+def tokenizar(sql: str) -> Tuple[Token, ...]:
+    """Tokens de `sql`, sem espaços e comentários (guardados por texto, em LRU)."""
+    if not sql:
+        return ()
+    return _tokenizar(sql)
+
+
+@lru_cache(maxsize=DEFAULT_MAX_TEXTOS)
+def _tokenizar(sql: str) -> Tuple[Token, ...]:
+    tokens = []
+    for m in _RE_TOKEN.finditer(sql):
+        tipo = m.lastgroup
+        if tipo is not None:
+            tokens.append(Token(tipo, m.group(tipo), m.start(tipo)))
+    return tuple(tokens)
+
+
+def limpar_cache():
+    _tokenizar.cache_clear()
+    _impressao_digital.cache_clear()
+
+
+def valor_identificador(token: Token) -> str:
+    """Nome sem delimitadores: [a]]b] -> a]b, "x" -> x, Tabela -> Tabela."""
+    t = token.texto
+    if token.tipo == DELIMITADO and t:
+        if t[0] == '[':
+            return t[1:-1 if t.endswith(']') else None].replace(']]', ']')
+        return t[1:-1 if len(t) > 1 and t.endswith('"') else None].replace('""', '"')
+    return t
+
+
+@dataclass(frozen=True)
+class NomeComposto:
+    """Nome de uma a quatro partes nos tokens [ini, fim)."""
+    partes: Tuple[str, ...]
+    ini: int
+    fim: int
+
+
+def nomes_compostos(tokens: Sequence[Token]) -> Iterator[NomeComposto]:
+    """Nomes (identificadores ligados por '.') na ordem em que aparecem.
+
+    Palavras-chave não iniciam nomes; um nome seguido de '(' é função e
+    também é ignorado.
+    """
+    i = 0
+    n = len(tokens)
+    while i < n:
+        tok = tokens[i]
+        if tok.tipo not in IDENTIFICADORES or tok.palavra in PALAVRAS_CHAVE:
+            i += 1
+            continue
+        # nome depois de '.' solto (ex.: 'x'.metodo) não é início de nome
+        if i > 0 and tokens[i - 1].texto == '.':
+            i += 1
+            continue
+        partes = [valor_identificador(tok)]
+        j = i + 1
+        while j + 1 < n and tokens[j].texto == '.' and tokens[j + 1].tipo in IDENTIFICADORES:
+            partes.append(valor_identificador(tokens[j + 1]))
+            j += 2
+        if j < n and tokens[j].texto == '(':
+            i = j
+            continue
+        yield NomeComposto(tuple(partes), i, j)
+        i = j
+
+
+def partes_nome(texto: str) -> Tuple[str, ...]:
+    """Partes do primeiro nome em `texto` ('[dbo].Vendas' -> ('dbo', 'Vendas'))."""
+    for nome in nomes_compostos(tokenizar(texto)):
+        return nome.partes
+    return ()
+
+
+def nome_unico(texto: str) -> Optional[Tuple[str, ...]]:
+    """Partes do nome quando `texto` é só um nome composto; None para expressões."""
+    tokens = tokenizar(texto)
+    for nome in nomes_compostos(tokens):
+        if nome.ini == 0 and nome.fim == len(tokens):
+            return nome.partes
+        break
+    return None
+
+
+def substituir_nomes(
+    sql: str,
+    trocar: Callable[[Tuple[str, ...], str], Optional[str]],
+    tokens: Optional[Sequence[Token]] = None,
+) -> str:
+    """Reescreve os nomes compostos.
+
+    `trocar(partes, texto)` recebe as partes sem delimitadores e o texto
+    original do nome e devolve o novo texto, ou None para manter.
+    """
+    if not sql:
+        return sql
+    tokens = tokenizar(sql) if tokens is None else tokens
+    out = []
+    ultimo = 0
+    for nome in nomes_compostos(tokens):
+        ini = tokens[nome.ini].inicio
+        fim = tokens[nome.fim - 1].fim
+        novo = trocar(nome.partes, sql[ini:fim])
+        if novo is None:
+            continue
+        out.append(sql[ultimo:ini])
+        out.append(novo)
+        ultimo = fim
+    if not out:
+        return sql
+    out.append(sql[ultimo:])
+    return ''.join(out)
+
+
+def qualificar_colunas(sql: str, alias: Optional[str], colunas: Iterable[str]) -> str:
+    """Prefixa com `alias.` as colunas simples (sem tabela) cujo nome está em `colunas`.
+
+    Literais, comentários, nomes já qualificados e funções não são alterados.
+    """
+    if not sql or not alias:
+        return sql
+    alvo = {str(c).lower() for c in colunas if c}
+    if not alvo:
+        return sql
+
+    def trocar(partes, texto):
+        if len(partes) == 1 and partes[0].lower() in alvo:
+            return f"{alias}.{texto}"
+        return None
+
+    return substituir_nomes(sql, trocar)
+
+
+@dataclass(frozen=True)
+class Clausula:
+    """Cláusula de nível 0: `nome` ('SELECT', 'GROUP BY'...), tokens [ini, fim)."""
+    nome: str
+    ini: int
+    fim: int
+    instrucao: int
+
+
+def clausulas(tokens: Sequence[Token]) -> List[Clausula]:
+    """Cláusulas de nível 0 de cada instrução (separadas por ';'), em uma passada.
+
+    O corpo de uma cláusula vai do token seguinte à palavra-chave até a
+    próxima cláusula; o que está entre parênteses (subconsultas, CTEs)
+    pertence à cláusula em que aparece.
+    """
+    resultado: List[Clausula] = []
+    profundidade = 0
+    instrucao = 0
+    atual: Optional[Tuple[str, int]] = None
+    # WITH só abre cláusula (CTE) no início da instrução; depois é dica de tabela
+    inicio_instrucao = True
+    n = len(tokens)
+    i = 0
+    while i < n:
+        tok = tokens[i]
+        primeiro, inicio_instrucao = inicio_instrucao, False
+        if tok.tipo == SIMBOLO:
+            if tok.texto == '(':
+                profundidade += 1
+            elif tok.texto == ')':
+                profundidade = max(0, profundidade - 1)
+            elif profundidade == 0 and tok.texto == ';':
+                if atual:
+                    resultado.append(Clausula(atual[0], atual[1], i, instrucao))
+                    atual = None
+                instrucao += 1
+                inicio_instrucao = True
+        elif profundidade == 0 and tok.tipo == PALAVRA and tok.palavra in _INICIO_CLAUSULA \
+                and (primeiro or tok.palavra != 'WITH'):
+            nome = tok.palavra
+            fim_palavra = i + 1
+            segunda = _INICIO_CLAUSULA[nome]
+            if segunda or nome == 'UNION':
+                if i + 1 < n and tokens[i + 1].palavra == (segunda or 'ALL'):
+                    nome = f"{nome} {tokens[i + 1].palavra}"
+                    fim_palavra = i + 2
+                elif segunda:
+                    i += 1
+                    continue
+            if atual:
+                resultado.append(Clausula(atual[0], atual[1], i, instrucao))
+            atual = (nome, fim_palavra)
+            i = fim_palavra
+            continue
+        i += 1
+    if atual:
+        resultado.append(Clausula(atual[0], atual[1], n, instrucao))
+    return resultado
+
+
+def texto_tokens(sql: str, tokens: Sequence[Token], ini: int, fim: int) -> str:
+    """Trecho original de `sql` do token `ini` ao token `fim - 1` (com os comentários internos)."""
+    if ini >= fim:
+        return ''
+    return sql[tokens[ini].inicio:tokens[fim - 1].fim]
+
+
+def extrair_clausula(sql: str, nome: str = 'WHERE') -> str:
+    """Texto (sem a palavra-chave) da primeira cláusula `nome` de nível 0; '' se não houver."""
+    tokens = tokenizar(sql)
+    alvo = nome.upper()
+    for c in clausulas(tokens):
+        if c.nome == alvo:
+            return texto_tokens(sql, tokens, c.ini, c.fim)
+    return ''
+
+
+def normalizar(sql: str, tokens: Optional[Sequence[Token]] = None) -> str:
+    """Remove comentários, colapsa espaços e descarta o ';' final.
+
+    Literais e identificadores delimitados ficam exatamente como escritos.
+    """
+    if not sql:
+        return ''
+    tokens = tokenizar(sql) if tokens is None else tokens
+    return _juntar(tokens, [t.texto for t in tokens])
+
+
+def _juntar(tokens: Sequence[Token], textos: List[str]) -> str:
+    """Junta `textos` (um por token) com um espaço onde havia espaço ou comentário."""
+    fim = len(tokens)
+    while fim and tokens[fim - 1].texto == ';':
+        fim -= 1
+    out = []
+    anterior = None
+    for k in range(fim):
+        tok = tokens[k]
+        if anterior is not None and tok.inicio > anterior:
+            out.append(' ')
+        out.append(textos[k])
+        anterior = tok.fim
+    return ''.join(out)
+
+
+def impressao_digital(sql: str, tokens: Optional[Sequence[Token]] = None) -> str:
+    """Hash (sha1) da SQL normalizada, com as palavras-chave em maiúsculas."""
+    if tokens is None:
+        return _impressao_digital(sql or '')
+    textos = [t.texto.upper() if t.palavra in PALAVRAS_CHAVE else t.texto for t in tokens]
+    return hashlib.sha1(_juntar(tokens, textos).encode('utf-8')).hexdigest()
+
+
+@lru_cache(maxsize=DEFAULT_MAX_TEXTOS)
+def _impressao_digital(sql: str) -> str:
+    return impressao_digital(sql, tokenizar(sql))
@@ -0,0 +1,71 @@
+"""Micro-benchmark da geração de SQL por agrupamento.
+
+Cria agrupamentos sintéticos com N joins, N dimensões e N métricas e mede,
+por chamada de `gerar_sql_por_agrupamento` com aliases e filtros:
+
+- compilando: o modelo é refeito a cada chamada (como era antes do cache);
+- em cache: o modelo compilado é reaproveitado e só o WHERE é montado.
+
+Uso: python tools/bench_agrupamentos.py [repeticoes]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from consulta_sql import QueryBuilder
+
+TAMANHOS = (1, 5, 10, 20, 40, 80)
+
+
+def agrupamento_sintetico(n: int) -> dict:
+    joins = [
+        {"tabela": f"dbo.Dim{i}", "on": f"dbo.Fato.CodDim{i} = dbo.Dim{i}.CodDim{i}"}
+        for i in range(n)
+    ]
+    dimensoes = [{"campo": f"Nome{i}", "tabela": f"Dim{i}"} for i in range(n)]
+    dimensoes.append({"campo": "DataMovimento", "tipo": "mes_ano"})
+    metricas = [{"campo": f"Valor{i}", "funcao": "SUM", "label": f"Total {i}"} for i in range(n)]
+    return {"id": f"n{n}", "tabela": "dbo.Fato", "dimensoes": dimensoes, "metricas": metricas, "joins": joins}
+
+
+def medir(fn, repeticoes: int) -> float:
+    """Microssegundos por chamada."""
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        fn()
+    return (time.perf_counter() - inicio) / repeticoes * 1e6
+
+
+def main(repeticoes: int = 2000):
+    with tempfile.TemporaryDirectory() as pasta:
+        with open(os.path.join(pasta, 'bench.json'), 'w', encoding='utf-8') as f:
+            json.dump({"modulo": "bench", "tabelas": {}}, f)
+        with open(os.path.join(pasta, 'bench_agrupamentos.json'), 'w', encoding='utf-8') as f:
+            json.dump({"agrupamentos": [agrupamento_sintetico(n) for n in TAMANHOS]}, f)
+
+        qb = QueryBuilder(None, pasta_metadados=pasta)
+        filtros = [("dbo.Fato.DataMovimento BETWEEN ? AND ?", ("2024-01-01", "2024-12-31"))]
+        print(f"{'joins/dims':>10} {'compilando (us)':>16} {'em cache (us)':>14} {'ganho':>7}")
+        for n in TAMANHOS:
+            aliases = {('dbo', 'Fato'): 'f'}
+            aliases.update({('dbo', f"Dim{i}"): f"d{i}" for i in range(n)})
+
+            def gerar():
+                return qb.gerar_sql_por_agrupamento('bench', f"n{n}", filtros, aliases)
+
+            def compilando():
+                qb.compilador_agrupamentos.clear()
+                return gerar()
+
+            esperado = compilando()
+            assert gerar() == esperado
+            frio = medir(compilando, max(1, repeticoes // max(1, n)))
+            quente = medir(gerar, repeticoes)
+            print(f"{n:>10} {frio:>16.1f} {quente:>14.1f} {frio / quente:>6.0f}x")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,77 @@
+"""Micro-benchmark do gráfico agregado no servidor contra a agregação no cliente.
+
+Usa um banco SQLite em memória como servidor (o SQLite aceita os
+identificadores entre colchetes gerados por montar_sql_agregacao) com N
+linhas de detalhe em 12 categorias, e compara:
+
+- cliente: trazer todas as linhas (fetchall) e agregar com pandas, como
+  `ChartGenerator.create_chart`;
+- servidor: executar a SQL de `montar_sql_agregacao` e receber só a série.
+
+Somente a obtenção da série é medida (sem desenhar a figura). A coluna
+"linhas" mostra quantas linhas cada caminho transfere do banco.
+
+Uso: python tools/bench_grafico_servidor.py [repeticoes]
+"""
+import os
+import random
+import sqlite3
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from chart_generator import AggregationType, montar_sql_agregacao
+
+TAMANHOS = (10_000, 100_000, 1_000_000)
+SQL = "SELECT Mes, Produto, Valor FROM Vendas WHERE Valor > ?"
+COLUNAS = ['Mes', 'Produto', 'Valor']
+
+
+def criar_banco(n):
+    rnd = random.Random(42)
+    conn = sqlite3.connect(':memory:')
+    conn.execute("CREATE TABLE Vendas (Mes TEXT, Produto TEXT, Valor REAL)")
+    conn.executemany(
+        "INSERT INTO Vendas VALUES (?, ?, ?)",
+        ((f"2025-{rnd.randint(1, 12):02d}", f"P{rnd.randint(1, 500)}", rnd.random() * 100) for _ in range(n)),
+    )
+    return conn
+
+
+def cliente(conn):
+    linhas = conn.execute(SQL, (0,)).fetchall()
+    df = pd.DataFrame(linhas, columns=COLUNAS)
+    return len(linhas), df.groupby('Mes', observed=True)['Valor'].sum()
+
+
+def servidor(conn, sql):
+    linhas = conn.execute(sql, (0,)).fetchall()
+    return len(linhas), pd.Series([r[1] for r in linhas], index=[r[0] for r in linhas])
+
+
+def medir(fn, repeticoes):
+    """Milissegundos por chamada."""
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        fn()
+    return (time.perf_counter() - inicio) / repeticoes * 1e3
+
+
+def main(repeticoes=3):
+    sql = montar_sql_agregacao(SQL, COLUNAS, 'Mes', 'Valor', AggregationType.SUM)
+    print(f"{'N':>9} {'cliente (ms)':>13} {'linhas':>9} {'servidor (ms)':>14} {'linhas':>7} {'igual':>6}")
+    for n in TAMANHOS:
+        conn = criar_banco(n)
+        linhas_c, serie_c = cliente(conn)
+        linhas_s, serie_s = servidor(conn, sql)
+        igual = 'sim' if (serie_c.round(6).values == serie_s.round(6).values).all() else 'não'
+        t_c = medir(lambda: cliente(conn), repeticoes)
+        t_s = medir(lambda: servidor(conn, sql), repeticoes)
+        print(f"{n:>9} {t_c:>13.1f} {linhas_c:>9} {t_s:>14.1f} {linhas_s:>7} {igual:>6}")
+        conn.close()
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 3)
@@ -0,0 +1,206 @@
+"""Micro-benchmark do tokenizador de SQL contra as expressões regulares antigas.
+
+Compara, em consultas geradas com N condições/joins, os caminhos que
+passaram a usar tokenizador_sql:
+
+- reescrita de aliases no ON (rewrite_on_expr de gerar_sql_por_agrupamento);
+- extração do WHERE (extrair_where_do_sql de main.py);
+- qualificação de colunas no WHERE digitado (_qualify_where_text de main.py);
+- normalização para a chave do cache (result_cache.normalizar_sql).
+
+As versões antigas estão copiadas abaixo (funções `legado_*`) apenas para
+a comparação. Os quatro caminhos rodam sobre a mesma SQL gerada, com o
+cache de tokens vazio a cada chamada; na linha "os quatro" a SQL é
+tokenizada uma vez e os quatro caminhos usam a mesma lista de tokens.
+Cada linha informa também se o resultado coincide — nas consultas
+geradas há literais, colchetes e subconsultas em que as versões antigas
+erravam, por isso "igual" pode ser "não".
+
+Uso: python tools/bench_tokenizador.py [repeticoes]
+"""
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from compilador_agrupamentos import _Aliases, _reescrever_on
+from tokenizador_sql import extrair_clausula, limpar_cache, normalizar, qualificar_colunas
+
+TAMANHOS = (10, 100, 1000)
+
+
+# ---------------------------------------------------------------- versões antigas
+
+def legado_rewrite_on_expr(on_expr, aliases):
+    token_re = re.compile(r"(?P<tok>(?:\[[^\]]+\]|[A-Za-z0-9_]+)(?:\.(?:\[[^\]]+\]|[A-Za-z0-9_]+)){1,2})")
+    out = []
+    last = 0
+    for m in token_re.finditer(on_expr):
+        start, end = m.span('tok')
+        out.append(on_expr[last:start])
+        tok = m.group('tok')
+        parts = [p.strip('[]') for p in tok.split('.')]
+        alias_repl = None
+        if len(parts) == 3:
+            schema, table, col = parts
+            if (schema, table) in aliases:
+                alias_repl = f"{aliases[(schema, table)]}.{col}"
+            else:
+                for (s2, t2), a2 in aliases.items():
+                    if t2.lower() == table.lower():
+                        alias_repl = f"{a2}.{col}"
+                        break
+        elif len(parts) == 2:
+            table, col = parts
+            for (s2, t2), a2 in aliases.items():
+                if t2.lower() == table.lower():
+                    alias_repl = f"{a2}.{col}"
+                    break
+        out.append(alias_repl if alias_repl else tok)
+        last = end
+    out.append(on_expr[last:])
+    return ''.join(out)
+
+
+def legado_extrair_where(sql):
+    match = re.search(r"\bWHERE\b(.*?)(\bGROUP BY\b|\bORDER BY\b|$)", sql, flags=re.IGNORECASE | re.DOTALL)
+    return match.group(1).strip() if match else ""
+
+
+def legado_qualify_where_text(text, main_alias, columns):
+    def replace_unquoted(s, pattern, repl):
+        out = []
+        i = 0
+        L = len(s)
+        while i < L:
+            if s[i] == "'":
+                j = i + 1
+                while j < L:
+                    if s[j] == "'":
+                        if j + 1 < L and s[j + 1] == "'":
+                            j += 2
+                            continue
+                        j += 1
+                        break
+                    j += 1
+                out.append(s[i:j])
+                i = j
+            else:
+                j = s.find("'", i)
+                segment = s[i:j] if j != -1 else s[i:]
+                out.append(pattern.sub(repl, segment))
+                if j == -1:
+                    break
+                i = j
+        return ''.join(out)
+
+    cols_sorted = sorted(columns, key=lambda x: -len(x))
+    compiled = re.compile(r"\b(" + '|'.join(re.escape(c) for c in cols_sorted) + r")\b", re.IGNORECASE)
+    return replace_unquoted(text, compiled, lambda m: f"{main_alias}.{m.group(1)}")
+
+
+def legado_normalizar(sql):
+    out = []
+    i = 0
+    n = len(sql)
+    pending_space = False
+    while i < n:
+        ch = sql[i]
+        if ch in ("'", '"', '['):
+            close = ']' if ch == '[' else ch
+            j = i + 1
+            while j < n:
+                if sql[j] == close:
+                    if j + 1 < n and sql[j + 1] == close:
+                        j += 2
+                        continue
+                    break
+                j += 1
+            if pending_space and out:
+                out.append(' ')
+            pending_space = False
+            out.append(sql[i:j + 1])
+            i = j + 1
+            continue
+        if ch == '-' and sql.startswith('--', i):
+            j = sql.find('\n', i)
+            i = n if j == -1 else j + 1
+            pending_space = True
+            continue
+        if ch == '/' and sql.startswith('/*', i):
+            j = sql.find('*/', i + 2)
+            i = n if j == -1 else j + 2
+            pending_space = True
+            continue
+        if ch.isspace():
+            pending_space = True
+            i += 1
+            continue
+        if pending_space and out:
+            out.append(' ')
+        pending_space = False
+        out.append(ch)
+        i += 1
+    texto = ''.join(out).strip()
+    while texto.endswith(';'):
+        texto = texto[:-1].rstrip()
+    return texto
+
+
+# ---------------------------------------------------------------- consultas geradas
+
+def gerar_sql(n):
+    """SELECT com n joins e 2n condições no WHERE, com literais e colchetes."""
+    joins = "\n".join(
+        f"INNER JOIN [dbo].[Dim{i % 50}] ON [dbo].[Fato].Cod{i} = [dbo].[Dim{i % 50}].Cod{i} AND Fato.Nome{i} <> 'Dim{i}.X'"
+        for i in range(n)
+    )
+    condicoes = " AND ".join(f"(Valor{i % 20} > {i} OR [Nome Cliente] LIKE 'group by {i}%')" for i in range(n))
+    return (
+        "SELECT Fato.Cod, SUM(Fato.Valor0) AS Total -- colunas\n"
+        f"FROM [dbo].[Fato]\n{joins}\n"
+        f"WHERE {condicoes} AND Fato.Cod IN (SELECT c.Cod FROM dbo.Cods c WHERE c.Ativo = 1)\n"
+        "GROUP BY Fato.Cod\nORDER BY Total DESC;"
+    )
+
+
+def medir(fn, repeticoes):
+    """Milissegundos por chamada, com o cache de tokens vazio a cada chamada."""
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        limpar_cache()
+        fn()
+    return (time.perf_counter() - inicio) / repeticoes * 1e3
+
+
+def main(repeticoes=20):
+    aliases = {('dbo', 'Fato'): 'f'}
+    aliases.update({('dbo', f"Dim{i}"): f"d{i}" for i in range(50)})
+    indice = _Aliases(aliases)
+    colunas = [f"Valor{i}" for i in range(20)]
+
+    print(f"{'caminho':<12} {'N':>5} {'chars':>8} {'regex (ms)':>11} {'tokens (ms)':>12} {'igual':>6}")
+    for n in TAMANHOS:
+        sql = gerar_sql(n)
+        casos = [
+            ('aliases', lambda: legado_rewrite_on_expr(sql, aliases), lambda: _reescrever_on(sql, indice)),
+            ('WHERE', lambda: legado_extrair_where(sql), lambda: extrair_clausula(sql)),
+            ('qualificar', lambda: legado_qualify_where_text(sql, 'f', colunas),
+             lambda: qualificar_colunas(sql, 'f', colunas)),
+            ('normalizar', lambda: legado_normalizar(sql), lambda: normalizar(sql)),
+        ]
+        casos.append((
+            'os quatro',
+            lambda: [antigo() for _, antigo, _ in casos[:4]],
+            lambda: [novo() for _, _, novo in casos[:4]],
+        ))
+        for nome, antigo, novo in casos:
+            limpar_cache()
+            igual = 'sim' if antigo() == novo() else 'não'
+            print(f"{nome:<12} {n:>5} {len(sql):>8} {medir(antigo, repeticoes):>11.2f} "
+                  f"{medir(novo, repeticoes):>12.2f} {igual:>6}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -0,0 +1,117 @@
+"""Micro-benchmark e corpus do validador de SQL (valida_sql).
+
+O corpus reúne consultas que o validador deve aceitar ou recusar, com o
+veredito esperado, mais consultas grandes geradas (N ramos UNION ALL, N
+condições). Para cada item são medidos:
+
+- antigo: o validador anterior (lower + um re.search por palavra proibida),
+  copiado abaixo apenas para a comparação;
+- frio: validar_sql com os caches de tokens e de vereditos vazios;
+- em cache: validar_sql de novo sobre a mesma SQL (como ao executar e
+  depois salvar a consulta).
+
+A coluna "ok" indica se o veredito do validador atual é o esperado e
+"antigo ok" se o do anterior era.
+
+Uso: python tools/bench_valida_sql.py [repeticoes]
+"""
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from tokenizador_sql import limpar_cache
+from valida_sql import cache_vereditos, validar_sql
+
+# (nome, sql, aceita?)
+CORPUS = [
+    ("select simples", "SELECT * FROM Produtos WHERE Ativo = 1", True),
+    ("sem where", "SELECT * FROM Produtos", False),
+    ("cliente Update Ltda", "SELECT * FROM Clientes WHERE Nome = 'Update Ltda'", True),
+    ("coluna [Delete]", "SELECT [Delete], Nome FROM Log WHERE Id > 10", True),
+    ("comentário com drop", "SELECT * FROM t -- drop table t\nWHERE a = 1", True),
+    ("';' em literal", "SELECT * FROM t WHERE Obs = 'a;b'", True),
+    ("';' final", "SELECT * FROM t WHERE a = 1;", True),
+    ("duas instruções", "SELECT * FROM t WHERE a = 1; DROP TABLE t", False),
+    ("duas sem ';'", "SELECT * FROM t WHERE a = 1 SELECT * FROM sys.sql_logins", False),
+    ("exec", "EXEC sp_configure", False),
+    ("update", "UPDATE t SET a = 1 WHERE b = 2", False),
+    ("merge", "MERGE t USING u ON t.a = u.a WHEN MATCHED THEN DELETE;", False),
+    ("union simples", "SELECT a FROM t WHERE 1=1 UNION SELECT a FROM u WHERE 1=1", False),
+    ("union all", "SELECT a FROM t WHERE 1=1 UNION ALL SELECT a FROM u WHERE 1=1", True),
+    ("ramo sem where", "SELECT a FROM t WHERE 1=1 UNION ALL SELECT a FROM u", False),
+    ("where só na subconsulta", "SELECT a FROM t WHERE a IN (SELECT b FROM u WHERE c = 1)", True),
+    ("cte", "WITH c AS (SELECT a FROM t) SELECT a FROM c WHERE a > 1", True),
+    ("comentário antes", "/* relatório */ SELECT a FROM t WHERE a > 1", True),
+]
+
+
+def gerar_union(n):
+    return "\nUNION ALL\n".join(
+        f"SELECT Cod, 'Update {i}' AS Origem FROM [dbo].[T{i}] WHERE Data >= '2024-01-01' -- ramo {i}"
+        for i in range(n)
+    )
+
+
+def gerar_condicoes(n):
+    condicoes = " AND ".join(f"(Valor{i} > {i} OR Nome LIKE 'delete {i}%')" for i in range(n))
+    return f"SELECT Cod, SUM(Valor0) AS Total FROM [dbo].[Fato] WHERE {condicoes} GROUP BY Cod"
+
+
+for _n in (10, 100, 1000):
+    CORPUS.append((f"union all x{_n}", gerar_union(_n), True))
+    CORPUS.append((f"condições x{_n}", gerar_condicoes(_n), True))
+
+
+def legado_validar_sql(sql):
+    s = (sql or "").strip()
+    if not s:
+        return False, "SQL vazia"
+    low = s.lower()
+    if ";" in s:
+        return False, "Múltiplas statements não permitidas; use apenas uma SELECT"
+    if re.search(r"\bexec\b", low):
+        return False, "EXEC não permitido"
+    for kw in ["insert", "update", "delete", "drop", "alter", "truncate"]:
+        if re.search(r"\b" + kw + r"\b", low):
+            return False, f"{kw.upper()} não permitido"
+    if re.search(r"\bunion\b(?!\s+all)", low):
+        return False, "UNION simples não permitido; use UNION ALL se necessário"
+    if not (low.startswith("select") or low.startswith("with")):
+        return False, "Somente SELECT é permitido"
+    if not re.search(r"\bwhere\b", low):
+        return False, "Falta cláusula WHERE"
+    return True, ""
+
+
+def medir(fn, repeticoes):
+    """Microssegundos por chamada."""
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        fn()
+    return (time.perf_counter() - inicio) / repeticoes * 1e6
+
+
+def frio(sql):
+    limpar_cache()
+    cache_vereditos.clear()
+    return validar_sql(sql)
+
+
+def main(repeticoes=50):
+    print(f"{'consulta':<24} {'chars':>7} {'antigo (us)':>12} {'frio (us)':>10} {'em cache (us)':>14} "
+          f"{'ok':>4} {'antigo ok':>10}")
+    for nome, sql, aceita in CORPUS:
+        ok = frio(sql)[0] == aceita
+        antigo_ok = legado_validar_sql(sql)[0] == aceita
+        antigo = medir(lambda: legado_validar_sql(sql), repeticoes)
+        t_frio = medir(lambda: frio(sql), repeticoes)
+        validar_sql(sql)
+        quente = medir(lambda: validar_sql(sql), repeticoes)
+        print(f"{nome:<24} {len(sql):>7} {antigo:>12.1f} {t_frio:>10.1f} {quente:>14.1f} "
+              f"{'sim' if ok else 'NÃO':>4} {'sim' if antigo_ok else 'não':>10}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
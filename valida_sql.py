@@ -2,52 +2,207 @@
 
 Fornece `validar_sql` e `validar_sql_for_save` que aplicam checagens
 conservadoras: permitem apenas SELECT e rejeitam comandos potencialmente
-modificadores (INSERT/UPDATE/DELETE/DROP) ou múltiplas statements.
+modificadores (INSERT/UPDATE/DELETE/DROP...) ou múltiplas statements.
+
+A SQL é lida uma vez, sobre os tokens de tokenizador_sql: palavras dentro
+de literais, comentários ou colchetes (ex.: um cliente 'Update Ltda') não
+contam. Na mesma passada são anotados o tipo de cada instrução, os
+comandos proibidos, UNION sem ALL e, para cada ramo de nível 0 da
+consulta (os SELECTs ligados por UNION ALL/EXCEPT/INTERSECT, e os ramos
+entre parênteses), se há WHERE. Um segundo SELECT de nível 0 no mesmo ramo
+é tratado como outra instrução, mesmo sem ';'.
+
+Os vereditos ficam guardados (LRU) pela impressão digital da SQL, de
+modo que executar e salvar a mesma consulta não a analisam de novo.
 """
-from typing import Tuple
-import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
 
+from tokenizador_sql import PALAVRA, SIMBOLO, impressao_digital, tokenizar
 
-def _normalize(sql: str) -> str:
-    return (sql or "").strip()
+DEFAULT_MAX_VEREDITOS = 512
 
+# comandos de escrita/DDL, na ordem em que são informados
+COMANDOS_PROIBIDOS = ("insert", "update", "delete", "drop", "alter", "truncate", "merge", "create")
+_PROIBIDOS = frozenset(c.upper() for c in COMANDOS_PROIBIDOS)
+_OPERADORES_CONJUNTO = frozenset(("UNION", "EXCEPT", "INTERSECT"))
 
-def validar_sql(sql: str) -> Tuple[bool, str]:
-    s = _normalize(sql)
-    if not s:
-        return False, "SQL vazia"
+MSG_VAZIA = "SQL vazia"
+MSG_MULTIPLAS = "Múltiplas statements não permitidas; use apenas uma SELECT"
+MSG_EXEC = "EXEC não permitido"
+MSG_UNION = "UNION simples não permitido; use UNION ALL se necessário"
+MSG_SOMENTE_SELECT = "Somente SELECT é permitido"
+MSG_SEM_WHERE = "Falta cláusula WHERE"
 
-    low = s.lower()
 
-    # Bloqueia múltiplas statements (presença de ';' indicando múltiplas)
-    if ";" in s:
-        return False, "Múltiplas statements não permitidas; use apenas uma SELECT"
+@dataclass
+class AnaliseSql:
+    # tipo de cada instrução: palavra inicial em maiúsculas (WITH conta como SELECT)
+    instrucoes: List[str] = field(default_factory=list)
+    tem_exec: bool = False
+    proibidos: set = field(default_factory=set)
+    union_simples: bool = False
+    ramos_sem_where: int = 0
 
-    # Bloqueia EXEC
-    if re.search(r"\bexec\b", low):
-        return False, "EXEC não permitido"
 
-    # Bloqueia comandos de escrita/DDL
-    for kw in ["insert", "update", "delete", "drop", "alter", "truncate"]:
-        if re.search(r"\b" + kw + r"\b", low):
-            return False, f"{kw.upper()} não permitido"
+class _Ramo:
+    """Estado do ramo corrente em um nível de parênteses."""
+    __slots__ = ("select", "where", "sub_ok", "ok", "consulta")
 
-    # UNION simples é proibido; UNION ALL é permitido
-    if re.search(r"\bunion\b(?!\s+all)", low):
-        return False, "UNION simples não permitido; use UNION ALL se necessário"
+    def __init__(self):
+        # houve SELECT em algum ramo deste nível
+        self.consulta = False
+        self.select = False
+        self.where = False
+        self.sub_ok: Optional[bool] = None
+        self.ok = True
 
-    # Deve começar com SELECT ou WITH (CTE)
-    if not (low.startswith("select") or low.startswith("with")):
-        return False, "Somente SELECT é permitido"
+    def fechar(self) -> bool:
+        """Fecha o ramo corrente; False quando é um SELECT sem WHERE."""
+        if self.select:
+            ramo_ok = self.where
+        else:
+            ramo_ok = self.sub_ok if self.sub_ok is not None else True
+        self.ok = self.ok and ramo_ok
+        self.select = self.where = False
+        self.sub_ok = None
+        return ramo_ok
 
-    # Requer cláusula WHERE em cada SELECT/CTE final (checagem simplificada)
-    # Procura por WHERE usando borda de palavra para cobrir quebras de linha/formatacoes
-    if not re.search(r"\bwhere\b", low):
-        return False, "Falta cláusula WHERE"
 
+def analisar_sql(sql: str) -> AnaliseSql:
+    """Percorre os tokens uma vez e anota o que a validação precisa."""
+    analise = AnaliseSql()
+    pilha = [_Ramo()]
+    inicio_instrucao = True
+    tokens = tokenizar(sql)
+    n = len(tokens)
+
+    def fechar_instrucao():
+        base = pilha[0]
+        if not base.fechar():
+            analise.ramos_sem_where += 1
+        pilha[1:] = []
+
+    for i, tok in enumerate(tokens):
+        if tok.tipo == SIMBOLO:
+            if tok.texto == ';' and len(pilha) == 1:
+                fechar_instrucao()
+                pilha[0] = _Ramo()
+                inicio_instrucao = True
+                continue
+            if tok.texto == '(':
+                pilha.append(_Ramo())
+            elif tok.texto == ')' and len(pilha) > 1:
+                filho = pilha.pop()
+                filho.fechar()
+                pai = pilha[-1]
+                # ramo entre parênteses: ... UNION ALL (SELECT ...)
+                if not pai.select and filho.consulta:
+                    pai.sub_ok = filho.ok
+        if inicio_instrucao:
+            inicio_instrucao = False
+            palavra = tok.palavra or tok.texto
+            analise.instrucoes.append('SELECT' if palavra == 'WITH' else palavra)
+        if tok.tipo != PALAVRA:
+            continue
+        palavra = tok.palavra
+        ramo = pilha[-1]
+        if palavra == 'SELECT':
+            if ramo.select and len(pilha) == 1:
+                # outro SELECT de nível 0 no mesmo ramo: nova instrução sem ';'
+                fechar_instrucao()
+                pilha[0] = _Ramo()
+                ramo = pilha[0]
+                analise.instrucoes.append('SELECT')
+            ramo.select = ramo.consulta = True
+        elif palavra == 'WHERE':
+            ramo.where = True
+        elif palavra in _OPERADORES_CONJUNTO:
+            if palavra == 'UNION' and not (i + 1 < n and tokens[i + 1].palavra == 'ALL'):
+                analise.union_simples = True
+            if not ramo.fechar() and len(pilha) == 1:
+                analise.ramos_sem_where += 1
+        elif palavra in ('EXEC', 'EXECUTE'):
+            analise.tem_exec = True
+        elif palavra in _PROIBIDOS:
+            analise.proibidos.add(palavra.lower())
+    if analise.instrucoes:
+        fechar_instrucao()
+    return analise
+
+
+def _veredito(analise: AnaliseSql) -> Tuple[bool, str]:
+    if not analise.instrucoes:
+        return False, MSG_VAZIA
+    if len(analise.instrucoes) > 1:
+        return False, MSG_MULTIPLAS
+    if analise.tem_exec:
+        return False, MSG_EXEC
+    for kw in COMANDOS_PROIBIDOS:
+        if kw in analise.proibidos:
+            return False, f"{kw.upper()} não permitido"
+    if analise.union_simples:
+        return False, MSG_UNION
+    if analise.instrucoes[0] != 'SELECT':
+        return False, MSG_SOMENTE_SELECT
+    if analise.ramos_sem_where:
+        return False, MSG_SEM_WHERE
     return True, ""
 
 
+class CacheVereditos:
+    """Vereditos por impressão digital da SQL, com descarte LRU."""
+
+    def __init__(self, max_entradas: int = DEFAULT_MAX_VEREDITOS):
+        self.max_entradas = max_entradas
+        self._lock = threading.Lock()
+        self._vereditos: "OrderedDict[str, Tuple[bool, str]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, chave: str) -> Optional[Tuple[bool, str]]:
+        with self._lock:
+            veredito = self._vereditos.get(chave)
+            if veredito is None:
+                self.misses += 1
+                return None
+            self._vereditos.move_to_end(chave)
+            self.hits += 1
+            return veredito
+
+    def put(self, chave: str, veredito: Tuple[bool, str]):
+        with self._lock:
+            self._vereditos[chave] = veredito
+            self._vereditos.move_to_end(chave)
+            while len(self._vereditos) > max(1, self.max_entradas):
+                self._vereditos.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._vereditos.clear()
+
+
+cache_vereditos = CacheVereditos()
+
+
+def _normalize(sql: str) -> str:
+    return (sql or "").strip()
+
+
+def validar_sql(sql: str) -> Tuple[bool, str]:
+    s = _normalize(sql)
+    if not s:
+        return False, MSG_VAZIA
+    chave = impressao_digital(s)
+    veredito = cache_vereditos.get(chave)
+    if veredito is None:
+        veredito = _veredito(analisar_sql(s))
+        cache_vereditos.put(chave, veredito)
+    return veredito
+
+
 def validar_sql_for_save(sql: str) -> Tuple[bool, str]:
     # Mesmas regras para salvar
     return validar_sql(sql)
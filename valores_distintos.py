@@ -0,0 +1,130 @@
+"""
+Valores distintos de uma coluna, paginados, para o filtro IN do CSData Studio
+
+O editor de valores do operador IN só aceitava valores digitados. A lista
+de valores existentes vem do servidor, página a página:
+
+    SELECT DISTINCT [col] FROM [schema].[tabela]
+    WHERE [col] IS NOT NULL AND [col] LIKE 'prefixo%'
+    ORDER BY [col] OFFSET n ROWS FETCH NEXT tamanho + 1 ROWS ONLY
+
+A linha a mais indica se há uma próxima página. Quando a página anterior
+está em cache, a seguinte é pedida a partir do último valor dela
+(`[col] > ?`, OFFSET 0) em vez de pular as linhas de novo — assim uma
+coluna como NomeCliente, com centenas de milhares de valores, continua
+navegável sem trazer todos os valores.
+
+`CachePaginasDistintos` guarda as páginas por (coluna, prefixo, número),
+em ordem LRU. Se a primeira página de um prefixo mais curto já trouxe
+todos os valores, a de um prefixo mais longo é filtrada dela sem consultar
+o banco (a comparação ignora maiúsculas/minúsculas, como a collation padrão
+do SQL Server).
+"""
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Tuple
+
+DEFAULT_TAMANHO_PAGINA = 200
+DEFAULT_MAX_PAGINAS = 300
+
+
+@dataclass
+class PaginaValores:
+    valores: List[Any] = field(default_factory=list)
+    tem_mais: bool = False
+
+
+def escapar_like(texto: str) -> str:
+    """Escapa os curingas do LIKE (usar com ESCAPE '\\')."""
+    for c in ('\\', '%', '_', '['):
+        texto = texto.replace(c, '\\' + c)
+    return texto
+
+
+def _quote(nome: str) -> str:
+    return "[" + str(nome).strip('[]').replace("]", "]]") + "]"
+
+
+def sql_pagina_distintos(
+    schema: str,
+    table: str,
+    column: str,
+    prefixo: str = '',
+    offset: int = 0,
+    tamanho: int = DEFAULT_TAMANHO_PAGINA,
+    apos: Optional[tuple] = None,
+) -> Tuple[str, list]:
+    """(sql, params) de uma página de valores distintos, com uma linha a mais.
+
+    `apos=(valor,)` pede os valores depois de `valor` (continuação pela chave).
+    """
+    col = _quote(column)
+    condicoes = [f"{col} IS NOT NULL"]
+    params: list = []
+    if prefixo:
+        condicoes.append(f"{col} LIKE ? ESCAPE '\\'")
+        params.append(escapar_like(prefixo) + '%')
+    if apos is not None:
+        condicoes.append(f"{col} > ?")
+        params.append(apos[0])
+        offset = 0
+    sql = (
+        f"SELECT DISTINCT {col} FROM {_quote(schema or 'dbo')}.{_quote(table)}\n"
+        f"WHERE {' AND '.join(condicoes)}\n"
+        f"ORDER BY {col} OFFSET {int(offset)} ROWS FETCH NEXT {int(tamanho) + 1} ROWS ONLY"
+    )
+    return sql, params
+
+
+def montar_pagina(linhas: List[tuple], tamanho: int) -> PaginaValores:
+    valores = [r[0] for r in linhas]
+    return PaginaValores(valores=valores[:tamanho], tem_mais=len(valores) > tamanho)
+
+
+class CachePaginasDistintos:
+    """Páginas de valores distintos por coluna, com descarte LRU."""
+
+    def __init__(self, max_paginas: int = DEFAULT_MAX_PAGINAS):
+        self.max_paginas = max_paginas
+        self._lock = threading.Lock()
+        # (coluna, prefixo, número) -> PaginaValores
+        self._paginas: "OrderedDict[Tuple[str, str, int], PaginaValores]" = OrderedDict()
+
+    def get(self, coluna: str, prefixo: str, numero: int) -> Optional[PaginaValores]:
+        with self._lock:
+            pagina = self._paginas.get((coluna, prefixo, numero))
+            if pagina is not None:
+                self._paginas.move_to_end((coluna, prefixo, numero))
+                return pagina
+            if numero != 0:
+                return None
+            # um prefixo mais curto com todos os valores em uma página já responde
+            alvo = prefixo.casefold()
+            for k in range(len(prefixo) - 1, -1, -1):
+                base = self._paginas.get((coluna, prefixo[:k], 0))
+                if base is not None and not base.tem_mais:
+                    return PaginaValores(
+                        valores=[v for v in base.valores if str(v).casefold().startswith(alvo)],
+                        tem_mais=False,
+                    )
+            return None
+
+    def put(self, coluna: str, prefixo: str, numero: int, pagina: PaginaValores):
+        with self._lock:
+            self._paginas[(coluna, prefixo, numero)] = pagina
+            self._paginas.move_to_end((coluna, prefixo, numero))
+            while len(self._paginas) > max(1, self.max_paginas):
+                self._paginas.popitem(last=False)
+
+    def ultimo_valor(self, coluna: str, prefixo: str, numero: int) -> Optional[tuple]:
+        """(último valor,) da página em cache, sem alterar a ordem LRU; None se não houver."""
+        with self._lock:
+            pagina = self._paginas.get((coluna, prefixo, numero))
+        if pagina is None or not pagina.valores:
+            return None
+        return (pagina.valores[-1],)
+
+    def clear(self):
+        with self._lock:
+            self._paginas.clear()